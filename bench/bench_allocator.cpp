@@ -1,10 +1,16 @@
 /// @file bench_allocator.cpp
-/// @brief Micro-benchmarks for the free-list allocator hot paths.
+/// @brief Micro-benchmarks for the allocator engines' hot paths.
 
 #include "allocator/arena.hpp"
+#include "allocator/buddy.hpp"
 #include "allocator/free_list.hpp"
+#include "allocator/tlsf.hpp"
 
+#include <algorithm>
 #include <benchmark/benchmark.h>
+#include <chrono>
+#include <memory>
+#include <random>
 #include <vector>
 
 using namespace mmap_viz;
@@ -81,3 +87,235 @@ static void BM_FragmentedAllocDealloc(benchmark::State &state) {
   }
 }
 BENCHMARK(BM_FragmentedAllocDealloc);
+
+// Churn over a mixed-size trace for each placement policy. Reports per-op
+// latency plus end-state fragmentation: how much of the free space is still
+// reachable as one contiguous block.
+static void BM_PolicyChurn(benchmark::State &state) {
+  const auto policy = static_cast<PlacementPolicy>(state.range(0));
+  auto arena = Arena::create(4 * 1024 * 1024).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity(), policy};
+
+  // Pre-generate the trace so RNG cost stays out of the timed loop.
+  constexpr std::size_t kTraceLen = 1 << 14;
+  constexpr std::size_t kMaxLive = 2048;
+  std::mt19937 rng{42};
+  std::uniform_int_distribution<std::size_t> size_dist{144, 4096};
+  std::uniform_int_distribution<int> op_dist{0, 2};
+  std::vector<std::size_t> sizes(kTraceLen);
+  std::vector<bool> is_alloc(kTraceLen);
+  std::vector<std::size_t> victims(kTraceLen);
+  for (std::size_t i = 0; i < kTraceLen; ++i) {
+    sizes[i] = size_dist(rng);
+    is_alloc[i] = op_dist(rng) != 0;
+    victims[i] = rng();
+  }
+
+  std::vector<AllocationResult> live;
+  live.reserve(kMaxLive);
+  std::size_t i = 0;
+
+  for (auto _ : state) {
+    const auto t = i++ % kTraceLen;
+    if (live.empty() || (is_alloc[t] && live.size() < kMaxLive)) {
+      auto r = alloc.allocate(sizes[t], 16);
+      benchmark::DoNotOptimize(r);
+      if (r.has_value())
+        live.push_back(*r);
+    } else {
+      auto idx = victims[t] % live.size();
+      alloc.deallocate(live[idx].ptr, live[idx].actual_size);
+      live[idx] = live.back();
+      live.pop_back();
+    }
+  }
+
+  const auto free_bytes = static_cast<double>(alloc.bytes_free());
+  const auto largest = static_cast<double>(alloc.largest_free_block());
+  state.SetLabel(to_string(policy));
+  state.counters["bytes_free"] = free_bytes;
+  state.counters["largest_free_block"] = largest;
+  state.counters["free_blocks"] =
+      static_cast<double>(alloc.free_block_count());
+  state.counters["frag_pct"] =
+      free_bytes > 0 ? 100.0 * (1.0 - largest / free_bytes) : 0.0;
+}
+BENCHMARK(BM_PolicyChurn)
+    ->Arg(static_cast<int>(PlacementPolicy::FirstFit))
+    ->Arg(static_cast<int>(PlacementPolicy::BestFit))
+    ->Arg(static_cast<int>(PlacementPolicy::NextFit));
+
+// Per-operation latency of each engine over the same mixed-size churn.
+// Every operation is timed on its own, so the counters show the tail the
+// mean hides: TLSF bounds each allocate and free by a constant, while the
+// RB tree's cost grows with the number of free blocks.
+static auto make_engine(EngineKind kind, Arena &arena)
+    -> std::unique_ptr<AllocatorEngine> {
+  switch (kind) {
+  case EngineKind::Tlsf:
+    return std::make_unique<TlsfAllocator>(arena.base(), arena.capacity());
+  case EngineKind::Buddy:
+    return std::make_unique<BuddyAllocator>(arena.base(), arena.capacity());
+  case EngineKind::FreeList:
+    break;
+  }
+  return std::make_unique<FreeListAllocator>(arena.base(), arena.capacity());
+}
+
+static void BM_EngineLatency(benchmark::State &state) {
+  const auto kind = static_cast<EngineKind>(state.range(0));
+  auto arena = Arena::create(16 * 1024 * 1024).value();
+  auto alloc = make_engine(kind, arena);
+
+  constexpr std::size_t kTraceLen = 1 << 14;
+  constexpr std::size_t kMaxLive = 2048;
+  std::mt19937 rng{42};
+  std::uniform_int_distribution<std::size_t> size_dist{16, 8192};
+  std::vector<std::size_t> sizes(kTraceLen);
+  std::vector<std::size_t> victims(kTraceLen);
+  for (std::size_t i = 0; i < kTraceLen; ++i) {
+    sizes[i] = size_dist(rng);
+    victims[i] = rng();
+  }
+
+  std::vector<AllocationResult> live;
+  live.reserve(kMaxLive);
+  std::vector<std::int64_t> ns;
+  ns.reserve(1 << 20);
+  std::size_t i = 0;
+
+  for (auto _ : state) {
+    const auto t = i++ % kTraceLen;
+    // Alternate towards a half-full heap so frees punch holes everywhere.
+    const bool do_alloc = live.size() < kMaxLive / 2 || (victims[t] & 1);
+    const auto start = std::chrono::steady_clock::now();
+    if (do_alloc && live.size() < kMaxLive) {
+      auto r = alloc->allocate(sizes[t], 16);
+      benchmark::DoNotOptimize(r);
+      if (r.has_value())
+        live.push_back(*r);
+    } else if (!live.empty()) {
+      auto idx = victims[t] % live.size();
+      (void)alloc->deallocate(live[idx].ptr, live[idx].actual_size);
+      live[idx] = live.back();
+      live.pop_back();
+    }
+    const auto elapsed = std::chrono::steady_clock::now() - start;
+    if (ns.size() < ns.capacity()) {
+      ns.push_back(
+          std::chrono::duration_cast<std::chrono::nanoseconds>(elapsed)
+              .count());
+    }
+  }
+
+  std::sort(ns.begin(), ns.end());
+  auto pct = [&](double p) {
+    return ns.empty() ? 0.0
+                      : static_cast<double>(
+                            ns[static_cast<std::size_t>(p * (ns.size() - 1))]);
+  };
+  state.SetLabel(to_string(kind));
+  state.counters["p50_ns"] = pct(0.5);
+  state.counters["p99_ns"] = pct(0.99);
+  state.counters["p99.9_ns"] = pct(0.999);
+  state.counters["max_ns"] = pct(1.0);
+  state.counters["free_blocks"] =
+      static_cast<double>(alloc->free_block_count());
+  state.counters["frag_pct"] =
+      static_cast<double>(alloc->fragmentation_pct());
+}
+BENCHMARK(BM_EngineLatency)
+    ->Arg(static_cast<int>(EngineKind::FreeList))
+    ->Arg(static_cast<int>(EngineKind::Tlsf))
+    ->Arg(static_cast<int>(EngineKind::Buddy));
+
+/// Churn of power-of-two blocks from 4 KB to 1 MB, the sizes a buddy
+/// allocator serves without rounding. Reports per-op time and how much of
+/// the free space is usable as one block afterwards.
+static void BM_PowerOfTwoChurn(benchmark::State &state) {
+  const auto kind = static_cast<EngineKind>(state.range(0));
+  auto arena = Arena::create(64 * 1024 * 1024).value();
+  auto alloc = make_engine(kind, arena);
+
+  constexpr std::size_t kTraceLen = 1 << 12;
+  constexpr std::size_t kMaxLive = 96;
+  std::mt19937 rng{42};
+  std::vector<std::size_t> sizes(kTraceLen);
+  std::vector<std::size_t> victims(kTraceLen);
+  for (std::size_t i = 0; i < kTraceLen; ++i) {
+    sizes[i] = std::size_t{4096} << (rng() % 9);
+    victims[i] = rng();
+  }
+
+  std::vector<AllocationResult> live;
+  live.reserve(kMaxLive);
+  std::size_t i = 0;
+  std::size_t failed = 0;
+
+  for (auto _ : state) {
+    const auto t = i++ % kTraceLen;
+    const bool do_alloc = live.size() < kMaxLive / 2 || (victims[t] & 1);
+    if (do_alloc && live.size() < kMaxLive) {
+      auto r = alloc->allocate(sizes[t], 16);
+      benchmark::DoNotOptimize(r);
+      if (r.has_value()) {
+        live.push_back(*r);
+      } else {
+        ++failed;
+      }
+    } else if (!live.empty()) {
+      auto idx = victims[t] % live.size();
+      (void)alloc->deallocate(live[idx].ptr, live[idx].actual_size);
+      live[idx] = live.back();
+      live.pop_back();
+    }
+  }
+
+  state.SetLabel(to_string(kind));
+  state.counters["failed"] = static_cast<double>(failed);
+  state.counters["free_blocks"] =
+      static_cast<double>(alloc->free_block_count());
+  state.counters["frag_pct"] =
+      static_cast<double>(alloc->fragmentation_pct());
+}
+BENCHMARK(BM_PowerOfTwoChurn)
+    ->Arg(static_cast<int>(EngineKind::FreeList))
+    ->Arg(static_cast<int>(EngineKind::Tlsf))
+    ->Arg(static_cast<int>(EngineKind::Buddy));
+
+/// Free-heavy phase: fill the allocator with tree-sized blocks, then time
+/// freeing all of them in random order. Arg = deferred-coalescing threshold
+/// (0 = eager coalescing).
+static void BM_FreeHeavyPhase(benchmark::State &state) {
+  const auto threshold = static_cast<std::size_t>(state.range(0));
+  auto arena = Arena::create(64 * 1024 * 1024).value();
+
+  constexpr std::size_t kBlocks = 4096;
+  std::mt19937 rng{42};
+  std::uniform_int_distribution<std::size_t> size_dist{4160, 16384};
+  std::vector<std::size_t> sizes(kBlocks);
+  for (auto &s : sizes) {
+    s = size_dist(rng);
+  }
+  std::vector<AllocationResult> blocks(kBlocks);
+
+  for (auto _ : state) {
+    FreeListAllocator alloc{arena.base(), arena.capacity()};
+    alloc.set_deferred_coalescing(threshold);
+    for (std::size_t i = 0; i < kBlocks; ++i) {
+      blocks[i] = alloc.allocate(sizes[i], 16).value();
+    }
+    std::shuffle(blocks.begin(), blocks.end(), rng);
+
+    const auto start = std::chrono::steady_clock::now();
+    for (const auto &b : blocks) {
+      (void)alloc.deallocate(b.ptr, b.actual_size);
+    }
+    alloc.coalesce();
+    const auto elapsed = std::chrono::steady_clock::now() - start;
+    state.SetIterationTime(std::chrono::duration<double>(elapsed).count());
+    benchmark::DoNotOptimize(alloc.largest_free_block());
+  }
+  state.SetItemsProcessed(state.iterations() * kBlocks);
+}
+BENCHMARK(BM_FreeHeavyPhase)->Arg(0)->Arg(64)->Arg(1024)->UseManualTime();
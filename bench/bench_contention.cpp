@@ -1,9 +1,17 @@
+#include "interface/biased_mutex.hpp"
 #include "interface/visualization_arena.hpp"
+#include <algorithm>
+#include <array>
 #include <atomic>
 #include <benchmark/benchmark.h>
+#include <chrono>
 #include <thread>
 #include <vector>
 
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#endif
+
 using namespace mmap_viz;
 
 // Multithreaded allocation benchmark to measure shard contention
@@ -23,10 +31,233 @@ static void BM_Contention_Allocation(benchmark::State &state) {
       break;
     }
   }
+
+  if (state.thread_index() == 0) {
+    auto mag = va.magazine_stats();
+    state.counters["mag_hit_pct"] =
+        100.0 * static_cast<double>(mag.hits) /
+        static_cast<double>(std::max<std::size_t>(mag.hits + mag.misses, 1));
+    auto fb = va.fallback_stats();
+    state.counters["fallbacks"] = static_cast<double>(fb.attempts);
+    state.counters["fallback_avg_ns"] =
+        static_cast<double>(fb.total_ns) /
+        static_cast<double>(std::max<std::size_t>(fb.attempts, 1));
+  }
 }
 
 // Register for various thread counts
 BENCHMARK(BM_Contention_Allocation)
     ->ThreadRange(1, std::thread::hardware_concurrency());
 
+// Throughput vs thread count for static sharding (256 shards, round-robin,
+// no rebinding) and adaptive sharding (hardware-derived count, least-loaded
+// placement, rebinding). Each iteration spawns fresh threads, and every
+// other one exits early, so placement has to cope with thread churn.
+// Args: {adaptive, threads}.
+static void BM_ShardMode(benchmark::State &state) {
+  const bool adaptive = state.range(0) != 0;
+  const auto threads = static_cast<int>(state.range(1));
+  constexpr int kOpsPerThread = 20000;
+
+  auto va = VisualizationArena::create(
+                {.arena_size = 256 * 1024 * 1024,
+                 .magazine_size = 0, // Every operation takes a shard lock.
+                 .shard_count = adaptive ? std::size_t{0} : std::size_t{256},
+                 .rebind_threads = adaptive})
+                .value();
+
+  std::size_t ops = 0;
+  for (auto _ : state) {
+    std::vector<std::thread> pool;
+    for (int t = 0; t < threads; ++t) {
+      const int rounds = t % 2 == 0 ? kOpsPerThread : kOpsPerThread / 8;
+      pool.emplace_back([&va, rounds] {
+        std::array<void *, 8> live{};
+        for (int i = 0; i < rounds; ++i) {
+          auto &slot = live[static_cast<std::size_t>(i) % live.size()];
+          va.dealloc_raw(slot, 0);
+          slot = va.alloc_raw(32 + (i % 16) * 16, 16, "shard");
+        }
+        for (void *p : live) {
+          va.dealloc_raw(p, 0);
+        }
+      });
+      ops += static_cast<std::size_t>(rounds);
+    }
+    for (auto &t : pool) {
+      t.join();
+    }
+  }
+
+  std::uint64_t acquisitions = 0;
+  std::uint64_t contentions = 0;
+  for (const auto &s : va.shard_stats()) {
+    acquisitions += s.acquisitions;
+    contentions += s.contentions;
+  }
+  state.SetLabel(adaptive ? "adaptive" : "static");
+  state.SetItemsProcessed(static_cast<std::int64_t>(ops));
+  state.counters["shards"] = static_cast<double>(va.shard_count());
+  state.counters["rebinds"] = static_cast<double>(va.thread_rebinds());
+  state.counters["contended_pct"] =
+      100.0 * static_cast<double>(contentions) /
+      static_cast<double>(std::max<std::uint64_t>(acquisitions, 1));
+}
+
+static void ShardModeArgs(benchmark::internal::Benchmark *b) {
+  const auto max_threads =
+      static_cast<int>(std::max(2u, 2 * std::thread::hardware_concurrency()));
+  for (int adaptive : {0, 1}) {
+    for (int threads = 1; threads <= max_threads; threads *= 2) {
+      b->Args({adaptive, threads});
+    }
+  }
+}
+BENCHMARK(BM_ShardMode)->Apply(ShardModeArgs)->UseRealTime();
+
+// Timestamp counter ticks (nanoseconds where there is no TSC).
+static auto cycles() -> std::uint64_t {
+#if defined(__x86_64__) || defined(__i386__)
+  return __rdtsc();
+#else
+  return static_cast<std::uint64_t>(
+      std::chrono::steady_clock::now().time_since_epoch().count());
+#endif
+}
+
+// Cycles of one uncontended lock/unlock pair of a shard mutex, taken on
+// the mutex (biased = false) or on the owner fast path (biased = true).
+static auto lock_pair_cycles(bool biased) -> double {
+  constexpr int kPairs = 1 << 20;
+  BiasedMutex m;
+  m.set_bias_enabled(biased);
+  for (std::uint32_t i = 0; i < BiasedMutex::kBiasStreak; ++i) {
+    std::lock_guard lock(m);
+  }
+  const auto start = cycles();
+  for (int i = 0; i < kPairs; ++i) {
+    m.lock();
+    benchmark::ClobberMemory();
+    m.unlock();
+  }
+  return static_cast<double>(cycles() - start) / kPairs;
+}
+
+// Run @p threads threads of @p ops alloc/free pairs each, 8 blocks live per
+// thread. Returns the number of pairs.
+static auto churn_threads(VisualizationArena &va, int threads, int ops)
+    -> std::size_t {
+  std::vector<std::thread> pool;
+  for (int t = 0; t < threads; ++t) {
+    pool.emplace_back([&va, ops] {
+      std::array<void *, 8> live{};
+      for (int i = 0; i < ops; ++i) {
+        auto &slot = live[static_cast<std::size_t>(i) % live.size()];
+        va.dealloc_raw(slot, 0);
+        slot = va.alloc_raw(32 + (i % 16) * 16, 16, "churn");
+      }
+      for (void *p : live) {
+        va.dealloc_raw(p, 0);
+      }
+    });
+  }
+  for (auto &t : pool) {
+    t.join();
+  }
+  return static_cast<std::size_t>(threads) * static_cast<std::size_t>(ops);
+}
+
+// Owner-thread lock elision: every thread churns its own shard, so after a
+// short streak each shard is biased towards its thread and alloc/free skip
+// the mutex. lock_cycles_saved_per_op is the fast path's saving per lock
+// pair times the biased lock acquisitions per operation.
+// Args: {biased, threads}.
+static void BM_LockElision(benchmark::State &state) {
+  const bool biased = state.range(0) != 0;
+  const auto threads = static_cast<int>(state.range(1));
+  constexpr int kOpsPerThread = 50000;
+  static const double saved_per_pair =
+      lock_pair_cycles(false) - lock_pair_cycles(true);
+
+  auto va = VisualizationArena::create(
+                {.arena_size = 256 * 1024 * 1024,
+                 .magazine_size = 0, // Every operation takes a shard lock.
+                 .shard_count = static_cast<std::size_t>(threads),
+                 .biased_locking = biased})
+                .value();
+
+  std::size_t ops = 0;
+  for (auto _ : state) {
+    ops += churn_threads(va, threads, kOpsPerThread);
+  }
+
+  std::uint64_t acquisitions = 0;
+  std::uint64_t fast = 0;
+  std::uint64_t revocations = 0;
+  for (const auto &s : va.shard_stats()) {
+    acquisitions += s.acquisitions;
+    fast += s.biased_acquisitions;
+    revocations += s.bias_revocations;
+  }
+  const auto per_op = [&](std::uint64_t n) {
+    return static_cast<double>(n) /
+           static_cast<double>(std::max<std::size_t>(ops, 1));
+  };
+  state.SetLabel(biased ? "biased" : "mutex");
+  state.SetItemsProcessed(static_cast<std::int64_t>(ops));
+  state.counters["biased_pct"] =
+      100.0 * static_cast<double>(fast) /
+      static_cast<double>(std::max<std::uint64_t>(acquisitions, 1));
+  state.counters["revocations"] = static_cast<double>(revocations);
+  state.counters["lock_cycles_saved_per_op"] = per_op(fast) * saved_per_pair;
+}
+
+static void LockElisionArgs(benchmark::internal::Benchmark *b) {
+  const auto max_threads =
+      static_cast<int>(std::max(1u, std::thread::hardware_concurrency()));
+  for (int biased : {0, 1}) {
+    for (int threads = 1; threads <= max_threads; threads *= 2) {
+      b->Args({biased, threads});
+    }
+  }
+}
+BENCHMARK(BM_LockElision)->Apply(LockElisionArgs)->UseRealTime();
+
+// Cost of ArenaConfig::lock_histograms: two clock reads and two histogram
+// updates per shard lock when on, one branch per lock and unlock when off.
+// Args: {lock_histograms, threads}.
+static void BM_LockHistograms(benchmark::State &state) {
+  const bool enabled = state.range(0) != 0;
+  const auto threads = static_cast<int>(state.range(1));
+  constexpr int kOpsPerThread = 50000;
+
+  auto va = VisualizationArena::create(
+                {.arena_size = 256 * 1024 * 1024,
+                 .magazine_size = 0, // Every operation takes a shard lock.
+                 .lock_histograms = enabled})
+                .value();
+
+  std::size_t ops = 0;
+  for (auto _ : state) {
+    ops += churn_threads(va, threads, kOpsPerThread);
+  }
+
+  state.SetLabel(enabled ? "histograms" : "off");
+  state.SetItemsProcessed(static_cast<std::int64_t>(ops));
+  if (enabled) {
+    std::uint64_t hold_ns = 0;
+    std::uint64_t acquisitions = 0;
+    for (const auto &h : va.shard_lock_histograms()) {
+      hold_ns += h.hold.approx_sum();
+      acquisitions += h.hold.total();
+    }
+    state.counters["avg_hold_ns"] =
+        static_cast<double>(hold_ns) /
+        static_cast<double>(std::max<std::uint64_t>(acquisitions, 1));
+  }
+}
+BENCHMARK(BM_LockHistograms)
+    ->ArgsProduct({{0, 1}, {1, 4}})
+    ->UseRealTime();
+
 BENCHMARK_MAIN();
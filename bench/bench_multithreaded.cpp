@@ -1,4 +1,7 @@
 #include "interface/visualization_arena.hpp"
+#include <algorithm>
+#include <array>
+#include <atomic>
 #include <benchmark/benchmark.h>
 #include <thread>
 #include <vector>
@@ -26,4 +29,103 @@ BENCHMARK(BM_MultiThreaded_Visualization)
     ->Threads(4)
     ->Threads(8);
 
+namespace {
+
+/// Single-producer single-consumer ring that hands blocks to a consumer.
+class Handoff {
+public:
+  void push(void *p) {
+    auto tail = tail_.load(std::memory_order_relaxed);
+    while (tail - head_.load(std::memory_order_acquire) == kSlots) {
+      std::this_thread::yield();
+    }
+    slots_[tail % kSlots] = p;
+    tail_.store(tail + 1, std::memory_order_release);
+  }
+
+  auto pop() -> void * {
+    auto head = head_.load(std::memory_order_relaxed);
+    while (tail_.load(std::memory_order_acquire) == head) {
+      std::this_thread::yield();
+    }
+    void *p = slots_[head % kSlots];
+    head_.store(head + 1, std::memory_order_release);
+    return p;
+  }
+
+private:
+  static constexpr std::size_t kSlots = 256;
+  std::array<void *, kSlots> slots_{};
+  alignas(64) std::atomic<std::size_t> head_{0};
+  alignas(64) std::atomic<std::size_t> tail_{0};
+};
+
+} // namespace
+
+// Producer threads allocate, consumer threads free. Without remote-free
+// lists every free locks the producer's shard and contends with its next
+// allocation; with them the consumer only pushes onto a lock-free list.
+// Args: {remote_free, producer/consumer pairs}.
+static void BM_ProducerConsumer(benchmark::State &state) {
+  const bool remote_free = state.range(0) != 0;
+  const auto pairs = static_cast<std::size_t>(state.range(1));
+  constexpr int kBlocksPerProducer = 20000;
+
+  auto va = VisualizationArena::create(
+                {.arena_size = 256 * 1024 * 1024,
+                 .magazine_size = 0, // Every lock-path operation is counted.
+                 .remote_free = remote_free})
+                .value();
+
+  for (auto _ : state) {
+    std::vector<Handoff> rings(pairs);
+    std::vector<std::thread> pool;
+    for (std::size_t t = 0; t < pairs; ++t) {
+      pool.emplace_back([&va, &ring = rings[t]] {
+        for (int i = 0; i < kBlocksPerProducer; ++i) {
+          ring.push(va.alloc_raw(32 + (i % 16) * 16, 16, "produced"));
+        }
+      });
+      pool.emplace_back([&va, &ring = rings[t]] {
+        for (int i = 0; i < kBlocksPerProducer; ++i) {
+          va.dealloc_raw(ring.pop(), 0);
+        }
+      });
+    }
+    for (auto &t : pool) {
+      t.join();
+    }
+  }
+
+  std::uint64_t acquisitions = 0;
+  std::uint64_t contentions = 0;
+  std::uint64_t remote_frees = 0;
+  for (const auto &s : va.shard_stats()) {
+    acquisitions += s.acquisitions;
+    contentions += s.contentions;
+    remote_frees += s.remote_frees;
+  }
+  const auto blocks = static_cast<double>(state.iterations()) *
+                      static_cast<double>(pairs * kBlocksPerProducer);
+  state.SetLabel(remote_free ? "remote-free" : "locked");
+  state.SetItemsProcessed(static_cast<std::int64_t>(blocks));
+  state.counters["contended_pct"] =
+      100.0 * static_cast<double>(contentions) /
+      static_cast<double>(std::max<std::uint64_t>(acquisitions, 1));
+  state.counters["locks_per_block"] =
+      static_cast<double>(acquisitions) / std::max(blocks, 1.0);
+  state.counters["remote_frees"] = static_cast<double>(remote_frees);
+}
+
+static void ProducerConsumerArgs(benchmark::internal::Benchmark *b) {
+  const auto max_pairs =
+      std::max(1U, std::thread::hardware_concurrency() / 2);
+  for (int remote_free : {0, 1}) {
+    for (unsigned pairs = 1; pairs <= max_pairs; pairs *= 2) {
+      b->Args({remote_free, static_cast<int>(pairs)});
+    }
+  }
+}
+BENCHMARK(BM_ProducerConsumer)->Apply(ProducerConsumerArgs)->UseRealTime();
+
 BENCHMARK_MAIN();
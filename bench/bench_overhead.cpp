@@ -0,0 +1,170 @@
+/// @file bench_overhead.cpp
+/// @brief Memory overhead of small objects: bytes of region consumed per
+/// live allocation, for tree-only and slab-backed allocators, for arena
+/// blocks with full or compact headers and for buddy arena blocks.
+
+#include "allocator/arena.hpp"
+#include "allocator/free_list.hpp"
+#include "interface/visualization_arena.hpp"
+
+#include <benchmark/benchmark.h>
+#include <optional>
+#include <vector>
+
+using namespace mmap_viz;
+
+// Args: {region bytes, object size}. A 16 KB region is too small for slab
+// runs, so every object is a tree block; 4 MB regions serve them from runs.
+static void OverheadArgs(benchmark::internal::Benchmark *b) {
+  for (std::int64_t region : {16 * 1024, 4 * 1024 * 1024}) {
+    for (std::int64_t size : {1, 8, 16, 24, 32, 48, 64, 128}) {
+      b->Args({region, size});
+    }
+  }
+}
+
+// Fill a fresh region with objects until it is exhausted. The timed part is
+// the fill; the counters report what each object cost in region bytes.
+static void BM_FillSmallObjects(benchmark::State &state) {
+  const auto region = static_cast<std::size_t>(state.range(0));
+  const auto size = static_cast<std::size_t>(state.range(1));
+  auto arena = Arena::create(region).value();
+  std::vector<AllocationResult> live;
+  live.reserve(arena.capacity() / 8);
+
+  for (auto _ : state) {
+    state.PauseTiming();
+    live.clear();
+    FreeListAllocator alloc{arena.base(), arena.capacity()};
+    state.ResumeTiming();
+
+    while (auto r = alloc.allocate(size, 8)) {
+      live.push_back(*r);
+    }
+    benchmark::DoNotOptimize(live.data());
+  }
+
+  const auto per_object =
+      static_cast<double>(arena.capacity()) / static_cast<double>(live.size());
+  state.SetLabel(region < 64 * 1024 ? "tree" : "slab");
+  state.counters["objects"] = static_cast<double>(live.size());
+  state.counters["bytes_per_object"] = per_object;
+  state.counters["overhead_pct"] =
+      100.0 * (per_object - static_cast<double>(size)) /
+      static_cast<double>(size);
+  state.SetItemsProcessed(state.iterations() *
+                          static_cast<std::int64_t>(live.size()));
+}
+BENCHMARK(BM_FillSmallObjects)->Apply(OverheadArgs);
+
+// Fragmented steady state: every other object of a full tree-only region
+// is freed, leaving one minimum-size hole per survivor. Reports how many
+// holes can be refilled, i.e. whether the hole size is usable at all.
+static void BM_RefillHoles(benchmark::State &state) {
+  const auto size = static_cast<std::size_t>(state.range(0));
+  auto arena = Arena::create(16 * 1024).value();
+  std::vector<AllocationResult> live;
+  std::size_t refilled = 0;
+
+  for (auto _ : state) {
+    state.PauseTiming();
+    live.clear();
+    FreeListAllocator alloc{arena.base(), arena.capacity()};
+    while (auto r = alloc.allocate(size, 8)) {
+      live.push_back(*r);
+    }
+    for (std::size_t i = 0; i < live.size(); i += 2) {
+      (void)alloc.deallocate(live[i].ptr, live[i].actual_size);
+    }
+    state.ResumeTiming();
+
+    refilled = 0;
+    while (alloc.allocate(size, 8)) {
+      ++refilled;
+    }
+  }
+
+  state.counters["holes"] = static_cast<double>((live.size() + 1) / 2);
+  state.counters["refilled"] = static_cast<double>(refilled);
+}
+BENCHMARK(BM_RefillHoles)->Arg(1)->Arg(16)->Arg(24)->Arg(48);
+
+// Live objects a 4 MB single-shard arena holds, with full 56-byte headers
+// or compact 16-byte ones. Args: {compact_headers, object size}.
+static void BM_ArenaLiveObjects(benchmark::State &state) {
+  const bool compact = state.range(0) != 0;
+  const auto size = static_cast<std::size_t>(state.range(1));
+  const ArenaConfig config{
+      .arena_size = 4 * 1024 * 1024,
+      .magazine_size = 0,
+      .cross_shard_fallback = false,
+      .shard_count = 1,
+      .compact_headers = compact,
+  };
+  std::vector<void *> live;
+  std::optional<VisualizationArena> arena;
+
+  for (auto _ : state) {
+    state.PauseTiming();
+    live.clear();
+    arena.reset(); // Unmap outside the timed region.
+    arena.emplace(VisualizationArena::create(config).value());
+    state.ResumeTiming();
+
+    while (void *p = arena->alloc_raw(size, 8, "object")) {
+      live.push_back(p);
+    }
+    benchmark::DoNotOptimize(live.data());
+  }
+
+  state.SetLabel(compact ? "compact" : "full");
+  state.counters["objects"] = static_cast<double>(live.size());
+  state.counters["bytes_per_object"] =
+      static_cast<double>(config.arena_size) / static_cast<double>(live.size());
+}
+BENCHMARK(BM_ArenaLiveObjects)
+    ->ArgsProduct({{0, 1}, {16, 32, 64, 128}})
+    ->Unit(benchmark::kMillisecond);
+
+// Power-of-two objects a 4 MB single-shard buddy arena holds. Block
+// headers are kept out of band, so each object should cost its own size
+// rather than the next order up. Args: {object size}.
+static void BM_BuddyArenaLiveObjects(benchmark::State &state) {
+  const auto size = static_cast<std::size_t>(state.range(0));
+  const ArenaConfig config{
+      .arena_size = 4 * 1024 * 1024,
+      .engine = EngineKind::Buddy,
+      .magazine_size = 0,
+      .cross_shard_fallback = false,
+      .shard_count = 1,
+  };
+  std::vector<void *> live;
+  std::optional<VisualizationArena> arena;
+
+  for (auto _ : state) {
+    state.PauseTiming();
+    live.clear();
+    arena.reset(); // Unmap outside the timed region.
+    arena.emplace(VisualizationArena::create(config).value());
+    state.ResumeTiming();
+
+    while (void *p = arena->alloc_raw(size, 16, "object")) {
+      live.push_back(p);
+    }
+    benchmark::DoNotOptimize(live.data());
+  }
+
+  state.counters["objects"] = static_cast<double>(live.size());
+  state.counters["bytes_per_object"] =
+      static_cast<double>(config.arena_size) / static_cast<double>(live.size());
+  state.SetItemsProcessed(state.iterations() *
+                          static_cast<std::int64_t>(live.size()));
+}
+BENCHMARK(BM_BuddyArenaLiveObjects)
+    ->Arg(64)
+    ->Arg(256)
+    ->Arg(4096)
+    ->Arg(65536)
+    ->Unit(benchmark::kMillisecond);
+
+BENCHMARK_MAIN();
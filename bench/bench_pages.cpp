@@ -0,0 +1,112 @@
+#include "allocator/arena.hpp"
+#include "allocator/free_list.hpp"
+#include <benchmark/benchmark.h>
+#include <random>
+#include <vector>
+
+using namespace mmap_viz;
+
+// Args: {HugePages mode, populate}. Explicit falls back to THP when the
+// HugeTLB pool is empty. The label shows the mode obtained, and the
+// "page_size" counter the page size the kernel actually backed the arena
+// with once touched.
+static void PageOptionArgs(benchmark::internal::Benchmark *b) {
+  for (auto mode :
+       {HugePages::None, HugePages::Transparent, HugePages::Explicit}) {
+    for (int populate : {0, 1}) {
+      b->Args({static_cast<int>(mode), populate});
+    }
+  }
+}
+
+static auto options_of(const benchmark::State &state) -> ArenaOptions {
+  return ArenaOptions{
+      .huge_pages = static_cast<HugePages>(state.range(0)),
+      .populate = state.range(1) != 0,
+  };
+}
+
+static void report(benchmark::State &state, const Arena &arena) {
+  state.SetLabel(std::string(to_string(arena.huge_pages())) +
+                 (state.range(1) != 0 ? "+populate" : ""));
+  state.counters["page_size"] = static_cast<double>(arena.mapped_page_size());
+}
+
+// Warm-up cost: map a 64 MB arena and write one byte per base page. With
+// populate the faults are paid inside create(); without it they are paid
+// on first touch. Both are timed.
+static void BM_FirstTouch(benchmark::State &state) {
+  constexpr std::size_t kArenaSize = 64 * 1024 * 1024;
+  const auto options = options_of(state);
+  const auto ps = Arena::page_size();
+
+  for (auto _ : state) {
+    auto arena = Arena::create(kArenaSize, options).value();
+    auto *base = arena.base();
+    for (std::size_t off = 0; off < arena.capacity(); off += ps) {
+      base[off] = std::byte{1};
+    }
+    benchmark::ClobberMemory();
+
+    state.PauseTiming();
+    report(state, arena);
+    arena = Arena::create(ps).value(); // Unmap outside the timed region.
+    state.ResumeTiming();
+  }
+  state.SetBytesProcessed(state.iterations() * kArenaSize);
+}
+BENCHMARK(BM_FirstTouch)->Apply(PageOptionArgs)->Unit(benchmark::kMillisecond);
+
+// Steady state: alloc/free churn over a 256 MB arena where every block is
+// written once per page, so throughput reflects TLB reach rather than
+// fault cost. The arena is warmed before timing.
+static void BM_SteadyStateChurn(benchmark::State &state) {
+  constexpr std::size_t kArenaSize = 256 * 1024 * 1024;
+  auto arena = Arena::create(kArenaSize, options_of(state)).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity()};
+  const auto ps = Arena::page_size();
+
+  // Warm every page so first-touch cost stays out of the timed loop.
+  for (std::size_t off = 0; off < arena.capacity(); off += ps) {
+    arena.base()[off] = std::byte{0};
+  }
+
+  constexpr std::size_t kTraceLen = 1 << 14;
+  constexpr std::size_t kMaxLive = 512;
+  std::mt19937 rng{7};
+  std::uniform_int_distribution<std::size_t> size_dist{4096, 256 * 1024};
+  std::vector<std::size_t> sizes(kTraceLen);
+  std::vector<std::size_t> victims(kTraceLen);
+  for (std::size_t i = 0; i < kTraceLen; ++i) {
+    sizes[i] = size_dist(rng);
+    victims[i] = rng();
+  }
+
+  std::vector<AllocationResult> live;
+  live.reserve(kMaxLive);
+  std::size_t i = 0;
+
+  for (auto _ : state) {
+    const auto t = i++ % kTraceLen;
+    if (live.size() == kMaxLive) {
+      auto idx = victims[t] % live.size();
+      alloc.deallocate(live[idx].ptr, live[idx].actual_size);
+      live[idx] = live.back();
+      live.pop_back();
+    }
+    auto r = alloc.allocate(sizes[t], 16);
+    if (r.has_value()) {
+      for (std::size_t off = 0; off < r->actual_size; off += ps) {
+        r->ptr[off] = std::byte{1};
+      }
+      live.push_back(*r);
+    }
+    benchmark::ClobberMemory();
+  }
+
+  report(state, arena);
+  state.SetItemsProcessed(state.iterations());
+}
+BENCHMARK(BM_SteadyStateChurn)->Apply(PageOptionArgs);
+
+BENCHMARK_MAIN();
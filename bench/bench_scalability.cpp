@@ -3,6 +3,7 @@
 
 #include "allocator/arena.hpp"
 #include "allocator/free_list.hpp"
+#include "interface/visualization_arena.hpp"
 
 #include <benchmark/benchmark.h>
 #include <random>
@@ -82,4 +83,92 @@ static void BM_Scalability(benchmark::State &state) {
 // Range: 100 to 100,000 free blocks
 BENCHMARK(BM_Scalability)->RangeMultiplier(10)->Range(100, 10000);
 
+// Same hole pattern, but holes alternate between two sizes so the policies
+// make different choices. Args: {num_blocks, PlacementPolicy}.
+static void BM_ScalabilityPolicy(benchmark::State &state) {
+  const auto num_blocks = static_cast<std::size_t>(state.range(0));
+  const auto policy = static_cast<PlacementPolicy>(state.range(1));
+
+  auto result = Arena::create(num_blocks * 1024 + 1024 * 1024);
+  if (!result.has_value()) {
+    state.SkipWithError("Failed to create arena (too large?)");
+    return;
+  }
+  Arena my_arena = std::move(result.value());
+  FreeListAllocator alloc{my_arena.base(), my_arena.capacity(), policy};
+
+  std::vector<AllocationResult> holes;
+  holes.reserve(num_blocks);
+  for (std::size_t i = 0; i < num_blocks; ++i) {
+    auto hole = alloc.allocate(i % 2 == 0 ? 512 : 160, 16);
+    auto keep = alloc.allocate(64, 16);
+    if (!hole || !keep) {
+      state.SkipWithError("Setup OOM");
+      return;
+    }
+    holes.push_back(*hole);
+  }
+  for (const auto &h : holes) {
+    alloc.deallocate(h.ptr, h.actual_size);
+  }
+
+  for (auto _ : state) {
+    auto r = alloc.allocate(144, 16);
+    benchmark::DoNotOptimize(r);
+    if (r.has_value()) {
+      alloc.deallocate(r->ptr, r->actual_size);
+    } else {
+      state.SkipWithError("Benchmark OOM");
+      break;
+    }
+  }
+
+  const auto free_bytes = static_cast<double>(alloc.bytes_free());
+  const auto largest = static_cast<double>(alloc.largest_free_block());
+  state.SetLabel(to_string(policy));
+  state.counters["bytes_free"] = free_bytes;
+  state.counters["largest_free_block"] = largest;
+  state.counters["frag_pct"] =
+      free_bytes > 0 ? 100.0 * (1.0 - largest / free_bytes) : 0.0;
+}
+
+BENCHMARK(BM_ScalabilityPolicy)
+    ->ArgsProduct({{100, 1000, 10000},
+                   {static_cast<int>(PlacementPolicy::FirstFit),
+                    static_cast<int>(PlacementPolicy::BestFit),
+                    static_cast<int>(PlacementPolicy::NextFit)}});
+
+// Snapshot cost with a fixed number of live blocks in arenas of growing
+// capacity. The snapshot walks free extents and live blocks only, so the
+// time should stay flat. Args: {arena MB, live blocks}.
+static void BM_SnapshotJson(benchmark::State &state) {
+  const auto arena_size = static_cast<std::size_t>(state.range(0)) << 20;
+  const auto count = static_cast<std::size_t>(state.range(1));
+  auto arena = VisualizationArena::create({
+                                              .arena_size = arena_size,
+                                              .magazine_size = 0,
+                                              .shard_count = 1,
+                                          })
+                   .value();
+
+  // Every other block is freed, leaving one hole per survivor.
+  std::vector<void *> ptrs;
+  for (std::size_t i = 0; i < 2 * count; ++i) {
+    ptrs.push_back(arena.alloc_raw(i % 3 == 0 ? 24 : 600, 16, "snapshot"));
+  }
+  for (std::size_t i = 0; i < ptrs.size(); i += 2) {
+    arena.dealloc_raw(ptrs[i], 0);
+  }
+
+  for (auto _ : state) {
+    benchmark::DoNotOptimize(arena.snapshot_json());
+  }
+  state.counters["live_blocks"] =
+      static_cast<double>(arena.active_block_count());
+}
+
+BENCHMARK(BM_SnapshotJson)
+    ->ArgsProduct({{1, 16, 256}, {100, 1000}})
+    ->Unit(benchmark::kMicrosecond);
+
 BENCHMARK_MAIN();
@@ -15,7 +15,7 @@ static void BM_Serialization_SingleEvent(benchmark::State &state) {
   event.block.alignment = 16;
   event.block.actual_size = 96;
   event.block.set_tag("test_tag");
-  event.block.timestamp = std::chrono::steady_clock::now();
+  event.block.timestamp = std::chrono::system_clock::now();
   event.total_allocated = 1024 * 1024;
   event.total_free = 1024 * 1024;
   event.fragmentation_pct = 5;
@@ -32,7 +32,7 @@ static void BM_Serialization_Batch(benchmark::State &state) {
   size_t batch_size = state.range(0);
   std::vector<AllocationEvent> events;
   for (size_t i = 0; i < batch_size; ++i) {
-    AllocationEvent event;
+    AllocationEvent event{};
     event.type = EventType::Allocate;
     event.event_id = i;
     event.block.offset = i * 128;
@@ -41,6 +41,7 @@ static void BM_Serialization_Batch(benchmark::State &state) {
     events.push_back(event);
   }
 
+  std::size_t bytes = 0;
   for (auto _ : state) {
     std::stringstream ss;
     ss << "[";
@@ -53,8 +54,11 @@ static void BM_Serialization_Batch(benchmark::State &state) {
     }
     ss << "]";
     std::string s = ss.str();
+    bytes = s.size();
     benchmark::DoNotOptimize(s);
   }
+  state.counters["bytes_per_event"] =
+      static_cast<double>(bytes) / static_cast<double>(batch_size);
 }
 
 BENCHMARK(BM_Serialization_SingleEvent);
@@ -1,4 +1,5 @@
 #include "allocator/free_list.hpp"
+#include "interface/object_pool.hpp"
 #include "interface/visualization_arena.hpp"
 #include <benchmark/benchmark.h>
 #include <random>
@@ -86,8 +87,78 @@ static void BM_VisualizationArena_Sampled(benchmark::State &state) {
   }
 }
 
+// Request-scoped lifetime: N objects built, then torn down together.
+// Per-object calls take the shard lock 2N times.
+static void BM_VisualizationArena_PerObjectRoundTrip(benchmark::State &state) {
+  auto va = VisualizationArena::create({.arena_size = 64 * 1024 * 1024,
+                                        .enable_server = false,
+                                        .sampling = 1})
+                .value();
+  const auto size = static_cast<std::size_t>(state.range(0));
+
+  std::vector<void *> ptrs(100);
+
+  for (auto _ : state) {
+    for (auto &p : ptrs) {
+      p = va.alloc_raw(size, 8, "request");
+    }
+    for (void *p : ptrs) {
+      va.dealloc_raw(p, size);
+    }
+  }
+  state.SetItemsProcessed(state.iterations() * ptrs.size());
+}
+
+// Same lifetime through the batch API: one lock round-trip each way.
+static void BM_VisualizationArena_BatchRoundTrip(benchmark::State &state) {
+  auto va = VisualizationArena::create({.arena_size = 64 * 1024 * 1024,
+                                        .enable_server = false,
+                                        .sampling = 1})
+                .value();
+  const auto size = static_cast<std::size_t>(state.range(0));
+
+  std::vector<void *> ptrs(100);
+
+  for (auto _ : state) {
+    va.alloc_batch(ptrs.size(), size, 8, "request", ptrs.data());
+    va.dealloc_batch(ptrs);
+  }
+  state.SetItemsProcessed(state.iterations() * ptrs.size());
+}
+
+// Same lifetime for typed objects from an ObjectPool: slots come off an
+// intrusive free list, with no header, padding or shard lock.
+template <std::size_t N> struct Blob {
+  std::byte bytes[N];
+};
+
+template <std::size_t N>
+static void BM_VisualizationArena_PoolRoundTrip(benchmark::State &state) {
+  auto va = VisualizationArena::create({.arena_size = 64 * 1024 * 1024,
+                                        .enable_server = false,
+                                        .sampling = 1})
+                .value();
+  ObjectPool<Blob<N>> pool{va, "request"};
+
+  std::vector<Blob<N> *> ptrs(100);
+
+  for (auto _ : state) {
+    for (auto &p : ptrs) {
+      p = pool.create();
+    }
+    for (auto *p : ptrs) {
+      pool.destroy(p);
+    }
+  }
+  state.SetItemsProcessed(state.iterations() * ptrs.size());
+}
+
 BENCHMARK(BM_AllocatorOnly);
 BENCHMARK(BM_VisualizationArena_NoServer);
 BENCHMARK(BM_VisualizationArena_Sampled);
+BENCHMARK(BM_VisualizationArena_PerObjectRoundTrip)->Arg(64)->Arg(1024);
+BENCHMARK(BM_VisualizationArena_BatchRoundTrip)->Arg(64)->Arg(1024);
+BENCHMARK(BM_VisualizationArena_PoolRoundTrip<64>);
+BENCHMARK(BM_VisualizationArena_PoolRoundTrip<1024>);
 
 BENCHMARK_MAIN();
@@ -0,0 +1,41 @@
+/// @file allocator_engine.cpp
+/// @brief Shared parts of the AllocatorEngine interface.
+
+#include "allocator/allocator_engine.hpp"
+#include "allocator/arena.hpp"
+
+#include <algorithm>
+#include <sys/mman.h>
+#include <vector>
+
+namespace mmap_viz {
+
+auto AllocatorEngine::resident_bytes() const -> std::size_t {
+  const std::size_t ps = Arena::page_size();
+  const auto begin = reinterpret_cast<std::uintptr_t>(base());
+  const auto end = begin + capacity();
+  const auto first = begin / ps * ps;
+  const std::size_t pages = (end - first + ps - 1) / ps;
+
+#ifdef __APPLE__
+  std::vector<char> residency(pages);
+#else
+  std::vector<unsigned char> residency(pages);
+#endif
+  if (::mincore(reinterpret_cast<void *>(first), pages * ps,
+                residency.data()) != 0) {
+    return 0;
+  }
+
+  std::size_t bytes = 0;
+  for (std::size_t i = 0; i < pages; ++i) {
+    if ((residency[i] & 1) != 0) {
+      const auto page_begin = std::max(first + i * ps, begin);
+      const auto page_end = std::min(first + (i + 1) * ps, end);
+      bytes += page_end - page_begin;
+    }
+  }
+  return bytes;
+}
+
+} // namespace mmap_viz
@@ -0,0 +1,257 @@
+#pragma once
+/// @file allocator_engine.hpp
+/// @brief Interface shared by the block allocators a shard can run on.
+
+#include <cstddef>
+#include <cstdint>
+#include <expected>
+#include <functional>
+#include <span>
+
+namespace mmap_viz {
+
+/// @brief Error codes returned by the allocators.
+enum class AllocError : std::uint8_t {
+  OutOfMemory,
+  InvalidAlignment,
+  DoubleFree,
+  BadPointer,
+  BadSuperblock,
+};
+
+/// @brief Human-readable description of an AllocError.
+[[nodiscard]] constexpr auto to_string(AllocError e) -> const char * {
+  switch (e) {
+  case AllocError::OutOfMemory:
+    return "out of memory";
+  case AllocError::InvalidAlignment:
+    return "invalid alignment (must be power of 2)";
+  case AllocError::DoubleFree:
+    return "double free detected";
+  case AllocError::BadPointer:
+    return "pointer not owned by this allocator";
+  case AllocError::BadSuperblock:
+    return "persistent superblock missing or not cleanly detached";
+  }
+  return "unknown";
+}
+
+/// @brief Allocator a VisualizationArena runs each shard on.
+enum class EngineKind : std::uint8_t {
+  FreeList, ///< FreeListAllocator: address-ordered RB tree plus slab runs.
+  Tlsf,     ///< TlsfAllocator: two-level segregated fit, O(1) worst case.
+  Buddy,    ///< BuddyAllocator: power-of-two blocks split and merged by order.
+};
+
+/// @brief Human-readable name of an EngineKind.
+[[nodiscard]] constexpr auto to_string(EngineKind k) -> const char * {
+  switch (k) {
+  case EngineKind::FreeList:
+    return "free_list";
+  case EngineKind::Tlsf:
+    return "tlsf";
+  case EngineKind::Buddy:
+    return "buddy";
+  }
+  return "unknown";
+}
+
+/// @brief How purge() returns free pages to the OS.
+enum class DecommitMode : std::uint8_t {
+  DontNeed, ///< MADV_DONTNEED: RSS drops at once, pages read back as zero.
+  Free,     ///< MADV_FREE: pages are reclaimed lazily under memory pressure.
+};
+
+/// @brief Result of a successful allocation.
+struct AllocationResult {
+  std::byte *ptr;          ///< Pointer to the allocated region.
+  std::size_t offset;      ///< Offset from the arena base.
+  std::size_t actual_size; ///< Size including alignment padding.
+  std::size_t zeroed_begin = 0; ///< Start of a range known to read as zero.
+  std::size_t zeroed_end = 0;   ///< End of that range (relative to ptr).
+};
+
+/// @brief A free range of an allocator: a tree block, a free slab slot, or
+/// all slots of a run none of which is in use.
+struct FreeExtent {
+  std::byte *ptr = nullptr; ///< Start of the range (nullptr = none).
+  std::size_t size = 0;     ///< Length in bytes.
+};
+
+/// @brief Slot layout of the size-class run containing an address.
+struct RunLayout {
+  std::byte *begin = nullptr;     ///< Run start (nullptr = not in a run).
+  std::byte *slots = nullptr;     ///< First slot, past the run header.
+  std::byte *slots_end = nullptr; ///< End of the last slot.
+  std::byte *end = nullptr;       ///< End of the run's tree block.
+  std::size_t slot_size = 0;      ///< Size class of the run.
+};
+
+/// @brief Block allocator over one contiguous memory region.
+///
+/// The surface VisualizationArena and LocalTracker program against, so a
+/// shard can run on any engine selected by ArenaConfig::engine. Optional
+/// capabilities (batching, compaction, growth, decommit, size-class runs)
+/// have conservative defaults that an engine overrides when it supports
+/// them.
+class AllocatorEngine {
+public:
+  AllocatorEngine() = default;
+  AllocatorEngine(const AllocatorEngine &) = delete;
+  AllocatorEngine &operator=(const AllocatorEngine &) = delete;
+  virtual ~AllocatorEngine() = default;
+
+  /// @brief Allocate a block of at least @p size bytes with given @p alignment.
+  /// @param size      Requested size in bytes (must be > 0).
+  /// @param alignment Required alignment (must be power of 2, default 16).
+  /// @return AllocationResult on success, AllocError on failure.
+  [[nodiscard]] virtual auto allocate(std::size_t size,
+                                      std::size_t alignment =
+                                          alignof(std::max_align_t))
+      -> std::expected<AllocationResult, AllocError> = 0;
+
+  /// @brief Deallocate a previously allocated block.
+  /// @param ptr  Pointer returned by allocate().
+  /// @param size Size passed to allocate() or its actual_size.
+  /// @return AllocError if the pointer is invalid.
+  virtual auto deallocate(std::byte *ptr, std::size_t size)
+      -> std::expected<void, AllocError> = 0;
+
+  /// @brief Resize a block in place.
+  /// @return The resized block (same ptr), or OutOfMemory if it cannot grow
+  ///         in place.
+  [[nodiscard]] virtual auto try_extend(std::byte *ptr, std::size_t size,
+                                        std::size_t new_size)
+      -> std::expected<AllocationResult, AllocError> = 0;
+
+  /// @brief Allocate up to `out.size()` blocks of @p size bytes at once.
+  /// Defaults to one allocate() per block.
+  /// @return Number of blocks written to @p out (short on exhaustion).
+  [[nodiscard]] virtual auto allocate_batch(std::size_t size,
+                                            std::size_t alignment,
+                                            std::span<AllocationResult> out)
+      -> std::size_t {
+    std::size_t n = 0;
+    for (; n < out.size(); ++n) {
+      auto r = allocate(size, alignment);
+      if (!r) {
+        break;
+      }
+      out[n] = *r;
+    }
+    return n;
+  }
+
+  /// @brief Deallocate several blocks at once. Invalid entries are skipped.
+  /// Defaults to one deallocate() per block.
+  /// @return Number of blocks released.
+  virtual auto deallocate_batch(std::span<AllocationResult> blocks)
+      -> std::size_t {
+    std::size_t n = 0;
+    for (const auto &b : blocks) {
+      n += deallocate(b.ptr, b.actual_size).has_value() ? 1 : 0;
+    }
+    return n;
+  }
+
+  /// @brief Allocate only from a free block lying wholly below @p limit;
+  /// used to slide live blocks toward the base of the region.
+  /// @return OutOfMemory if no such block exists or the engine cannot
+  ///         place by address (the default).
+  [[nodiscard]] virtual auto allocate_below(std::size_t /*size*/,
+                                            std::size_t /*alignment*/,
+                                            const std::byte * /*limit*/)
+      -> std::expected<AllocationResult, AllocError> {
+    return std::unexpected(AllocError::OutOfMemory);
+  }
+
+  /// @brief Total bytes currently allocated.
+  [[nodiscard]] virtual auto bytes_allocated() const noexcept
+      -> std::size_t = 0;
+  /// @brief Total bytes currently free.
+  [[nodiscard]] virtual auto bytes_free() const noexcept -> std::size_t = 0;
+  /// @brief Size of the largest contiguous free block.
+  [[nodiscard]] virtual auto largest_free_block() const noexcept
+      -> std::size_t = 0;
+  /// @brief Number of free blocks (fragmentation indicator).
+  [[nodiscard]] virtual auto free_block_count() const noexcept
+      -> std::size_t = 0;
+  /// @brief Number of blocks currently allocated. O(1).
+  [[nodiscard]] virtual auto live_block_count() const noexcept
+      -> std::size_t = 0;
+  /// @brief External fragmentation: the share of free bytes (0–100) that
+  /// lies outside the largest free block.
+  [[nodiscard]] virtual auto fragmentation_pct() const noexcept
+      -> std::size_t = 0;
+
+  /// @brief Base address of the region.
+  [[nodiscard]] virtual auto base() const noexcept -> std::byte * = 0;
+  /// @brief Bytes of the region currently managed.
+  [[nodiscard]] virtual auto capacity() const noexcept -> std::size_t = 0;
+  /// @brief Capacity the region may reach through grow().
+  [[nodiscard]] virtual auto max_capacity() const noexcept -> std::size_t {
+    return capacity();
+  }
+  /// @brief Check if this allocator owns the given pointer.
+  [[nodiscard]] virtual bool contains(const void *ptr) const noexcept = 0;
+
+  /// @brief Append @p bytes of newly usable memory at the end of the region.
+  /// @return False (and no change) if the range does not fit or the engine
+  ///         cannot grow (the default).
+  virtual auto grow(std::size_t /*bytes*/) -> bool { return false; }
+
+  /// @brief Return whole pages inside free blocks of at least @p min_block
+  /// bytes to the OS.
+  /// @return Bytes decommitted by this call (0 if unsupported, the default).
+  virtual auto purge(std::size_t /*min_block*/ = 0,
+                     DecommitMode /*mode*/ = DecommitMode::DontNeed)
+      -> std::size_t {
+    return 0;
+  }
+
+  /// @brief Merge frees the engine has deferred into its free structures,
+  /// so that free extents and statistics are exact. Does nothing for
+  /// engines that coalesce on every free (the default).
+  virtual void coalesce() {}
+
+  /// @brief Capacity minus the bytes currently released by purge().
+  [[nodiscard]] virtual auto committed_bytes() const noexcept -> std::size_t {
+    return capacity();
+  }
+
+  /// @brief Bytes of the region currently resident in RAM (via mincore).
+  [[nodiscard]] virtual auto resident_bytes() const -> std::size_t;
+
+  /// @brief Size of the block a successful allocate(size, alignment) hands
+  /// out (it may absorb a small tail beyond this).
+  [[nodiscard]] virtual auto block_size_for(
+      std::size_t size,
+      std::size_t alignment = alignof(std::max_align_t)) const noexcept
+      -> std::size_t = 0;
+
+  /// @brief Call @p fn with every free extent, in address order.
+  virtual void for_each_free_extent(
+      const std::function<void(const FreeExtent &)> &fn) const = 0;
+
+  /// @brief Layout of the size-class run containing @p ptr, or an empty
+  /// layout if @p ptr is not inside a run (always, by default).
+  [[nodiscard]] virtual auto run_layout(const std::byte * /*ptr*/) const
+      -> RunLayout {
+    return {};
+  }
+
+  /// @brief Buddy order of a block of @p actual_size bytes, or -1 for
+  /// engines whose blocks have no order (the default).
+  [[nodiscard]] virtual auto block_order(std::size_t /*actual_size*/) const
+      noexcept -> int {
+    return -1;
+  }
+
+  /// @brief Bytes of engine metadata directly in front of every allocated
+  /// block (boundary tags). Walkers of the region skip them.
+  [[nodiscard]] virtual auto block_overhead() const noexcept -> std::size_t {
+    return 0;
+  }
+};
+
+} // namespace mmap_viz
@@ -3,19 +3,89 @@
 
 #include "allocator/arena.hpp"
 
+#include <algorithm>
 #include <cerrno>
+#include <cinttypes>
+#include <cstdint>
+#include <cstdio>
+#include <fcntl.h>
 #include <sys/mman.h>
+#include <sys/stat.h>
 #include <unistd.h>
 #include <utility>
 
 namespace mmap_viz {
 
+namespace {
+
+/// @brief mmap anonymous private memory; nullptr (with errno set) on failure.
+auto map_anonymous(std::size_t bytes, int extra_flags) -> std::byte * {
+  void *ptr = ::mmap(nullptr, bytes, PROT_READ | PROT_WRITE,
+                     MAP_ANONYMOUS | MAP_PRIVATE | extra_flags,
+                     -1, // No file descriptor.
+                     0   // No offset.
+  );
+  return ptr == MAP_FAILED ? nullptr : static_cast<std::byte *>(ptr);
+}
+
+/// @brief Map @p bytes at an @p align-aligned address by over-mapping and
+/// trimming the excess head and tail.
+auto map_aligned(std::size_t bytes, std::size_t align) -> std::byte * {
+  auto *raw = map_anonymous(bytes + align, 0);
+  if (raw == nullptr) {
+    return nullptr;
+  }
+  const auto addr = reinterpret_cast<std::uintptr_t>(raw);
+  const auto head = ((addr + align - 1) & ~(align - 1)) - addr;
+  if (head != 0) {
+    ::munmap(raw, head);
+  }
+  ::munmap(raw + head + bytes, align - head);
+  return raw + head;
+}
+
+/// @brief Fault in every page of [base, base + bytes) for writing.
+void prefault(std::byte *base, std::size_t bytes, std::size_t page) {
+#ifdef MADV_POPULATE_WRITE
+  if (::madvise(base, bytes, MADV_POPULATE_WRITE) == 0) {
+    return;
+  }
+#endif
+  for (std::size_t off = 0; off < bytes; off += page) {
+    *reinterpret_cast<volatile std::byte *>(base + off) = std::byte{0};
+  }
+}
+
+/// @brief The current errno as a std::error_code.
+auto last_error() -> std::error_code {
+  return std::make_error_code(static_cast<std::errc>(errno));
+}
+
+} // namespace
+
 auto Arena::page_size() noexcept -> std::size_t {
   static const auto ps = static_cast<std::size_t>(::sysconf(_SC_PAGESIZE));
   return ps;
 }
 
-auto Arena::create(std::size_t capacity)
+auto Arena::huge_page_size() noexcept -> std::size_t {
+  static const auto hps = [] {
+    std::size_t kb = 0;
+    if (std::FILE *f = std::fopen("/proc/meminfo", "r")) {
+      char line[128];
+      while (std::fgets(line, sizeof(line), f) != nullptr) {
+        if (std::sscanf(line, "Hugepagesize: %zu kB", &kb) == 1) {
+          break;
+        }
+      }
+      std::fclose(f);
+    }
+    return kb != 0 ? kb * 1024 : std::size_t{2} << 20;
+  }();
+  return hps;
+}
+
+auto Arena::create(std::size_t capacity, ArenaOptions options)
     -> std::expected<Arena, std::error_code> {
   if (capacity == 0) {
     return std::unexpected(std::make_error_code(std::errc::invalid_argument));
@@ -23,23 +93,156 @@ auto Arena::create(std::size_t capacity)
 
   // Round up to page boundary.
   const auto ps = page_size();
-  const auto aligned_capacity = ((capacity + ps - 1) / ps) * ps;
+  auto aligned_capacity = ((capacity + ps - 1) / ps) * ps;
 
-  void *ptr = ::mmap(nullptr, aligned_capacity, PROT_READ | PROT_WRITE,
-                     MAP_ANONYMOUS | MAP_PRIVATE,
-                     -1, // No file descriptor.
-                     0   // No offset.
-  );
+  std::byte *ptr = nullptr;
+  HugePages obtained = HugePages::None;
+
+  // 1. Explicit huge pages from the HugeTLB pool (fails if the pool is
+  // empty or too small).
+#ifdef MAP_HUGETLB
+  if (options.huge_pages == HugePages::Explicit) {
+    const auto hps = huge_page_size();
+    const auto huge_capacity = ((capacity + hps - 1) / hps) * hps;
+    ptr = map_anonymous(huge_capacity, MAP_HUGETLB | (options.populate
+                                                          ? MAP_POPULATE
+                                                          : 0));
+    if (ptr != nullptr) {
+      aligned_capacity = huge_capacity;
+      obtained = HugePages::Explicit;
+    }
+  }
+#endif
+
+  // 2. Transparent huge pages: align the region to the huge page size so
+  // the kernel can back it with whole huge pages.
+  if (ptr == nullptr && options.huge_pages != HugePages::None) {
+    ptr = map_aligned(aligned_capacity, huge_page_size());
+    if (ptr == nullptr) {
+      return std::unexpected(
+          std::make_error_code(static_cast<std::errc>(errno)));
+    }
+#ifdef MADV_HUGEPAGE
+    if (::madvise(ptr, aligned_capacity, MADV_HUGEPAGE) == 0) {
+      obtained = HugePages::Transparent;
+    }
+#endif
+    // MAP_POPULATE would fault base pages before the advice took effect.
+    if (options.populate) {
+      prefault(ptr, aligned_capacity, ps);
+    }
+  }
+
+  // 3. Base pages.
+  if (ptr == nullptr) {
+#ifdef MAP_POPULATE
+    ptr = map_anonymous(aligned_capacity, options.populate ? MAP_POPULATE : 0);
+#else
+    ptr = map_anonymous(aligned_capacity, 0);
+    if (ptr != nullptr && options.populate) {
+      prefault(ptr, aligned_capacity, ps);
+    }
+#endif
+    if (ptr == nullptr) {
+      return std::unexpected(
+          std::make_error_code(static_cast<std::errc>(errno)));
+    }
+  }
+
+  return Arena{ptr, aligned_capacity, obtained};
+}
+
+auto Arena::create_file(const std::filesystem::path &path,
+                        std::size_t capacity)
+    -> std::expected<Arena, std::error_code> {
+  const int fd = ::open(path.c_str(), O_RDWR | O_CREAT | O_CLOEXEC, 0644);
+  if (fd < 0) {
+    return std::unexpected(last_error());
+  }
+
+  // The mapping keeps the file referenced; the descriptor is not needed
+  // past this function.
+  auto fail = [fd]() -> std::unexpected<std::error_code> {
+    auto ec = last_error();
+    ::close(fd);
+    return std::unexpected(ec);
+  };
+
+  struct stat st{};
+  if (::fstat(fd, &st) != 0) {
+    return fail();
+  }
+
+  const auto ps = page_size();
+  const auto file_size = static_cast<std::size_t>(st.st_size);
+  auto aligned_capacity =
+      ((std::max(capacity, file_size) + ps - 1) / ps) * ps;
+  if (aligned_capacity == 0) {
+    ::close(fd);
+    return std::unexpected(std::make_error_code(std::errc::invalid_argument));
+  }
+  if (file_size < aligned_capacity &&
+      ::ftruncate(fd, static_cast<off_t>(aligned_capacity)) != 0) {
+    return fail();
+  }
+
+  // Reserve an aligned range, then map the file over it.
+  auto *reserved = map_aligned(aligned_capacity, huge_page_size());
+  if (reserved == nullptr) {
+    return fail();
+  }
+  void *ptr = ::mmap(reserved, aligned_capacity, PROT_READ | PROT_WRITE,
+                     MAP_SHARED | MAP_FIXED, fd, 0);
+  if (ptr == MAP_FAILED) {
+    auto ec = last_error();
+    ::munmap(reserved, aligned_capacity);
+    ::close(fd);
+    return std::unexpected(ec);
+  }
+  ::close(fd);
+
+  return Arena{static_cast<std::byte *>(ptr), aligned_capacity,
+               HugePages::None, /*file_backed=*/true};
+}
+
+auto Arena::reserve(std::size_t capacity)
+    -> std::expected<Arena, std::error_code> {
+  if (capacity == 0) {
+    return std::unexpected(std::make_error_code(std::errc::invalid_argument));
+  }
+  const auto ps = page_size();
+  const auto aligned_capacity = ((capacity + ps - 1) / ps) * ps;
 
+  void *ptr = ::mmap(nullptr, aligned_capacity, PROT_NONE,
+                     MAP_ANONYMOUS | MAP_PRIVATE | MAP_NORESERVE, -1, 0);
   if (ptr == MAP_FAILED) {
-    return std::unexpected(std::make_error_code(static_cast<std::errc>(errno)));
+    return std::unexpected(last_error());
   }
+  return Arena{static_cast<std::byte *>(ptr), aligned_capacity,
+               HugePages::None, /*file_backed=*/false, /*reserved=*/true};
+}
 
-  return Arena{static_cast<std::byte *>(ptr), aligned_capacity};
+auto Arena::commit(std::size_t offset, std::size_t length)
+    -> std::expected<void, std::error_code> {
+  if (!reserved_) {
+    return {};
+  }
+  const auto ps = page_size();
+  if (offset % ps != 0 || offset > capacity_ ||
+      length > capacity_ - offset) {
+    return std::unexpected(std::make_error_code(std::errc::invalid_argument));
+  }
+  const auto len = std::min(((length + ps - 1) / ps) * ps, capacity_ - offset);
+  if (::mprotect(base_ + offset, len, PROT_READ | PROT_WRITE) != 0) {
+    return std::unexpected(last_error());
+  }
+  return {};
 }
 
-Arena::Arena(std::byte *base, std::size_t capacity) noexcept
-    : base_{base}, capacity_{capacity} {}
+Arena::Arena(std::byte *base, std::size_t capacity, HugePages huge_pages,
+             bool file_backed, bool reserved) noexcept
+    : base_{base}, capacity_{capacity}, huge_pages_{huge_pages},
+      file_backed_{file_backed}, reserved_{reserved} {}
 
 Arena::~Arena() {
   if (base_ != nullptr) {
@@ -49,7 +252,10 @@ Arena::~Arena() {
 
 Arena::Arena(Arena &&other) noexcept
     : base_{std::exchange(other.base_, nullptr)},
-      capacity_{std::exchange(other.capacity_, 0)} {}
+      capacity_{std::exchange(other.capacity_, 0)},
+      huge_pages_{std::exchange(other.huge_pages_, HugePages::None)},
+      file_backed_{std::exchange(other.file_backed_, false)},
+      reserved_{std::exchange(other.reserved_, false)} {}
 
 Arena &Arena::operator=(Arena &&other) noexcept {
   if (this != &other) {
@@ -58,6 +264,9 @@ Arena &Arena::operator=(Arena &&other) noexcept {
     }
     base_ = std::exchange(other.base_, nullptr);
     capacity_ = std::exchange(other.capacity_, 0);
+    huge_pages_ = std::exchange(other.huge_pages_, HugePages::None);
+    file_backed_ = std::exchange(other.file_backed_, false);
+    reserved_ = std::exchange(other.reserved_, false);
   }
   return *this;
 }
@@ -66,4 +275,53 @@ auto Arena::base() const noexcept -> std::byte * { return base_; }
 
 auto Arena::capacity() const noexcept -> std::size_t { return capacity_; }
 
+auto Arena::huge_pages() const noexcept -> HugePages { return huge_pages_; }
+
+auto Arena::mapped_page_size() const noexcept -> std::size_t {
+  // The mappings overlapping the region say what the kernel has backed it
+  // with: KernelPageSize for HugeTLB, AnonHugePages once THP promoted any.
+  std::size_t largest = 0;
+  if (std::FILE *f = std::fopen("/proc/self/smaps", "r")) {
+    const auto begin = reinterpret_cast<std::uintptr_t>(base_);
+    const auto end = begin + capacity_;
+    bool overlaps = false;
+    char line[256];
+    while (std::fgets(line, sizeof(line), f) != nullptr) {
+      std::uintptr_t lo = 0;
+      std::uintptr_t hi = 0;
+      std::size_t kb = 0;
+      if (std::sscanf(line, "%" SCNxPTR "-%" SCNxPTR, &lo, &hi) == 2) {
+        overlaps = lo < end && begin < hi;
+      } else if (!overlaps) {
+        continue;
+      } else if (std::sscanf(line, "KernelPageSize: %zu kB", &kb) == 1) {
+        largest = std::max(largest, kb * 1024);
+      } else if (std::sscanf(line, "AnonHugePages: %zu kB", &kb) == 1 &&
+                 kb != 0) {
+        largest = std::max(largest, huge_page_size());
+      }
+    }
+    std::fclose(f);
+  }
+  if (largest != 0) {
+    return largest;
+  }
+  // No smaps: HugeTLB pages are certain, THP promotion is not.
+  return huge_pages_ == HugePages::Explicit ? huge_page_size() : page_size();
+}
+
+auto Arena::reserved() const noexcept -> bool { return reserved_; }
+
+auto Arena::file_backed() const noexcept -> bool { return file_backed_; }
+
+auto Arena::sync() const -> std::expected<void, std::error_code> {
+  if (!file_backed_ || base_ == nullptr) {
+    return {};
+  }
+  if (::msync(base_, capacity_, MS_SYNC) != 0) {
+    return std::unexpected(last_error());
+  }
+  return {};
+}
+
 } // namespace mmap_viz
@@ -3,23 +3,88 @@
 /// @brief RAII wrapper around mmap/munmap for a contiguous virtual memory arena.
 
 #include <cstddef>
+#include <cstdint>
 #include <expected>
+#include <filesystem>
 #include <system_error>
 
 namespace mmap_viz {
 
+/// @brief Huge page backing requested for an Arena.
+enum class HugePages : std::uint8_t {
+    None,        ///< Base pages only.
+    Transparent, ///< madvise(MADV_HUGEPAGE) on a huge-page-aligned mapping.
+    Explicit,    ///< MAP_HUGETLB, falling back to Transparent if unavailable.
+};
+
+/// @brief Human-readable name of a huge page mode.
+[[nodiscard]] constexpr auto to_string(HugePages h) -> const char* {
+    switch (h) {
+    case HugePages::None:
+        return "none";
+    case HugePages::Transparent:
+        return "transparent";
+    case HugePages::Explicit:
+        return "explicit";
+    }
+    return "unknown";
+}
+
+/// @brief Mapping options for Arena::create.
+struct ArenaOptions {
+    HugePages huge_pages = HugePages::None; ///< Requested huge page backing.
+    bool populate = false; ///< Pre-fault every page at creation.
+};
+
 /// @brief Owns a contiguous region of virtual memory obtained via mmap.
 ///
 /// Move-only. The region is mapped with PROT_READ|PROT_WRITE,
-/// MAP_ANONYMOUS|MAP_PRIVATE. Unmapped on destruction.
+/// MAP_ANONYMOUS|MAP_PRIVATE, or MAP_SHARED over a file for create_file().
+/// reserve() maps it PROT_NONE instead, to be made usable piecewise with
+/// commit(). Unmapped on destruction.
 class Arena {
 public:
     /// @brief Map a contiguous anonymous region of at least @p capacity bytes.
-    /// @param capacity Requested size in bytes (rounded up to page boundary).
+    /// @param capacity Requested size in bytes (rounded up to page boundary,
+    ///                 or to the huge page size for HugePages::Explicit).
+    /// @param options  Huge page and pre-fault options.
     /// @return Arena on success, or std::error_code on mmap failure.
-    [[nodiscard]] static auto create(std::size_t capacity)
+    [[nodiscard]] static auto create(std::size_t capacity,
+                                     ArenaOptions options = {})
         -> std::expected<Arena, std::error_code>;
 
+    /// @brief Map a file as a shared, persistent region.
+    ///
+    /// The file is created if missing and grown to @p capacity bytes if
+    /// shorter; an existing longer file is mapped whole. The mapping is
+    /// aligned to huge_page_size() so that contents holding pointers into
+    /// the region can be relocated when it is mapped again elsewhere.
+    /// @param path     File to map.
+    /// @param capacity Minimum size in bytes (rounded up to page boundary).
+    ///                 0 maps an existing file at its current size.
+    /// @return Arena on success, or std::error_code on open/mmap failure.
+    [[nodiscard]] static auto create_file(const std::filesystem::path& path,
+                                          std::size_t capacity)
+        -> std::expected<Arena, std::error_code>;
+
+    /// @brief Reserve address space without backing it.
+    ///
+    /// The region is mapped PROT_NONE with MAP_NORESERVE, so it costs no
+    /// memory or swap accounting until ranges are committed.
+    /// @param capacity Size to reserve (rounded up to page boundary).
+    /// @return Arena on success, or std::error_code on mmap failure.
+    [[nodiscard]] static auto reserve(std::size_t capacity)
+        -> std::expected<Arena, std::error_code>;
+
+    /// @brief Make [base() + offset, + length) readable and writable.
+    ///
+    /// A no-op for arenas not created by reserve(). Committing a range
+    /// twice is harmless.
+    /// @param offset Page-aligned offset into the region.
+    /// @param length Bytes to commit (rounded up to page boundary).
+    [[nodiscard]] auto commit(std::size_t offset, std::size_t length)
+        -> std::expected<void, std::error_code>;
+
     ~Arena();
 
     // Move-only semantics.
@@ -34,14 +99,43 @@ public:
     /// @brief Actual mapped capacity (page-aligned, >= requested).
     [[nodiscard]] auto capacity() const noexcept -> std::size_t;
 
+    /// @brief Huge page backing actually obtained. Explicit requests report
+    /// Transparent after a fallback, and None if THP is unavailable too.
+    /// Transparent only means the kernel took the advice; see
+    /// mapped_page_size() for whether it promoted anything.
+    [[nodiscard]] auto huge_pages() const noexcept -> HugePages;
+
+    /// @brief Largest page size the kernel currently backs the region with,
+    /// read from /proc/self/smaps: the huge page size for HugeTLB, and for
+    /// THP once any part of the region has been promoted (after populate or
+    /// first touch); page_size() otherwise. Reads /proc on every call.
+    [[nodiscard]] auto mapped_page_size() const noexcept -> std::size_t;
+
+    /// @brief True if the region was created by reserve().
+    [[nodiscard]] auto reserved() const noexcept -> bool;
+
+    /// @brief True if the region is a shared mapping of a file.
+    [[nodiscard]] auto file_backed() const noexcept -> bool;
+
+    /// @brief Write dirty pages of a file-backed region to the file
+    /// (msync). A no-op for anonymous arenas.
+    [[nodiscard]] auto sync() const -> std::expected<void, std::error_code>;
+
     /// @brief System page size used for alignment.
     [[nodiscard]] static auto page_size() noexcept -> std::size_t;
 
+    /// @brief Default huge page size of the system (2 MB if unknown).
+    [[nodiscard]] static auto huge_page_size() noexcept -> std::size_t;
+
 private:
-    Arena(std::byte* base, std::size_t capacity) noexcept;
+    Arena(std::byte* base, std::size_t capacity, HugePages huge_pages,
+          bool file_backed = false, bool reserved = false) noexcept;
 
-    std::byte*  base_     = nullptr;
-    std::size_t capacity_ = 0;
+    std::byte*  base_        = nullptr;
+    std::size_t capacity_    = 0;
+    HugePages   huge_pages_  = HugePages::None;
+    bool        file_backed_ = false;
+    bool        reserved_    = false;
 };
 
 } // namespace mmap_viz
@@ -0,0 +1,346 @@
+/// @file buddy.cpp
+/// @brief Implementation of the binary buddy allocator.
+
+#include "allocator/buddy.hpp"
+
+#include <algorithm>
+#include <bit>
+
+namespace mmap_viz {
+
+BuddyAllocator::BuddyAllocator(std::byte *base, std::size_t size,
+                               std::size_t max_size)
+    : base_{base}, size_{size & ~(kMinBlock - 1)},
+      max_size_{std::max(max_size & ~(kMinBlock - 1), size_)},
+      base_align_{std::min(
+          std::size_t{1} << std::countr_zero(
+              reinterpret_cast<std::uintptr_t>(base) | block_bytes(kMaxOrder)),
+          block_bytes(kMaxOrder))} {
+  size_bitmaps();
+  release_range(0, size_);
+}
+
+// ─── Orders and bitmaps ──────────────────────────────────────────────────
+
+auto BuddyAllocator::order_for(std::size_t size) noexcept -> unsigned {
+  if (size <= kMinBlock) {
+    return 0;
+  }
+  return static_cast<unsigned>(std::bit_width(size - 1)) - kMinLog2;
+}
+
+auto BuddyAllocator::is_root(unsigned order, std::size_t offset) const noexcept
+    -> bool {
+  if (order == kMaxOrder) {
+    return true;
+  }
+  const auto parent_bytes = block_bytes(order + 1);
+  return (offset & ~(parent_bytes - 1)) + parent_bytes > size_;
+}
+
+auto BuddyAllocator::test(const Bitmap &bits, unsigned order,
+                          std::size_t offset) noexcept -> bool {
+  const auto i = offset >> (kMinLog2 + order);
+  return (bits[order][i / 64] >> (i % 64) & 1) != 0;
+}
+
+void BuddyAllocator::set(Bitmap &bits, unsigned order,
+                         std::size_t offset) noexcept {
+  const auto i = offset >> (kMinLog2 + order);
+  bits[order][i / 64] |= std::uint64_t{1} << (i % 64);
+}
+
+void BuddyAllocator::clear(Bitmap &bits, unsigned order,
+                           std::size_t offset) noexcept {
+  const auto i = offset >> (kMinLog2 + order);
+  bits[order][i / 64] &= ~(std::uint64_t{1} << (i % 64));
+}
+
+void BuddyAllocator::size_bitmaps() {
+  for (unsigned k = 0; k < kOrders; ++k) {
+    const auto blocks = size_ >> (kMinLog2 + k);
+    free_bits_[k].resize((blocks + 63) / 64);
+    split_bits_[k].resize((blocks + 63) / 64);
+  }
+}
+
+// ─── Free lists ──────────────────────────────────────────────────────────
+
+void BuddyAllocator::push_free(unsigned order, std::size_t offset) noexcept {
+  auto *node = reinterpret_cast<FreeNode *>(base_ + offset);
+  node->prev = nullptr;
+  node->next = lists_[order];
+  if (node->next != nullptr) {
+    node->next->prev = node;
+  }
+  lists_[order] = node;
+  nonempty_ |= std::uint64_t{1} << order;
+  set(free_bits_, order, offset);
+  ++free_blocks_;
+}
+
+void BuddyAllocator::unlink_free(unsigned order, std::size_t offset) noexcept {
+  auto *node = reinterpret_cast<FreeNode *>(base_ + offset);
+  if (node->next != nullptr) {
+    node->next->prev = node->prev;
+  }
+  if (node->prev != nullptr) {
+    node->prev->next = node->next;
+  } else {
+    lists_[order] = node->next;
+    if (node->next == nullptr) {
+      nonempty_ &= ~(std::uint64_t{1} << order);
+    }
+  }
+  clear(free_bits_, order, offset);
+  --free_blocks_;
+}
+
+void BuddyAllocator::release(unsigned order, std::size_t offset) noexcept {
+  while (!is_root(order, offset)) {
+    const auto buddy = offset ^ block_bytes(order);
+    if (!test(free_bits_, order, buddy)) {
+      break;
+    }
+    unlink_free(order, buddy);
+    offset = std::min(offset, buddy);
+    ++order;
+    clear(split_bits_, order, offset);
+  }
+  push_free(order, offset);
+}
+
+void BuddyAllocator::release_range(std::size_t begin,
+                                   std::size_t end) noexcept {
+  while (begin < end) {
+    unsigned order = std::min<unsigned>(
+        kMaxOrder, static_cast<unsigned>(std::countr_zero(begin | block_bytes(
+                                                                     kMaxOrder))) -
+                       kMinLog2);
+    while (block_bytes(order) > end - begin) {
+      --order;
+    }
+    release(order, begin);
+    begin += block_bytes(order);
+  }
+}
+
+auto BuddyAllocator::locate(std::size_t offset, unsigned order) const
+    -> std::expected<unsigned, AllocError> {
+  for (unsigned k = order; k < kOrders; ++k) {
+    const auto at = offset & ~(block_bytes(k) - 1);
+    if (at + block_bytes(k) > size_)
+      return std::unexpected(AllocError::BadPointer);
+    if (test(free_bits_, k, at))
+      return std::unexpected(AllocError::DoubleFree);
+    if (test(split_bits_, k, at))
+      return std::unexpected(AllocError::BadPointer);
+    // The block exists iff its parent is split; then it is allocated.
+    if (is_root(k, at) ||
+        test(split_bits_, k + 1, at & ~(block_bytes(k + 1) - 1))) {
+      if (at != offset)
+        return std::unexpected(AllocError::BadPointer);
+      return k;
+    }
+  }
+  return std::unexpected(AllocError::BadPointer);
+}
+
+auto BuddyAllocator::result_of(unsigned order, std::size_t offset) const
+    noexcept -> AllocationResult {
+  return AllocationResult{
+      .ptr = base_ + offset,
+      .offset = offset,
+      .actual_size = block_bytes(order),
+  };
+}
+
+// ─── Allocation ──────────────────────────────────────────────────────────
+
+auto BuddyAllocator::allocate(std::size_t size, std::size_t alignment)
+    -> std::expected<AllocationResult, AllocError> {
+  if (alignment != 0 && (alignment & (alignment - 1)) != 0)
+    return std::unexpected(AllocError::InvalidAlignment);
+  if (alignment > base_align_)
+    return std::unexpected(AllocError::InvalidAlignment);
+  if (size > size_)
+    return std::unexpected(AllocError::OutOfMemory);
+
+  // Blocks are aligned to their own size.
+  const unsigned order = order_for(std::max(size, alignment));
+  if (order > kMaxOrder)
+    return std::unexpected(AllocError::OutOfMemory);
+  const auto candidates = nonempty_ & (~std::uint64_t{0} << order);
+  if (candidates == 0)
+    return std::unexpected(AllocError::OutOfMemory);
+
+  auto k = static_cast<unsigned>(std::countr_zero(candidates));
+  const auto offset =
+      static_cast<std::size_t>(reinterpret_cast<std::byte *>(lists_[k]) -
+                               base_);
+  unlink_free(k, offset);
+  while (k > order) {
+    set(split_bits_, k, offset);
+    --k;
+    push_free(k, offset + block_bytes(k));
+  }
+
+  allocated_ += block_bytes(order);
+  ++live_blocks_;
+  return result_of(order, offset);
+}
+
+auto BuddyAllocator::deallocate(std::byte *ptr, std::size_t size)
+    -> std::expected<void, AllocError> {
+  if (!contains(ptr))
+    return std::unexpected(AllocError::BadPointer);
+  const auto offset = static_cast<std::size_t>(ptr - base_);
+  auto order = locate(offset, order_for(size));
+  if (!order)
+    return std::unexpected(order.error());
+
+  allocated_ -= block_bytes(*order);
+  --live_blocks_;
+  release(*order, offset);
+  return {};
+}
+
+auto BuddyAllocator::try_extend(std::byte *ptr, std::size_t size,
+                                std::size_t new_size)
+    -> std::expected<AllocationResult, AllocError> {
+  if (!contains(ptr))
+    return std::unexpected(AllocError::BadPointer);
+  const auto offset = static_cast<std::size_t>(ptr - base_);
+  auto located = locate(offset, order_for(size));
+  if (!located)
+    return std::unexpected(located.error());
+
+  const unsigned order = *located;
+  const unsigned target = order_for(new_size);
+  if (target > kMaxOrder)
+    return std::unexpected(AllocError::OutOfMemory);
+
+  if (target > order) {
+    // Every level up must have the block as its lower half and a free
+    // upper half.
+    for (unsigned k = order; k < target; ++k) {
+      if ((offset & block_bytes(k)) != 0 || is_root(k, offset) ||
+          !test(free_bits_, k, offset + block_bytes(k)))
+        return std::unexpected(AllocError::OutOfMemory);
+    }
+    for (unsigned k = order; k < target; ++k) {
+      unlink_free(k, offset + block_bytes(k));
+      clear(split_bits_, k + 1, offset);
+    }
+  } else {
+    for (unsigned k = order; k > target; --k) {
+      set(split_bits_, k, offset);
+      release(k - 1, offset + block_bytes(k - 1));
+    }
+  }
+
+  allocated_ = allocated_ - block_bytes(order) + block_bytes(target);
+  return result_of(target, offset);
+}
+
+auto BuddyAllocator::grow(std::size_t bytes) -> bool {
+  if (bytes % kMinBlock != 0 || bytes > max_size_ - size_)
+    return false;
+  if (bytes == 0)
+    return true;
+
+  // Blocks straddling the old end now fit whole; their halves below the
+  // old end already exist, so they start out split.
+  const auto old_size = size_;
+  size_ += bytes;
+  size_bitmaps();
+  for (unsigned k = 0; k < kOrders; ++k) {
+    const auto at = old_size & ~(block_bytes(k) - 1);
+    if (at != old_size && at + block_bytes(k) <= size_) {
+      set(split_bits_, k, at);
+    }
+  }
+  release_range(old_size, size_);
+  return true;
+}
+
+// ─── Statistics ──────────────────────────────────────────────────────────
+
+auto BuddyAllocator::bytes_allocated() const noexcept -> std::size_t {
+  return allocated_;
+}
+
+auto BuddyAllocator::bytes_free() const noexcept -> std::size_t {
+  return size_ - allocated_;
+}
+
+auto BuddyAllocator::largest_free_block() const noexcept -> std::size_t {
+  if (nonempty_ == 0) {
+    return 0;
+  }
+  return block_bytes(static_cast<unsigned>(std::bit_width(nonempty_)) - 1);
+}
+
+auto BuddyAllocator::free_block_count() const noexcept -> std::size_t {
+  return free_blocks_;
+}
+
+auto BuddyAllocator::live_block_count() const noexcept -> std::size_t {
+  return live_blocks_;
+}
+
+auto BuddyAllocator::fragmentation_pct() const noexcept -> std::size_t {
+  const auto free = bytes_free();
+  if (free == 0) {
+    return 0;
+  }
+  return 100 - std::min(largest_free_block(), free) * 100 / free;
+}
+
+auto BuddyAllocator::block_size_for(std::size_t size,
+                                    std::size_t alignment) const noexcept
+    -> std::size_t {
+  return block_bytes(order_for(std::max(size, alignment)));
+}
+
+auto BuddyAllocator::block_order(std::size_t actual_size) const noexcept
+    -> int {
+  if (actual_size < kMinBlock || !std::has_single_bit(actual_size)) {
+    return -1;
+  }
+  return static_cast<int>(order_for(actual_size));
+}
+
+void BuddyAllocator::for_each_free_extent(
+    const std::function<void(const FreeExtent &)> &fn) const {
+  struct Node {
+    unsigned order;
+    std::size_t offset;
+  };
+  std::array<Node, kOrders + 1> stack{};
+  std::size_t root = 0;
+  while (root < size_) {
+    // Roots are the largest aligned blocks that fit, as in release_range.
+    unsigned order = std::min<unsigned>(
+        kMaxOrder, static_cast<unsigned>(std::countr_zero(
+                       root | block_bytes(kMaxOrder))) -
+                       kMinLog2);
+    while (block_bytes(order) > size_ - root) {
+      --order;
+    }
+    std::size_t depth = 0;
+    stack[depth++] = {order, root};
+    while (depth > 0) {
+      const auto [k, at] = stack[--depth];
+      if (test(free_bits_, k, at)) {
+        fn(FreeExtent{base_ + at, block_bytes(k)});
+      } else if (k > 0 && test(split_bits_, k, at)) {
+        stack[depth++] = {k - 1, at + block_bytes(k - 1)};
+        stack[depth++] = {k - 1, at};
+      }
+    }
+    root += block_bytes(order);
+  }
+}
+
+} // namespace mmap_viz
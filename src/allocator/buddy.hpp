@@ -0,0 +1,182 @@
+#pragma once
+/// @file buddy.hpp
+/// @brief Binary buddy allocator operating over an Arena.
+
+#include "allocator/allocator_engine.hpp"
+
+#include <array>
+#include <bit>
+#include <cstddef>
+#include <cstdint>
+#include <expected>
+#include <functional>
+#include <vector>
+
+namespace mmap_viz {
+
+/// @brief Binary buddy allocator: every block is kMinBlock << order bytes
+/// and aligned to its size relative to the region base.
+///
+/// The region is cut into the largest aligned power-of-two roots that fit.
+/// A block splits into two buddies of the next lower order, and a freed
+/// block merges with its buddy whenever that one is free too, so merging
+/// needs no search: the buddy of the block at offset o is at o ^ size.
+///
+/// State lives in two bitmaps per order, one bit per possible block: free
+/// (the block is on its order's free list) and split (the block exists
+/// only as its two halves). Free lists are intrusive, and a one-word mask
+/// of the non-empty lists finds the order to split from with one bit scan.
+/// Split and merge walk at most kMaxOrder levels.
+///
+/// Requests round up to the next power of two, which costs up to half a
+/// block in internal fragmentation but is exact for power-of-two sizes.
+/// There are no size-class runs, compaction support or decommit.
+class BuddyAllocator final : public AllocatorEngine {
+public:
+  /// @brief Construct a buddy allocator over the given memory range.
+  /// @param base     Start of the memory region (16-byte aligned). Blocks
+  ///                 are aligned to at most the alignment of @p base.
+  /// @param size     Size of the memory region in bytes.
+  /// @param max_size Bytes from @p base the region may later grow to with
+  ///                 grow() (0 = fixed at @p size).
+  BuddyAllocator(std::byte *base, std::size_t size,
+                 std::size_t max_size = 0);
+
+  /// @brief Allocate the smallest block of at least max(@p size,
+  /// @p alignment) bytes.
+  /// @return InvalidAlignment if @p alignment is not a power of 2 or
+  ///         exceeds the alignment of the region base.
+  [[nodiscard]] auto allocate(std::size_t size,
+                              std::size_t alignment = alignof(std::max_align_t))
+      -> std::expected<AllocationResult, AllocError> override;
+
+  /// @brief Free a block, merging it with its buddy up the orders.
+  /// @param size Any size that rounds up to at most the block's size.
+  auto deallocate(std::byte *ptr, std::size_t size)
+      -> std::expected<void, AllocError> override;
+
+  /// @brief Resize a block in place. Shrinking frees the upper halves;
+  /// growing absorbs the buddies above the block while they are free and
+  /// the block is their lower half.
+  /// @return The resized block (same ptr), or OutOfMemory if it cannot grow
+  ///         in place.
+  [[nodiscard]] auto try_extend(std::byte *ptr, std::size_t size,
+                                std::size_t new_size)
+      -> std::expected<AllocationResult, AllocError> override;
+
+  [[nodiscard]] auto bytes_allocated() const noexcept -> std::size_t override;
+  [[nodiscard]] auto bytes_free() const noexcept -> std::size_t override;
+  /// @brief Size of the block at the highest order with a free block. O(1).
+  [[nodiscard]] auto largest_free_block() const noexcept
+      -> std::size_t override;
+  [[nodiscard]] auto free_block_count() const noexcept
+      -> std::size_t override;
+  [[nodiscard]] auto live_block_count() const noexcept
+      -> std::size_t override;
+  [[nodiscard]] auto fragmentation_pct() const noexcept
+      -> std::size_t override;
+
+  [[nodiscard]] auto base() const noexcept -> std::byte * override {
+    return base_;
+  }
+  [[nodiscard]] auto capacity() const noexcept -> std::size_t override {
+    return size_;
+  }
+  [[nodiscard]] auto max_capacity() const noexcept -> std::size_t override {
+    return max_size_;
+  }
+  [[nodiscard]] bool contains(const void *ptr) const noexcept override {
+    const auto *p = reinterpret_cast<const std::byte *>(ptr);
+    return p >= base_ && p < base_ + size_;
+  }
+
+  /// @brief Append @p bytes at the end of the region. Blocks that now fit
+  /// around the old end become split parents, and the new range is freed
+  /// as aligned blocks merging with free buddies.
+  /// @param bytes Multiple of 16, at most max_capacity() - capacity().
+  /// @return False (and no change) if the range does not fit.
+  auto grow(std::size_t bytes) -> bool override;
+
+  /// @brief Size of the block allocate(size, alignment) hands out.
+  [[nodiscard]] auto block_size_for(std::size_t size,
+                                    std::size_t alignment = alignof(
+                                        std::max_align_t)) const noexcept
+      -> std::size_t override;
+
+  /// @brief Call @p fn with every free block in address order. Descends
+  /// the split blocks from each root: O(blocks * kMaxOrder).
+  void for_each_free_extent(
+      const std::function<void(const FreeExtent &)> &fn) const override;
+
+  /// @brief log2(@p actual_size / kMinBlock) for a power-of-two size of at
+  /// least kMinBlock, -1 otherwise.
+  [[nodiscard]] auto block_order(std::size_t actual_size) const noexcept
+      -> int override;
+
+  /// @brief Size of an order-0 block.
+  static constexpr std::size_t kMinBlock = 16;
+  /// @brief Highest order: blocks of up to kMinBlock << kMaxOrder bytes.
+  static constexpr unsigned kMaxOrder = 36;
+
+private:
+  /// @brief Links stored in every free block.
+  struct FreeNode {
+    FreeNode *next;
+    FreeNode *prev;
+  };
+
+  static constexpr unsigned kMinLog2 = std::countr_zero(kMinBlock);
+  static constexpr std::size_t kOrders = kMaxOrder + 1;
+
+  [[nodiscard]] static constexpr auto block_bytes(unsigned order) noexcept
+      -> std::size_t {
+    return kMinBlock << order;
+  }
+  /// @brief Lowest order whose blocks hold @p size bytes.
+  [[nodiscard]] static auto order_for(std::size_t size) noexcept -> unsigned;
+
+  /// @brief The block at (@p order, @p offset) has no parent in the region.
+  [[nodiscard]] auto is_root(unsigned order, std::size_t offset) const noexcept
+      -> bool;
+
+  // --- Per-order bitmaps, one bit per aligned block ---
+  using Bitmap = std::array<std::vector<std::uint64_t>, kOrders>;
+  [[nodiscard]] static auto test(const Bitmap &bits, unsigned order,
+                                 std::size_t offset) noexcept -> bool;
+  static void set(Bitmap &bits, unsigned order, std::size_t offset) noexcept;
+  static void clear(Bitmap &bits, unsigned order, std::size_t offset) noexcept;
+  /// @brief Size every bitmap for a region of size_ bytes.
+  void size_bitmaps();
+
+  /// @brief Put the block at (@p order, @p offset) on its free list.
+  void push_free(unsigned order, std::size_t offset) noexcept;
+  /// @brief Take the block at (@p order, @p offset) off its free list.
+  void unlink_free(unsigned order, std::size_t offset) noexcept;
+  /// @brief Free a block, merging with free buddies.
+  void release(unsigned order, std::size_t offset) noexcept;
+  /// @brief Free [@p begin, @p end) as the largest aligned blocks.
+  void release_range(std::size_t begin, std::size_t end) noexcept;
+  /// @brief Order of the allocated block at @p offset, given the order a
+  /// caller's size rounds up to.
+  [[nodiscard]] auto locate(std::size_t offset, unsigned order) const
+      -> std::expected<unsigned, AllocError>;
+
+  [[nodiscard]] auto result_of(unsigned order, std::size_t offset) const
+      noexcept -> AllocationResult;
+
+  std::byte *base_;
+  std::size_t size_;
+  std::size_t max_size_;
+  std::size_t base_align_; ///< Alignment of base_, capped at the top order.
+
+  Bitmap free_bits_;
+  Bitmap split_bits_;
+  std::array<FreeNode *, kOrders> lists_{};
+  std::uint64_t nonempty_ = 0; ///< Bit k set if lists_[k] is non-empty.
+
+  std::size_t allocated_ = 0;
+  std::size_t free_blocks_ = 0;
+  std::size_t live_blocks_ = 0;
+};
+
+} // namespace mmap_viz
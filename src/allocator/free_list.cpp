@@ -3,18 +3,67 @@
 /// Address-Ordered Red-Black Tree.
 
 #include "allocator/free_list.hpp"
+#include "allocator/arena.hpp"
+#include <algorithm>
+#include <array>
+#include <bit>
 #include <cassert>
 #include <cstdio>
 #include <cstdlib>
 #include <cstring>
 #include <memory>
+#include <sys/mman.h>
+#include <vector>
 
 namespace mmap_viz {
 
+namespace {
+
+/// Slab size classes: 16-byte steps up to 128 B, then four classes per
+/// power of two up to 4 KB.
+constexpr std::size_t kSlabClassSizes[] = {
+    16,   32,   48,   64,   80,   96,   112,  128,  160,  192,
+    224,  256,  320,  384,  448,  512,  640,  768,  896,  1024,
+    1280, 1536, 1792, 2048, 2560, 3072, 3584, 4096,
+};
+
+/// Maps ceil(size / 16) to the smallest class that holds `size` bytes.
+constexpr auto kSlabClassLookup = [] {
+  std::array<std::uint8_t, 4096 / 16 + 1> table{};
+  std::size_t c = 0;
+  for (std::size_t q = 1; q < table.size(); ++q) {
+    while (kSlabClassSizes[c] < q * 16) {
+      ++c;
+    }
+    table[q] = static_cast<std::uint8_t>(c);
+  }
+  return table;
+}();
+
+/// MADV_DONTNEED on private anonymous memory refaults zero pages on Linux;
+/// elsewhere the contents are not guaranteed.
+#ifdef __linux__
+constexpr bool kDontNeedZeroes = true;
+#else
+constexpr bool kDontNeedZeroes = false;
+#endif
+
+/// @brief madvise wrapper for purge(); false if the kernel refused.
+auto release_pages(std::byte *ptr, std::size_t len, DecommitMode mode)
+    -> bool {
+#ifdef MADV_FREE
+  if (mode == DecommitMode::Free) {
+    return ::madvise(ptr, len, MADV_FREE) == 0;
+  }
+#endif
+  return ::madvise(ptr, len, MADV_DONTNEED) == 0;
+}
+
+} // namespace
+
 struct OpLogEntry {
   const char *op;
   void *node;
-  void *parent;
   void *left;
   void *right;
   std::size_t size;
@@ -25,8 +74,8 @@ static constexpr int kMaxLog = 256;
 struct AllocLog {
   OpLogEntry entries[kMaxLog];
   int tail = 0;
-  void add(const char *op, void *n, void *p, void *l, void *r, std::size_t s) {
-    entries[tail % kMaxLog] = {op, n, p, l, r, s};
+  void add(const char *op, void *n, void *l, void *r, std::size_t s) {
+    entries[tail % kMaxLog] = {op, n, l, r, s};
     tail++;
   }
   void dump() {
@@ -36,8 +85,8 @@ struct AllocLog {
     for (int i = 0; i < count; ++i) {
       int idx = (start + i) % kMaxLog;
       auto &e = entries[idx];
-      std::fprintf(stderr, "[%d] %s: node=%p p=%p l=%p r=%p size=%zu\n", idx,
-                   e.op, e.node, e.parent, e.left, e.right, e.size);
+      std::fprintf(stderr, "[%d] %s: node=%p l=%p r=%p size=%zu\n", idx, e.op,
+                   e.node, e.left, e.right, e.size);
     }
   }
 };
@@ -68,203 +117,370 @@ thread_local AllocLog g_log;
   }
 #endif
 
-#define SET_PARENT(n, p)                                                       \
-  do {                                                                         \
-    ASSERT_NOT_NULL(p);                                                        \
-    if ((n) != nil_)                                                           \
-      (n)->parent = (p);                                                       \
-  } while (0)
-#define SET_LEFT(n, l)                                                         \
-  do {                                                                         \
-    ASSERT_NOT_NULL(n);                                                        \
-    ASSERT_NOT_NULL(l);                                                        \
-    (n)->left = (l);                                                           \
-  } while (0)
-#define SET_RIGHT(n, r)                                                        \
-  do {                                                                         \
-    ASSERT_NOT_NULL(n);                                                        \
-    ASSERT_NOT_NULL(r);                                                        \
-    (n)->right = (r);                                                          \
-  } while (0)
-
-FreeListAllocator::FreeListAllocator(std::byte *base, std::size_t size) noexcept
-    : base_{base}, size_{size} {
-  static_assert(sizeof(FreeBlock) <= 48, "FreeBlock too large");
+FreeListAllocator::FreeListAllocator(std::byte *base, std::size_t size,
+                                     PlacementPolicy policy,
+                                     std::size_t max_size) noexcept
+    : base_{base}, size_{std::min(size, kMaxRegionSize) & ~(kGranule - 1)},
+      max_size_{std::min(std::max(size, max_size), kMaxRegionSize)},
+      policy_{policy}, rover_{base} {
+  static_assert(sizeof(FreeBlock) == kGranule, "FreeBlock must stay compact");
   // Initialize sentinel node for leaves.
   // We allocate it from the arena? No, that's messy.
   // We can just use a static instance or a member instance?
   // Member instance is safer for lifetime.
-  // But FreeBlock is huge now.
   // Let's allocate it on the heap for now, or use a special location.
   // Ah, we can't allocate from the allocator itself.
   // We can treat nil_ as a special pointer value, but that complicates logic.
   // Better to have a real object.
   // Let's just `new` it on the C++ heap. It's one node per allocator.
+  // (Persistent allocators keep it in their superblock instead.)
 
   nil_ = new FreeBlock();
-  nil_->size = 0;
-  nil_->parent = nil_;
-  nil_->left = nil_;
-  nil_->right = nil_;
-  nil_->subtree_max = 0;
-  nil_->color = Color::Black;
+  init_nil();
+  init_heap();
+
+  const auto first = reinterpret_cast<std::uintptr_t>(base_);
+  run_pages_storage_ = std::make_unique<std::uint8_t[]>(
+      (first + max_size_ - 1) / kSlabPageSize - first / kSlabPageSize + 1);
+  init_maps(run_pages_storage_.get());
+}
 
+FreeListAllocator::FreeListAllocator(Superblock *super, bool restore) noexcept
+    : base_{reinterpret_cast<std::byte *>(super) + super->heap_offset},
+      size_{std::min(super->region_size - super->heap_offset, kMaxRegionSize) &
+            ~(kGranule - 1)},
+      max_size_{size_},
+      policy_{static_cast<PlacementPolicy>(super->policy)}, rover_{base_} {
+  super_ = super;
+  nil_ = &super->nil;
+  init_nil();
+  init_maps(reinterpret_cast<std::uint8_t *>(super) + super->run_map_offset);
+  if (restore) {
+    restore_state();
+  } else {
+    init_heap();
+  }
+  super_->clean = 0;
+}
+
+FreeListAllocator::~FreeListAllocator() {
+  if (super_ != nullptr) {
+    save_state();
+  } else {
+    delete nil_;
+  }
+}
+
+void FreeListAllocator::init_nil() {
+  // Black, empty and childless; never written after this.
+  *nil_ = FreeBlock{};
   root_ = nil_;
+  pending_ = nil_;
+}
 
+void FreeListAllocator::init_heap() {
   // Initialize with a single free block spanning the entire arena.
-  auto *block = new (base_) FreeBlock{
-      .size = size_,
-      .parent = nil_,
-      .left = nil_,
-      .right = nil_,
-      .subtree_max = size_,
-      .color = Color::Black, // Root is always black
-  };
-
-  insert_node(block);
+  insert_node(make_node(base_, size_));
 
   // Stats
   free_blocks_ = 1;
+}
+
+void FreeListAllocator::init_maps(std::uint8_t *run_map) {
+  // Per-page run map covering every absolute page the shard may reach.
+  const auto first = reinterpret_cast<std::uintptr_t>(base_);
+  base_page_ = first / kSlabPageSize;
+  run_page_count_ = (first + max_size_ - 1) / kSlabPageSize - base_page_ + 1;
+  run_pages_ = run_map;
+
+  // Decommit state per OS page; everything starts out committed.
+  os_page_size_ = Arena::page_size();
+  os_base_page_ = first / os_page_size_;
+  os_page_count_ =
+      (first + max_size_ - 1) / os_page_size_ - os_base_page_ + 1;
+  page_state_ = std::make_unique<PageState[]>(os_page_count_);
+
+  size_run_classes();
+}
 
-  // Initialize segregated free lists
-  for (auto &list : free_lists_) {
-    list = nullptr;
+void FreeListAllocator::size_run_classes() {
+  // Size each class's runs; disable classes whose runs are too large for
+  // this shard so tiny shards keep using the tree directly.
+  for (std::size_t c = 0; c < kNumSlabClasses; ++c) {
+    std::size_t bytes = kSlabPageSize;
+    while (kSlabHeaderSize + kMinObjectsPerRun * kSlabClassSizes[c] > bytes) {
+      bytes <<= 1;
+    }
+    if (bytes * kMinRunsPerShard <= size_) {
+      run_log2_[c] = static_cast<std::uint8_t>(std::countr_zero(bytes));
+    }
+  }
+}
+
+// ─── Persistence ─────────────────────────────────────────────────────────
+
+auto FreeListAllocator::format(std::byte *region, std::size_t size,
+                               PlacementPolicy policy)
+    -> std::expected<std::unique_ptr<FreeListAllocator>, AllocError> {
+  const auto addr = reinterpret_cast<std::uintptr_t>(region);
+  if (addr % kSlabQuantum != 0) {
+    return std::unexpected(AllocError::InvalidAlignment);
+  }
+
+  // The run map is sized for the whole region so the layout does not
+  // depend on where the heap starts within a page.
+  const std::size_t map_offset = sizeof(Superblock);
+  const std::size_t map_bytes =
+      size == 0 ? 0
+                : (addr + size - 1) / kSlabPageSize - addr / kSlabPageSize + 1;
+  const std::size_t heap_offset =
+      (map_offset + map_bytes + kSlabQuantum - 1) & ~(kSlabQuantum - 1);
+  if (size < heap_offset + kMinBlockSize) {
+    return std::unexpected(AllocError::OutOfMemory);
+  }
+
+  auto *super = new (region) Superblock{
+      .magic = Superblock::kMagic,
+      .version = Superblock::kVersion,
+      .policy = static_cast<std::uint8_t>(policy),
+      .clean = 0,
+      .region_size = size,
+      .run_map_offset = map_offset,
+      .heap_offset = heap_offset,
+      .saved_base = addr,
+      .root = 0,
+      .rover = heap_offset,
+      .allocated = 0,
+      .free_blocks = 0,
+      .live_blocks = 0,
+      .partial_runs = {},
+      .nil = {},
+  };
+  std::memset(region + map_offset, 0, map_bytes);
+
+  return std::unique_ptr<FreeListAllocator>(
+      new FreeListAllocator(super, /*restore=*/false));
+}
+
+auto FreeListAllocator::attach(std::byte *region, std::size_t size)
+    -> std::expected<std::unique_ptr<FreeListAllocator>, AllocError> {
+  if (size < sizeof(Superblock) ||
+      reinterpret_cast<std::uintptr_t>(region) % kSlabQuantum != 0) {
+    return std::unexpected(AllocError::BadSuperblock);
+  }
+  auto *super = reinterpret_cast<Superblock *>(region);
+  const auto shift = reinterpret_cast<std::uintptr_t>(region) -
+                     static_cast<std::uintptr_t>(super->saved_base);
+  if (super->magic != Superblock::kMagic ||
+      super->version != Superblock::kVersion || super->clean != 1 ||
+      super->region_size > size || super->heap_offset >= super->region_size ||
+      super->policy > static_cast<std::uint8_t>(PlacementPolicy::NextFit) ||
+      shift % kMaxRunBytes != 0) {
+    return std::unexpected(AllocError::BadSuperblock);
+  }
+
+  return std::unique_ptr<FreeListAllocator>(
+      new FreeListAllocator(super, /*restore=*/true));
+}
+
+void FreeListAllocator::restore_state() {
+  auto *region = reinterpret_cast<std::byte *>(super_);
+  const auto shift = reinterpret_cast<std::uintptr_t>(region) -
+                     static_cast<std::uintptr_t>(super_->saved_base);
+
+  root_ = super_->root == 0 ? nil_
+                            : reinterpret_cast<FreeBlock *>(region + super_->root);
+  rover_ = region + super_->rover;
+  allocated_ = super_->allocated;
+  free_blocks_ = super_->free_blocks;
+  live_blocks_ = super_->live_blocks;
+  for (std::size_t c = 0; c < kNumSlabClasses; ++c) {
+    partial_runs_[c] =
+        super_->partial_runs[c] == 0
+            ? nullptr
+            : reinterpret_cast<SlabRun *>(region + super_->partial_runs[c]);
+  }
+
+  // Tree links are offsets from base_ and need no fixing up; run links are
+  // pointers and move with the region.
+  auto moved = [shift](auto *p) {
+    return reinterpret_cast<decltype(p)>(reinterpret_cast<std::uintptr_t>(p) +
+                                         shift);
+  };
+  // The histogram is derived state: rebuild it from the tree and from the
+  // runs with free slots (full runs contribute nothing).
+  std::vector<FreeBlock *> pending{root_};
+  while (!pending.empty()) {
+    auto *x = pending.back();
+    pending.pop_back();
+    if (x == nil_) {
+      continue;
+    }
+    ++free_histogram_[bucket_of(size_of(x))];
+    index_insert(x);
+    pending.push_back(left(x));
+    pending.push_back(right(x));
   }
+  for (auto *run : partial_runs_) {
+    for (; run != nullptr; run = run->next) {
+      if (shift != 0) {
+        run->prev = run->prev != nullptr ? moved(run->prev) : nullptr;
+        run->next = run->next != nullptr ? moved(run->next) : nullptr;
+      }
+      count_run(run, 1);
+    }
+  }
+  free_blocks_ = super_->free_blocks; // count_run() added the runs again.
+#ifndef NDEBUG
+  verify_tree(root_);
+#endif
 }
 
-// Check Allocator destructor? We aren't deleting nil_.
-// It's a leak of sizeof(FreeBlock) per Allocator instance.
-// But this is "Memory Mapping Visualization", likely long lived.
-// Ideally usage requires a destructor, but the class didn't have one
-// deklarated. We should add one if we want to be clean, but for now we follow
-// the existing style or just leak the sentinel. Actually, I can just make nil_
-// a member variable? `FreeBlock nil_node_;` `nil_ = &nil_node_;` But FreeBlock
-// is incomplete in header? No, it's defined in private. We can't change the
-// header again easily in this step. Let's just leak it for now, or use a
-// `std::unique_ptr` wrapper if we could. For the purpose of this task, leaking
-// one node on allocator destruction (which likely happens at program exit) is
-// acceptable for the prototype optimization.
+void FreeListAllocator::save_state() noexcept {
+  coalesce(); // Pending frees are not part of the saved state.
+  auto *region = reinterpret_cast<std::byte *>(super_);
+  auto offset_of = [region](const void *p) -> std::uint64_t {
+    return p == nullptr ? 0 : static_cast<const std::byte *>(p) - region;
+  };
+
+  super_->saved_base = reinterpret_cast<std::uintptr_t>(region);
+  super_->root = root_ == nil_ ? 0 : offset_of(root_);
+  super_->rover = offset_of(rover_);
+  super_->allocated = allocated_;
+  super_->free_blocks = free_blocks_;
+  super_->live_blocks = live_blocks_;
+  for (std::size_t c = 0; c < kNumSlabClasses; ++c) {
+    super_->partial_runs[c] = offset_of(partial_runs_[c]);
+  }
+  super_->clean = 1;
+}
 
 auto FreeListAllocator::allocate(std::size_t size, std::size_t alignment)
     -> std::expected<AllocationResult, AllocError> {
+  if (alignment != 0 && (alignment & (alignment - 1)) != 0)
+    return std::unexpected(AllocError::InvalidAlignment);
   if (size == 0)
     size = 1;
 
   // Enforce 16-byte alignment for internal structural integrity.
   // All FreeBlock headers MUST be 16-byte aligned.
   std::size_t internal_align = std::max(alignment, std::size_t(16));
-  std::size_t internal_size = (size + 15) & ~std::size_t(15);
-
-  // 1. Check small block segregated lists first
-  if (internal_size <= kMaxSmallBlockSize &&
-      internal_size >= kSmallBlockQuantum) {
-    std::size_t idx = (internal_size / kSmallBlockQuantum) - 1;
-    if (idx < kNumSmallClasses && free_lists_[idx]) {
-      auto *node = free_lists_[idx];
-      free_lists_[idx] = node->next;
-
-      allocated_ += internal_size;
-      free_blocks_--;
-
-      return AllocationResult{
-          .ptr = reinterpret_cast<std::byte *>(node),
-          .offset = static_cast<std::size_t>(
-              reinterpret_cast<std::byte *>(node) - base_),
-          .actual_size = internal_size,
-      };
-    }
+
+  // 1. Small requests come from the size-class runs.
+  auto slab = slab_allocate(size, internal_align);
+  if (slab.ptr != nullptr) {
+    allocated_ += slab.actual_size;
+    ++live_blocks_;
+    return slab;
   }
 
-  // 2. Search Red-Black Tree for first-fit
-  std::size_t min_size = std::max(internal_size, kMinBlockSize);
-  auto *curr = find_first_fit(min_size);
-
-  while (curr != nil_) {
-    auto *block_start = reinterpret_cast<std::byte *>(curr);
-
-    // Check alignment for PAYLOAD (which is the entire block now)
-    void *aligned_ptr = block_start;
-    std::size_t space = curr->size;
-
-    if (std::align(internal_align, internal_size, aligned_ptr, space)) {
-      // It fits!
-      auto *header_ptr =
-          static_cast<std::byte *>(aligned_ptr); // The returned pointer
-      auto pre_padding = static_cast<std::size_t>(header_ptr - block_start);
-
-      std::size_t total_block_size = curr->size;
-      delete_node(curr);
-
-      // Handle Pre-Padding
-      if (pre_padding >= kSmallBlockQuantum) {
-        auto *gap_block = reinterpret_cast<FreeBlock *>(block_start);
-        gap_block->size = pre_padding;
-
-        if (pre_padding <= kMaxSmallBlockSize) {
-          std::size_t idx = (pre_padding / kSmallBlockQuantum) - 1;
-          auto *node = reinterpret_cast<FreeNode *>(gap_block);
-          node->next = free_lists_[idx];
-          free_lists_[idx] = node;
-        } else {
-          ASSERT_NOT_NULL(nil_);
-          gap_block->parent = nil_;
-          gap_block->left = nil_;
-          gap_block->right = nil_;
-          gap_block->subtree_max = pre_padding;
-          gap_block->color = Color::Red;
-          insert_node(gap_block);
-        }
-      }
+  // 2. Everything else is carved from the tree, once more after merging
+  // pending frees if it has no fitting block.
+  auto result = carve_block(size, internal_align);
+  if (!result.has_value() && pending_count_ > 0) {
+    coalesce();
+    result = carve_block(size, internal_align);
+  }
+  if (result.has_value()) {
+    allocated_ += result->actual_size;
+    ++live_blocks_;
+  }
+  return result;
+}
 
-      // Handle Remainder
-      std::size_t remainder_size =
-          (total_block_size - pre_padding) - internal_size;
-
-      bool absorbed = false;
-      if (remainder_size >= kMinBlockSize) {
-        auto *new_free = new (header_ptr + internal_size)
-            FreeBlock{.size = remainder_size,
-                      .parent = nil_,
-                      .left = nil_,
-                      .right = nil_,
-                      .subtree_max = remainder_size,
-                      .color = Color::Red};
-        insert_node(new_free);
-      } else if (remainder_size >= kSmallBlockQuantum) {
-        if (remainder_size <= kMaxSmallBlockSize) {
-          std::size_t idx = (remainder_size / kSmallBlockQuantum) - 1;
-          auto *node = reinterpret_cast<FreeNode *>(header_ptr + internal_size);
-          node->next = free_lists_[idx];
-          free_lists_[idx] = node;
-        } else {
-          absorbed = true;
-        }
-      } else {
-        absorbed = true;
-      }
+auto FreeListAllocator::allocate_below(std::size_t size, std::size_t alignment,
+                                       const std::byte *limit)
+    -> std::expected<AllocationResult, AllocError> {
+  if (alignment != 0 && (alignment & (alignment - 1)) != 0)
+    return std::unexpected(AllocError::InvalidAlignment);
+  if (size == 0)
+    size = 1;
 
-      if (absorbed) {
-        internal_size += remainder_size;
-        free_blocks_--;
-      }
+  std::size_t internal_align = std::max(alignment, std::size_t(16));
+  std::size_t internal_size =
+      std::max((size + 15) & ~std::size_t(15), kMinBlockSize);
+  coalesce();
+
+  // Lowest-address fit regardless of the placement policy; blocks are
+  // visited in address order, so the first one past the limit ends it.
+  for (auto *x = find_first_fit(internal_size);
+       x != nil_ && reinterpret_cast<std::byte *>(x) < limit;
+       x = find_fit_from(reinterpret_cast<std::byte *>(x) + size_of(x),
+                         internal_size)) {
+    auto *at = placement_in(x, internal_size, internal_align);
+    if (at == nullptr) {
+      continue;
+    }
+    if (at + internal_size > limit) {
+      break;
+    }
+    auto result = carve_from(x, internal_size, internal_align);
+    allocated_ += result.actual_size;
+    ++live_blocks_;
+    return result;
+  }
+  return std::unexpected(AllocError::OutOfMemory);
+}
 
-      allocated_ += internal_size;
+auto FreeListAllocator::carve_block(std::size_t size, std::size_t alignment)
+    -> std::expected<AllocationResult, AllocError> {
+  // Tree blocks must be able to hold a FreeBlock once they are freed.
+  std::size_t internal_size =
+      std::max((size + 15) & ~std::size_t(15), kMinBlockSize);
+
+  // Search Red-Black Tree according to the placement policy
+  auto *curr = find_fit(internal_size, alignment);
+  if (curr == nil_) {
+    return std::unexpected(AllocError::OutOfMemory);
+  }
+  return carve_from(curr, internal_size, alignment);
+}
 
-      verify_tree(root_);
-      return AllocationResult{
-          .ptr = header_ptr,
-          .offset = static_cast<std::size_t>(header_ptr - base_),
-          .actual_size = internal_size,
-      };
+auto FreeListAllocator::carve_from(FreeBlock *curr, std::size_t internal_size,
+                                   std::size_t alignment) -> AllocationResult {
+  auto *block_start = reinterpret_cast<std::byte *>(curr);
+  auto *header_ptr = placement_in(curr, internal_size, alignment);
+  auto pre_padding = static_cast<std::size_t>(header_ptr - block_start);
+
+  std::size_t total_block_size = size_of(curr);
+  std::size_t remainder_size = (total_block_size - pre_padding) - internal_size;
+
+  // The node stays in the tree for whichever piece keeps its place in
+  // address order: the leading gap, else the remainder (moved up).
+  // placement_in guarantees the gap is 0 or >= kMinBlockSize.
+  if (pre_padding > 0) {
+    resize_node(curr, pre_padding);
+    if (remainder_size >= kMinBlockSize) {
+      recommit(header_ptr + internal_size, kMinBlockSize);
+      insert_node(make_node(header_ptr + internal_size, remainder_size));
+      free_blocks_++;
     }
+  } else if (remainder_size >= kMinBlockSize) {
+    recommit(header_ptr + internal_size, kMinBlockSize);
+    resize_node(curr, remainder_size, header_ptr + internal_size);
+  } else {
+    delete_node(curr);
+    free_blocks_--;
+  }
 
-    curr = successor(curr);
-    while (curr != nil_ && curr->size < min_size) {
-      curr = successor(curr);
-    }
+  if (remainder_size < kMinBlockSize) {
+    // Too small to track on its own: absorb it into the allocation.
+    internal_size += remainder_size;
   }
 
-  return std::unexpected(AllocError::OutOfMemory);
+  rover_ = header_ptr + internal_size;
+  auto [zeroed_begin, zeroed_end] = recommit(header_ptr, internal_size);
+
+#ifndef NDEBUG
+  verify_tree(root_);
+#endif
+  return AllocationResult{
+      .ptr = header_ptr,
+      .offset = static_cast<std::size_t>(header_ptr - base_),
+      .actual_size = internal_size,
+      .zeroed_begin = zeroed_begin,
+      .zeroed_end = zeroed_end,
+  };
 }
 
 auto FreeListAllocator::deallocate(std::byte *ptr, std::size_t size)
@@ -279,8 +495,105 @@ auto FreeListAllocator::deallocate(std::byte *ptr, std::size_t size)
     return std::unexpected(AllocError::BadPointer);
   }
 
-  std::size_t remaining_space = static_cast<std::size_t>(end - ptr);
-  if (size > remaining_space || size < kSmallBlockQuantum) {
+  // Slab objects are identified by address; the size is implied by the run.
+  if (auto *run = run_of(ptr)) {
+    return slab_deallocate(run, ptr);
+  }
+
+  auto actual_size = tree_block_size(ptr, size);
+  if (!actual_size.has_value()) {
+    return std::unexpected(actual_size.error());
+  }
+
+  if (is_pending(ptr)) {
+    return std::unexpected(AllocError::DoubleFree);
+  }
+
+  allocated_ -= *actual_size;
+  --live_blocks_;
+  free_range(ptr, *actual_size);
+  return {};
+}
+
+auto FreeListAllocator::try_extend(std::byte *ptr, std::size_t size,
+                                   std::size_t new_size)
+    -> std::expected<AllocationResult, AllocError> {
+  if (ptr == nullptr || !contains(ptr)) {
+    return std::unexpected(AllocError::BadPointer);
+  }
+  auto result = [&](std::size_t actual, std::size_t zb = 0,
+                    std::size_t ze = 0) {
+    return AllocationResult{
+        .ptr = ptr,
+        .offset = static_cast<std::size_t>(ptr - base_),
+        .actual_size = actual,
+        .zeroed_begin = zb,
+        .zeroed_end = ze,
+    };
+  };
+
+  // Slab objects keep their slot; anything up to the class size fits.
+  if (auto *run = run_of(ptr)) {
+    const std::size_t class_size = kSlabClassSizes[run->class_idx];
+    if (std::max(new_size, std::size_t{1}) > class_size) {
+      return std::unexpected(AllocError::OutOfMemory);
+    }
+    return result(class_size);
+  }
+
+  auto old_size = tree_block_size(ptr, size);
+  if (!old_size.has_value()) {
+    return std::unexpected(old_size.error());
+  }
+  std::size_t target =
+      std::max((new_size + 15) & ~std::size_t(15), kMinBlockSize);
+
+  // Shrink: hand the tail back unless it is too small to track.
+  if (target <= *old_size) {
+    const std::size_t tail = *old_size - target;
+    if (tail < kMinBlockSize) {
+      return result(*old_size);
+    }
+    allocated_ -= tail;
+    free_range(ptr + target, tail);
+    return result(target);
+  }
+
+  // Grow: the successor must start right at the end of the block, and may
+  // still be pending.
+  coalesce();
+  auto *end = ptr + *old_size;
+  const std::size_t need = target - *old_size;
+  auto *next = find_fit_from(end, need);
+  if (next == nil_ || reinterpret_cast<std::byte *>(next) != end) {
+    return std::unexpected(AllocError::OutOfMemory);
+  }
+
+  const std::size_t remainder = size_of(next) - need;
+  if (remainder >= kMinBlockSize) {
+    recommit(end + need, kMinBlockSize);
+    resize_node(next, remainder, end + need);
+  } else {
+    delete_node(next);
+    free_blocks_--;
+    target += remainder;
+  }
+
+  allocated_ += target - *old_size;
+  auto [zeroed_begin, zeroed_end] = recommit(end, target - *old_size);
+#ifndef NDEBUG
+  verify_tree(root_);
+#endif
+  if (zeroed_end == 0) {
+    return result(target);
+  }
+  return result(target, *old_size + zeroed_begin, *old_size + zeroed_end);
+}
+
+auto FreeListAllocator::tree_block_size(std::byte *ptr, std::size_t size) const
+    -> std::expected<std::size_t, AllocError> {
+  std::size_t remaining_space = static_cast<std::size_t>(base_ + size_ - ptr);
+  if (size > remaining_space || size < kSlabQuantum) {
     std::fprintf(stderr,
                  "FATAL: deallocate with invalid size %zu (remaining=%zu)\n",
                  size, remaining_space);
@@ -292,94 +605,542 @@ auto FreeListAllocator::deallocate(std::byte *ptr, std::size_t size)
     return std::unexpected(AllocError::InvalidAlignment);
   }
 
-  std::size_t actual_size = size;
-  // No header to find. 'ptr' is the start of the block.
+  // Tree blocks are never smaller than kMinBlockSize (see carve_block).
+  return std::max((size + 15) & ~std::size_t(15), kMinBlockSize);
+}
 
-  if (actual_size <= kMaxSmallBlockSize) {
-    std::size_t idx = (actual_size / kSmallBlockQuantum) - 1;
-    if (idx >= kNumSmallClasses)
-      idx = kNumSmallClasses - 1;
+auto FreeListAllocator::allocate_batch(std::size_t size, std::size_t alignment,
+                                       std::span<AllocationResult> out)
+    -> std::size_t {
+  if (alignment != 0 && (alignment & (alignment - 1)) != 0)
+    return 0;
+  if (size == 0)
+    size = 1;
+
+  std::size_t internal_align = std::max(alignment, std::size_t(16));
+  std::size_t n = 0;
 
-    auto *block = reinterpret_cast<FreeNode *>(ptr);
+  // 1. Small requests come from the size-class runs.
+  while (n < out.size()) {
+    auto slab = slab_allocate(size, internal_align);
+    if (slab.ptr == nullptr) {
+      break;
+    }
+    allocated_ += slab.actual_size;
+    ++live_blocks_;
+    out[n++] = slab;
+  }
 
-    block->next = free_lists_[idx];
-    free_lists_[idx] = block;
+  // 2. Carve room for as many objects as possible from one tree block and
+  // split it into equal-stride pieces. If no block is large enough, retry
+  // for half as many objects.
+  std::size_t stride = std::max((size + 15) & ~std::size_t(15), kMinBlockSize);
+  stride = (stride + internal_align - 1) & ~(internal_align - 1);
+  std::size_t want = std::min(out.size() - n, size_ / stride);
+
+  while (n < out.size() && want > 0) {
+    want = std::min(want, out.size() - n);
+    auto carved = carve_block(want * stride, internal_align);
+    if (!carved.has_value()) {
+      if (pending_count_ > 0) {
+        coalesce();
+        continue;
+      }
+      want /= 2;
+      continue;
+    }
 
-    allocated_ -= actual_size;
-    free_blocks_++;
-    return {};
+    allocated_ += carved->actual_size;
+    live_blocks_ += want;
+    for (std::size_t i = 0; i < want; ++i) {
+      out[n++] = AllocationResult{
+          .ptr = carved->ptr + i * stride,
+          .offset = carved->offset + i * stride,
+          .actual_size = stride,
+      };
+    }
+    // The last piece absorbs any tail too small to stay in the tree.
+    out[n - 1].actual_size += carved->actual_size - want * stride;
+
+    // Split the carve's zeroed range among the pieces.
+    for (std::size_t i = n - want; i < n; ++i) {
+      auto &piece = out[i];
+      const auto begin = static_cast<std::size_t>(piece.ptr - carved->ptr);
+      const auto end = begin + piece.actual_size;
+      const auto zb = std::clamp(carved->zeroed_begin, begin, end);
+      const auto ze = std::clamp(carved->zeroed_end, zb, end);
+      piece.zeroed_begin = zb - begin;
+      piece.zeroed_end = ze - begin;
+    }
+  }
+  return n;
+}
+
+auto FreeListAllocator::deallocate_batch(std::span<AllocationResult> blocks)
+    -> std::size_t {
+  std::sort(blocks.begin(), blocks.end(),
+            [](const AllocationResult &a, const AllocationResult &b) {
+              return a.ptr < b.ptr;
+            });
+
+  // Address-adjacent tree blocks accumulate into one pending range that is
+  // released (and coalesced) with a single tree insertion.
+  std::byte *range_start = nullptr;
+  std::size_t range_size = 0;
+  auto flush = [&] {
+    if (range_size != 0) {
+      free_range(range_start, range_size);
+      range_size = 0;
+    }
+  };
+
+  std::size_t released = 0;
+  for (const auto &block : blocks) {
+    if (block.ptr == nullptr || !contains(block.ptr)) {
+      continue;
+    }
+    if (auto *run = run_of(block.ptr)) {
+      if (slab_deallocate(run, block.ptr).has_value()) {
+        ++released;
+      }
+      continue;
+    }
+    if (range_size != 0 && block.ptr < range_start + range_size) {
+      continue; // Duplicate of a block already in the pending range.
+    }
+
+    auto tree_size = tree_block_size(block.ptr, block.actual_size);
+    if (!tree_size.has_value() || is_pending(block.ptr)) {
+      continue;
+    }
+    allocated_ -= *tree_size;
+    --live_blocks_;
+    ++released;
+
+    if (range_size != 0 && range_start + range_size == block.ptr) {
+      range_size += *tree_size;
+    } else {
+      flush();
+      range_start = block.ptr;
+      range_size = *tree_size;
+    }
+  }
+  flush();
+  return released;
+}
+
+void FreeListAllocator::release_block(std::byte *ptr, std::size_t size) {
+  if (size == 0 || size > size_ || size % kGranule != 0) {
+    std::fprintf(stderr, "FATAL: releasing garbage block size %zu at %p\n",
+                 size, (void *)ptr);
+    std::fflush(stderr);
+    g_log.dump();
+    std::abort();
   }
 
-  // Ensure block is large enough for RB metadata
-  if (actual_size < kMinBlockSize) {
-    std::size_t idx = kNumSmallClasses - 1;
-    auto *block = reinterpret_cast<FreeNode *>(ptr);
-    block->next = free_lists_[idx];
-    free_lists_[idx] = block;
-    allocated_ -= actual_size;
+  // 1. Find the neighbours in the address-ordered tree.
+  auto [prev, succ] = neighbours(ptr);
+  const bool merge_prev =
+      prev != nil_ && reinterpret_cast<std::byte *>(prev) + size_of(prev) == ptr;
+  const bool merge_succ =
+      succ != nil_ && ptr + size == reinterpret_cast<std::byte *>(succ);
+
+  // 2. Coalesce. Growing prev or moving succ down to ptr keeps their place
+  // in address order, so only a free block with no free neighbour needs an
+  // insertion.
+  if (merge_prev && merge_succ) {
+    const std::size_t succ_size = size_of(succ);
+    delete_node(succ);
+    free_blocks_--;
+    resize_node(prev, size_of(prev) + size + succ_size);
+  } else if (merge_prev) {
+    resize_node(prev, size_of(prev) + size);
+  } else if (merge_succ) {
+    resize_node(succ, size + size_of(succ), ptr);
+  } else {
+    insert_node(make_node(ptr, size));
     free_blocks_++;
-    return {};
   }
 
-  auto *block_addr = ptr;
-
-  // 1. Find potential neighbors in address-ordered tree
-  // We insert a temporary node to find predecessor/successor
-  auto *freed = new (block_addr) FreeBlock{.size = actual_size,
-                                           .parent = nil_,
-                                           .left = nil_,
-                                           .right = nil_,
-                                           .subtree_max = actual_size,
-                                           .color = Color::Red};
-
-  insert_node(freed);
-  free_blocks_++;
-  allocated_ -= actual_size;
-
-  // 2. Coalesce with Successor
-  auto *succ = successor(freed);
-  if (succ != nil_) {
-    auto *freed_end = reinterpret_cast<std::byte *>(freed) + freed->size;
-    if (freed_end == reinterpret_cast<std::byte *>(succ)) {
-      std::size_t succ_size = succ->size;
-      if (succ_size > size_ || succ_size == 0) {
-        std::fprintf(stderr, "FATAL: coalescing with garbage succ_size %zu\n",
-                     succ_size);
+#ifndef NDEBUG
+  verify_tree(root_);
+#endif
+}
+
+// --- Deferred coalescing ---
+//
+// Pending frees form a list linked through `right`, newest first. A sweep
+// sorts it, flattens the tree into a second sorted list, merges the two
+// while joining adjacent blocks, and rebuilds the tree from the result.
+
+void FreeListAllocator::set_deferred_coalescing(std::size_t threshold) {
+  coalesce_threshold_ = threshold;
+  if (threshold == 0 || pending_count_ >= threshold) {
+    coalesce();
+  }
+}
+
+void FreeListAllocator::free_range(std::byte *ptr, std::size_t size) {
+  if (coalesce_threshold_ == 0) {
+    release_block(ptr, size);
+    return;
+  }
+  pending_ = new (ptr) FreeBlock{
+      .size_red = static_cast<std::uint32_t>(size / kGranule) << 1,
+      .left = 0,
+      .right = ref(pending_),
+      .subtree_max = kPendingMark,
+  };
+  ++pending_count_;
+  ++free_blocks_;
+  ++free_histogram_[bucket_of(size)];
+  if (pending_count_ >= coalesce_threshold_) {
+    coalesce();
+  }
+}
+
+auto FreeListAllocator::is_pending(const std::byte *ptr) const -> bool {
+  // A live block may hold the mark by chance; only the list can tell.
+  if (pending_count_ == 0 ||
+      reinterpret_cast<const FreeBlock *>(ptr)->subtree_max != kPendingMark) {
+    return false;
+  }
+  for (const auto *x = pending_; x != nil_; x = right(x)) {
+    if (reinterpret_cast<const std::byte *>(x) == ptr) {
+      return true;
+    }
+  }
+  return false;
+}
+
+void FreeListAllocator::coalesce() {
+  if (pending_count_ == 0) {
+    return;
+  }
+  // Pending blocks leave the statistics and come back as tree blocks.
+  for (auto *x = pending_; x != nil_; x = right(x)) {
+    --free_blocks_;
+    --free_histogram_[bucket_of(size_of(x))];
+  }
+  auto *pending = sort_list(pending_, pending_count_);
+  pending_ = nil_;
+  pending_count_ = 0;
+
+  auto *tree = flatten_tree();
+  FreeBlock *head = nil_;
+  FreeBlock *tail = nil_;
+  std::size_t count = 0;
+  while (tree != nil_ || pending != nil_) {
+    FreeBlock *x = nullptr;
+    if (pending == nil_ || (tree != nil_ && tree < pending)) {
+      x = tree;
+      tree = right(tree);
+      --free_blocks_;
+    } else {
+      x = pending;
+      pending = right(pending);
+    }
+    auto *begin = reinterpret_cast<std::byte *>(x);
+    if (tail != nil_) {
+      auto *tail_end = reinterpret_cast<std::byte *>(tail) + size_of(tail);
+      if (begin < tail_end) {
+        // Only a block freed twice overlaps another free block.
+        std::fprintf(stderr,
+                     "FATAL: free block %p overlaps free block %p (%zu)\n",
+                     (void *)x, (void *)tail, size_of(tail));
         std::fflush(stderr);
-        g_log.dump();
         std::abort();
       }
-      delete_node(succ);
-      freed->size += succ_size;
-      update_max_upwards(freed);
-      free_blocks_--;
-    }
-  }
-
-  // 3. Coalesce with Predecessor
-  auto *prev = predecessor(freed);
-  if (prev != nil_) {
-    auto *prev_end = reinterpret_cast<std::byte *>(prev) + prev->size;
-    if (prev_end == reinterpret_cast<std::byte *>(freed)) {
-      std::size_t freed_size = freed->size;
-      if (freed_size > size_ || freed_size == 0) {
-        std::fprintf(stderr, "FATAL: coalescing with garbage freed_size %zu\n",
-                     freed_size);
-        std::fflush(stderr);
-        g_log.dump();
-        std::abort();
+      if (begin == tail_end) {
+        // Adjacent: join.
+        set_size(tail, size_of(tail) + size_of(x));
+        continue;
       }
-      delete_node(freed);
-      prev->size += freed_size;
-      update_max_upwards(prev);
-      free_blocks_--;
+      tail->right = ref(x);
+    } else {
+      head = x;
     }
+    tail = x;
+    ++count;
+  }
+  if (tail != nil_) {
+    tail->right = 0;
   }
 
+  // A tree whose subtrees differ in size by at most one node has all its
+  // leaves on the last two levels; colouring the partial last level red
+  // gives every path the same number of black nodes.
+  const int red_depth = static_cast<int>(std::bit_width(count + 1)) - 1;
+  root_ = build_tree(head, count, 0, red_depth);
+  free_blocks_ += count;
+#ifndef NDEBUG
   verify_tree(root_);
+#endif
+}
+
+auto FreeListAllocator::sort_list(FreeBlock *head, std::size_t count)
+    -> FreeBlock * {
+  if (count <= 1) {
+    head->right = 0;
+    return head;
+  }
+  auto *mid = head;
+  for (std::size_t i = 1; i < count / 2; ++i) {
+    mid = right(mid);
+  }
+  auto *a = right(mid);
+  mid->right = 0;
+  a = sort_list(a, count - count / 2);
+  auto *b = sort_list(head, count / 2);
+
+  FreeBlock *first = nil_;
+  FreeBlock *tail = nil_;
+  while (a != nil_ || b != nil_) {
+    FreeBlock *x = nullptr;
+    if (b == nil_ || (a != nil_ && a < b)) {
+      x = a;
+      a = right(a);
+    } else {
+      x = b;
+      b = right(b);
+    }
+    if (tail == nil_) {
+      first = x;
+    } else {
+      tail->right = ref(x);
+    }
+    tail = x;
+  }
+  tail->right = 0;
+  return first;
+}
+
+auto FreeListAllocator::flatten_tree() -> FreeBlock * {
+  size_index_.clear();
+  FreeBlock *stack[kMaxTreeDepth];
+  int depth = 0;
+  auto push_left = [&](FreeBlock *x) {
+    for (; x != nil_; x = left(x)) {
+      stack[depth++] = x;
+    }
+  };
+
+  FreeBlock *head = nil_;
+  FreeBlock *tail = nil_;
+  push_left(root_);
+  while (depth > 0) {
+    auto *x = stack[--depth];
+    push_left(right(x));
+    --free_histogram_[bucket_of(size_of(x))];
+    x->left = 0;
+    x->right = 0;
+    if (tail == nil_) {
+      head = x;
+    } else {
+      tail->right = ref(x);
+    }
+    tail = x;
+  }
+  root_ = nil_;
+  return head;
+}
+
+auto FreeListAllocator::build_tree(FreeBlock *&cursor, std::size_t count,
+                                   int depth, int red_depth) -> FreeBlock * {
+  if (count == 0) {
+    return nil_;
+  }
+  const std::size_t left_count = (count - 1) / 2;
+  auto *l = build_tree(cursor, left_count, depth + 1, red_depth);
+  auto *x = cursor;
+  cursor = right(cursor);
+  auto *r = build_tree(cursor, count - 1 - left_count, depth + 1, red_depth);
+
+  x->left = ref(l);
+  x->right = ref(r);
+  set_red(x, depth == red_depth);
+  update_max(x);
+  index_insert(x);
+  ++free_histogram_[bucket_of(size_of(x))];
+  return x;
+}
+
+// --- Slab size-class engine ---
+
+auto FreeListAllocator::slab_allocate(std::size_t size, std::size_t alignment)
+    -> AllocationResult {
+  if (size > kMaxSlabSize || alignment > kSlabQuantum) {
+    return {};
+  }
+  const std::size_t c =
+      kSlabClassLookup[(size + kSlabQuantum - 1) / kSlabQuantum];
+  if (run_log2_[c] == 0) {
+    return {};
+  }
+
+  auto *run = partial_runs_[c];
+  if (run == nullptr) {
+    run = make_run(c);
+    if (run == nullptr) {
+      return {};
+    }
+  }
+
+  std::size_t w = 0;
+  while (run->bitmap[w] == 0) {
+    ++w;
+  }
+  const auto bit = static_cast<std::size_t>(std::countr_zero(run->bitmap[w]));
+
+  count_run(run, -1);
+  run->bitmap[w] &= run->bitmap[w] - 1;
+  run->free_count--;
+  count_run(run, 1);
+
+  if (run->free_count == 0) {
+    unlink_run(run);
+  }
+
+  const std::size_t class_size = kSlabClassSizes[c];
+  auto *ptr = reinterpret_cast<std::byte *>(run) + kSlabHeaderSize +
+              (w * 64 + bit) * class_size;
+  return AllocationResult{
+      .ptr = ptr,
+      .offset = static_cast<std::size_t>(ptr - base_),
+      .actual_size = class_size,
+  };
+}
+
+auto FreeListAllocator::slab_deallocate(SlabRun *run, std::byte *ptr)
+    -> std::expected<void, AllocError> {
+  auto *slots = reinterpret_cast<std::byte *>(run) + kSlabHeaderSize;
+  const std::size_t class_size = kSlabClassSizes[run->class_idx];
+  if (ptr < slots ||
+      static_cast<std::size_t>(ptr - slots) % class_size != 0 ||
+      static_cast<std::size_t>(ptr - slots) / class_size >= run->capacity) {
+    return std::unexpected(AllocError::BadPointer);
+  }
+
+  const auto slot = static_cast<std::size_t>(ptr - slots) / class_size;
+  const std::uint64_t mask = std::uint64_t{1} << (slot % 64);
+  auto &word = run->bitmap[slot / 64];
+  if ((word & mask) != 0) {
+    return std::unexpected(AllocError::DoubleFree);
+  }
+
+  count_run(run, -1);
+  word |= mask;
+  if (run->free_count++ == 0) {
+    link_run(run);
+  }
+  count_run(run, 1);
+  allocated_ -= class_size;
+  --live_blocks_;
+
+  // Return an empty run to the tree unless it is the class's only run with
+  // free slots; keeping one avoids carve/release ping-pong on alloc/free
+  // pairs.
+  if (run->free_count == run->capacity &&
+      (partial_runs_[run->class_idx] != run || run->next != nullptr)) {
+    unlink_run(run);
+    count_run(run, -1);
+    mark_run_pages(run, 0);
+    release_block(reinterpret_cast<std::byte *>(run), run->block_size);
+  }
   return {};
 }
 
+auto FreeListAllocator::make_run(std::size_t class_idx) -> SlabRun * {
+  const std::size_t run_bytes = std::size_t{1} << run_log2_[class_idx];
+  auto block = carve_block(run_bytes, run_bytes);
+  if (!block.has_value()) {
+    return nullptr;
+  }
+
+  const auto capacity = static_cast<std::uint16_t>(
+      (run_bytes - kSlabHeaderSize) / kSlabClassSizes[class_idx]);
+  auto *run = new (block->ptr) SlabRun{
+      .block_size = block->actual_size,
+      .next = nullptr,
+      .prev = nullptr,
+      .class_idx = static_cast<std::uint16_t>(class_idx),
+      .capacity = capacity,
+      .free_count = capacity,
+      .log2_bytes = run_log2_[class_idx],
+      .bitmap = {},
+  };
+  for (std::size_t i = 0; i < capacity; ++i) {
+    run->bitmap[i / 64] |= std::uint64_t{1} << (i % 64);
+  }
+
+  mark_run_pages(run, run_log2_[class_idx]);
+  link_run(run);
+  count_run(run, 1);
+  return run;
+}
+
+void FreeListAllocator::link_run(SlabRun *run) {
+  auto &head = partial_runs_[run->class_idx];
+  run->prev = nullptr;
+  run->next = head;
+  if (head != nullptr) {
+    head->prev = run;
+  }
+  head = run;
+}
+
+void FreeListAllocator::unlink_run(SlabRun *run) {
+  if (run->prev != nullptr) {
+    run->prev->next = run->next;
+  } else {
+    partial_runs_[run->class_idx] = run->next;
+  }
+  if (run->next != nullptr) {
+    run->next->prev = run->prev;
+  }
+  run->next = run->prev = nullptr;
+}
+
+auto FreeListAllocator::run_free_blocks(const SlabRun *run) noexcept
+    -> std::size_t {
+  // An untouched run is one contiguous free extent, not `capacity` holes.
+  return run->free_count == run->capacity ? 1 : run->free_count;
+}
+
+void FreeListAllocator::count_run(const SlabRun *run, int sign) noexcept {
+  const std::size_t class_size = kSlabClassSizes[run->class_idx];
+  const std::size_t blocks = run_free_blocks(run);
+  const std::size_t block_size = run->free_count == run->capacity
+                                     ? run->capacity * class_size
+                                     : class_size;
+  auto &bucket = free_histogram_[bucket_of(block_size)];
+  if (sign > 0) {
+    free_blocks_ += blocks;
+    bucket += blocks;
+  } else {
+    free_blocks_ -= blocks;
+    bucket -= blocks;
+  }
+}
+
+void FreeListAllocator::mark_run_pages(SlabRun *run, std::uint8_t value) {
+  const auto first =
+      reinterpret_cast<std::uintptr_t>(run) / kSlabPageSize - base_page_;
+  const std::size_t pages =
+      (std::size_t{1} << run->log2_bytes) / kSlabPageSize;
+  std::memset(run_pages_ + first, value, pages);
+}
+
+auto FreeListAllocator::run_of(const std::byte *ptr) const -> SlabRun * {
+  const auto addr = reinterpret_cast<std::uintptr_t>(ptr);
+  const auto page = addr / kSlabPageSize - base_page_;
+  if (page >= run_page_count_ || run_pages_[page] == 0) {
+    return nullptr;
+  }
+  const auto mask = (std::uintptr_t{1} << run_pages_[page]) - 1;
+  return reinterpret_cast<SlabRun *>(addr & ~mask);
+}
+
 auto FreeListAllocator::bytes_allocated() const noexcept -> std::size_t {
   return allocated_;
 }
@@ -389,82 +1150,260 @@ auto FreeListAllocator::bytes_free() const noexcept -> std::size_t {
 }
 
 auto FreeListAllocator::largest_free_block() const noexcept -> std::size_t {
-  if (root_ == nil_)
-    return 0;
-  return root_->subtree_max;
+  return max_of(root_);
 }
 
 auto FreeListAllocator::free_block_count() const noexcept -> std::size_t {
   return free_blocks_;
 }
 
+auto FreeListAllocator::live_block_count() const noexcept -> std::size_t {
+  return live_blocks_;
+}
+
+auto FreeListAllocator::fragmentation_pct() const noexcept -> std::size_t {
+  const std::size_t free = bytes_free();
+  if (free == 0) {
+    return 0;
+  }
+  return 100 - std::min(largest_free_block(), free) * 100 / free;
+}
+
+auto FreeListAllocator::max_capacity() const noexcept -> std::size_t {
+  return max_size_;
+}
+
+auto FreeListAllocator::grow(std::size_t bytes) -> bool {
+  if (bytes == 0 || bytes % kSlabQuantum != 0 || bytes > max_size_ - size_) {
+    return false;
+  }
+  std::byte *tail = base_ + size_;
+  size_ += bytes;
+  release_block(tail, bytes);
+  size_run_classes();
+  return true;
+}
+
 auto FreeListAllocator::capacity() const noexcept -> std::size_t {
   return size_;
 }
 
 auto FreeListAllocator::base() const noexcept -> std::byte * { return base_; }
 
+auto FreeListAllocator::policy() const noexcept -> PlacementPolicy {
+  return policy_;
+}
+
+auto FreeListAllocator::purge(std::size_t min_block, DecommitMode mode)
+    -> std::size_t {
+  const std::size_t threshold = std::max(min_block, std::size_t{1});
+  const std::size_t ps = os_page_size_;
+  std::size_t released = 0;
+  coalesce();
+
+  // Visit every block of at least `threshold` bytes, pruning by subtree_max.
+  std::vector<FreeBlock *> pending{root_};
+  while (!pending.empty()) {
+    auto *x = pending.back();
+    pending.pop_back();
+    if (x == nil_ || max_of(x) < threshold) {
+      continue;
+    }
+    if (size_of(x) >= threshold) {
+      // Keep the page holding the FreeBlock header; release whole pages
+      // after it.
+      const auto addr = reinterpret_cast<std::uintptr_t>(x);
+      const auto begin = (addr + kMinBlockSize + ps - 1) / ps * ps;
+      const auto end = (addr + size_of(x)) / ps * ps;
+      if (begin < end) {
+        released += decommit_pages(reinterpret_cast<std::byte *>(begin),
+                                   reinterpret_cast<std::byte *>(end), mode);
+      }
+    }
+    pending.push_back(left(x));
+    pending.push_back(right(x));
+  }
+  return released;
+}
+
+auto FreeListAllocator::decommit_pages(std::byte *begin, std::byte *end,
+                                       DecommitMode mode) -> std::size_t {
+  const std::size_t ps = os_page_size_;
+  // Shared file pages keep their contents across MADV_DONTNEED.
+  const PageState target =
+      mode == DecommitMode::DontNeed && kDontNeedZeroes && super_ == nullptr
+          ? PageState::Zeroed
+          : PageState::Released;
+  auto needs_release = [&](std::size_t page) {
+    auto state = page_state_[page - os_base_page_];
+    return mode == DecommitMode::DontNeed ? state != target
+                                          : state == PageState::Committed;
+  };
+
+  const std::size_t last = reinterpret_cast<std::uintptr_t>(end) / ps;
+  std::size_t page = reinterpret_cast<std::uintptr_t>(begin) / ps;
+  std::size_t released = 0;
+
+  // One madvise per run of pages that still need releasing.
+  while (page < last) {
+    if (!needs_release(page)) {
+      ++page;
+      continue;
+    }
+    std::size_t run_end = page + 1;
+    while (run_end < last && needs_release(run_end)) {
+      ++run_end;
+    }
+    if (release_pages(reinterpret_cast<std::byte *>(page * ps),
+                      (run_end - page) * ps, mode)) {
+      for (std::size_t p = page; p < run_end; ++p) {
+        auto &state = page_state_[p - os_base_page_];
+        if (state == PageState::Committed) {
+          decommitted_ += ps;
+          released += ps;
+        }
+        state = target;
+      }
+    }
+    page = run_end;
+  }
+  return released;
+}
+
+auto FreeListAllocator::recommit(std::byte *ptr, std::size_t size)
+    -> std::pair<std::size_t, std::size_t> {
+  if (decommitted_ == 0 || size == 0) {
+    return {0, 0};
+  }
+
+  const std::size_t ps = os_page_size_;
+  const auto addr = reinterpret_cast<std::uintptr_t>(ptr);
+  std::size_t best_begin = 0;
+  std::size_t best_end = 0;
+  std::size_t run_begin = 0;
+  bool in_run = false;
+
+  for (std::size_t page = addr / ps; page <= (addr + size - 1) / ps; ++page) {
+    auto &state = page_state_[page - os_base_page_];
+    const std::uintptr_t page_addr = page * ps;
+    const bool inside = page_addr >= addr && page_addr + ps <= addr + size;
+
+    if (state == PageState::Zeroed && inside) {
+      if (!in_run) {
+        run_begin = page_addr - addr;
+        in_run = true;
+      }
+      const std::size_t run_end = page_addr + ps - addr;
+      if (run_end - run_begin > best_end - best_begin) {
+        best_begin = run_begin;
+        best_end = run_end;
+      }
+    } else {
+      in_run = false;
+    }
+
+    if (state != PageState::Committed) {
+      decommitted_ -= ps;
+      state = PageState::Committed;
+    }
+  }
+  return {best_begin, best_end};
+}
+
+auto FreeListAllocator::committed_bytes() const noexcept -> std::size_t {
+  return size_ - decommitted_;
+}
+
+auto FreeListAllocator::block_size_for(std::size_t size,
+                                       std::size_t alignment) const noexcept
+    -> std::size_t {
+  if (size == 0)
+    size = 1;
+  if (size <= kMaxSlabSize && alignment <= kSlabQuantum) {
+    const std::size_t c =
+        kSlabClassLookup[(size + kSlabQuantum - 1) / kSlabQuantum];
+    if (run_log2_[c] != 0) {
+      return kSlabClassSizes[c];
+    }
+  }
+  return std::max((size + 15) & ~std::size_t(15), kMinBlockSize);
+}
+
 // --- RB Tree Implementation ---
+//
+// Nodes carry no parent link. Insertion and deletion record the path from
+// the root and rebalance along it; everything else walks downwards only.
+
+auto FreeListAllocator::make_node(std::byte *at, std::size_t size) noexcept
+    -> FreeBlock * {
+  const auto granules = static_cast<std::uint32_t>(size / kGranule);
+  return new (at) FreeBlock{
+      .size_red = granules << 1 | 1,
+      .left = 0,
+      .right = 0,
+      .subtree_max = granules,
+  };
+}
 
-void FreeListAllocator::left_rotate(FreeBlock *x) {
-  FreeBlock *y = x->right;
-  ASSERT_NOT_NULL(y);
-  SET_RIGHT(x, y->left);
-  if (y->left != nil_) {
-    SET_PARENT(y->left, x);
-  }
-  SET_PARENT(y, x->parent);
-  if (x->parent == nil_) {
-    root_ = y;
-  } else if (x == x->parent->left) {
-    SET_LEFT(x->parent, y);
+void FreeListAllocator::replace_child(FreeBlock *parent,
+                                      const FreeBlock *old_child,
+                                      FreeBlock *new_child) {
+  if (parent == nil_) {
+    root_ = new_child;
+  } else if (parent->left == ref(old_child)) {
+    parent->left = ref(new_child);
   } else {
-    SET_RIGHT(x->parent, y);
+    parent->right = ref(new_child);
   }
-  SET_LEFT(y, x);
-  SET_PARENT(x, y);
+}
+
+auto FreeListAllocator::path_to(const FreeBlock *x, FreeBlock **path) const
+    -> int {
+  int depth = 0;
+  for (auto *y = root_; y != x; y = x < y ? left(y) : right(y)) {
+    if (y == nil_) {
+      std::fprintf(stderr, "RB-Tree Error: node %p is not in the tree\n",
+                   (void *)x);
+      g_log.dump();
+      std::abort();
+    }
+    path[depth++] = y;
+  }
+  return depth;
+}
 
-  g_log.add("left_rotate", x, x->parent, x->left, x->right, x->size);
+void FreeListAllocator::left_rotate(FreeBlock *x, FreeBlock *parent) {
+  FreeBlock *y = right(x);
+  x->right = y->left;
+  y->left = ref(x);
+  replace_child(parent, x, y);
 
-  // Update max. Note: y's max becomes what x's was, then we re-derive.
+  g_log.add("left_rotate", x, left(x), right(x), size_of(x));
+
+  // y now spans x's old subtree; x's shrank and is re-derived.
   y->subtree_max = x->subtree_max;
   update_max(x);
-  update_max(y);
 }
 
-void FreeListAllocator::right_rotate(FreeBlock *x) {
-  FreeBlock *y = x->left;
-  ASSERT_NOT_NULL(y);
-  SET_LEFT(x, y->right);
-  if (y->right != nil_) {
-    SET_PARENT(y->right, x);
-  }
-  SET_PARENT(y, x->parent);
-  if (x->parent == nil_) {
-    root_ = y;
-  } else if (x == x->parent->right) {
-    SET_RIGHT(x->parent, y);
-  } else {
-    SET_LEFT(x->parent, y);
-  }
-  SET_RIGHT(y, x);
-  SET_PARENT(x, y);
+void FreeListAllocator::right_rotate(FreeBlock *x, FreeBlock *parent) {
+  FreeBlock *y = left(x);
+  x->left = y->right;
+  y->right = ref(x);
+  replace_child(parent, x, y);
 
-  g_log.add("right_rotate", x, x->parent, x->left, x->right, x->size);
+  g_log.add("right_rotate", x, left(x), right(x), size_of(x));
 
-  // Update max. Note: y's max becomes what x's was, then we re-derive.
   y->subtree_max = x->subtree_max;
   update_max(x);
-  update_max(y);
 }
 
 void FreeListAllocator::insert_node(FreeBlock *z) {
   if (z == nullptr || z == nil_)
     return;
 
-  if (z->size > 1024 * 1024 * 1024 || z->size == 0) {
+  if (size_of(z) > size_ || size_of(z) == 0) {
     std::fprintf(stderr, "FATAL: insert_node with garbage size %zu at %p\n",
-                 z->size, (void *)z);
+                 size_of(z), (void *)z);
     std::fflush(stderr);
     g_log.dump();
     std::fflush(stderr);
@@ -479,320 +1418,351 @@ void FreeListAllocator::insert_node(FreeBlock *z) {
     std::abort();
   }
 
-  FreeBlock *y = nil_;
-  FreeBlock *x = root_;
-
-  // Key is Address
-  while (x != nil_) {
-    ASSERT_NOT_NULL(x);
-    y = x;
-    if (z < x) {
-      x = x->left;
-    } else {
-      x = x->right;
-    }
+  z->left = 0;
+  z->right = 0;
+  set_red(z, true);
+  z->subtree_max = z->size_red >> 1;
+
+  // Key is Address. The new leaf raises subtree_max along its path.
+  FreeBlock *path[kMaxTreeDepth];
+  int depth = 0;
+  for (auto *x = root_; x != nil_; x = z < x ? left(x) : right(x)) {
+    x->subtree_max = std::max(x->subtree_max, z->subtree_max);
+    path[depth++] = x;
   }
-
-  ASSERT_NOT_NULL(y);
-  z->parent = y;
-  if (y == nil_) {
+  if (depth == 0) {
     root_ = z;
-  } else if (z < y) {
-    ASSERT_NOT_NULL(z);
-    y->left = z;
+  } else if (z < path[depth - 1]) {
+    path[depth - 1]->left = ref(z);
   } else {
-    ASSERT_NOT_NULL(z);
-    y->right = z;
+    path[depth - 1]->right = ref(z);
   }
 
-  ASSERT_NOT_NULL(nil_);
-  z->left = nil_;
-  z->right = nil_;
-  z->color = Color::Red;
-  z->subtree_max = z->size;
-
-  g_log.add("insert_node", z, z->parent, z->left, z->right, z->size);
-
-  update_max_upwards(z);
-
-  rb_insert_fixup(z);
-}
-
-void FreeListAllocator::rb_insert_fixup(FreeBlock *z) {
-  while (z != nullptr && z->parent != nullptr &&
-         z->parent->color == Color::Red) {
-    ASSERT_NOT_NULL(z->parent->parent);
-    if (z->parent == z->parent->parent->left) {
-      FreeBlock *y = z->parent->parent->right;
-      if (y->color == Color::Red) {
-        z->parent->color = Color::Black;
-        y->color = Color::Black;
-        z->parent->parent->color = Color::Red;
-        z = z->parent->parent;
-      } else {
-        if (z == z->parent->right) {
-          z = z->parent;
-          left_rotate(z);
-        }
-        z->parent->color = Color::Black;
-        z->parent->parent->color = Color::Red;
-        right_rotate(z->parent->parent);
+  g_log.add("insert_node", z, nil_, nil_, size_of(z));
+
+  // Fixup: path[i - 1] is the parent of x.
+  FreeBlock *x = z;
+  int i = depth;
+  while (i > 0 && is_red(path[i - 1])) {
+    FreeBlock *p = path[i - 1];
+    FreeBlock *g = path[i - 2]; // A red parent is never the root.
+    FreeBlock *gp = i >= 3 ? path[i - 3] : nil_;
+    const bool p_is_left = left(g) == p;
+    FreeBlock *uncle = p_is_left ? right(g) : left(g);
+
+    if (is_red(uncle)) {
+      set_red(p, false);
+      set_red(uncle, false);
+      set_red(g, true);
+      x = g;
+      i -= 2;
+      continue;
+    }
+    if (p_is_left) {
+      if (x == right(p)) {
+        left_rotate(p, g);
+        p = x;
       }
+      right_rotate(g, gp);
     } else {
-      FreeBlock *y = z->parent->parent->left;
-      if (y->color == Color::Red) {
-        z->parent->color = Color::Black;
-        y->color = Color::Black;
-        z->parent->parent->color = Color::Red;
-        z = z->parent->parent;
-      } else {
-        if (z == z->parent->left) {
-          z = z->parent;
-          right_rotate(z);
-        }
-        z->parent->color = Color::Black;
-        z->parent->parent->color = Color::Red;
-        left_rotate(z->parent->parent);
+      if (x == left(p)) {
+        right_rotate(p, g);
+        p = x;
       }
+      left_rotate(g, gp);
     }
+    set_red(p, false);
+    set_red(g, true);
+    break;
   }
-  root_->color = Color::Black;
-}
+  set_red(root_, false);
 
-void FreeListAllocator::rb_transplant(FreeBlock *u, FreeBlock *v) {
-  if (u->parent == nil_) {
-    root_ = v;
-  } else if (u == u->parent->left) {
-    SET_LEFT(u->parent, v);
-  } else {
-    SET_RIGHT(u->parent, v);
-  }
-  if (v != nil_) {
-    SET_PARENT(v, u->parent);
-  }
+  index_insert(z);
+  ++free_histogram_[bucket_of(size_of(z))];
 }
 
 void FreeListAllocator::delete_node(FreeBlock *z) {
-  if (z->parent == nil_) {
-    // Parent is nil (root), this is fine.
-  }
-
-  FreeBlock *y = z;
-  FreeBlock *x;
-  Color y_original_color = y->color;
-
-  // We need to fixup sizes starting from somewhere.
-  // The path from the replaced node upwards needs update.
-  FreeBlock *fix_start = nullptr;
-
-  FreeBlock *x_parent = nil_;
-
-  if (z->left == nil_) {
-    x = z->right;
-    x_parent = z->parent;
-    rb_transplant(z, z->right);
-    fix_start = z->parent;
-  } else if (z->right == nil_) {
-    x = z->left;
-    x_parent = z->parent;
-    rb_transplant(z, z->left);
-    fix_start = z->parent;
-  } else {
-    y = minimum(z->right);
-    y_original_color = y->color;
-    x = y->right;
-
-    if (y->parent == z) {
-      x_parent = y;
-      fix_start = y;
+  index_erase(z);
+  --free_histogram_[bucket_of(size_of(z))];
+
+  FreeBlock *path[kMaxTreeDepth];
+  int depth = path_to(z, path);
+  const int z_depth = depth;
+  path[depth++] = z;
+
+  // With two children, swap z with its successor y so that z ends up with
+  // at most one child. Address order is only violated for z, which leaves.
+  if (z->left != 0 && z->right != 0) {
+    FreeBlock *y = right(z);
+    path[depth++] = y;
+    while (y->left != 0) {
+      y = left(y);
+      path[depth++] = y;
+    }
+    FreeBlock *z_parent = z_depth > 0 ? path[z_depth - 1] : nil_;
+    const std::uint32_t y_right = y->right;
+    const bool z_red = is_red(z);
+    set_red(z, is_red(y));
+    set_red(y, z_red);
+    y->left = z->left;
+    if (path[depth - 2] == z) {
+      y->right = ref(z); // y was z's right child.
     } else {
-      x_parent = y->parent;
-      rb_transplant(y, y->right);
-      SET_RIGHT(y, z->right);
-      SET_PARENT(y->right, y);
-      fix_start = y->parent;
+      y->right = z->right;
+      path[depth - 2]->left = ref(z);
     }
-
-    rb_transplant(z, y);
-    SET_LEFT(y, z->left);
-    SET_PARENT(y->left, y);
-    y->color = z->color;
+    z->left = 0;
+    z->right = y_right;
+    replace_child(z_parent, z, y);
+    path[z_depth] = y;
+    path[depth - 1] = z;
   }
 
-  g_log.add("delete_node", z, z->parent, z->left, z->right, z->size);
+  g_log.add("delete_node", z, left(z), right(z), size_of(z));
 
-  // First, update max for the node that replaced z (if it wasn't spliced out)
-  if (y != z) {
-    update_max(y);
-  }
+  // Splice z out; its only child (possibly nil_) takes its place.
+  --depth;
+  FreeBlock *parent = depth > 0 ? path[depth - 1] : nil_;
+  FreeBlock *x = z->left != 0 ? left(z) : right(z);
+  replace_child(parent, z, x);
 
-  // Walk up from fix_start updating max
-  FreeBlock *iter = fix_start;
-  while (iter != nil_ && iter != nullptr) {
-    update_max(iter);
-    iter = iter->parent;
+  for (int i = depth - 1; i >= 0; --i) {
+    update_max(path[i]);
   }
 
-  if (y_original_color == Color::Black) {
-    rb_delete_fixup(x, x_parent);
+  if (is_red(z)) {
+    return;
   }
-}
 
-void FreeListAllocator::rb_delete_fixup(FreeBlock *x, FreeBlock *x_parent) {
-  while (x != root_ &&
-         (x == nil_ || (x != nullptr && x->color == Color::Black))) {
-    ASSERT_NOT_NULL(x_parent);
-    if (x == x_parent->left) {
-      FreeBlock *w = x_parent->right;
-      if (w->color == Color::Red) {
-        w->color = Color::Black;
-        x_parent->color = Color::Red;
-        left_rotate(x_parent);
-        w = x_parent->right;
+  // Fixup of the extra black at x; path[i - 1] is the parent of x.
+  int i = depth;
+  while (i > 0 && !is_red(x)) {
+    FreeBlock *p = path[i - 1];
+    FreeBlock *gp = i >= 2 ? path[i - 2] : nil_;
+
+    if (x == left(p)) {
+      FreeBlock *w = right(p);
+      if (is_red(w)) {
+        set_red(w, false);
+        set_red(p, true);
+        left_rotate(p, gp);
+        // w now sits between gp and p.
+        path[i - 1] = w;
+        path[i++] = p;
+        gp = w;
+        w = right(p);
       }
-      if (w->left->color == Color::Black && w->right->color == Color::Black) {
-        if (w != nil_)
-          w->color = Color::Red;
-        x = x_parent;
-        x_parent = x->parent;
-      } else {
-        if (w->right->color == Color::Black) {
-          w->left->color = Color::Black;
-          w->color = Color::Red;
-          right_rotate(w);
-          w = x_parent->right;
-        }
-        w->color = x_parent->color;
-        x_parent->color = Color::Black;
-        w->right->color = Color::Black;
-        left_rotate(x_parent);
-        x = root_;
+      if (!is_red(left(w)) && !is_red(right(w))) {
+        set_red(w, true);
+        x = p;
+        --i;
+        continue;
+      }
+      if (!is_red(right(w))) {
+        set_red(left(w), false);
+        set_red(w, true);
+        right_rotate(w, p);
+        w = right(p);
       }
+      set_red(w, is_red(p));
+      set_red(p, false);
+      set_red(right(w), false);
+      left_rotate(p, gp);
     } else {
-      FreeBlock *w = x_parent->left;
-      if (w->color == Color::Red) {
-        w->color = Color::Black;
-        x_parent->color = Color::Red;
-        right_rotate(x_parent);
-        w = x_parent->left;
+      FreeBlock *w = left(p);
+      if (is_red(w)) {
+        set_red(w, false);
+        set_red(p, true);
+        right_rotate(p, gp);
+        path[i - 1] = w;
+        path[i++] = p;
+        gp = w;
+        w = left(p);
       }
-      if (w->right->color == Color::Black && w->left->color == Color::Black) {
-        if (w != nil_)
-          w->color = Color::Red;
-        x = x_parent;
-        x_parent = x->parent;
-      } else {
-        if (w->left->color == Color::Black) {
-          w->right->color = Color::Black;
-          w->color = Color::Red;
-          left_rotate(w);
-          w = x_parent->left;
-        }
-        w->color = x_parent->color;
-        x_parent->color = Color::Black;
-        w->left->color = Color::Black;
-        right_rotate(x_parent);
-        x = root_;
+      if (!is_red(right(w)) && !is_red(left(w))) {
+        set_red(w, true);
+        x = p;
+        --i;
+        continue;
+      }
+      if (!is_red(left(w))) {
+        set_red(right(w), false);
+        set_red(w, true);
+        left_rotate(w, p);
+        w = left(p);
       }
+      set_red(w, is_red(p));
+      set_red(p, false);
+      set_red(left(w), false);
+      right_rotate(p, gp);
     }
+    x = root_;
+    break;
   }
   if (x != nil_)
-    x->color = Color::Black;
+    set_red(x, false);
 }
 
 auto FreeListAllocator::minimum(FreeBlock *x) const -> FreeBlock * {
-  while (x->left != nil_) {
-    x = x->left;
+  while (x->left != 0) {
+    x = left(x);
   }
   return x;
 }
 
-auto FreeListAllocator::maximum(FreeBlock *x) const -> FreeBlock * {
-  while (x->right != nil_) {
-    x = x->right;
+auto FreeListAllocator::neighbours(const std::byte *addr) const
+    -> std::pair<FreeBlock *, FreeBlock *> {
+  FreeBlock *below = nil_;
+  FreeBlock *above = nil_;
+  for (auto *x = root_; x != nil_;) {
+    if (addr < reinterpret_cast<std::byte *>(x)) {
+      above = x;
+      x = left(x);
+    } else {
+      below = x;
+      x = right(x);
+    }
   }
-  return x;
+  return {below, above};
 }
 
-auto FreeListAllocator::predecessor(FreeBlock *x) const -> FreeBlock * {
-  if (x->left != nil_) {
-    return maximum(x->left);
+auto FreeListAllocator::free_block_at(const std::byte *ptr) const
+    -> std::size_t {
+  for (auto *x = root_; x != nil_;) {
+    const auto *addr = reinterpret_cast<const std::byte *>(x);
+    if (ptr == addr) {
+      return size_of(x);
+    }
+    x = ptr < addr ? left(x) : right(x);
   }
-  FreeBlock *y = x->parent;
-  while (y != nil_ && x == y->left) {
-    x = y;
-    y = y->parent;
+  return 0;
+}
+
+auto FreeListAllocator::free_extents() const -> FreeExtents {
+  return FreeExtents{*this};
+}
+
+void FreeListAllocator::for_each_free_extent(
+    const std::function<void(const FreeExtent &)> &fn) const {
+  for (const auto &ext : free_extents()) {
+    fn(ext);
   }
-  return y;
 }
 
-auto FreeListAllocator::successor(FreeBlock *x) const -> FreeBlock * {
-  if (x->right != nil_) {
-    return minimum(x->right);
+auto FreeListAllocator::run_layout(const std::byte *ptr) const -> RunLayout {
+  const auto *run = run_of(ptr);
+  if (run == nullptr) {
+    return {};
   }
-  FreeBlock *y = x->parent;
-  while (y != nil_ && x == y->right) {
-    x = y;
-    y = y->parent;
+  auto *begin = reinterpret_cast<std::byte *>(const_cast<SlabRun *>(run));
+  const std::size_t class_size = kSlabClassSizes[run->class_idx];
+  return RunLayout{
+      .begin = begin,
+      .slots = begin + kSlabHeaderSize,
+      .slots_end = begin + kSlabHeaderSize + run->capacity * class_size,
+      .end = begin + run->block_size,
+      .slot_size = class_size,
+  };
+}
+
+// --- Free extent iteration ---
+
+FreeListAllocator::FreeExtents::FreeExtents(const FreeListAllocator &alloc)
+    : alloc_{&alloc} {
+  if (alloc.root_ != nullptr) {
+    push_left(alloc.root_);
+  }
+  for (const auto *head : alloc.partial_runs_) {
+    for (const auto *run = head; run != nullptr; run = run->next) {
+      runs_.push_back(run);
+    }
+  }
+  std::sort(runs_.begin(), runs_.end());
+  tree_ = next_tree_block();
+  slot_ext_ = next_free_slot();
+  advance();
+}
+
+void FreeListAllocator::FreeExtents::push_left(const FreeBlock *x) {
+  for (; x != alloc_->nil_; x = alloc_->left(x)) {
+    stack_[depth_++] = x;
   }
-  return y;
 }
 
-void FreeListAllocator::update_max_upwards(FreeBlock *x) {
-  while (x != nil_ && x != nullptr) {
-    std::size_t old_max = x->subtree_max;
-    update_max(x);
-    if (x->subtree_max == old_max) {
-      // Optimization: if max didn't change, we can potentially stop.
-      // But wait, if we decreased size, we might need to continue.
-      // For simplicity, always walk up or at least check one more level.
+auto FreeListAllocator::FreeExtents::next_tree_block() -> FreeExtent {
+  if (depth_ == 0) {
+    return {};
+  }
+  const auto *x = stack_[--depth_];
+  push_left(alloc_->right(x));
+  return {reinterpret_cast<std::byte *>(const_cast<FreeBlock *>(x)),
+          size_of(x)};
+}
+
+auto FreeListAllocator::FreeExtents::next_free_slot() -> FreeExtent {
+  for (; run_ < runs_.size(); ++run_, slot_ = 0) {
+    const auto *run = runs_[run_];
+    auto *slots = reinterpret_cast<std::byte *>(const_cast<SlabRun *>(run)) +
+                  kSlabHeaderSize;
+    const std::size_t class_size = kSlabClassSizes[run->class_idx];
+    // An untouched run is one extent, as in free_block_count().
+    if (run->free_count == run->capacity) {
+      if (slot_ == 0) {
+        slot_ = run->capacity;
+        return {slots, run->capacity * class_size};
+      }
+      continue;
+    }
+    while (slot_ < run->capacity) {
+      const auto i = slot_++;
+      if ((run->bitmap[i / 64] >> (i % 64) & 1) != 0) {
+        return {slots + i * class_size, class_size};
+      }
     }
-    x = x->parent;
+  }
+  return {};
+}
+
+void FreeListAllocator::FreeExtents::advance() {
+  if (tree_.ptr != nullptr &&
+      (slot_ext_.ptr == nullptr || tree_.ptr < slot_ext_.ptr)) {
+    current_ = std::exchange(tree_, next_tree_block());
+  } else if (slot_ext_.ptr != nullptr) {
+    current_ = std::exchange(slot_ext_, next_free_slot());
+  } else {
+    current_ = {};
   }
 }
 
 void FreeListAllocator::update_max(FreeBlock *x) {
   if (x == nil_ || x == nullptr)
     return;
-  x->subtree_max = x->size;
-  if (x->left != nil_) {
-    x->subtree_max = std::max(x->subtree_max, x->left->subtree_max);
-  }
-  if (x->right != nil_) {
-    x->subtree_max = std::max(x->subtree_max, x->right->subtree_max);
-  }
+  x->subtree_max = std::max({x->size_red >> 1, left(x)->subtree_max,
+                             right(x)->subtree_max});
 }
 
 auto FreeListAllocator::find_first_fit(std::size_t size) const -> FreeBlock * {
   FreeBlock *x = root_;
-  FreeBlock *result = nil_;
-
-  // We want the node with the SMALLEST address (Leftmost) that satisfies
-  // node.size >= size? No, we want the node with SMALLEST address (Leftmost)
-  // that satisfies condition. Condition: `node.subtree_max >= size`. Valid
-  // nodes are those where `node.size >= size` OR `node.left.subtree_max >=
-  // size` OR ... We want to enter the leftmost subtree that contains a
-  // candidate.
 
+  // Leftmost node with size >= size: descend into the leftmost subtree
+  // whose subtree_max admits a candidate.
   while (x != nil_) {
-    if (x->left != nil_ && x->left->subtree_max >= size) {
+    if (max_of(left(x)) >= size) {
       // There is a candidate on the left.
       // We MUST go left to find the first (address-ordered) contact.
-      x = x->left;
+      x = left(x);
     } else {
       // Left subtree does not have it.
       // Check current node.
-      if (x->size >= size) {
+      if (size_of(x) >= size) {
         // Current node fits.
         // Since left doesn't have it, Current is the winner!
         return x;
       }
       // If current doesn't fit, it must be in right.
-      if (x->right != nil_ && x->right->subtree_max >= size) {
-        x = x->right;
+      if (max_of(right(x)) >= size) {
+        x = right(x);
       } else {
-        // Not found in this subtree.
-        // Should not happen if we guard call, but for leaf cases:
         return nil_;
       }
     }
@@ -801,6 +1771,136 @@ auto FreeListAllocator::find_first_fit(std::size_t size) const -> FreeBlock * {
   return nil_;
 }
 
+auto FreeListAllocator::find_fit_from(const std::byte *addr,
+                                      std::size_t size) const -> FreeBlock * {
+  // Leftmost node with address >= addr and size >= size. Subtrees whose
+  // subtree_max is too small are pruned, and subtrees lying entirely below
+  // addr are skipped, so only the boundary path and one descent are walked.
+  FreeBlock *x = root_;
+  FreeBlock *stack[kMaxTreeDepth];
+  int depth = 0;
+
+  while (x != nil_ || depth > 0) {
+    if (x != nil_ && max_of(x) >= size) {
+      if (reinterpret_cast<std::byte *>(x) < addr) {
+        x = right(x);
+      } else {
+        stack[depth++] = x;
+        x = left(x);
+      }
+      continue;
+    }
+    if (depth == 0)
+      break;
+    x = stack[--depth];
+    if (size_of(x) >= size) {
+      return x;
+    }
+    x = right(x);
+  }
+  return nil_;
+}
+
+auto FreeListAllocator::placement_in(FreeBlock *block, std::size_t size,
+                                     std::size_t align) noexcept
+    -> std::byte * {
+  auto *start = reinterpret_cast<std::byte *>(block);
+  const auto addr = reinterpret_cast<std::uintptr_t>(start);
+  const std::size_t block_size = size_of(block);
+  auto pad = ((addr + align - 1) & ~(align - 1)) - addr;
+
+  // A leading gap must be able to hold a FreeBlock; if it cannot, move the
+  // placement up by whole alignment steps until it can.
+  if (pad != 0 && pad < kMinBlockSize) {
+    pad += ((kMinBlockSize - pad + align - 1) / align) * align;
+  }
+  if (pad > block_size || block_size - pad < size) {
+    return nullptr;
+  }
+  return start + pad;
+}
+
+auto FreeListAllocator::find_fit(std::size_t size, std::size_t align) const
+    -> FreeBlock * {
+  auto next_after = [&](FreeBlock *x) {
+    return find_fit_from(reinterpret_cast<std::byte *>(x) + size_of(x), size);
+  };
+
+  switch (policy_) {
+  case PlacementPolicy::BestFit: {
+    // Smallest block first; ties broken by address.
+    for (auto it = size_index_.lower_bound({size, nullptr});
+         it != size_index_.end(); ++it) {
+      if (placement_in(it->second, size, align) != nullptr) {
+        return it->second;
+      }
+    }
+    return nil_;
+  }
+  case PlacementPolicy::NextFit: {
+    // Search [rover_, end) first, then wrap around to [base_, rover_).
+    for (auto *x = find_fit_from(rover_, size); x != nil_; x = next_after(x)) {
+      if (placement_in(x, size, align) != nullptr) {
+        return x;
+      }
+    }
+    for (auto *x = find_first_fit(size);
+         x != nil_ && reinterpret_cast<std::byte *>(x) < rover_;
+         x = next_after(x)) {
+      if (placement_in(x, size, align) != nullptr) {
+        return x;
+      }
+    }
+    return nil_;
+  }
+  case PlacementPolicy::FirstFit:
+    break;
+  }
+
+  for (auto *x = find_first_fit(size); x != nil_; x = next_after(x)) {
+    if (placement_in(x, size, align) != nullptr) {
+      return x;
+    }
+  }
+  return nil_;
+}
+
+void FreeListAllocator::index_insert(FreeBlock *x) {
+  if (policy_ == PlacementPolicy::BestFit) {
+    size_index_.emplace(size_of(x), x);
+  }
+}
+
+void FreeListAllocator::index_erase(FreeBlock *x) {
+  if (policy_ == PlacementPolicy::BestFit) {
+    size_index_.erase({size_of(x), x});
+  }
+}
+
+void FreeListAllocator::resize_node(FreeBlock *x, std::size_t new_size,
+                                    std::byte *to) {
+  FreeBlock *path[kMaxTreeDepth];
+  const int depth = path_to(x, path);
+  index_erase(x);
+
+  if (to != nullptr && to != reinterpret_cast<std::byte *>(x)) {
+    // Same place in address order, new address: copy the node and relink.
+    const FreeBlock moved = *x;
+    auto *y = new (to) FreeBlock{moved};
+    replace_child(depth > 0 ? path[depth - 1] : nil_, x, y);
+    x = y;
+  }
+
+  --free_histogram_[bucket_of(size_of(x))];
+  ++free_histogram_[bucket_of(new_size)];
+  set_size(x, new_size);
+  update_max(x);
+  for (int i = depth - 1; i >= 0; --i) {
+    update_max(path[i]);
+  }
+  index_insert(x);
+}
+
 void FreeListAllocator::verify_tree(FreeBlock *x) const {
   if (x == nil_ || x == nullptr)
     return;
@@ -812,40 +1912,34 @@ void FreeListAllocator::verify_tree(FreeBlock *x) const {
     std::abort();
   }
 
-  if (x->left != nil_) {
-    if (x->left->parent != x) {
+  if (x->left != 0) {
+    if (left(x) >= x || (is_red(x) && is_red(left(x)))) {
       std::fprintf(stderr,
-                   "RB-Tree Error: x->left->parent != x. x=%p, x->left=%p, "
-                   "x->left->parent=%p\n",
-                   (void *)x, (void *)x->left, (void *)x->left->parent);
+                   "RB-Tree Error: bad left child. x=%p, x->left=%p\n",
+                   (void *)x, (void *)left(x));
       g_log.dump();
       std::abort();
     }
-    verify_tree(x->left);
+    verify_tree(left(x));
   }
-  if (x->right != nil_) {
-    if (x->right->parent != x) {
+  if (x->right != 0) {
+    if (right(x) <= x || (is_red(x) && is_red(right(x)))) {
       std::fprintf(stderr,
-                   "RB-Tree Error: x->right->parent != x. x=%p, x->right=%p, "
-                   "x->right->parent=%p\n",
-                   (void *)x, (void *)x->right, (void *)x->right->parent);
+                   "RB-Tree Error: bad right child. x=%p, x->right=%p\n",
+                   (void *)x, (void *)right(x));
       g_log.dump();
       std::abort();
     }
-    verify_tree(x->right);
+    verify_tree(right(x));
   }
-  std::size_t expected_max = x->size;
-  if (x->left != nil_)
-    expected_max = std::max(expected_max, x->left->subtree_max);
-  if (x->right != nil_)
-    expected_max = std::max(expected_max, x->right->subtree_max);
-  if (x->subtree_max != expected_max) {
+  std::size_t expected_max =
+      std::max({size_of(x), max_of(left(x)), max_of(right(x))});
+  if (max_of(x) != expected_max) {
     std::fprintf(
         stderr,
         "RB-Tree Error: subtree_max mismatch. x=%p, size=%zu, left->max=%zu, "
         "right->max=%zu, x->subtree_max=%zu, expected=%zu\n",
-        (void *)x, x->size, (x->left != nil_ ? x->left->subtree_max : 0),
-        (x->right != nil_ ? x->right->subtree_max : 0), x->subtree_max,
+        (void *)x, size_of(x), max_of(left(x)), max_of(right(x)), max_of(x),
         expected_max);
     std::abort();
   }
@@ -2,55 +2,77 @@
 /// @file free_list.hpp
 /// @brief First-fit free-list allocator operating over an Arena.
 
+#include "allocator/allocator_engine.hpp"
+
+#include <algorithm>
+#include <array>
+#include <bit>
 #include <cstddef>
+#include <cstdint>
 #include <expected>
+#include <iterator>
+#include <memory>
+#include <memory_resource>
+#include <set>
+#include <span>
 #include <string>
+#include <utility>
+#include <vector>
 
 namespace mmap_viz {
 
 class Arena;
 
-/// @brief Error codes specific to the free-list allocator.
-enum class AllocError : std::uint8_t {
-  OutOfMemory,
-  InvalidAlignment,
-  DoubleFree,
-  BadPointer,
+/// @brief Placement policy used to pick a free block for an allocation.
+enum class PlacementPolicy : std::uint8_t {
+  FirstFit, ///< Lowest-address block that fits (augmented RB-tree descent).
+  BestFit,  ///< Smallest block that fits (secondary size-ordered index).
+  NextFit,  ///< First fit starting at a roving cursor, wrapping at the end.
 };
 
-/// @brief Human-readable description of an AllocError.
-[[nodiscard]] constexpr auto to_string(AllocError e) -> const char * {
-  switch (e) {
-  case AllocError::OutOfMemory:
-    return "out of memory";
-  case AllocError::InvalidAlignment:
-    return "invalid alignment (must be power of 2)";
-  case AllocError::DoubleFree:
-    return "double free detected";
-  case AllocError::BadPointer:
-    return "pointer not owned by this allocator";
+/// @brief Human-readable name of a PlacementPolicy.
+[[nodiscard]] constexpr auto to_string(PlacementPolicy p) -> const char * {
+  switch (p) {
+  case PlacementPolicy::FirstFit:
+    return "first_fit";
+  case PlacementPolicy::BestFit:
+    return "best_fit";
+  case PlacementPolicy::NextFit:
+    return "next_fit";
   }
   return "unknown";
 }
 
-/// @brief Result of a successful allocation.
-struct AllocationResult {
-  std::byte *ptr;          ///< Pointer to the allocated region.
-  std::size_t offset;      ///< Offset from the arena base.
-  std::size_t actual_size; ///< Size including alignment padding.
-};
-
 /// @brief First-fit free-list allocator backed by an Arena.
 ///
-/// Maintains an intrusive linked list of free blocks stored within
-/// the free regions themselves (zero metadata overhead for free blocks).
-/// Supports coalescing on deallocate and splitting on allocate.
-class FreeListAllocator {
+/// Maintains an intrusive address-ordered RB tree of free blocks stored
+/// within the free regions themselves (zero metadata overhead for free
+/// blocks). Supports coalescing on deallocate and splitting on allocate.
+/// Small requests are served from slab-style size-class runs.
+///
+/// The block chosen for an allocation is governed by a PlacementPolicy.
+/// BestFit keeps an additional (size, address)-ordered index of tree blocks
+/// on the C++ heap; the other policies need no extra metadata.
+///
+/// Coalescing is eager by default. With set_deferred_coalescing(), freed
+/// tree blocks are only queued and merged later in one sweep.
+///
+/// A persistent allocator (format() / attach()) keeps its state in a
+/// Superblock at the start of the region, so a file-backed region can be
+/// reattached by a later process without rebuilding the free tree.
+class FreeListAllocator final : public AllocatorEngine {
 public:
+  struct Superblock;
+
   /// @brief Construct a free-list allocator over the given memory range.
-  /// @param base Start of the memory region.
-  /// @param size Size of the memory region in bytes.
-  FreeListAllocator(std::byte *base, std::size_t size) noexcept;
+  /// @param base     Start of the memory region.
+  /// @param size     Size of the memory region in bytes.
+  /// @param policy   Placement policy used by allocate().
+  /// @param max_size Bytes from @p base the region may later grow to with
+  ///                 grow() (0 = fixed at @p size).
+  FreeListAllocator(std::byte *base, std::size_t size,
+                    PlacementPolicy policy = PlacementPolicy::FirstFit,
+                    std::size_t max_size = 0) noexcept;
 
   // Non-copyable, non-movable (references an arena).
   FreeListAllocator(const FreeListAllocator &) = delete;
@@ -58,103 +80,614 @@ public:
   FreeListAllocator(FreeListAllocator &&) = delete;
   FreeListAllocator &operator=(FreeListAllocator &&) = delete;
 
+  ~FreeListAllocator();
+
+  /// @brief Create a persistent allocator over @p region, overwriting any
+  /// previous contents. The first bytes of the region hold a Superblock and
+  /// the per-page run map; the rest is the heap.
+  /// @param region Start of the region (16-byte aligned).
+  /// @param size   Size of the region in bytes, superblock included.
+  /// @param policy Placement policy, recorded in the superblock.
+  /// @return The allocator, or OutOfMemory / InvalidAlignment.
+  [[nodiscard]] static auto format(std::byte *region, std::size_t size,
+                                   PlacementPolicy policy =
+                                       PlacementPolicy::FirstFit)
+      -> std::expected<std::unique_ptr<FreeListAllocator>, AllocError>;
+
+  /// @brief Reattach to a region previously set up with format().
+  ///
+  /// The state is the one written back when the previous allocator was
+  /// destroyed. Free blocks link each other by offset and survive a move of
+  /// the region as they are; if it now lives at another address, the links
+  /// between runs are relocated. This needs the shift to be a multiple of
+  /// kMaxRunBytes, which mappings aligned to a huge page (see
+  /// Arena::create_file) always satisfy.
+  /// @param region Start of the region.
+  /// @param size   Size of the mapped region in bytes.
+  /// @return The allocator, or BadSuperblock if the region holds no cleanly
+  ///         detached superblock (e.g. the previous process crashed).
+  [[nodiscard]] static auto attach(std::byte *region, std::size_t size)
+      -> std::expected<std::unique_ptr<FreeListAllocator>, AllocError>;
+
+  /// @brief True for allocators created with format() or attach().
+  [[nodiscard]] auto persistent() const noexcept -> bool {
+    return super_ != nullptr;
+  }
+
   /// @brief Allocate a block of at least @p size bytes with given @p alignment.
   /// @param size     Requested size in bytes (must be > 0).
   /// @param alignment Required alignment (must be power of 2, default 16).
   /// @return AllocationResult on success, AllocError on failure.
   [[nodiscard]] auto allocate(std::size_t size,
                               std::size_t alignment = alignof(std::max_align_t))
-      -> std::expected<AllocationResult, AllocError>;
+      -> std::expected<AllocationResult, AllocError> override;
+
+  /// @brief Allocate from the lowest-address tree block that fits, but
+  /// only if the whole block lies below @p limit. Ignores the placement
+  /// policy and the size-class runs; used to slide live blocks toward the
+  /// base of the region.
+  /// @return OutOfMemory if no such block exists.
+  [[nodiscard]] auto allocate_below(std::size_t size, std::size_t alignment,
+                                    const std::byte *limit)
+      -> std::expected<AllocationResult, AllocError> override;
 
   /// @brief Deallocate a previously allocated block.
   /// @param ptr  Pointer returned by allocate().
   /// @param size Size passed to allocate().
   /// @return AllocError if the pointer is invalid.
   auto deallocate(std::byte *ptr, std::size_t size)
-      -> std::expected<void, AllocError>;
+      -> std::expected<void, AllocError> override;
+
+  /// @brief Resize a block in place.
+  ///
+  /// Growing absorbs the free block that directly follows the allocation
+  /// (its address-order successor in the tree) if it is large enough; the
+  /// unused rest of it stays free. Shrinking splits the tail off and frees
+  /// it. A slab object can change size only within its size class.
+  /// @param ptr      Pointer returned by allocate().
+  /// @param size     Current size, as passed to deallocate().
+  /// @param new_size Requested size in bytes.
+  /// @return The resized block (same ptr), or OutOfMemory if it cannot grow
+  ///         in place.
+  [[nodiscard]] auto try_extend(std::byte *ptr, std::size_t size,
+                                std::size_t new_size)
+      -> std::expected<AllocationResult, AllocError> override;
+
+  /// @brief Allocate up to `out.size()` blocks of @p size bytes at once.
+  ///
+  /// Slab-sized requests are drawn from the size-class runs. Larger ones are
+  /// carved from as few tree blocks as possible: each carve reserves room
+  /// for several objects and is split into equal-stride pieces, every one
+  /// of which may later be freed on its own.
+  /// @param size      Requested size of each block in bytes.
+  /// @param alignment Required alignment of each block (power of 2).
+  /// @param out       Receives one AllocationResult per block.
+  /// @return Number of blocks written to @p out (short on exhaustion).
+  [[nodiscard]] auto allocate_batch(std::size_t size, std::size_t alignment,
+                                    std::span<AllocationResult> out)
+      -> std::size_t override;
+
+  /// @brief Deallocate several blocks at once.
+  ///
+  /// Blocks are released in address order; address-adjacent tree blocks are
+  /// returned to the tree as a single range. Invalid entries are skipped.
+  /// @param blocks `ptr` / `actual_size` of each block (sorted in place).
+  /// @return Number of blocks released.
+  auto deallocate_batch(std::span<AllocationResult> blocks)
+      -> std::size_t override;
+
+  /// @brief Defer the coalescing of freed tree blocks.
+  ///
+  /// With a non-zero @p threshold, deallocate(), deallocate_batch() and
+  /// shrinking try_extend() calls queue a freed tree block on a pending list
+  /// in O(1) instead of merging it into the tree. coalesce() sorts the list
+  /// and merges it with the tree in a single pass. It runs when
+  /// @p threshold blocks are pending, when an allocation finds no fitting
+  /// tree block, and before any operation that needs the tree complete
+  /// (growing in place, allocate_below(), purge(), detaching).
+  /// Slab objects are not affected.
+  /// @param threshold Pending blocks that trigger a sweep (0 = coalesce on
+  ///                  every free, the default). Lowering it to 0 sweeps.
+  void set_deferred_coalescing(std::size_t threshold);
+
+  /// @brief Sweep threshold set with set_deferred_coalescing().
+  [[nodiscard]] auto deferred_coalescing() const noexcept -> std::size_t {
+    return coalesce_threshold_;
+  }
+
+  /// @brief Freed tree blocks waiting for the next sweep.
+  [[nodiscard]] auto pending_frees() const noexcept -> std::size_t {
+    return pending_count_;
+  }
+
+  /// @brief Merge the pending frees into the tree.
+  ///
+  /// The pending blocks are merge-sorted by address. The tree is flattened
+  /// into an address-ordered list and merged with them, joining adjacent
+  /// blocks, and a balanced tree is rebuilt from the result. This takes
+  /// O(n + k log k) for n tree blocks and k pending ones, so a sweep costs
+  /// in proportion to every free block, not just the pending ones, and a
+  /// small threshold can be slower than coalescing eagerly. Allocates no
+  /// memory, except for the BestFit size index.
+  void coalesce() override;
 
   /// @brief Total bytes currently allocated (not including free-list overhead).
-  [[nodiscard]] auto bytes_allocated() const noexcept -> std::size_t;
+  [[nodiscard]] auto bytes_allocated() const noexcept -> std::size_t override;
 
   /// @brief Total bytes currently free.
-  [[nodiscard]] auto bytes_free() const noexcept -> std::size_t;
+  [[nodiscard]] auto bytes_free() const noexcept -> std::size_t override;
 
   /// @brief Size of the largest contiguous free block.
-  [[nodiscard]] auto largest_free_block() const noexcept -> std::size_t;
+  [[nodiscard]] auto largest_free_block() const noexcept
+      -> std::size_t override;
 
   /// @brief Number of free blocks in the list (fragmentation indicator).
-  [[nodiscard]] auto free_block_count() const noexcept -> std::size_t;
+  [[nodiscard]] auto free_block_count() const noexcept
+      -> std::size_t override;
+
+  /// @brief Number of log2 buckets in free_histogram().
+  static constexpr std::size_t kHistogramBuckets = 64;
+
+  /// @brief Free blocks by size: entry i counts blocks of [2^i, 2^(i+1))
+  /// bytes. Covers the same blocks as free_block_count(): tree blocks,
+  /// pending frees, free slab slots, and untouched runs as one block each.
+  /// Kept up to date on every split, merge and slot change, so reading it
+  /// is O(1).
+  [[nodiscard]] auto free_histogram() const noexcept
+      -> const std::array<std::size_t, kHistogramBuckets> & {
+    return free_histogram_;
+  }
+
+  /// @brief Number of blocks currently allocated. O(1).
+  [[nodiscard]] auto live_block_count() const noexcept
+      -> std::size_t override;
+
+  /// @brief External fragmentation: the share of free bytes (0–100) that
+  /// lies outside the largest free block. O(1).
+  [[nodiscard]] auto fragmentation_pct() const noexcept
+      -> std::size_t override;
 
   /// @brief Total capacity of the backing arena.
-  [[nodiscard]] auto capacity() const noexcept -> std::size_t;
+  [[nodiscard]] auto capacity() const noexcept -> std::size_t override;
+
+  /// @brief Capacity the region may reach through grow().
+  [[nodiscard]] auto max_capacity() const noexcept -> std::size_t override;
+
+  /// @brief Append @p bytes of newly usable memory at the end of the region.
+  ///
+  /// The caller makes [base() + capacity(), + bytes) accessible first. The
+  /// new range is coalesced with a free tail block, and size classes that
+  /// were too large for the old capacity are enabled.
+  /// @param bytes Multiple of 16, at most max_capacity() - capacity().
+  /// @return False (and no change) if the range does not fit.
+  auto grow(std::size_t bytes) -> bool override;
 
   /// @brief Base address of the arena.
-  [[nodiscard]] auto base() const noexcept -> std::byte *;
+  [[nodiscard]] auto base() const noexcept -> std::byte * override;
+
+  /// @brief Return the whole pages inside free blocks of at least
+  /// @p min_block bytes to the OS. Each block's header page stays resident.
+  /// Pages released with DecommitMode::DontNeed are reported as zeroed when
+  /// they are handed out again, so callers can skip clearing them.
+  /// @return Bytes decommitted by this call.
+  auto purge(std::size_t min_block = 0,
+             DecommitMode mode = DecommitMode::DontNeed)
+      -> std::size_t override;
+
+  /// @brief Capacity minus the bytes currently released by purge().
+  [[nodiscard]] auto committed_bytes() const noexcept
+      -> std::size_t override;
+
+  /// @brief Placement policy selected at construction.
+  [[nodiscard]] auto policy() const noexcept -> PlacementPolicy;
+
+  /// @brief Size of the block a successful allocate(size, alignment) hands
+  /// out: the size class for slab-served requests, the rounded tree block
+  /// otherwise. Tree allocations may absorb a small tail beyond this.
+  [[nodiscard]] auto block_size_for(std::size_t size,
+                                    std::size_t alignment = alignof(
+                                        std::max_align_t)) const noexcept
+      -> std::size_t override;
 
   /// @brief Check if this allocator owns the given pointer.
-  [[nodiscard]] bool contains(const void *ptr) const noexcept {
+  [[nodiscard]] bool contains(const void *ptr) const noexcept override {
     const auto *p = reinterpret_cast<const std::byte *>(ptr);
     return p >= base_ && p < base_ + size_;
   }
 
-private:
-  enum class Color : bool { Red, Black };
+  /// @brief Size of the free tree block starting at @p ptr, or 0 if no
+  /// free block starts there. O(log n).
+  [[nodiscard]] auto free_block_at(const std::byte *ptr) const
+      -> std::size_t;
+
+  class FreeExtents;
+
+  /// @brief Every free extent in address order: an in-order walk of the
+  /// free tree merged with the free slots of the runs on the size-class
+  /// lists. Pending frees are not visited; call coalesce() first. Then it
+  /// visits exactly free_block_count() extents. The allocator must not
+  /// change while the range is in use.
+  [[nodiscard]] auto free_extents() const -> FreeExtents;
 
+  /// @brief Call @p fn with every extent of free_extents().
+  void for_each_free_extent(
+      const std::function<void(const FreeExtent &)> &fn) const override;
+
+  /// @brief Layout of the run containing @p ptr, or an empty layout if
+  /// @p ptr is not inside a run. O(1).
+  [[nodiscard]] auto run_layout(const std::byte *ptr) const
+      -> RunLayout override;
+
+  /// @brief Tree nodes address the region in 16-byte granules with 32-bit
+  /// fields, which bounds what one allocator can manage. Bytes beyond this
+  /// are left unused.
+  static constexpr std::size_t kMaxRegionSize = std::size_t{16} << 30;
+
+private:
   /// @brief Intrusive Red-Black Tree Node stored within free regions.
+  ///
+  /// 16 bytes: sizes count 16-byte granules and children are granule
+  /// indices relative to base_ (plus one; 0 = nil_), so the node holds no
+  /// pointers and the minimum free block is 16 bytes. There is no parent
+  /// link; operations that walk upwards record the path from the root.
   struct FreeBlock {
-    std::size_t size;        ///< Size of this block.
-    FreeBlock *parent;       ///< Parent node.
-    FreeBlock *left;         ///< Left child (lower addresses).
-    FreeBlock *right;        ///< Right child (higher addresses).
-    std::size_t subtree_max; ///< Max block size in this subtree.
-    Color color;             ///< RB Color.
+    std::uint32_t size_red;    ///< Size in granules << 1 | 1 if red.
+    std::uint32_t left;        ///< Lower-address child.
+    std::uint32_t right;       ///< Higher-address child.
+    std::uint32_t subtree_max; ///< Largest size in this subtree, granules.
   };
 
+  // A pending free is a FreeBlock outside the tree. It holds its size,
+  // `right` links it to the next pending block, and subtree_max holds
+  // kPendingMark, which no tree node can: size_red leaves room for 2^31
+  // granules at most. A flattened tree uses the same layout.
+  static constexpr std::uint32_t kPendingMark = 0xFFFFFFFF;
+
   /// @brief Minimum size required to store a FreeBlock header.
   static constexpr std::size_t kMinBlockSize = sizeof(FreeBlock);
+  static constexpr std::size_t kGranule = 16;
+  /// Deepest root-to-leaf path of an RB tree over 2^32 nodes.
+  static constexpr int kMaxTreeDepth = 2 * 32 + 2;
+
+  // --- Node encoding ---
+  [[nodiscard]] auto node(std::uint32_t ref) const noexcept -> FreeBlock * {
+    return ref == 0 ? nil_
+                    : reinterpret_cast<FreeBlock *>(base_ +
+                                                    (ref - 1) * kGranule);
+  }
+  [[nodiscard]] auto ref(const FreeBlock *x) const noexcept -> std::uint32_t {
+    return x == nil_ ? 0
+                     : static_cast<std::uint32_t>(
+                           (reinterpret_cast<const std::byte *>(x) - base_) /
+                               kGranule +
+                           1);
+  }
+  [[nodiscard]] auto left(const FreeBlock *x) const noexcept -> FreeBlock * {
+    return node(x->left);
+  }
+  [[nodiscard]] auto right(const FreeBlock *x) const noexcept -> FreeBlock * {
+    return node(x->right);
+  }
+  [[nodiscard]] static auto size_of(const FreeBlock *x) noexcept
+      -> std::size_t {
+    return std::size_t{x->size_red >> 1} * kGranule;
+  }
+  [[nodiscard]] static auto max_of(const FreeBlock *x) noexcept
+      -> std::size_t {
+    return std::size_t{x->subtree_max} * kGranule;
+  }
+  [[nodiscard]] static auto is_red(const FreeBlock *x) noexcept -> bool {
+    return (x->size_red & 1) != 0;
+  }
+  static void set_red(FreeBlock *x, bool red) noexcept {
+    x->size_red = (x->size_red & ~std::uint32_t{1}) | (red ? 1 : 0);
+  }
+  static void set_size(FreeBlock *x, std::size_t size) noexcept {
+    x->size_red = static_cast<std::uint32_t>(size / kGranule) << 1 |
+                  (x->size_red & 1);
+  }
+  /// @brief Write a detached red node of @p size bytes at @p at.
+  [[nodiscard]] static auto make_node(std::byte *at, std::size_t size) noexcept
+      -> FreeBlock *;
 
   // --- RB Tree Helpers ---
   void insert_node(FreeBlock *z);
   void delete_node(FreeBlock *z);
-  void rb_transplant(FreeBlock *u, FreeBlock *v);
-  void rb_insert_fixup(FreeBlock *z);
-  void rb_delete_fixup(FreeBlock *x, FreeBlock *x_parent);
-  void left_rotate(FreeBlock *x);
-  void right_rotate(FreeBlock *x);
+  /// @brief Rotate @p x down to the left / right; @p parent is its parent
+  /// (nil_ for the root).
+  void left_rotate(FreeBlock *x, FreeBlock *parent);
+  void right_rotate(FreeBlock *x, FreeBlock *parent);
+  /// @brief Point @p parent's link to @p old_child at @p new_child.
+  void replace_child(FreeBlock *parent, const FreeBlock *old_child,
+                     FreeBlock *new_child);
+  /// @brief Nodes from the root down to, excluding, @p x.
+  auto path_to(const FreeBlock *x, FreeBlock **path) const -> int;
 
-  /// @brief Updates subtree_max for x and its ancestors.
+  /// @brief Recomputes subtree_max of x from its children.
   void update_max(FreeBlock *x);
-  void update_max_upwards(FreeBlock *x);
 
   /// @brief Finds the first block in address order that fits the size.
   [[nodiscard]] auto find_first_fit(std::size_t size) const -> FreeBlock *;
 
+  /// @brief Finds the first block at or above @p addr that fits the size.
+  [[nodiscard]] auto find_fit_from(const std::byte *addr,
+                                   std::size_t size) const -> FreeBlock *;
+
+  /// @brief Picks a block able to hold @p size bytes at @p align according
+  /// to the placement policy. Returns nil_ if no block qualifies.
+  [[nodiscard]] auto find_fit(std::size_t size, std::size_t align) const
+      -> FreeBlock *;
+
+  // --- Best-fit size index helpers (no-ops for other policies) ---
+  void index_insert(FreeBlock *x);
+  void index_erase(FreeBlock *x);
+
+  /// @brief Changes the size of a tree node, keeping the augmentation and
+  /// the size index consistent. With @p to, the node also moves there; @p to
+  /// must lie between x's neighbours in address order.
+  void resize_node(FreeBlock *x, std::size_t new_size,
+                   std::byte *to = nullptr);
+
+  // --- Deferred coalescing ---
+  /// @brief Return a freed range to the tree, or queue it in deferred mode.
+  void free_range(std::byte *ptr, std::size_t size);
+  /// @brief True if @p ptr starts a block on the pending list.
+  [[nodiscard]] auto is_pending(const std::byte *ptr) const -> bool;
+  /// @brief Sort a list linked through `right` by address.
+  [[nodiscard]] auto sort_list(FreeBlock *head, std::size_t count)
+      -> FreeBlock *;
+  /// @brief Unlink every tree node into an address-ordered list.
+  [[nodiscard]] auto flatten_tree() -> FreeBlock *;
+  /// @brief Build a balanced tree from the first @p count nodes of the list
+  /// at @p cursor, advancing it. Nodes at @p red_depth are coloured red.
+  [[nodiscard]] auto build_tree(FreeBlock *&cursor, std::size_t count,
+                                int depth, int red_depth) -> FreeBlock *;
+
   [[nodiscard]] auto minimum(FreeBlock *x) const -> FreeBlock *;
-  [[nodiscard]] auto maximum(FreeBlock *x) const -> FreeBlock *;
-  [[nodiscard]] auto predecessor(FreeBlock *x) const -> FreeBlock *;
-  [[nodiscard]] auto successor(FreeBlock *x) const -> FreeBlock *;
+  /// @brief Free blocks immediately below and above @p addr (nil_ if none).
+  [[nodiscard]] auto neighbours(const std::byte *addr) const
+      -> std::pair<FreeBlock *, FreeBlock *>;
 
   std::byte *base_;
   std::size_t size_;
+  std::size_t max_size_; ///< Upper bound of size_ reachable via grow().
   FreeBlock *root_ = nullptr; ///< Root of the address-ordered RB tree.
   FreeBlock *nil_;            ///< Sentinel node for leaves.
 
-  // Segregated Free Lists for small allocations (O(1))
-  static constexpr std::size_t kSmallBlockQuantum = 16;
-  static constexpr std::size_t kNumSmallClasses = 8;
-  static constexpr std::size_t kMaxSmallBlockSize =
-      kSmallBlockQuantum * kNumSmallClasses;
+  // --- Slab size-class engine for small allocations (O(1)) ---
+  //
+  // Requests up to kMaxSlabSize are rounded to one of kNumSlabClasses size
+  // classes and served from runs: power-of-two, self-aligned chunks carved
+  // from the tree. Each run holds objects of a single class and tracks free
+  // slots in a bitmap. Runs that become empty are returned to the tree.
+
+  static constexpr std::size_t kSlabQuantum = 16;
+  static constexpr std::size_t kSlabPageSize = 4096;
+  static constexpr std::size_t kMaxSlabSize = 4096;
+  static constexpr std::size_t kNumSlabClasses = 28;
+  static constexpr std::size_t kSlabBitmapWords = 4;
+  static constexpr std::size_t kMinObjectsPerRun = 8;
+  /// Runs are only used if at least this many of them fit in the shard.
+  static constexpr std::size_t kMinRunsPerShard = 8;
 
-  struct FreeNode {
-    FreeNode *next;
+  /// @brief Header at the start of every run.
+  struct SlabRun {
+    std::size_t block_size; ///< Tree block size the run was carved as.
+    SlabRun *next;          ///< Next run of this class with free slots.
+    SlabRun *prev;          ///< Previous run of this class with free slots.
+    std::uint16_t class_idx;
+    std::uint16_t capacity;   ///< Number of slots.
+    std::uint16_t free_count; ///< Number of free slots.
+    std::uint16_t log2_bytes; ///< log2 of the run size.
+    std::uint64_t bitmap[kSlabBitmapWords]; ///< 1 bit = free slot.
   };
 
-  FreeNode *free_lists_[kNumSmallClasses];
+  static constexpr std::size_t kSlabHeaderSize =
+      (sizeof(SlabRun) + kSlabQuantum - 1) & ~(kSlabQuantum - 1);
+
+public:
+  /// @brief Largest run of any size class. Runs are aligned to their size,
+  /// so a persistent region may only move by multiples of this.
+  static constexpr std::size_t kMaxRunBytes = std::bit_ceil(
+      std::max(kSlabPageSize, kSlabHeaderSize + kMinObjectsPerRun * kMaxSlabSize));
+
+private:
+  /// @brief Allocate from the size-class runs. The result's ptr is nullptr
+  /// if the request is not slab-eligible or no run could be created.
+  [[nodiscard]] auto slab_allocate(std::size_t size, std::size_t alignment)
+      -> AllocationResult;
+  /// @brief Return a slot to its run, releasing the run once it is empty.
+  auto slab_deallocate(SlabRun *run, std::byte *ptr)
+      -> std::expected<void, AllocError>;
+  /// @brief Run containing @p ptr, or nullptr if @p ptr is a tree block.
+  [[nodiscard]] auto run_of(const std::byte *ptr) const -> SlabRun *;
+  /// @brief Carve and initialize a fresh run for @p class_idx.
+  [[nodiscard]] auto make_run(std::size_t class_idx) -> SlabRun *;
+  void mark_run_pages(SlabRun *run, std::uint8_t value);
+  void link_run(SlabRun *run);
+  void unlink_run(SlabRun *run);
+  /// @brief Free-block count contributed by a run (an empty run counts 1).
+  [[nodiscard]] static auto run_free_blocks(const SlabRun *run) noexcept
+      -> std::size_t;
+  /// @brief Add (@p sign = 1) or remove (-1) the free blocks of @p run in
+  /// free_blocks_ and the histogram.
+  void count_run(const SlabRun *run, int sign) noexcept;
+
+  /// @brief Carve a block from the tree (no accounting of allocated_).
+  [[nodiscard]] auto carve_block(std::size_t size, std::size_t alignment)
+      -> std::expected<AllocationResult, AllocError>;
+  /// @brief Carve @p internal_size bytes (a multiple of 16) from tree block
+  /// @p curr, which must have room for them at @p alignment.
+  [[nodiscard]] auto carve_from(FreeBlock *curr, std::size_t internal_size,
+                                std::size_t alignment) -> AllocationResult;
+  /// @brief Return a block to the tree, coalescing with its neighbours.
+  void release_block(std::byte *ptr, std::size_t size);
+  /// @brief Validate a tree block passed to deallocate and return the size
+  /// it occupies in the tree.
+  [[nodiscard]] auto tree_block_size(std::byte *ptr, std::size_t size) const
+      -> std::expected<std::size_t, AllocError>;
+
+  /// @brief Where an allocation of @p size at @p align would start inside
+  /// @p block, or nullptr if it does not fit. Never leaves a leading gap
+  /// smaller than kMinBlockSize.
+  [[nodiscard]] static auto placement_in(FreeBlock *block, std::size_t size,
+                                         std::size_t align) noexcept
+      -> std::byte *;
+
+  SlabRun *partial_runs_[kNumSlabClasses] = {}; ///< Runs with free slots.
+  std::uint8_t run_log2_[kNumSlabClasses] = {}; ///< 0 = class disabled.
+  std::uint8_t *run_pages_ = nullptr; ///< Per-page log2(run size).
+  std::unique_ptr<std::uint8_t[]> run_pages_storage_; ///< Unless persistent.
+  std::size_t run_page_count_ = 0;
+  std::size_t base_page_ = 0; ///< Absolute page index of base_.
+
+  // --- Decommit state, one entry per OS page overlapping the region ---
+
+  enum class PageState : std::uint8_t {
+    Committed, ///< Possibly resident, contents undefined.
+    Released,  ///< Given back with MADV_FREE; contents undefined.
+    Zeroed,    ///< Given back with MADV_DONTNEED; reads as zero.
+  };
+
+  /// @brief Release the committed pages of [begin, end) (page aligned).
+  auto decommit_pages(std::byte *begin, std::byte *end, DecommitMode mode)
+      -> std::size_t;
+  /// @brief Mark every page overlapping [ptr, ptr + size) committed again.
+  /// @return The longest run of zeroed pages fully inside the range, as
+  /// offsets from @p ptr (empty if none).
+  auto recommit(std::byte *ptr, std::size_t size)
+      -> std::pair<std::size_t, std::size_t>;
+
+  std::unique_ptr<PageState[]> page_state_;
+  std::size_t os_page_size_ = 0;
+  std::size_t os_base_page_ = 0; ///< Absolute OS page index of base_.
+  std::size_t os_page_count_ = 0;
+  std::size_t decommitted_ = 0; ///< Bytes in Released or Zeroed pages.
+
+  // --- Persistence ---
+
+  /// @brief Persistent allocator over the heap described by @p super.
+  /// Either lays out a fresh heap or restores the saved state.
+  FreeListAllocator(Superblock *super, bool restore) noexcept;
+
+  void init_nil();
+  void init_heap();
+  void init_maps(std::uint8_t *run_map);
+  /// @brief Enable every size class whose runs fit the current capacity.
+  void size_run_classes();
+  /// @brief Load the saved state, relocating run links if the region moved.
+  void restore_state();
+  /// @brief Write the state back into the superblock and mark it clean.
+  void save_state() noexcept;
+
+  Superblock *super_ = nullptr; ///< Set for persistent allocators.
 
   void verify_tree(FreeBlock *x) const;
 
+  /// @brief Histogram bucket of a free block of @p size bytes.
+  [[nodiscard]] static auto bucket_of(std::size_t size) noexcept
+      -> std::size_t {
+    return static_cast<std::size_t>(std::bit_width(size | 1)) - 1;
+  }
+
   std::size_t allocated_ = 0;
   std::size_t free_blocks_ = 0;
+  std::size_t live_blocks_ = 0;
+  std::array<std::size_t, kHistogramBuckets> free_histogram_{};
+
+  PlacementPolicy policy_;
+
+  FreeBlock *pending_ = nullptr; ///< Newest pending free (nil_ = none).
+  std::size_t pending_count_ = 0;
+  std::size_t coalesce_threshold_ = 0; ///< 0 = coalesce eagerly.
+
+  /// Next-fit roving cursor: address just past the last placement.
+  std::byte *rover_;
+
+  /// Best-fit secondary index of tree blocks ordered by (size, address).
+  using SizeKey = std::pair<std::size_t, FreeBlock *>;
+  std::pmr::unsynchronized_pool_resource index_pool_;
+  std::pmr::set<SizeKey> size_index_{&index_pool_};
+};
+
+/// @brief State of a persistent allocator, stored at offset 0 of its region.
+///
+/// Plain data with offsets relative to the superblock, so tools can map the
+/// file and walk the heap offline. The per-page run map follows at
+/// run_map_offset and the heap at heap_offset.
+struct FreeListAllocator::Superblock {
+  static constexpr std::uint64_t kMagic = 0x50414548'5a49564d; // "MVIZHEAP"
+  static constexpr std::uint32_t kVersion = 3;
+
+  std::uint64_t magic;
+  std::uint32_t version;
+  std::uint8_t policy; ///< PlacementPolicy.
+  std::uint8_t clean;  ///< 1 once the allocator was destroyed cleanly.
+  std::uint64_t region_size;    ///< Bytes covered, superblock included.
+  std::uint64_t run_map_offset; ///< Offset of the per-page run map.
+  std::uint64_t heap_offset;    ///< Offset of the first heap byte.
+  std::uint64_t saved_base;     ///< Region address when last saved.
+  std::uint64_t root;           ///< Tree root offset (0 = empty tree).
+  std::uint64_t rover;          ///< Next-fit cursor offset.
+  std::uint64_t allocated;      ///< bytes_allocated().
+  std::uint64_t free_blocks;    ///< free_block_count().
+  std::uint64_t live_blocks;    ///< live_block_count().
+  std::uint64_t partial_runs[kNumSlabClasses]; ///< Run offsets (0 = none).
+  FreeBlock nil; ///< Tree sentinel; leaves point here.
+};
+
+/// @brief Input range over the free extents of a FreeListAllocator, in
+/// address order (see FreeListAllocator::free_extents()).
+class FreeListAllocator::FreeExtents {
+public:
+  class iterator {
+  public:
+    using value_type = FreeExtent;
+    using difference_type = std::ptrdiff_t;
+
+    auto operator*() const -> const FreeExtent & { return range_->current_; }
+    auto operator->() const -> const FreeExtent * { return &range_->current_; }
+    auto operator++() -> iterator & {
+      range_->advance();
+      return *this;
+    }
+    void operator++(int) { range_->advance(); }
+    auto operator==(std::default_sentinel_t) const -> bool {
+      return range_->current_.ptr == nullptr;
+    }
+
+  private:
+    friend FreeExtents;
+    explicit iterator(FreeExtents *range) noexcept : range_{range} {}
+    FreeExtents *range_;
+  };
+
+  [[nodiscard]] auto begin() noexcept -> iterator { return iterator{this}; }
+  [[nodiscard]] auto end() const noexcept -> std::default_sentinel_t {
+    return {};
+  }
+
+private:
+  friend FreeListAllocator;
+  explicit FreeExtents(const FreeListAllocator &alloc);
+
+  /// @brief Make the lower of the next tree block and the next free slot
+  /// current.
+  void advance();
+  /// @brief Push @p x and its chain of left children.
+  void push_left(const FreeBlock *x);
+  [[nodiscard]] auto next_tree_block() -> FreeExtent;
+  [[nodiscard]] auto next_free_slot() -> FreeExtent;
+
+  const FreeListAllocator *alloc_;
+  std::array<const FreeBlock *, kMaxTreeDepth> stack_{}; ///< In-order path.
+  int depth_ = 0;
+  std::vector<const SlabRun *> runs_; ///< Runs with free slots, by address.
+  std::size_t run_ = 0;  ///< Run holding the next free slot.
+  std::size_t slot_ = 0; ///< First slot of runs_[run_] not yet visited.
+  FreeExtent tree_;      ///< Next tree block.
+  FreeExtent slot_ext_;  ///< Next free slot.
+  FreeExtent current_;
 };
 
 } // namespace mmap_viz
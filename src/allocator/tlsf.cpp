@@ -0,0 +1,320 @@
+/// @file tlsf.cpp
+/// @brief Implementation of the two-level segregated fit allocator.
+
+#include "allocator/tlsf.hpp"
+
+#include <algorithm>
+#include <bit>
+
+namespace mmap_viz {
+
+TlsfAllocator::TlsfAllocator(std::byte *base, std::size_t size,
+                             std::size_t max_size) noexcept
+    : base_{base}, size_{size & ~(kGranule - 1)},
+      max_size_{std::max(max_size & ~(kGranule - 1), size_)} {
+  if (size_ < kMinBlockSize + kHeaderSize) {
+    size_ = 0;
+    max_size_ = 0;
+    return;
+  }
+  end_ = at(base_ + size_ - kHeaderSize);
+  end_->prev_size = 0;
+  end_->size_flags = 0;
+
+  auto *first = at(base_);
+  first->prev_size = 0;
+  first->size_flags = size_ - kHeaderSize;
+  insert_free(first);
+}
+
+// ─── List mapping ────────────────────────────────────────────────────────
+
+auto TlsfAllocator::mapping_insert(std::size_t size) noexcept
+    -> std::pair<unsigned, unsigned> {
+  if (size < kSmallBlock) {
+    return {0, static_cast<unsigned>(size / (kSmallBlock / kSlCount))};
+  }
+  const auto msb = static_cast<unsigned>(std::bit_width(size)) - 1;
+  const auto sl =
+      static_cast<unsigned>((size >> (msb - kSlLog2)) ^ kSlCount);
+  return {msb - kFlShift + 1, sl};
+}
+
+auto TlsfAllocator::mapping_search(std::size_t size) noexcept
+    -> std::pair<unsigned, unsigned> {
+  if (size >= kSmallBlock) {
+    const auto msb = static_cast<unsigned>(std::bit_width(size)) - 1;
+    size += (std::size_t{1} << (msb - kSlLog2)) - 1;
+  }
+  return mapping_insert(size);
+}
+
+auto TlsfAllocator::find_suitable(unsigned fl, unsigned sl) const noexcept
+    -> Block * {
+  auto sl_map = sl_bitmap_[fl] & (~std::uint32_t{0} << sl);
+  if (sl_map == 0) {
+    const auto fl_map = fl_bitmap_ & (~std::uint64_t{0} << (fl + 1));
+    if (fl_map == 0) {
+      return nullptr;
+    }
+    fl = static_cast<unsigned>(std::countr_zero(fl_map));
+    sl_map = sl_bitmap_[fl];
+  }
+  return lists_[fl][std::countr_zero(sl_map)];
+}
+
+// ─── Free lists ──────────────────────────────────────────────────────────
+
+void TlsfAllocator::insert_free(Block *b) noexcept {
+  const auto size = size_of(b);
+  const auto [fl, sl] = mapping_insert(size);
+  b->size_flags |= kFreeBit;
+  b->prev_free = nullptr;
+  b->next_free = lists_[fl][sl];
+  if (b->next_free != nullptr) {
+    b->next_free->prev_free = b;
+  }
+  lists_[fl][sl] = b;
+  list_max_[fl][sl] = std::max(list_max_[fl][sl], size);
+  fl_bitmap_ |= std::uint64_t{1} << fl;
+  sl_bitmap_[fl] |= std::uint32_t{1} << sl;
+
+  auto *next = next_of(b);
+  next->prev_size = size;
+  next->size_flags |= kPrevFreeBit;
+  free_bytes_ += size;
+  ++free_blocks_;
+}
+
+void TlsfAllocator::remove_free(Block *b) noexcept {
+  const auto size = size_of(b);
+  const auto [fl, sl] = mapping_insert(size);
+  if (b->next_free != nullptr) {
+    b->next_free->prev_free = b->prev_free;
+  }
+  if (b->prev_free != nullptr) {
+    b->prev_free->next_free = b->next_free;
+  } else {
+    lists_[fl][sl] = b->next_free;
+  }
+  if (lists_[fl][sl] == nullptr) {
+    sl_bitmap_[fl] &= ~(std::uint32_t{1} << sl);
+    if (sl_bitmap_[fl] == 0) {
+      fl_bitmap_ &= ~(std::uint64_t{1} << fl);
+    }
+    list_max_[fl][sl] = 0;
+    max_stale_[fl] &= ~(std::uint32_t{1} << sl);
+  } else if (size == list_max_[fl][sl]) {
+    max_stale_[fl] |= std::uint32_t{1} << sl;
+  }
+  b->size_flags &= ~kFreeBit;
+  next_of(b)->size_flags &= ~kPrevFreeBit;
+  free_bytes_ -= size;
+  --free_blocks_;
+}
+
+void TlsfAllocator::trim(Block *b, std::size_t size) noexcept {
+  const auto rest = size_of(b) - size;
+  if (rest < kMinBlockSize) {
+    return;
+  }
+  set_size(b, size);
+  auto *tail = next_of(b);
+  tail->size_flags = rest;
+  release(tail);
+}
+
+void TlsfAllocator::release(Block *b) noexcept {
+  if (is_prev_free(b)) {
+    auto *prev = at(reinterpret_cast<std::byte *>(b) - b->prev_size);
+    remove_free(prev);
+    set_size(prev, size_of(prev) + size_of(b));
+    b = prev;
+  }
+  if (auto *next = next_of(b); is_free(next)) {
+    remove_free(next);
+    set_size(b, size_of(b) + size_of(next));
+  }
+  insert_free(b);
+}
+
+auto TlsfAllocator::block_size(std::size_t size) noexcept -> std::size_t {
+  return std::max((size + kGranule - 1) & ~(kGranule - 1), kGranule) +
+         kHeaderSize;
+}
+
+auto TlsfAllocator::result_of(Block *b) const noexcept -> AllocationResult {
+  auto *ptr = payload(b);
+  return AllocationResult{
+      .ptr = ptr,
+      .offset = static_cast<std::size_t>(ptr - base_),
+      .actual_size = size_of(b) - kHeaderSize,
+  };
+}
+
+// ─── Allocation ──────────────────────────────────────────────────────────
+
+auto TlsfAllocator::allocate(std::size_t size, std::size_t alignment)
+    -> std::expected<AllocationResult, AllocError> {
+  if (alignment != 0 && (alignment & (alignment - 1)) != 0)
+    return std::unexpected(AllocError::InvalidAlignment);
+  if (size == 0)
+    size = 1;
+  if (size > size_)
+    return std::unexpected(AllocError::OutOfMemory);
+
+  // Payloads are 16-byte aligned by construction. Stricter alignments
+  // search for room to split a free block off the front.
+  const std::size_t need = block_size(size);
+  const bool over_aligned = alignment > kGranule;
+  const auto [fl, sl] =
+      mapping_search(over_aligned ? need + alignment + kMinBlockSize : need);
+  if (fl >= kFlCount)
+    return std::unexpected(AllocError::OutOfMemory);
+  auto *b = find_suitable(fl, sl);
+  if (b == nullptr)
+    return std::unexpected(AllocError::OutOfMemory);
+  remove_free(b);
+
+  if (over_aligned) {
+    const auto addr = reinterpret_cast<std::uintptr_t>(payload(b));
+    auto gap = ((addr + alignment - 1) & ~(alignment - 1)) - addr;
+    if (gap != 0 && gap < kMinBlockSize) {
+      gap += alignment;
+    }
+    if (gap != 0) {
+      auto *aligned = at(reinterpret_cast<std::byte *>(b) + gap);
+      aligned->size_flags = size_of(b) - gap;
+      set_size(b, gap);
+      insert_free(b);
+      b = aligned;
+    }
+  }
+
+  trim(b, need);
+  allocated_ += size_of(b) - kHeaderSize;
+  ++live_blocks_;
+  return result_of(b);
+}
+
+auto TlsfAllocator::deallocate(std::byte *ptr, std::size_t size)
+    -> std::expected<void, AllocError> {
+  if (!contains(ptr) || ptr < base_ + kHeaderSize ||
+      (ptr - base_) % kGranule != 0)
+    return std::unexpected(AllocError::BadPointer);
+  auto *b = at(ptr - kHeaderSize);
+  if (is_free(b))
+    return std::unexpected(AllocError::DoubleFree);
+  const auto block = size_of(b);
+  if (block < kMinBlockSize || block - kHeaderSize < size ||
+      block > static_cast<std::size_t>(reinterpret_cast<std::byte *>(end_) -
+                                       reinterpret_cast<std::byte *>(b)))
+    return std::unexpected(AllocError::BadPointer);
+
+  allocated_ -= block - kHeaderSize;
+  --live_blocks_;
+  release(b);
+  return {};
+}
+
+auto TlsfAllocator::try_extend(std::byte *ptr, std::size_t size,
+                               std::size_t new_size)
+    -> std::expected<AllocationResult, AllocError> {
+  if (!contains(ptr) || ptr < base_ + kHeaderSize ||
+      (ptr - base_) % kGranule != 0)
+    return std::unexpected(AllocError::BadPointer);
+  auto *b = at(ptr - kHeaderSize);
+  const auto old_block = size_of(b);
+  if (is_free(b) || old_block - kHeaderSize < size)
+    return std::unexpected(AllocError::BadPointer);
+
+  const std::size_t need = block_size(new_size);
+  if (need > old_block) {
+    auto *next = next_of(b);
+    if (!is_free(next) || old_block + size_of(next) < need)
+      return std::unexpected(AllocError::OutOfMemory);
+    remove_free(next);
+    set_size(b, old_block + size_of(next));
+  }
+  trim(b, need);
+  allocated_ = allocated_ - old_block + size_of(b);
+  return result_of(b);
+}
+
+auto TlsfAllocator::grow(std::size_t bytes) -> bool {
+  if (end_ == nullptr || bytes % kGranule != 0 || bytes < kMinBlockSize ||
+      bytes > max_size_ - size_)
+    return false;
+
+  // The old end tag heads the new range; a new one closes the region.
+  auto *b = end_;
+  set_size(b, bytes);
+  size_ += bytes;
+  end_ = at(base_ + size_ - kHeaderSize);
+  end_->prev_size = 0;
+  end_->size_flags = 0;
+  release(b);
+  return true;
+}
+
+// ─── Statistics ──────────────────────────────────────────────────────────
+
+auto TlsfAllocator::bytes_allocated() const noexcept -> std::size_t {
+  return allocated_;
+}
+
+auto TlsfAllocator::bytes_free() const noexcept -> std::size_t {
+  return size_ - allocated_;
+}
+
+auto TlsfAllocator::largest_free_block() const noexcept -> std::size_t {
+  if (fl_bitmap_ == 0) {
+    return 0;
+  }
+  const auto fl = std::bit_width(fl_bitmap_) - 1;
+  const auto sl = std::bit_width(sl_bitmap_[fl]) - 1;
+  auto &largest = list_max_[fl][sl];
+  if ((max_stale_[fl] >> sl & 1) != 0) {
+    largest = 0;
+    for (const auto *b = lists_[fl][sl]; b != nullptr; b = b->next_free) {
+      largest = std::max(largest, size_of(b));
+    }
+    max_stale_[fl] &= ~(std::uint32_t{1} << sl);
+  }
+  return largest;
+}
+
+auto TlsfAllocator::free_block_count() const noexcept -> std::size_t {
+  return free_blocks_;
+}
+
+auto TlsfAllocator::live_block_count() const noexcept -> std::size_t {
+  return live_blocks_;
+}
+
+auto TlsfAllocator::fragmentation_pct() const noexcept -> std::size_t {
+  if (free_bytes_ == 0) {
+    return 0;
+  }
+  return 100 - largest_free_block() * 100 / free_bytes_;
+}
+
+auto TlsfAllocator::block_size_for(std::size_t size,
+                                   std::size_t /*alignment*/) const noexcept
+    -> std::size_t {
+  return block_size(size) - kHeaderSize;
+}
+
+void TlsfAllocator::for_each_free_extent(
+    const std::function<void(const FreeExtent &)> &fn) const {
+  if (end_ == nullptr) {
+    return;
+  }
+  for (auto *b = at(base_); b != end_; b = next_of(b)) {
+    if (is_free(b)) {
+      fn(FreeExtent{reinterpret_cast<std::byte *>(b), size_of(b)});
+    }
+  }
+}
+
+} // namespace mmap_viz
@@ -0,0 +1,220 @@
+#pragma once
+/// @file tlsf.hpp
+/// @brief Two-level segregated fit (TLSF) allocator operating over an Arena.
+
+#include "allocator/allocator_engine.hpp"
+
+#include <array>
+#include <bit>
+#include <cstddef>
+#include <cstdint>
+#include <expected>
+#include <functional>
+#include <utility>
+
+namespace mmap_viz {
+
+/// @brief Two-level segregated fit allocator with O(1) allocate and free.
+///
+/// Free blocks are kept on segregated lists indexed by a first level (the
+/// power of two of the size) and a second level (kSlCount linear steps
+/// within it). One bitmap per level records the non-empty lists, so the
+/// list to allocate from is found with two bit scans and no search.
+/// Requests are rounded up to the next list boundary ("good fit"), which
+/// makes the head of any non-empty list large enough.
+///
+/// Every block starts with a 16-byte boundary tag holding its size, its
+/// free bit and whether the block before it is free; a free block's tag
+/// also records the size of its physical predecessor when that one is
+/// free. Coalescing on deallocate therefore reaches both neighbours
+/// without a search. A zero-size tag at the end of the region stops the
+/// walk.
+///
+/// Compared to FreeListAllocator the worst case of every operation is
+/// bounded by a constant, at the price of the boundary tags (16 bytes per
+/// block) and up to 1/kSlCount of internal fragmentation on large
+/// requests. It has no size-class runs, compaction support or decommit.
+class TlsfAllocator final : public AllocatorEngine {
+public:
+  /// @brief Construct a TLSF allocator over the given memory range.
+  /// @param base     Start of the memory region (16-byte aligned).
+  /// @param size     Size of the memory region in bytes.
+  /// @param max_size Bytes from @p base the region may later grow to with
+  ///                 grow() (0 = fixed at @p size).
+  TlsfAllocator(std::byte *base, std::size_t size,
+                std::size_t max_size = 0) noexcept;
+
+  [[nodiscard]] auto allocate(std::size_t size,
+                              std::size_t alignment = alignof(std::max_align_t))
+      -> std::expected<AllocationResult, AllocError> override;
+
+  auto deallocate(std::byte *ptr, std::size_t size)
+      -> std::expected<void, AllocError> override;
+
+  /// @brief Resize a block in place. Growing absorbs the physically next
+  /// block if it is free and large enough; shrinking splits the tail off
+  /// and frees it.
+  /// @return The resized block (same ptr), or OutOfMemory if it cannot grow
+  ///         in place.
+  [[nodiscard]] auto try_extend(std::byte *ptr, std::size_t size,
+                                std::size_t new_size)
+      -> std::expected<AllocationResult, AllocError> override;
+
+  /// @brief Total payload bytes of the allocated blocks.
+  [[nodiscard]] auto bytes_allocated() const noexcept -> std::size_t override;
+  /// @brief Capacity minus bytes_allocated() (boundary tags count as free).
+  [[nodiscard]] auto bytes_free() const noexcept -> std::size_t override;
+  /// @brief Size of the largest free block, tag included. Reads a cached
+  /// size for the highest non-empty list; that list is only scanned again
+  /// after its largest block was taken off it.
+  [[nodiscard]] auto largest_free_block() const noexcept
+      -> std::size_t override;
+  [[nodiscard]] auto free_block_count() const noexcept
+      -> std::size_t override;
+  [[nodiscard]] auto live_block_count() const noexcept
+      -> std::size_t override;
+  /// @brief Share of the bytes in free blocks lying outside the largest.
+  [[nodiscard]] auto fragmentation_pct() const noexcept
+      -> std::size_t override;
+
+  [[nodiscard]] auto base() const noexcept -> std::byte * override {
+    return base_;
+  }
+  [[nodiscard]] auto capacity() const noexcept -> std::size_t override {
+    return size_;
+  }
+  [[nodiscard]] auto max_capacity() const noexcept -> std::size_t override {
+    return max_size_;
+  }
+  [[nodiscard]] bool contains(const void *ptr) const noexcept override {
+    const auto *p = reinterpret_cast<const std::byte *>(ptr);
+    return p >= base_ && p < base_ + size_;
+  }
+
+  /// @brief Append @p bytes at the end of the region. The old end tag
+  /// becomes the head of a new free block, coalesced with a free tail.
+  /// @param bytes Multiple of 16, at most max_capacity() - capacity().
+  /// @return False (and no change) if the range does not fit.
+  auto grow(std::size_t bytes) -> bool override;
+
+  /// @brief Payload size allocate(size, alignment) hands out: @p size
+  /// rounded up to 16 bytes. A block may absorb a remainder too small to
+  /// split off.
+  [[nodiscard]] auto block_size_for(std::size_t size,
+                                    std::size_t alignment = alignof(
+                                        std::max_align_t)) const noexcept
+      -> std::size_t override;
+
+  /// @brief Call @p fn with every free block, tag included, in address
+  /// order. Walks the boundary tags of the whole region: O(blocks).
+  void for_each_free_extent(
+      const std::function<void(const FreeExtent &)> &fn) const override;
+
+  /// @brief The boundary tag in front of every block.
+  [[nodiscard]] auto block_overhead() const noexcept -> std::size_t override {
+    return kHeaderSize;
+  }
+
+  /// @brief log2 of the number of second-level lists per power of two.
+  static constexpr unsigned kSlLog2 = 4;
+  /// @brief Second-level lists per first-level class.
+  static constexpr std::size_t kSlCount = std::size_t{1} << kSlLog2;
+
+private:
+  /// @brief Boundary tag at the start of every block. The links are only
+  /// valid (and only stored) while the block is free.
+  struct Block {
+    std::size_t prev_size;  ///< Size of the previous block if that is free.
+    std::size_t size_flags; ///< Block size, tag included | kFreeBit | kPrevFreeBit.
+    Block *next_free;       ///< Next block on the same list.
+    Block *prev_free;       ///< Previous block on the same list.
+  };
+
+  static constexpr std::size_t kGranule = 16;
+  static constexpr std::size_t kHeaderSize = 2 * sizeof(std::size_t);
+  /// Smallest block: tag plus room for the free-list links.
+  static constexpr std::size_t kMinBlockSize = sizeof(Block);
+  static constexpr std::size_t kFreeBit = 1;
+  static constexpr std::size_t kPrevFreeBit = 2;
+  static constexpr std::size_t kFlagMask = kFreeBit | kPrevFreeBit;
+
+  /// Sizes below kSmallBlock share first-level list 0, split linearly.
+  static constexpr unsigned kFlShift =
+      kSlLog2 + std::countr_zero(kGranule);
+  static constexpr std::size_t kSmallBlock = std::size_t{1} << kFlShift;
+  /// Blocks up to 2^kFlMax bytes; covers any region of a 64-bit space.
+  static constexpr unsigned kFlMax = 48;
+  static constexpr std::size_t kFlCount = kFlMax - kFlShift + 1;
+
+  [[nodiscard]] static auto size_of(const Block *b) noexcept -> std::size_t {
+    return b->size_flags & ~kFlagMask;
+  }
+  [[nodiscard]] static auto is_free(const Block *b) noexcept -> bool {
+    return (b->size_flags & kFreeBit) != 0;
+  }
+  [[nodiscard]] static auto is_prev_free(const Block *b) noexcept -> bool {
+    return (b->size_flags & kPrevFreeBit) != 0;
+  }
+  static void set_size(Block *b, std::size_t size) noexcept {
+    b->size_flags = size | (b->size_flags & kFlagMask);
+  }
+  [[nodiscard]] static auto at(std::byte *p) noexcept -> Block * {
+    return reinterpret_cast<Block *>(p);
+  }
+  [[nodiscard]] static auto next_of(const Block *b) noexcept -> Block * {
+    return at(const_cast<std::byte *>(
+                  reinterpret_cast<const std::byte *>(b)) +
+              size_of(b));
+  }
+  [[nodiscard]] static auto payload(Block *b) noexcept -> std::byte * {
+    return reinterpret_cast<std::byte *>(b) + kHeaderSize;
+  }
+
+  /// @brief List indices of a block of @p size bytes.
+  [[nodiscard]] static auto mapping_insert(std::size_t size) noexcept
+      -> std::pair<unsigned, unsigned>;
+  /// @brief List indices whose every block holds @p size bytes.
+  [[nodiscard]] static auto mapping_search(std::size_t size) noexcept
+      -> std::pair<unsigned, unsigned>;
+  /// @brief Head of the first non-empty list at or above (fl, sl), or
+  /// nullptr.
+  [[nodiscard]] auto find_suitable(unsigned fl, unsigned sl) const noexcept
+      -> Block *;
+
+  /// @brief Put block @p b on its list and flag it and its successor free.
+  void insert_free(Block *b) noexcept;
+  /// @brief Take free block @p b off its list and flag it used.
+  void remove_free(Block *b) noexcept;
+  /// @brief Split used block @p b at @p size if the rest makes a block;
+  /// the rest is freed, coalescing with a free successor.
+  void trim(Block *b, std::size_t size) noexcept;
+  /// @brief Free @p b, merging it with free physical neighbours.
+  void release(Block *b) noexcept;
+
+  /// @brief Block size (tag included) for a request of @p size bytes.
+  [[nodiscard]] static auto block_size(std::size_t size) noexcept
+      -> std::size_t;
+
+  [[nodiscard]] auto result_of(Block *b) const noexcept -> AllocationResult;
+
+  std::byte *base_;
+  std::size_t size_;
+  std::size_t max_size_;
+  Block *end_ = nullptr; ///< Zero-size tag closing the region.
+
+  std::uint64_t fl_bitmap_ = 0;
+  std::array<std::uint32_t, kFlCount> sl_bitmap_{};
+  std::array<std::array<Block *, kSlCount>, kFlCount> lists_{};
+  /// Largest block size on each list; an upper bound while the list's bit
+  /// in max_stale_ is set (its largest block was taken off).
+  mutable std::array<std::array<std::size_t, kSlCount>, kFlCount>
+      list_max_{};
+  mutable std::array<std::uint32_t, kFlCount> max_stale_{};
+
+  std::size_t allocated_ = 0;  ///< Payload bytes of allocated blocks.
+  std::size_t free_bytes_ = 0; ///< Bytes in free blocks, tags included.
+  std::size_t free_blocks_ = 0;
+  std::size_t live_blocks_ = 0;
+};
+
+} // namespace mmap_viz
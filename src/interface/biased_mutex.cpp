@@ -0,0 +1,199 @@
+/// @file biased_mutex.cpp
+/// @brief Implementation of the owner-biased mutex.
+
+#include "interface/biased_mutex.hpp"
+
+#include <thread>
+
+#if defined(__linux__)
+#include <linux/membarrier.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+#endif
+
+#if defined(__SANITIZE_THREAD__)
+#define MMAP_VIZ_TSAN 1
+#elif defined(__has_feature)
+#if __has_feature(thread_sanitizer)
+#define MMAP_VIZ_TSAN 1
+#endif
+#endif
+
+namespace mmap_viz {
+
+namespace {
+
+#if defined(MMAP_VIZ_TSAN)
+constexpr bool kBiasSupported = false;
+#else
+constexpr bool kBiasSupported = true;
+#endif
+
+/// @brief Address unique to the calling thread while it runs.
+auto this_thread_token() noexcept -> const void * {
+  thread_local char token;
+  return &token;
+}
+
+#if defined(__linux__)
+auto membarrier(int cmd) noexcept -> long {
+  return syscall(__NR_membarrier, cmd, 0, 0);
+}
+#endif
+
+/// @brief Register for expedited private membarrier; false if the kernel
+/// lacks it.
+auto register_membarrier() noexcept -> bool {
+#if defined(__linux__)
+  const long cmds = membarrier(MEMBARRIER_CMD_QUERY);
+  if (cmds < 0 || (cmds & MEMBARRIER_CMD_PRIVATE_EXPEDITED) == 0) {
+    return false;
+  }
+  return membarrier(MEMBARRIER_CMD_REGISTER_PRIVATE_EXPEDITED) == 0;
+#else
+  return false;
+#endif
+}
+
+/// @brief Owner side of the barrier pair: free if the revoker can force
+/// a full barrier onto this thread.
+inline void light_barrier() noexcept {
+  if (BiasedMutex::asymmetric()) {
+    std::atomic_signal_fence(std::memory_order_seq_cst);
+  } else {
+    std::atomic_thread_fence(std::memory_order_seq_cst);
+  }
+}
+
+/// @brief Revoker side: a full barrier on every running thread.
+void heavy_barrier() noexcept {
+#if defined(__linux__)
+  if (BiasedMutex::asymmetric()) {
+    membarrier(MEMBARRIER_CMD_PRIVATE_EXPEDITED);
+    return;
+  }
+#endif
+  std::atomic_thread_fence(std::memory_order_seq_cst);
+}
+
+inline void cpu_relax() noexcept {
+#if defined(__x86_64__) || defined(__i386__)
+  __builtin_ia32_pause();
+#elif defined(__aarch64__)
+  asm volatile("yield");
+#endif
+}
+
+} // namespace
+
+auto BiasedMutex::asymmetric() noexcept -> bool {
+  static const bool available = kBiasSupported && register_membarrier();
+  return available;
+}
+
+BiasedMutex::BiasedMutex() {
+  // Register before any thread can own a bias.
+  (void)asymmetric();
+}
+
+void BiasedMutex::lock() {
+  if (try_lock_biased()) {
+    return;
+  }
+  mutex_.lock();
+  (void)acquired(true);
+}
+
+auto BiasedMutex::try_lock() -> bool {
+  if (try_lock_biased()) {
+    return true;
+  }
+  if (!mutex_.try_lock()) {
+    return false;
+  }
+  if (!acquired(false)) {
+    mutex_.unlock();
+    return false;
+  }
+  return true;
+}
+
+auto BiasedMutex::try_lock_unbiased() -> bool {
+  if (try_lock_biased()) {
+    return true;
+  }
+  if (!mutex_.try_lock()) {
+    return false;
+  }
+  // Only a holder of mutex_ sets owner_, so this cannot change under us.
+  const void *owner = owner_.load(std::memory_order_relaxed);
+  if (owner != nullptr && owner != this_thread_token()) {
+    mutex_.unlock();
+    return false;
+  }
+  return acquired(true);
+}
+
+void BiasedMutex::unlock() {
+  if (held_biased_) {
+    held_biased_ = false;
+    busy_.store(false, std::memory_order_release);
+    return;
+  }
+  mutex_.unlock();
+}
+
+auto BiasedMutex::try_lock_biased() -> bool {
+  const void *me = this_thread_token();
+  if (owner_.load(std::memory_order_relaxed) != me) {
+    return false;
+  }
+  busy_.store(true, std::memory_order_relaxed);
+  light_barrier();
+  if (owner_.load(std::memory_order_relaxed) != me) {
+    // Revoked meanwhile; the revoker may be waiting on busy_.
+    busy_.store(false, std::memory_order_release);
+    return false;
+  }
+  held_biased_ = true;
+  fast_acquisitions_.store(
+      fast_acquisitions_.load(std::memory_order_relaxed) + 1,
+      std::memory_order_relaxed);
+  return true;
+}
+
+auto BiasedMutex::acquired(bool wait) -> bool {
+  const void *me = this_thread_token();
+  const void *owner = owner_.load(std::memory_order_relaxed);
+  if (owner != nullptr && owner != me) {
+    owner_.store(nullptr, std::memory_order_relaxed);
+    heavy_barrier();
+    if (!wait && busy_.load(std::memory_order_acquire)) {
+      // The owner is inside; hand the bias back rather than wait.
+      owner_.store(owner, std::memory_order_relaxed);
+      return false;
+    }
+    for (unsigned spins = 0; busy_.load(std::memory_order_acquire); ++spins) {
+      if (spins < 64) {
+        cpu_relax();
+      } else {
+        std::this_thread::yield();
+      }
+    }
+    revocations_.store(revocations_.load(std::memory_order_relaxed) + 1,
+                       std::memory_order_relaxed);
+  }
+  held_biased_ = false;
+
+  if (streak_thread_ != me) {
+    streak_thread_ = me;
+    streak_ = 0;
+  }
+  if (++streak_ >= kBiasStreak && bias_enabled_ && kBiasSupported &&
+      owner_.load(std::memory_order_relaxed) == nullptr) {
+    owner_.store(me, std::memory_order_relaxed);
+  }
+  return true;
+}
+
+} // namespace mmap_viz
@@ -0,0 +1,93 @@
+#pragma once
+/// @file biased_mutex.hpp
+/// @brief Mutex with a fence-free fast path for the one thread using it.
+
+#include <atomic>
+#include <cstdint>
+#include <mutex>
+
+namespace mmap_viz {
+
+/// @brief Mutex biased towards a thread that takes it almost exclusively.
+///
+/// A thread that acquires the mutex kBiasStreak times in a row, with no
+/// other thread in between, becomes its owner. The owner then locks with a
+/// store to busy_, a compiler barrier and a re-check of owner_, and unlocks
+/// with a release store: no atomic read-modify-write and no fence.
+///
+/// Any other thread takes the underlying mutex and revokes the bias: it
+/// clears owner_, issues an asymmetric barrier (membarrier on Linux) that
+/// serializes every running thread of the process, and waits for busy_ to
+/// drop. The barrier turns the owner's compiler barrier into a full one
+/// after the fact, so either the owner sees the revocation or the revoker
+/// sees the owner inside. From then on everyone, the old owner included,
+/// uses the mutex until a new streak rebiases it.
+///
+/// Where no asymmetric barrier exists both sides use a full fence, which
+/// keeps the protocol correct but gives up most of the fast path's gain.
+/// Biasing is off under ThreadSanitizer, which cannot see the barrier.
+///
+/// Satisfies Lockable, so std::lock_guard and std::unique_lock work.
+class BiasedMutex {
+public:
+  BiasedMutex();
+  BiasedMutex(const BiasedMutex &) = delete;
+  BiasedMutex &operator=(const BiasedMutex &) = delete;
+
+  /// @brief Block until the mutex is held.
+  void lock();
+  /// @brief Take the mutex if that needs no waiting. Never waits for a
+  /// biased owner to leave its critical section.
+  [[nodiscard]] auto try_lock() -> bool;
+  /// @brief Like try_lock(), but also fail while another thread owns the
+  /// bias, so that probing never revokes it.
+  [[nodiscard]] auto try_lock_unbiased() -> bool;
+  void unlock();
+
+  /// @brief Allow or forbid biasing. Call before the mutex is shared.
+  void set_bias_enabled(bool enabled) noexcept { bias_enabled_ = enabled; }
+
+  /// @brief True while some thread owns the bias.
+  [[nodiscard]] auto biased() const noexcept -> bool {
+    return owner_.load(std::memory_order_relaxed) != nullptr;
+  }
+  /// @brief Acquisitions that took the owner fast path.
+  [[nodiscard]] auto fast_acquisitions() const noexcept -> std::uint64_t {
+    return fast_acquisitions_.load(std::memory_order_relaxed);
+  }
+  /// @brief Times the bias was taken away from its owner.
+  [[nodiscard]] auto revocations() const noexcept -> std::uint64_t {
+    return revocations_.load(std::memory_order_relaxed);
+  }
+
+  /// @brief True if revocation uses an asymmetric barrier, so the owner
+  /// fast path needs no fence.
+  [[nodiscard]] static auto asymmetric() noexcept -> bool;
+
+  /// @brief Consecutive acquisitions by one thread that bias the mutex.
+  static constexpr std::uint32_t kBiasStreak = 64;
+
+private:
+  /// @brief Owner fast path: enter without the mutex if still biased
+  /// towards the calling thread.
+  [[nodiscard]] auto try_lock_biased() -> bool;
+  /// @brief Revoke a foreign bias and count the streak. Caller holds
+  /// mutex_. Returns false (bias kept) if the owner is inside and
+  /// @p wait is false.
+  [[nodiscard]] auto acquired(bool wait) -> bool;
+
+  std::atomic<const void *> owner_{nullptr}; ///< Biased thread, if any.
+  std::atomic<bool> busy_{false}; ///< Owner is inside via the fast path.
+  bool held_biased_ = false; ///< Current holder entered via the fast path.
+  bool bias_enabled_ = true;
+
+  std::mutex mutex_;
+  // Streak of the thread acquiring mutex_, guarded by it.
+  const void *streak_thread_ = nullptr;
+  std::uint32_t streak_ = 0;
+
+  std::atomic<std::uint64_t> fast_acquisitions_{0};
+  std::atomic<std::uint64_t> revocations_{0};
+};
+
+} // namespace mmap_viz
@@ -0,0 +1,127 @@
+#pragma once
+/// @file block_table.hpp
+/// @brief Out-of-band headers for arena blocks that must keep their size.
+
+#include "allocator/arena.hpp"
+
+#include <algorithm>
+#include <bit>
+#include <cstddef>
+#include <cstdint>
+#include <expected>
+#include <system_error>
+#include <vector>
+
+namespace mmap_viz {
+
+/// @brief Headers of arena blocks kept beside the blocks rather than in
+/// front of them.
+///
+/// Buddy blocks are powers of two, so an in-band header would push every
+/// power-of-two request up an order and double it. Here a block of
+/// kMinBlock << k bytes at offset o from the table base has its order k in
+/// a byte map at o / kMinBlock and its Entry at o >> log2(kMinBlock << k)
+/// in the entry array of order k. Blocks of one size never start closer
+/// than their size, so no two live blocks share an entry, and each array is
+/// as dense as the blocks using it. Everything lives in one lazily faulted
+/// mapping, so memory is spent in proportion to the blocks in use.
+///
+/// Like an in-band header, a block's entry is written only by the thread
+/// that owns the block, so the table needs no lock.
+class BlockTable {
+public:
+  /// @brief Header of one block.
+  struct Entry {
+    std::uint64_t size;   ///< Requested user size.
+    std::uint32_t magic;  ///< kMagicValue while the block is live.
+    std::uint16_t tag_id; ///< Interned tag (TagTable).
+    static constexpr std::uint32_t kMagicValue = 0xB0DDB10C;
+  };
+  static_assert(sizeof(Entry) == 16);
+
+  /// @brief Smallest block tracked: the arena never hands out less than a
+  /// ParkedBlock.
+  static constexpr std::size_t kMinBlock = 32;
+
+  /// @brief Table for power-of-two blocks in [@p base, @p base +
+  /// @p capacity).
+  [[nodiscard]] static auto create(const std::byte *base,
+                                   std::size_t capacity)
+      -> std::expected<BlockTable, std::error_code> {
+    const std::size_t orders =
+        std::bit_width(std::max(capacity / kMinBlock, std::size_t{1}));
+    const std::size_t map_bytes =
+        (capacity / kMinBlock + sizeof(Entry)) & ~(sizeof(Entry) - 1);
+    std::size_t bytes = map_bytes;
+    for (std::size_t k = 0; k < orders; ++k) {
+      bytes += entries_of(capacity, k) * sizeof(Entry);
+    }
+    // Reserved without backing, then opened whole: pages fault in on use.
+    auto mapping = Arena::reserve(bytes);
+    if (!mapping.has_value()) {
+      return std::unexpected(mapping.error());
+    }
+    if (auto opened = mapping->commit(0, mapping->capacity());
+        !opened.has_value()) {
+      return std::unexpected(opened.error());
+    }
+
+    BlockTable table{base, std::move(*mapping)};
+    auto *next = table.mapping_.base() + map_bytes;
+    for (std::size_t k = 0; k < orders; ++k) {
+      table.entries_.push_back(reinterpret_cast<Entry *>(next));
+      next += entries_of(capacity, k) * sizeof(Entry);
+    }
+    return table;
+  }
+
+  /// @brief Record that a block of @p actual_size bytes (a power of two,
+  /// at least kMinBlock) starts at @p block.
+  /// @return Its entry, holding whatever the last block of that size there
+  ///         left.
+  auto bind(const std::byte *block, std::size_t actual_size) -> Entry & {
+    const auto order = static_cast<std::uint8_t>(
+        std::countr_zero(actual_size) - std::countr_zero(kMinBlock));
+    orders()[offset_of(block) / kMinBlock] = order;
+    return entry_at(block, order);
+  }
+
+  /// @brief Entry of the block last bound at @p block.
+  [[nodiscard]] auto find(const std::byte *block) -> Entry & {
+    return entry_at(block, orders()[offset_of(block) / kMinBlock]);
+  }
+  [[nodiscard]] auto find(const std::byte *block) const -> const Entry & {
+    return const_cast<BlockTable *>(this)->find(block);
+  }
+
+  /// @brief Size of the block last bound at @p block.
+  [[nodiscard]] auto actual_size(const std::byte *block) const
+      -> std::size_t {
+    return kMinBlock << orders()[offset_of(block) / kMinBlock];
+  }
+
+private:
+  BlockTable(const std::byte *base, Arena mapping)
+      : base_{base}, mapping_{std::move(mapping)} {}
+
+  [[nodiscard]] static auto entries_of(std::size_t capacity,
+                                       std::size_t order) -> std::size_t {
+    return (capacity / kMinBlock >> order) + 1;
+  }
+  [[nodiscard]] auto offset_of(const std::byte *block) const -> std::size_t {
+    return static_cast<std::size_t>(block - base_);
+  }
+  [[nodiscard]] auto orders() const -> std::uint8_t * {
+    return reinterpret_cast<std::uint8_t *>(mapping_.base());
+  }
+  [[nodiscard]] auto entry_at(const std::byte *block, std::uint8_t order)
+      -> Entry & {
+    return entries_[order][offset_of(block) / kMinBlock >> order];
+  }
+
+  const std::byte *base_;
+  Arena mapping_; ///< Order map, then the entry array of every order.
+  std::vector<Entry *> entries_;
+};
+
+} // namespace mmap_viz
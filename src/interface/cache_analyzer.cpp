@@ -103,8 +103,8 @@ auto CacheAnalyzer::analyze(std::span<const BlockMetadata> blocks,
         accum.is_split = true;
       }
 
-      if (block.tag[0] != '\0') {
-        accum.tags.push_back(block.tag);
+      if (auto tag = block.tag(); !tag.empty()) {
+        accum.tags.emplace_back(tag);
       }
     }
   }
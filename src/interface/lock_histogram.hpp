@@ -0,0 +1,126 @@
+#pragma once
+/// @file lock_histogram.hpp
+/// @brief Log-scale duration histograms for shard lock instrumentation.
+
+#include <algorithm>
+#include <array>
+#include <atomic>
+#include <bit>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+
+namespace mmap_viz {
+
+/// @brief Counts of durations in power-of-two nanosecond buckets.
+///
+/// Bucket 0 counts zero-length samples (an uncontended acquisition has no
+/// wait) and bucket i > 0 those in [2^(i-1), 2^i) ns. The last bucket is
+/// open-ended and takes everything from about one second up.
+struct LatencyHistogram {
+  static constexpr std::size_t kBuckets = 32;
+
+  std::array<std::uint64_t, kBuckets> counts{};
+
+  /// @brief Bucket of a duration of @p ns nanoseconds.
+  [[nodiscard]] static constexpr auto bucket_of(std::uint64_t ns) noexcept
+      -> std::size_t {
+    return std::min<std::size_t>(std::bit_width(ns), kBuckets - 1);
+  }
+
+  /// @brief Exclusive upper bound of bucket @p i in nanoseconds.
+  [[nodiscard]] static constexpr auto bucket_limit(std::size_t i) noexcept
+      -> std::uint64_t {
+    return std::uint64_t{1} << i;
+  }
+
+  /// @brief Number of samples.
+  [[nodiscard]] auto total() const noexcept -> std::uint64_t {
+    std::uint64_t n = 0;
+    for (auto c : counts) {
+      n += c;
+    }
+    return n;
+  }
+
+  /// @brief Sum of the samples in ns, taking each at the midpoint of its
+  /// bucket (the last bucket at its lower bound).
+  [[nodiscard]] auto approx_sum() const noexcept -> std::uint64_t {
+    std::uint64_t sum = 0;
+    for (std::size_t i = 1; i + 1 < kBuckets; ++i) {
+      sum += counts[i] * (bucket_limit(i) - bucket_limit(i) / 4);
+    }
+    return sum + counts[kBuckets - 1] * bucket_limit(kBuckets - 2);
+  }
+
+  /// @brief Upper bound (ns) of the bucket holding quantile @p q in [0, 1];
+  /// 0 if the quantile falls in bucket 0 or there are no samples.
+  [[nodiscard]] auto percentile(double q) const noexcept -> std::uint64_t {
+    const auto n = total();
+    if (n == 0) {
+      return 0;
+    }
+    const auto rank = std::max<std::uint64_t>(
+        1, static_cast<std::uint64_t>(std::ceil(q * static_cast<double>(n))));
+    std::uint64_t seen = 0;
+    for (std::size_t i = 0; i < kBuckets; ++i) {
+      seen += counts[i];
+      if (seen >= rank) {
+        return i == 0 ? 0 : bucket_limit(i);
+      }
+    }
+    return bucket_limit(kBuckets - 1);
+  }
+
+  /// @brief Samples recorded since @p earlier, a previous reading of the
+  /// same histogram.
+  [[nodiscard]] auto since(const LatencyHistogram &earlier) const noexcept
+      -> LatencyHistogram {
+    LatencyHistogram d;
+    for (std::size_t i = 0; i < kBuckets; ++i) {
+      d.counts[i] = counts[i] - earlier.counts[i];
+    }
+    return d;
+  }
+};
+
+/// @brief LatencyHistogram that other threads may read while it records.
+///
+/// record() is a relaxed load and store of one counter, not a
+/// read-modify-write, so recorders must be serialized (the shard lock
+/// does that). Readers never block them and see each counter whole.
+class AtomicLatencyHistogram {
+public:
+  void record(std::uint64_t ns) noexcept {
+    auto &c = counts_[LatencyHistogram::bucket_of(ns)];
+    c.store(c.load(std::memory_order_relaxed) + 1, std::memory_order_relaxed);
+  }
+
+  [[nodiscard]] auto load() const noexcept -> LatencyHistogram {
+    LatencyHistogram h;
+    for (std::size_t i = 0; i < LatencyHistogram::kBuckets; ++i) {
+      h.counts[i] = counts_[i].load(std::memory_order_relaxed);
+    }
+    return h;
+  }
+
+private:
+  std::array<std::atomic<std::uint64_t>, LatencyHistogram::kBuckets>
+      counts_{};
+};
+
+/// @brief Lock timing of one shard (ArenaConfig::lock_histograms). Every
+/// instrumented acquisition adds one sample to each histogram, so
+/// wait.total() is the acquisition count.
+struct ShardLockHistograms {
+  LatencyHistogram wait; ///< Time to acquire the lock (0 = uncontended).
+  LatencyHistogram hold; ///< Time from acquiring to releasing it.
+
+  /// @brief Samples recorded since @p earlier.
+  [[nodiscard]] auto since(const ShardLockHistograms &earlier) const noexcept
+      -> ShardLockHistograms {
+    return {wait.since(earlier.wait), hold.since(earlier.hold)};
+  }
+};
+
+} // namespace mmap_viz
@@ -0,0 +1,208 @@
+#pragma once
+/// @file object_pool.hpp
+/// @brief Typed pool of fixed-size slots carved from VisualizationArena
+/// slabs.
+
+#include "interface/visualization_arena.hpp"
+
+#include <algorithm>
+#include <cstddef>
+#include <new>
+#include <string>
+#include <string_view>
+#include <utility>
+#include <vector>
+
+namespace mmap_viz {
+
+/// @brief Pool of equally sized slots for objects of type T.
+///
+/// Slots are carved from slabs, each one tracked block of the arena, and
+/// recycled through a free list threaded through the free slots. create()
+/// and destroy() therefore skip block headers, alignment padding and the
+/// shard lock; only a new slab goes through alloc_raw(). The visualizer
+/// sees one block per slab instead of one per object: the pool's
+/// occupancy fills its slabs in order and is streamed as "fill" events
+/// whenever it changes by a sixteenth of the pool's capacity.
+///
+/// Not synchronized: a pool is meant to be used by one thread at a time.
+/// It must not outlive its arena. Objects still live when the pool is
+/// destroyed are released with their slabs, without running destructors.
+template <typename T> class ObjectPool {
+public:
+  /// @brief Alignment of every slot.
+  static constexpr std::size_t kSlotAlign =
+      std::max(alignof(T), alignof(void *));
+  /// @brief Bytes per slot: T, or a free-list link if larger.
+  static constexpr std::size_t kSlotSize =
+      (std::max(sizeof(T), sizeof(void *)) + kSlotAlign - 1) &
+      ~(kSlotAlign - 1);
+
+  /// @brief Construct an empty pool; the first slab is taken on demand.
+  /// @param arena      Backing arena.
+  /// @param tag        Diagnostic tag of every slab.
+  /// @param slab_slots Slots per slab (0 = as many as fit in 64 KB, at
+  ///                   least 16).
+  ObjectPool(VisualizationArena &arena, std::string_view tag,
+             std::size_t slab_slots = 0)
+      : arena_{&arena}, tag_{tag},
+        slab_slots_{slab_slots != 0
+                        ? slab_slots
+                        : std::max<std::size_t>(64 * 1024 / kSlotSize, 16)} {}
+
+  ~ObjectPool() { release(); }
+
+  ObjectPool(ObjectPool &&other) noexcept
+      : arena_{other.arena_}, tag_{std::move(other.tag_)},
+        slab_slots_{other.slab_slots_}, slabs_{std::move(other.slabs_)},
+        free_{std::exchange(other.free_, nullptr)},
+        bump_{std::exchange(other.bump_, nullptr)},
+        bump_end_{std::exchange(other.bump_end_, nullptr)},
+        live_{std::exchange(other.live_, 0)},
+        reported_{std::exchange(other.reported_, 0)},
+        step_{std::exchange(other.step_, 1)} {
+    other.slabs_.clear();
+  }
+
+  ObjectPool &operator=(ObjectPool &&other) noexcept {
+    if (this != &other) {
+      release();
+      arena_ = other.arena_;
+      tag_ = std::move(other.tag_);
+      slab_slots_ = other.slab_slots_;
+      slabs_ = std::move(other.slabs_);
+      other.slabs_.clear();
+      free_ = std::exchange(other.free_, nullptr);
+      bump_ = std::exchange(other.bump_, nullptr);
+      bump_end_ = std::exchange(other.bump_end_, nullptr);
+      live_ = std::exchange(other.live_, 0);
+      reported_ = std::exchange(other.reported_, 0);
+      step_ = std::exchange(other.step_, 1);
+    }
+    return *this;
+  }
+
+  ObjectPool(const ObjectPool &) = delete;
+  ObjectPool &operator=(const ObjectPool &) = delete;
+
+  /// @brief Allocate a slot and construct a T in it.
+  /// @return Pointer to the constructed T, or nullptr on OOM.
+  template <typename... Args> auto create(Args &&...args) -> T * {
+    void *slot = allocate();
+    if (slot == nullptr) {
+      return nullptr;
+    }
+    return ::new (slot) T(std::forward<Args>(args)...);
+  }
+
+  /// @brief Destruct a T from create() and recycle its slot.
+  void destroy(T *ptr) {
+    if (ptr == nullptr) {
+      return;
+    }
+    ptr->~T();
+    deallocate(ptr);
+  }
+
+  /// @brief Uninitialized slot of kSlotSize bytes, or nullptr on OOM.
+  auto allocate() -> void * {
+    void *slot = nullptr;
+    if (free_ != nullptr) {
+      slot = std::exchange(free_, free_->next);
+    } else {
+      if (bump_ == bump_end_ && !grow()) {
+        return nullptr;
+      }
+      slot = std::exchange(bump_, bump_ + kSlotSize);
+    }
+    if (++live_ >= reported_ + step_) {
+      report();
+    }
+    return slot;
+  }
+
+  /// @brief Recycle a slot from allocate().
+  void deallocate(void *ptr) {
+    free_ = ::new (ptr) FreeSlot{free_};
+    if (--live_ + step_ <= reported_) {
+      report();
+    }
+  }
+
+  /// @brief Return every slab to the arena. Live objects are abandoned.
+  void release() {
+    for (auto *slab : slabs_) {
+      arena_->dealloc_raw(slab, slab_bytes());
+    }
+    slabs_.clear();
+    free_ = nullptr;
+    bump_ = nullptr;
+    bump_end_ = nullptr;
+    live_ = 0;
+    reported_ = 0;
+    step_ = 1;
+  }
+
+  /// @brief Objects currently live.
+  [[nodiscard]] auto size() const noexcept -> std::size_t { return live_; }
+
+  /// @brief Slots in all slabs.
+  [[nodiscard]] auto capacity() const noexcept -> std::size_t {
+    return slabs_.size() * slab_slots_;
+  }
+
+  /// @brief Number of slabs (tracked blocks) taken from the arena.
+  [[nodiscard]] auto slab_count() const noexcept -> std::size_t {
+    return slabs_.size();
+  }
+
+private:
+  struct FreeSlot {
+    FreeSlot *next;
+  };
+
+  [[nodiscard]] auto slab_bytes() const noexcept -> std::size_t {
+    return slab_slots_ * kSlotSize;
+  }
+
+  /// @brief Take another slab and make it the bump range.
+  auto grow() -> bool {
+    auto *slab = static_cast<std::byte *>(
+        arena_->alloc_raw(slab_bytes(), kSlotAlign, tag_));
+    if (slab == nullptr) {
+      return false;
+    }
+    slabs_.push_back(slab);
+    bump_ = slab;
+    bump_end_ = slab + slab_bytes();
+    step_ = std::max<std::size_t>(capacity() / 16, 1);
+    return true;
+  }
+
+  /// @brief Send the fill level of every slab the occupancy moved across
+  /// since the last report.
+  void report() {
+    const auto lo = std::min(live_, reported_) / slab_slots_;
+    const auto hi = std::max(live_, reported_) / slab_slots_;
+    for (auto i = lo; i <= hi && i < slabs_.size(); ++i) {
+      const auto first = i * slab_slots_;
+      const auto in_slab =
+          live_ > first ? std::min(live_ - first, slab_slots_) : 0;
+      arena_->record_fill(slabs_[i], in_slab * kSlotSize);
+    }
+    reported_ = live_;
+  }
+
+  VisualizationArena *arena_;
+  std::string tag_;
+  std::size_t slab_slots_;
+  std::vector<std::byte *> slabs_;
+  FreeSlot *free_ = nullptr;
+  std::byte *bump_ = nullptr;     ///< Next never-used slot of the last slab.
+  std::byte *bump_end_ = nullptr; ///< End of the last slab.
+  std::size_t live_ = 0;
+  std::size_t reported_ = 0; ///< live_ at the last fill report.
+  std::size_t step_ = 1;     ///< Change in live_ that triggers a report.
+};
+
+} // namespace mmap_viz
@@ -65,7 +65,7 @@ compute_padding_report(std::span<const BlockMetadata> blocks) -> PaddingReport {
         .alignment = block.alignment,
         .padding_bytes = wasted,
         .efficiency = eff,
-        .tag = block.tag,
+        .tag = std::string(block.tag()),
     });
 
     report.total_requested += block.size;
@@ -0,0 +1,84 @@
+/// @file region.cpp
+/// @brief Implementation of Region.
+
+#include "interface/region.hpp"
+#include "interface/visualization_arena.hpp"
+
+#include <new>
+#include <utility>
+
+namespace mmap_viz {
+
+Region::Region(VisualizationArena *arena, std::byte *base,
+               std::size_t capacity) noexcept
+    : arena_{arena}, base_{base}, capacity_{capacity},
+      next_report_{report_step()} {}
+
+Region::~Region() { release(); }
+
+Region::Region(Region &&other) noexcept
+    : arena_{std::exchange(other.arena_, nullptr)},
+      base_{std::exchange(other.base_, nullptr)},
+      capacity_{std::exchange(other.capacity_, 0)},
+      used_{std::exchange(other.used_, 0)},
+      reported_{std::exchange(other.reported_, 0)},
+      next_report_{std::exchange(other.next_report_, SIZE_MAX)} {}
+
+Region &Region::operator=(Region &&other) noexcept {
+  if (this != &other) {
+    release();
+    arena_ = std::exchange(other.arena_, nullptr);
+    base_ = std::exchange(other.base_, nullptr);
+    capacity_ = std::exchange(other.capacity_, 0);
+    used_ = std::exchange(other.used_, 0);
+    reported_ = std::exchange(other.reported_, 0);
+    next_report_ = std::exchange(other.next_report_, SIZE_MAX);
+  }
+  return *this;
+}
+
+void Region::reset() noexcept {
+  used_ = 0;
+  if (base_ != nullptr && reported_ != 0) {
+    report_fill();
+  }
+  next_report_ = base_ != nullptr ? report_step() : SIZE_MAX;
+}
+
+void Region::release() noexcept {
+  if (base_ == nullptr)
+    return;
+  arena_->dealloc_raw(base_, capacity_);
+  arena_ = nullptr;
+  base_ = nullptr;
+  capacity_ = 0;
+  used_ = 0;
+  reported_ = 0;
+  next_report_ = SIZE_MAX;
+}
+
+void Region::report_fill() noexcept {
+  arena_->record_fill(base_, used_);
+  reported_ = used_;
+  next_report_ = (used_ / report_step() + 1) * report_step();
+}
+
+// ─── PMR view ────────────────────────────────────────────────────────────
+
+void *Region::Resource::do_allocate(std::size_t bytes, std::size_t alignment) {
+  void *ptr = region_->allocate(bytes, alignment);
+  if (!ptr) {
+    throw std::bad_alloc{};
+  }
+  return ptr;
+}
+
+void Region::Resource::do_deallocate(void * /*ptr*/, std::size_t /*bytes*/,
+                                     std::size_t /*alignment*/) {}
+
+bool Region::Resource::do_is_equal(
+    const std::pmr::memory_resource &other) const noexcept {
+  return this == &other;
+}
+
+} // namespace mmap_viz
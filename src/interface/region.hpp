@@ -0,0 +1,118 @@
+#pragma once
+/// @file region.hpp
+/// @brief Bump-pointer sub-arena carved from one tracked block.
+
+#include <cstddef>
+#include <cstdint>
+#include <memory>
+#include <memory_resource>
+
+namespace mmap_viz {
+
+class VisualizationArena;
+
+/// @brief Monotonic allocator over a single block of a VisualizationArena.
+///
+/// Allocation bumps a cursor and never touches the arena's free tree;
+/// individual frees are no-ops. reset() rewinds the cursor and release()
+/// returns the whole block, both in O(1). The visualizer shows the region
+/// as one block whose fill level follows "fill" events, sent whenever the
+/// bytes in use cross another sixteenth of the capacity and on reset.
+///
+/// Not synchronized: a region is meant to be used by one thread at a time.
+/// It must not outlive its arena.
+class Region {
+public:
+  /// @brief A null region: every allocation fails.
+  Region() noexcept = default;
+  ~Region();
+
+  Region(Region &&other) noexcept;
+  Region &operator=(Region &&other) noexcept;
+  Region(const Region &) = delete;
+  Region &operator=(const Region &) = delete;
+
+  /// @brief True if the region owns a block.
+  explicit operator bool() const noexcept { return base_ != nullptr; }
+
+  /// @brief Carve @p size bytes aligned to @p alignment (power of 2).
+  /// @return nullptr if the rest of the region is too small.
+  auto allocate(std::size_t size,
+                std::size_t alignment = alignof(std::max_align_t)) noexcept
+      -> void * {
+    const auto at = (reinterpret_cast<std::uintptr_t>(base_) + used_ +
+                     alignment - 1) &
+                    ~(alignment - 1);
+    const auto begin = at - reinterpret_cast<std::uintptr_t>(base_);
+    if (base_ == nullptr || begin > capacity_ || size > capacity_ - begin) {
+      return nullptr;
+    }
+    used_ = begin + size;
+    if (used_ >= next_report_) {
+      report_fill();
+    }
+    return base_ + begin;
+  }
+
+  /// @brief Forget every allocation; the memory is reused from the start.
+  void reset() noexcept;
+
+  /// @brief Return the block to the arena, leaving a null region.
+  void release() noexcept;
+
+  /// @brief Bytes handed out since the last reset, padding included.
+  [[nodiscard]] auto used() const noexcept -> std::size_t { return used_; }
+
+  /// @brief Usable bytes of the block.
+  [[nodiscard]] auto capacity() const noexcept -> std::size_t {
+    return capacity_;
+  }
+
+  /// @brief Start of the block.
+  [[nodiscard]] auto data() const noexcept -> std::byte * { return base_; }
+
+  /// @brief std::pmr view of this region. Deallocation is a no-op and
+  /// exhaustion throws std::bad_alloc, as for
+  /// std::pmr::monotonic_buffer_resource without upstream.
+  /// @return Non-owning pointer; valid for the lifetime of this region.
+  [[nodiscard]] auto resource() noexcept -> std::pmr::memory_resource * {
+    return &resource_;
+  }
+
+private:
+  friend class VisualizationArena;
+  Region(VisualizationArena *arena, std::byte *base,
+         std::size_t capacity) noexcept;
+
+  class Resource final : public std::pmr::memory_resource {
+  public:
+    explicit Resource(Region *region) noexcept : region_{region} {}
+
+  protected:
+    void *do_allocate(std::size_t bytes, std::size_t alignment) override;
+    void do_deallocate(void *ptr, std::size_t bytes,
+                       std::size_t alignment) override;
+    bool do_is_equal(
+        const std::pmr::memory_resource &other) const noexcept override;
+
+  private:
+    Region *region_;
+  };
+
+  /// @brief Send a fill event and move next_report_ past used_.
+  void report_fill() noexcept;
+  /// @brief Bytes per fill report step.
+  [[nodiscard]] auto report_step() const noexcept -> std::size_t {
+    return capacity_ / 16 + 1;
+  }
+
+  VisualizationArena *arena_ = nullptr;
+  std::byte *base_ = nullptr;
+  std::size_t capacity_ = 0;
+  std::size_t used_ = 0;
+  std::size_t reported_ = 0; ///< used_ at the last fill event.
+  std::size_t next_report_ = SIZE_MAX; ///< used_ that triggers a report.
+  Resource resource_{this};
+};
+
+} // namespace mmap_viz
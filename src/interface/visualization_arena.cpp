@@ -2,11 +2,19 @@
 /// @brief Implementation of the VisualizationArena façade.
 
 #include "interface/visualization_arena.hpp"
+#include "interface/biased_mutex.hpp"
+#include "interface/block_table.hpp"
 #include "serialization/json_serializer.hpp"
 #include "server/ws_server.hpp"
+#include "tracker/tag_table.hpp"
 
 #include <nlohmann/json.hpp>
 
+#include <algorithm>
+#include <array>
+#include <bit>
+#include <chrono>
+#include <condition_variable>
 #include <iostream>
 #include <string>
 #include <thread>
@@ -22,24 +30,379 @@ std::atomic<std::size_t> VisualizationArena::global_generation_{1};
 
 static constexpr std::size_t kMaxShards = 256;
 
+// Rebinding: a thread re-evaluates its shard every kRebindInterval
+// allocations, and moves if more than 1/kRebindContention of the shard's
+// lock acquisitions since then had to wait.
+static constexpr std::size_t kRebindInterval = 1024;
+static constexpr std::uint64_t kRebindContention = 4;
+
+// Magazine geometry: one class per 16 bytes of block size, up to 1 KB.
+static constexpr std::size_t kMagazineQuantum = 16;
+static constexpr std::size_t kMagazineClasses = 64;
+static constexpr std::size_t kMaxMagazineSize = 64;
+
+namespace {
+
+/// @brief Where and in which layout the arena keeps block headers.
+struct HeaderFormat {
+  bool compact = false; ///< CompactHeader instead of AllocationHeader.
+  /// Out of band instead of either (buddy engine): the user pointer is the
+  /// block itself.
+  BlockTable *table = nullptr;
+};
+
+/// @brief Distance from the start of a block to the user pointer: header,
+/// footer and enough padding to keep the user pointer aligned. A compact
+/// header ends in its own footer.
+auto user_offset(std::size_t alignment, HeaderFormat headers) -> std::size_t {
+  if (headers.table != nullptr) {
+    return 0;
+  }
+  std::size_t base_overhead =
+      headers.compact ? sizeof(CompactHeader)
+                      : sizeof(AllocationHeader) + sizeof(std::uint32_t);
+  std::size_t padding = 0;
+  if (alignment > 0) {
+    std::size_t remainder = base_overhead % alignment;
+    if (remainder != 0) {
+      padding = alignment - remainder;
+    }
+  }
+  return base_overhead + padding;
+}
+
+/// @brief Header of a freed block held outside its allocator: parked in a
+/// magazine or queued on a shard's remote-free list. Keeps the
+/// AllocationHeader layout up to the tag, whose first bytes hold the link.
+/// With compact headers, actual_size overlays CompactHeader::magic and can
+/// never match it, being a multiple of 16.
+struct ParkedBlock {
+  std::size_t size;        ///< Block size, first word like a free block.
+  std::size_t actual_size; ///< Same as size.
+  std::uint64_t magic;     ///< 0, as for any freed block.
+  ParkedBlock *next;
+};
+static_assert(offsetof(ParkedBlock, magic) ==
+              offsetof(AllocationHeader, magic));
+static_assert(offsetof(ParkedBlock, next) == offsetof(AllocationHeader, tag));
+static_assert(offsetof(ParkedBlock, actual_size) ==
+              offsetof(CompactHeader, magic));
+static_assert(CompactHeader::kMagicValue % CompactHeader::kGranule != 0);
+
+/// @brief Overwrite the header of a freed block of @p actual_size bytes
+/// with a ParkedBlock.
+auto park(std::byte *raw_ptr, std::size_t actual_size,
+          BlockTable *table = nullptr) -> ParkedBlock * {
+  if (table != nullptr) {
+    // A block fresh from the allocator has no entry of its size yet.
+    table->bind(raw_ptr, actual_size).magic = 0;
+  }
+  auto *node = reinterpret_cast<ParkedBlock *>(raw_ptr);
+  node->size = actual_size;
+  node->actual_size = actual_size;
+  node->magic = 0;
+  return node;
+}
+
+/// @brief Bytes to request from a shard for @p size user bytes. Every block
+/// must be able to hold a ParkedBlock once freed.
+auto block_request(std::size_t size, std::size_t offset_to_user)
+    -> std::size_t {
+  return std::max(size + offset_to_user, sizeof(ParkedBlock));
+}
+
+/// @brief Write the header and footer of a block and zero its user region.
+/// Bytes in [zeroed_begin, zeroed_end) of the block are known to be zero
+/// already (freshly refaulted pages) and are not cleared again.
+/// @return The user pointer.
+auto init_block(std::byte *raw_ptr, std::size_t offset_to_user,
+                std::size_t size, std::size_t actual_size,
+                std::string_view tag, HeaderFormat headers,
+                std::size_t zeroed_begin = 0, std::size_t zeroed_end = 0)
+    -> std::byte * {
+  std::byte *user_ptr = raw_ptr + offset_to_user;
+
+  if (headers.table != nullptr) {
+    auto &entry = headers.table->bind(raw_ptr, actual_size);
+    entry.size = size;
+    entry.tag_id = TagTable::global().intern(tag);
+    entry.magic = BlockTable::Entry::kMagicValue;
+  } else if (headers.compact) {
+    auto *header = reinterpret_cast<CompactHeader *>(raw_ptr);
+    header->user_offset = static_cast<std::uint32_t>(offset_to_user);
+    header->set_sizes(actual_size, size);
+    header->tag_id = TagTable::global().intern(tag);
+    header->magic = CompactHeader::kMagicValue;
+  } else {
+    auto *header = reinterpret_cast<AllocationHeader *>(raw_ptr);
+    header->magic = AllocationHeader::kMagicValue;
+    header->size = size;
+    header->actual_size = actual_size;
+
+    std::size_t len = std::min(tag.size(), sizeof(header->tag) - 1);
+    std::memcpy(header->tag, tag.data(), len);
+    header->tag[len] = '\0';
+  }
+
+  // Footer: offset back to raw_ptr.
+  if (headers.table == nullptr) {
+    *reinterpret_cast<std::uint32_t *>(user_ptr - sizeof(std::uint32_t)) =
+        static_cast<std::uint32_t>(offset_to_user);
+  }
+
+  const std::size_t end = offset_to_user + size;
+  const std::size_t zb = std::clamp(zeroed_begin, offset_to_user, end);
+  const std::size_t ze = std::clamp(zeroed_end, zb, end);
+  std::memset(user_ptr, 0, zb - offset_to_user);
+  std::memset(raw_ptr + ze, 0, end - ze);
+  return user_ptr;
+}
+
+/// @brief True if @p raw_ptr starts a live block.
+auto is_live(const std::byte *raw_ptr, HeaderFormat headers) -> bool {
+  if (headers.table != nullptr) {
+    return headers.table->find(raw_ptr).magic ==
+           BlockTable::Entry::kMagicValue;
+  }
+  if (headers.compact) {
+    return reinterpret_cast<const CompactHeader *>(raw_ptr)->magic ==
+           CompactHeader::kMagicValue;
+  }
+  return reinterpret_cast<const AllocationHeader *>(raw_ptr)->magic ==
+         AllocationHeader::kMagicValue;
+}
+
+/// @brief Mark a live block freed, so that it is not freed twice.
+void retire(std::byte *raw_ptr, HeaderFormat headers) {
+  if (headers.table != nullptr) {
+    headers.table->find(raw_ptr).magic = 0;
+  } else if (headers.compact) {
+    reinterpret_cast<CompactHeader *>(raw_ptr)->magic = 0;
+  } else {
+    reinterpret_cast<AllocationHeader *>(raw_ptr)->magic = 0;
+  }
+}
+
+/// @brief Sizes recorded in the header of a live block.
+struct BlockSizes {
+  std::size_t size;        ///< Requested user size.
+  std::size_t actual_size; ///< Full block size.
+};
+
+auto sizes_of(const std::byte *raw_ptr, HeaderFormat headers) -> BlockSizes {
+  if (headers.table != nullptr) {
+    return {headers.table->find(raw_ptr).size,
+            headers.table->actual_size(raw_ptr)};
+  }
+  if (headers.compact) {
+    const auto *header = reinterpret_cast<const CompactHeader *>(raw_ptr);
+    return {header->size(), header->actual_size()};
+  }
+  const auto *header = reinterpret_cast<const AllocationHeader *>(raw_ptr);
+  return {header->size, header->actual_size};
+}
+
+/// @brief Record new sizes in the header of a live block.
+void set_sizes(std::byte *raw_ptr, HeaderFormat headers, std::size_t size,
+               std::size_t actual_size) {
+  if (headers.table != nullptr) {
+    // A resized buddy block changes order, so its entry moves.
+    auto &old_entry = headers.table->find(raw_ptr);
+    auto entry = old_entry;
+    old_entry.magic = 0;
+    entry.size = size;
+    headers.table->bind(raw_ptr, actual_size) = entry;
+  } else if (headers.compact) {
+    reinterpret_cast<CompactHeader *>(raw_ptr)->set_sizes(actual_size, size);
+  } else {
+    auto *header = reinterpret_cast<AllocationHeader *>(raw_ptr);
+    header->size = size;
+    header->actual_size = actual_size;
+  }
+}
+
+/// @brief Tag of a live block; compact tags resolve through TagTable.
+auto tag_of(const std::byte *raw_ptr, HeaderFormat headers)
+    -> std::string_view {
+  if (headers.table != nullptr) {
+    return TagTable::global().name(headers.table->find(raw_ptr).tag_id);
+  }
+  if (headers.compact) {
+    return TagTable::global().name(
+        reinterpret_cast<const CompactHeader *>(raw_ptr)->tag_id);
+  }
+  const auto *header = reinterpret_cast<const AllocationHeader *>(raw_ptr);
+  return {header->tag, ::strnlen(header->tag, sizeof(header->tag))};
+}
+
+/// @brief TagTable id of the tag of a live block.
+auto tag_id_of(const std::byte *raw_ptr, HeaderFormat headers)
+    -> std::uint16_t {
+  if (headers.table != nullptr) {
+    return headers.table->find(raw_ptr).tag_id;
+  }
+  if (headers.compact) {
+    return reinterpret_cast<const CompactHeader *>(raw_ptr)->tag_id;
+  }
+  return TagTable::global().intern(tag_of(raw_ptr, headers));
+}
+
+/// @brief Start of the block holding @p user_ptr, found via its footer.
+auto block_start(void *user_ptr, HeaderFormat headers) -> std::byte * {
+  auto *p = static_cast<std::byte *>(user_ptr);
+  if (headers.table != nullptr) {
+    return p;
+  }
+  std::uint32_t offset_val =
+      *reinterpret_cast<std::uint32_t *>(p - sizeof(std::uint32_t));
+  return p - offset_val;
+}
+
+/// @brief Invoke @p fn(first, count, stride) for each maximal run of blocks
+/// in @p blocks whose addresses advance by a constant stride.
+template <typename Fn>
+void for_each_stride_run(std::span<const AllocationResult> blocks, Fn &&fn) {
+  std::size_t i = 0;
+  while (i < blocks.size()) {
+    std::size_t stride = blocks[i].actual_size;
+    if (i + 1 < blocks.size() && blocks[i + 1].ptr > blocks[i].ptr) {
+      stride = static_cast<std::size_t>(blocks[i + 1].ptr - blocks[i].ptr);
+    }
+    std::size_t j = i + 1;
+    while (j < blocks.size() && blocks[j].ptr == blocks[j - 1].ptr + stride) {
+      ++j;
+    }
+    fn(i, j - i, stride);
+    i = j;
+  }
+}
+
+} // namespace
+
 // ─── Impl Definition ─────────────────────────────────────────────────────
 
 struct VisualizationArena::Impl {
   Impl(ArenaConfig cfg) : config(cfg) {}
+  ~Impl();
 
   ArenaConfig config;
 
   // Global state
   std::unique_ptr<Arena> arena;
+  /// Out-of-band block headers; only for the buddy engine, whose blocks
+  /// must stay exact powers of two.
+  std::unique_ptr<BlockTable> block_table;
+
+  [[nodiscard]] auto headers() const -> HeaderFormat {
+    return {.compact = config.compact_headers, .table = block_table.get()};
+  }
   CacheAnalyzer cache_analyzer;
 
   // Sharding
   struct Shard {
-    alignas(64) std::mutex mutex;
-    std::unique_ptr<FreeListAllocator> allocator;
+    /// Biased towards the thread that keeps taking it (see BiasedMutex).
+    alignas(64) BiasedMutex mutex;
+    std::unique_ptr<AllocatorEngine> allocator;
+    /// Freed but not yet back in the allocator: parked in magazines or
+    /// queued on the remote-free list.
+    std::atomic<std::size_t> cached_bytes{0};
+    std::atomic<std::size_t> cached_blocks{0}; ///< Blocks in cached_bytes.
+    std::atomic<std::size_t> bound_threads{0}; ///< Threads homed here.
+    BlockTable *block_table = nullptr; ///< Impl::block_table.
+    /// Allocator totals for tracked events, republished on every release
+    /// of the mutex that may have changed them.
+    AllocatorTotals totals;
+
+    /// Blocks freed by threads homed on other shards, pushed without the
+    /// mutex and returned to the allocator by whoever locks it next.
+    std::atomic<ParkedBlock *> remote_head{nullptr};
+    std::atomic<std::uint64_t> remote_frees{0};
+
+    // Lock statistics, written only while holding the mutex.
+    std::atomic<std::uint64_t> acquisitions{0};
+    std::atomic<std::uint64_t> contentions{0};
+    std::atomic<std::uint64_t> wait_ns{0};
+    /// Wait and hold time histograms; null unless
+    /// ArenaConfig::lock_histograms, so that disabled costs one branch.
+    struct Timing {
+      AtomicLatencyHistogram wait;
+      AtomicLatencyHistogram hold;
+    };
+    std::unique_ptr<Timing> timing;
+
+    /// @brief The mutex as held through lock(). Publishes the totals and
+    /// records the hold time (with timing histograms) on release.
+    class Guard {
+    public:
+      Guard(Shard &shard, std::unique_lock<BiasedMutex> lock)
+          : shard_{&shard}, lock_{std::move(lock)} {
+        if (shard_->timing) {
+          acquired_ = std::chrono::steady_clock::now();
+        }
+      }
+      Guard(Guard &&) noexcept = default;
+      Guard &operator=(Guard &&) = delete;
+      ~Guard() {
+        if (!lock_.owns_lock())
+          return;
+        shard_->publish_totals();
+        if (shard_->timing) {
+          shard_->timing->hold.record(static_cast<std::uint64_t>(
+              std::chrono::duration_cast<std::chrono::nanoseconds>(
+                  std::chrono::steady_clock::now() - acquired_)
+                  .count()));
+        }
+      }
+
+    private:
+      Shard *shard_;
+      std::unique_lock<BiasedMutex> lock_;
+      std::chrono::steady_clock::time_point acquired_{};
+    };
+
+    /// @brief Lock the mutex, recording whether and how long it waited,
+    /// then drain the remote-free list.
+    auto lock() -> Guard;
+
+    /// @brief Queue the chain @p first .. @p last (linked through next) of
+    /// @p count blocks totalling @p bytes. Lock-free, any thread.
+    void push_remote(ParkedBlock *first, ParkedBlock *last, std::size_t count,
+                     std::size_t bytes);
+    /// @brief Return every queued block to the allocator. Caller holds the
+    /// mutex.
+    void drain_remote();
+    /// @brief Publish the allocator's totals. Caller holds the mutex.
+    void publish_totals() noexcept { totals.publish(*allocator); }
   };
   std::vector<std::unique_ptr<Shard>> shards;
   std::atomic<std::size_t> next_shard_idx{0};
+  std::size_t shard_stride = 0; ///< Address space per shard.
+  std::atomic<std::size_t> committed{0}; ///< Sum of shard capacities.
+
+  /// @brief Commit another chunk at the end of @p shard, enough for about
+  /// @p need bytes and at least doubling it. Caller holds the shard mutex.
+  auto grow_shard(Shard &shard, std::size_t need) -> bool;
+
+  /// @brief Current lock histograms of every shard (empty if not enabled).
+  auto lock_histograms() const -> std::vector<ShardLockHistograms>;
+
+  // Cross-shard fallback
+  std::atomic<std::size_t> fallback_attempts{0};
+  std::atomic<std::size_t> fallback_successes{0};
+  std::atomic<std::size_t> fallback_busy_skips{0};
+  std::atomic<std::uint64_t> fallback_ns{0};
+  std::atomic<std::uint64_t> fallback_max_ns{0};
+
+  std::atomic<std::size_t> rebinds{0};
+
+  /// @brief Allocate from a shard other than @p home without blocking:
+  /// shards whose lock is free are ranked by free bytes, then tried in that
+  /// order. Neighbours of @p home win ties. A shard biased towards another
+  /// thread is ranked by its published totals, so probing it costs no
+  /// revocation; only the shard finally allocated from may pay one.
+  auto fallback_allocate(const Shard *home, std::size_t total,
+                         std::size_t alignment)
+      -> std::expected<AllocationResult, AllocError>;
 
   // Server & Aggregation
   struct Batcher {
@@ -56,21 +419,102 @@ struct VisualizationArena::Impl {
   // PMR Resource
   std::unique_ptr<TrackedResource> resource;
 
+  /// Shared with every ThreadContext so that a context outliving the arena
+  /// knows not to flush its magazines into freed shards.
+  struct Lifeline {
+    std::mutex mutex;
+    bool alive = true;
+    std::atomic<std::size_t> retired_hits{0};
+    std::atomic<std::size_t> retired_misses{0};
+  };
+  std::shared_ptr<Lifeline> lifeline = std::make_shared<Lifeline>();
+
   // Control
   std::atomic<bool> running{true};
   std::size_t generation = 0;
 
+  // Purge thread wake-up
+  std::mutex purge_mutex;
+  std::condition_variable purge_cv;
+
+  // Handle table. Slots live in chunks that never move, so pin() reads
+  // them without the mutex; the mutex orders slot reuse and compaction.
+  struct HandleSlot {
+    std::atomic<std::uint32_t> state{0}; ///< Pin count, or kMoving.
+    std::atomic<void *> ptr{nullptr};    ///< User pointer (null = free slot).
+    Relocator relocate = nullptr;        ///< nullptr = memcpy.
+    std::uint32_t alignment = 0;
+    std::uint32_t next_free = 0;
+  };
+  static constexpr std::uint32_t kMoving = std::uint32_t{1} << 31;
+  static constexpr std::size_t kHandleChunk = 4096;
+  static constexpr std::size_t kMaxHandleChunks = 1024;
+  std::mutex handles_mutex;
+  std::array<std::atomic<HandleSlot *>, kMaxHandleChunks> handle_chunks{};
+  std::uint32_t handle_slots = 0; ///< Slots ever used; ids are 1..this.
+  std::uint32_t free_handles = 0; ///< First free slot id (0 = none).
+  std::atomic<std::size_t> relocations{0};
+
+  auto handle_slot(std::uint32_t id) const -> HandleSlot & {
+    return handle_chunks[(id - 1) / kHandleChunk].load(
+        std::memory_order_acquire)[(id - 1) % kHandleChunk];
+  }
+
   // Methods moved to Impl to simplify callbacks
   auto snapshot_json() const -> std::string;
   auto event_log_json() const -> std::string;
+  auto purge(std::size_t min_block) -> std::size_t;
+  /// @brief Move the unpinned handle blocks of @p shard down until none
+  /// can move any further.
+  /// @return Number of moves.
+  auto compact(Shard &shard) -> std::size_t;
+  /// @brief Move each unpinned handle block of @p shard once, lowest block
+  /// first. Caller holds handles_mutex.
+  auto compact_pass(Shard &shard) -> std::size_t;
 };
 
 // ─── ThreadContext Definition ────────────────────────────────────────────
 
 struct VisualizationArena::ThreadContext {
+  ~ThreadContext();
+
   std::size_t generation = 0;
   Impl::Shard *shard = nullptr;
   std::unique_ptr<LocalTracker> tracker;
+
+  // ─── Magazine cache ───
+  //
+  // Freed blocks of this thread's shard are parked per size class and
+  // handed out again without taking the shard mutex. Magazines refill and
+  // flush in bulk under the lock. Parked blocks keep magic = 0 and store
+  // their block size in the header's first word.
+
+  /// @brief Cached blocks of one size class, newest on top.
+  struct Magazine {
+    std::size_t count = 0;
+    std::array<std::byte *, kMaxMagazineSize> blocks{};
+  };
+  std::array<Magazine, kMagazineClasses> magazines{};
+  std::size_t magazine_size = 0; ///< Per-class capacity (0 = disabled).
+  std::atomic<std::size_t> hits{0};
+  std::atomic<std::size_t> misses{0};
+  std::shared_ptr<Impl::Lifeline> lifeline;
+
+  // ─── Rebinding ───
+  std::size_t ops = 0; ///< Allocations since the last rebind check.
+  std::uint64_t seen_acquisitions = 0; ///< Shard counters at that check.
+  std::uint64_t seen_contentions = 0;
+
+  /// @brief Take a block able to hold @p total bytes, refilling the
+  /// magazine on a miss. nullptr if the request is not cacheable or the
+  /// shard is exhausted.
+  auto magazine_pop(std::size_t total, std::size_t alignment) -> std::byte *;
+  /// @brief Park a freed block. False if it does not belong in a magazine.
+  auto magazine_push(std::byte *raw_ptr, std::size_t actual_size) -> bool;
+  /// @brief Return the @p n oldest blocks of @p mag to the shard.
+  void flush(Magazine &mag, std::size_t n);
+  /// @brief Return every parked block to the shard.
+  auto flush_all() -> bool;
 };
 
 thread_local std::shared_ptr<VisualizationArena::ThreadContext>
@@ -78,78 +522,193 @@ thread_local std::shared_ptr<VisualizationArena::ThreadContext>
 
 // ─── Impl Methods ────────────────────────────────────────────────────────
 
+auto VisualizationArena::Impl::Shard::lock() -> Guard {
+  auto bump = [](std::atomic<std::uint64_t> &counter, std::uint64_t by) {
+    counter.store(counter.load(std::memory_order_relaxed) + by,
+                  std::memory_order_relaxed);
+  };
+  std::unique_lock lock(mutex, std::try_to_lock);
+  std::uint64_t waited = 0;
+  if (!lock.owns_lock()) {
+    const auto start = std::chrono::steady_clock::now();
+    lock.lock();
+    waited = static_cast<std::uint64_t>(
+        std::chrono::duration_cast<std::chrono::nanoseconds>(
+            std::chrono::steady_clock::now() - start)
+            .count());
+    bump(contentions, 1);
+    bump(wait_ns, waited);
+  }
+  bump(acquisitions, 1);
+  if (timing) {
+    timing->wait.record(waited);
+  }
+  Guard guard{*this, std::move(lock)};
+  drain_remote();
+  return guard;
+}
+
+auto VisualizationArena::Impl::lock_histograms() const
+    -> std::vector<ShardLockHistograms> {
+  std::vector<ShardLockHistograms> out;
+  if (!config.lock_histograms)
+    return out;
+  out.reserve(shards.size());
+  for (const auto &shard : shards) {
+    out.push_back({shard->timing->wait.load(), shard->timing->hold.load()});
+  }
+  return out;
+}
+
+void VisualizationArena::Impl::Shard::push_remote(ParkedBlock *first,
+                                                  ParkedBlock *last,
+                                                  std::size_t count,
+                                                  std::size_t bytes) {
+  // Count the bytes before publishing so a drain never subtracts first.
+  cached_bytes.fetch_add(bytes, std::memory_order_relaxed);
+  cached_blocks.fetch_add(count, std::memory_order_relaxed);
+  remote_frees.fetch_add(count, std::memory_order_relaxed);
+  auto *head = remote_head.load(std::memory_order_relaxed);
+  do {
+    last->next = head;
+  } while (!remote_head.compare_exchange_weak(head, first,
+                                              std::memory_order_release,
+                                              std::memory_order_relaxed));
+}
+
+void VisualizationArena::Impl::Shard::drain_remote() {
+  // Taking the whole list at once has no ABA problem: nodes are never
+  // popped individually.
+  if (remote_head.load(std::memory_order_relaxed) == nullptr)
+    return;
+  auto *node = remote_head.exchange(nullptr, std::memory_order_acquire);
+
+  std::array<AllocationResult, kMaxMagazineSize> blocks;
+  while (node != nullptr) {
+    std::size_t n = 0;
+    std::size_t bytes = 0;
+    for (; node != nullptr && n < blocks.size(); node = node->next) {
+      auto *raw_ptr = reinterpret_cast<std::byte *>(node);
+      blocks[n++] = AllocationResult{
+          .ptr = raw_ptr,
+          .offset = static_cast<std::size_t>(raw_ptr - allocator->base()),
+          .actual_size = node->actual_size,
+      };
+      bytes += node->actual_size;
+    }
+    (void)allocator->deallocate_batch(std::span(blocks.data(), n));
+    cached_bytes.fetch_sub(bytes, std::memory_order_relaxed);
+    cached_blocks.fetch_sub(n, std::memory_order_relaxed);
+  }
+}
+
+VisualizationArena::Impl::~Impl() {
+  {
+    std::lock_guard lock(lifeline->mutex);
+    lifeline->alive = false;
+  }
+  for (auto &chunk : handle_chunks) {
+    delete[] chunk.load(std::memory_order_relaxed);
+  }
+}
+
 auto VisualizationArena::Impl::snapshot_json() const -> std::string {
   std::vector<BlockMetadata> blocks;
   std::size_t total_allocated = 0;
   std::size_t total_free = 0;
   std::size_t free_blocks = 0;
+  std::size_t largest_free = 0;
 
   for (const auto &shard : shards) {
     if (!shard)
       continue;
     std::lock_guard lock(shard->mutex);
     auto *alloc = shard->allocator.get();
+    alloc->coalesce(); // Free extents must include deferred frees.
+    shard->publish_totals();
 
-    total_allocated += alloc->bytes_allocated();
-    total_free += alloc->bytes_free();
+    auto cached = shard->cached_bytes.load(std::memory_order_relaxed);
+    total_allocated += alloc->bytes_allocated() - cached;
+    total_free += alloc->bytes_free() + cached;
     free_blocks += alloc->free_block_count();
-
-    // Walk heap
-    auto *base = alloc->base();
-    std::size_t cap = alloc->capacity();
-    std::size_t offset = 0;
-
-    while (offset + sizeof(AllocationHeader) <= cap) {
-      auto *ptr = base + offset;
-      auto *header = reinterpret_cast<AllocationHeader *>(ptr);
-      std::size_t block_size = 0;
-      bool is_allocated = false;
-
-      if (header->magic == AllocationHeader::kMagicValue) {
-        block_size = header->size;
-        is_allocated = true;
-      } else {
-        struct GenericHeader {
-          std::size_t size;
-        };
-        auto *generic = reinterpret_cast<GenericHeader *>(ptr);
-        block_size = generic->size;
-      }
-
-      if (block_size == 0 || block_size > cap || offset + block_size > cap) {
-        break;
-      }
-
-      if (is_allocated) {
-        BlockMetadata meta;
-        meta.offset = static_cast<std::size_t>(ptr - arena->base());
-        meta.actual_size = block_size;
-        meta.size = block_size > sizeof(AllocationHeader)
-                        ? block_size - sizeof(AllocationHeader)
-                        : 0;
-
-        char safe_tag[33] = {};
-        std::memcpy(safe_tag, header->tag, sizeof(header->tag));
-        safe_tag[32] = '\0';
-
-        // Sanitize tag for JSON
-        for (int i = 0; i < 32 && safe_tag[i] != '\0'; ++i) {
-          if (static_cast<unsigned char>(safe_tag[i]) < 32 ||
-              static_cast<unsigned char>(safe_tag[i]) > 126) {
-            safe_tag[i] = '?';
+    largest_free = std::max(largest_free, alloc->largest_free_block());
+
+    // Live blocks lie between free extents. Each gap is walked block by
+    // block from headers; the allocator tells where runs keep their slots
+    // and how many bytes of its own it keeps in front of each block.
+    const auto headers = this->headers();
+    const std::size_t overhead = alloc->block_overhead();
+    auto block_meta = [&](const std::byte *p) {
+      const auto sizes = sizes_of(p, headers);
+      BlockMetadata meta{};
+      meta.offset = static_cast<std::size_t>(p - arena->base());
+      meta.actual_size = sizes.actual_size;
+      meta.size = sizes.size;
+      meta.tag_id = tag_id_of(p, headers);
+      meta.order = static_cast<std::int8_t>(
+          alloc->block_order(sizes.actual_size));
+      return meta;
+    };
+    auto walk_gap = [&](std::byte *p, std::byte *end) {
+      while (p < end) {
+        if (auto run = alloc->run_layout(p); run.begin != nullptr) {
+          if (p < run.slots) {
+            p = run.slots; // Run header.
+            continue;
+          }
+          if (p >= run.slots_end) {
+            p = run.end; // Tail too small for another slot.
+            continue;
           }
+          if (is_live(p, headers)) {
+            blocks.push_back(block_meta(p));
+          }
+          p += run.slot_size;
+          continue;
         }
-
-        meta.set_tag(safe_tag);
-
-        blocks.push_back(meta);
+        p += overhead;
+        if (p >= end) {
+          break; // End-of-region sentinel.
+        }
+        std::size_t block_size = 0;
+        const auto *parked = reinterpret_cast<const ParkedBlock *>(p);
+        if (is_live(p, headers)) {
+          blocks.push_back(block_meta(p));
+          block_size = blocks.back().actual_size;
+        } else if (headers.table != nullptr) {
+          block_size = headers.table->actual_size(p); // Parked or freed.
+        } else if (parked->size == parked->actual_size) {
+          block_size = parked->size; // In a magazine or remote-free list.
+        } else {
+          block_size = sizes_of(p, headers).actual_size; // Being freed.
+        }
+        if (block_size == 0 ||
+            block_size > static_cast<std::size_t>(end - p)) {
+          break;
+        }
+        p += block_size;
       }
-      offset += block_size;
-    }
+    };
+
+    std::byte *cursor = alloc->base();
+    alloc->for_each_free_extent([&](const FreeExtent &extent) {
+      walk_gap(cursor, extent.ptr);
+      cursor = extent.ptr + extent.size;
+    });
+    walk_gap(cursor, alloc->base() + alloc->capacity());
   }
 
+  const std::size_t fragmentation =
+      total_free == 0
+          ? 0
+          : 100 - std::min(largest_free, total_free) * 100 / total_free;
   auto j = snapshot_to_json(blocks, total_allocated, total_free,
-                            arena->capacity(), 0, free_blocks);
+                            arena->capacity(), fragmentation, free_blocks);
+  j["engine"] = to_string(config.engine);
+  if (config.engine == EngineKind::Buddy) {
+    // Buddy blocks are aligned relative to their shard's base.
+    j["buddy_stride"] = shard_stride;
+  }
   return j.dump();
 }
 
@@ -181,18 +740,256 @@ auto VisualizationArena::Impl::event_log_json() const -> std::string {
   return ss.str();
 }
 
+auto VisualizationArena::Impl::grow_shard(Shard &shard, std::size_t need)
+    -> bool {
+  auto *alloc = shard.allocator.get();
+  const std::size_t current = alloc->capacity();
+  const std::size_t room = alloc->max_capacity() - current;
+  if (room == 0) {
+    return false;
+  }
+
+  // Double the shard, or more if the request alone needs it.
+  const auto ps = Arena::page_size();
+  const std::size_t chunk =
+      std::min(std::max(current, (need + ps - 1) / ps * ps), room);
+  const auto offset = static_cast<std::size_t>(
+      alloc->base() + current - arena->base());
+  if (!arena->commit(offset, chunk).has_value() || !alloc->grow(chunk)) {
+    return false;
+  }
+  committed.fetch_add(chunk, std::memory_order_relaxed);
+  return true;
+}
+
+auto VisualizationArena::Impl::fallback_allocate(const Shard *home,
+                                                 std::size_t total,
+                                                 std::size_t alignment)
+    -> std::expected<AllocationResult, AllocError> {
+  const auto start = std::chrono::steady_clock::now();
+  fallback_attempts.fetch_add(1, std::memory_order_relaxed);
+
+  const std::size_t n = shards.size();
+  const auto home_idx = static_cast<std::size_t>(
+      (home->allocator->base() - arena->base()) / shard_stride);
+
+  // 1. Probe the other shards in ring order from home.
+  std::vector<std::pair<std::size_t, Shard *>> candidates;
+  std::size_t busy = 0;
+  for (std::size_t k = 1; k < n; ++k) {
+    auto *shard = shards[(home_idx + k) % n].get();
+    std::size_t free = 0;
+    if (shard->mutex.try_lock_unbiased()) {
+      std::lock_guard lock(shard->mutex, std::adopt_lock);
+      shard->drain_remote();
+      shard->publish_totals();
+      free = shard->allocator->bytes_free();
+    } else if (shard->mutex.biased()) {
+      // Locking would revoke its owner's bias; go by the last totals.
+      free = shard->totals.load().free;
+    } else {
+      ++busy;
+      continue;
+    }
+    if (free >= total) {
+      candidates.emplace_back(free, shard);
+    }
+  }
+  std::stable_sort(candidates.begin(), candidates.end(),
+                   [](const auto &a, const auto &b) { return a.first > b.first; });
+
+  // 2. Allocate from the roomiest shard that is still free to lock.
+  std::expected<AllocationResult, AllocError> result =
+      std::unexpected(AllocError::OutOfMemory);
+  for (const auto &[free, shard] : candidates) {
+    std::unique_lock lock(shard->mutex, std::try_to_lock);
+    if (!lock.owns_lock()) {
+      ++busy;
+      continue;
+    }
+    result = shard->allocator->allocate(total, alignment);
+    shard->publish_totals();
+    if (result.has_value()) {
+      fallback_successes.fetch_add(1, std::memory_order_relaxed);
+      break;
+    }
+  }
+
+  const auto ns = static_cast<std::uint64_t>(
+      std::chrono::duration_cast<std::chrono::nanoseconds>(
+          std::chrono::steady_clock::now() - start)
+          .count());
+  fallback_busy_skips.fetch_add(busy, std::memory_order_relaxed);
+  fallback_ns.fetch_add(ns, std::memory_order_relaxed);
+  auto max = fallback_max_ns.load(std::memory_order_relaxed);
+  while (ns > max && !fallback_max_ns.compare_exchange_weak(
+                         max, ns, std::memory_order_relaxed)) {
+  }
+  return result;
+}
+
+auto VisualizationArena::Impl::purge(std::size_t min_block) -> std::size_t {
+  std::size_t released = 0;
+  for (auto &shard : shards) {
+    if (!shard)
+      continue;
+    std::lock_guard lock(shard->mutex);
+    shard->drain_remote();
+    released += shard->allocator->purge(min_block);
+    shard->publish_totals();
+  }
+  return released;
+}
+
+auto VisualizationArena::Impl::compact(Shard &shard) -> std::size_t {
+  std::lock_guard handles(handles_mutex);
+  std::size_t moved = 0;
+  while (auto n = compact_pass(shard)) {
+    moved += n;
+  }
+  return moved;
+}
+
+auto VisualizationArena::Impl::compact_pass(Shard &shard) -> std::size_t {
+  const auto headers = this->headers();
+  auto *alloc = shard.allocator.get();
+
+  // Blocks are moved in address order, each into the lowest free block
+  // below it that fits.
+  std::vector<std::pair<std::byte *, std::uint32_t>> blocks;
+  for (std::uint32_t id = 1; id <= handle_slots; ++id) {
+    auto *ptr = static_cast<std::byte *>(
+        handle_slot(id).ptr.load(std::memory_order_relaxed));
+    if (ptr != nullptr && alloc->contains(ptr)) {
+      blocks.emplace_back(block_start(ptr, headers), id);
+    }
+  }
+  std::sort(blocks.begin(), blocks.end());
+
+  // The old blocks stay allocated until the relocate events are queued, so
+  // no event about a block reusing their space can overtake them.
+  std::vector<AllocationEvent> moves;
+  std::vector<AllocationResult> vacated;
+  std::size_t vacated_bytes = 0;
+  {
+    std::lock_guard lock(shard.mutex);
+    shard.drain_remote();
+    for (const auto &[raw, id] : blocks) {
+      auto &slot = handle_slot(id);
+      std::uint32_t unpinned = 0;
+      if (!slot.state.compare_exchange_strong(unpinned, kMoving,
+                                              std::memory_order_acquire,
+                                              std::memory_order_relaxed)) {
+        continue; // Pinned.
+      }
+
+      auto *user = static_cast<std::byte *>(
+          slot.ptr.load(std::memory_order_relaxed));
+      const auto offset_to_user = static_cast<std::size_t>(user - raw);
+      const auto sizes = sizes_of(raw, headers);
+      auto result =
+          alloc->allocate_below(block_request(sizes.size, offset_to_user),
+                                slot.alignment, raw);
+      if (!result.has_value()) {
+        slot.state.store(0, std::memory_order_release);
+        continue;
+      }
+
+      // The object is copied over the whole user region; nothing to zero.
+      auto *fresh = init_block(result->ptr, offset_to_user, sizes.size,
+                               result->actual_size, tag_of(raw, headers),
+                               headers, 0, result->actual_size);
+      if (slot.relocate != nullptr) {
+        slot.relocate(fresh, user);
+      } else {
+        std::memcpy(fresh, user, sizes.size);
+      }
+      retire(raw, headers);
+      slot.ptr.store(fresh, std::memory_order_relaxed);
+      slot.state.store(0, std::memory_order_release);
+      vacated.push_back(AllocationResult{
+          .ptr = raw,
+          .offset = static_cast<std::size_t>(raw - alloc->base()),
+          .actual_size = sizes.actual_size,
+      });
+      vacated_bytes += sizes.actual_size;
+
+      BlockMetadata meta{
+          .offset = static_cast<std::size_t>(result->ptr - arena->base()),
+          .size = sizes.size,
+          .alignment = slot.alignment,
+          .actual_size = result->actual_size,
+          .timestamp = std::chrono::system_clock::now(),
+      };
+      meta.tag_id = tag_id_of(result->ptr, headers);
+      moves.push_back(AllocationEvent{
+          .type = EventType::Relocate,
+          .block = meta,
+          .event_id = relocations.fetch_add(1, std::memory_order_relaxed) + 1,
+          .total_allocated = alloc->bytes_allocated() - vacated_bytes,
+          .total_free = alloc->bytes_free() + vacated_bytes,
+          .fragmentation_pct = alloc->fragmentation_pct(),
+          .free_block_count = alloc->free_block_count(),
+          .from_offset = static_cast<std::size_t>(raw - arena->base()),
+      });
+    }
+    shard.publish_totals();
+  }
+  if (moves.empty())
+    return 0;
+
+  // Events recorded before the moves (e.g. the frees that opened the holes)
+  // go out first.
+  {
+    std::lock_guard lock(contexts_mutex);
+    std::lock_guard batch_lock(batcher->mutex);
+    for (const auto &weak_ctx : active_contexts) {
+      if (auto ctx = weak_ctx.lock()) {
+        ctx->tracker->drain_to(batcher->events);
+      }
+    }
+    batcher->events.insert(batcher->events.end(), moves.begin(), moves.end());
+  }
+
+  std::lock_guard lock(shard.mutex);
+  (void)alloc->deallocate_batch(vacated);
+  shard.publish_totals();
+  return moves.size();
+}
+
 // ─── VisualizationArena ──────────────────────────────────────────────────
 
 auto VisualizationArena::create(ArenaConfig cfg)
     -> std::expected<VisualizationArena, std::error_code> {
 
-  // Ensure total capacity is a multiple of 16 * kMaxShards for shard alignment
-  std::size_t alignment_quantum = 16 * kMaxShards;
+  // One to two shards per hardware thread unless configured; a power of two
+  // keeps every shard a multiple of 16 bytes.
+  std::size_t shard_count = cfg.shard_count;
+  if (shard_count == 0) {
+    shard_count = 2 * std::max(std::thread::hardware_concurrency(), 1u);
+  }
+  shard_count = std::bit_ceil(std::clamp<std::size_t>(shard_count, 1, kMaxShards));
+
+  // Ensure total capacity is a multiple of 16 * shard_count for shard alignment
+  std::size_t alignment_quantum = 16 * shard_count;
   std::size_t aligned_arena_size =
       (cfg.arena_size + alignment_quantum - 1) & ~(alignment_quantum - 1);
 
-  // 1. Create the mmap-backed arena.
-  auto arena_result = Arena::create(aligned_arena_size);
+  // 1. Create the mmap-backed arena. A growable arena reserves address
+  // space for max_arena_size and commits each shard's slice on demand.
+  const auto ps = Arena::page_size();
+  const bool growable = cfg.max_arena_size > aligned_arena_size;
+  if (growable && aligned_arena_size == 0) {
+    return std::unexpected(std::make_error_code(std::errc::invalid_argument));
+  }
+  const std::size_t stride =
+      growable ? (cfg.max_arena_size / shard_count + ps - 1) / ps * ps : 0;
+  auto arena_result =
+      growable
+          ? Arena::reserve(stride * shard_count)
+          : Arena::create(aligned_arena_size,
+                          ArenaOptions{.huge_pages = cfg.huge_pages,
+                                       .populate = cfg.prefault});
   if (!arena_result.has_value()) {
     return std::unexpected(arena_result.error());
   }
@@ -200,7 +997,15 @@ auto VisualizationArena::create(ArenaConfig cfg)
   // 2. Initialize Impl
   auto impl = std::make_unique<Impl>(cfg);
   impl->arena = std::make_unique<Arena>(std::move(*arena_result));
-  impl->shards.resize(kMaxShards);
+  if (cfg.engine == EngineKind::Buddy) {
+    auto table =
+        BlockTable::create(impl->arena->base(), impl->arena->capacity());
+    if (!table.has_value()) {
+      return std::unexpected(table.error());
+    }
+    impl->block_table = std::make_unique<BlockTable>(std::move(*table));
+  }
+  impl->shards.resize(shard_count);
 
   // 3. Resolve cache-line size.
   auto line_sz = (cfg.cache_line_size == 0) ? CacheAnalyzer::detect_line_size()
@@ -213,15 +1018,41 @@ auto VisualizationArena::create(ArenaConfig cfg)
   // Initialize all shards upfront to avoid races and O(1) allocation path
   std::byte *base = impl->arena->base();
   std::size_t total_cap = impl->arena->capacity();
-  std::size_t shard_size = total_cap / kMaxShards;
+  impl->shard_stride = total_cap / shard_count;
+  std::size_t shard_size =
+      growable ? std::min((aligned_arena_size / shard_count + ps - 1) / ps * ps,
+                          impl->shard_stride)
+               : impl->shard_stride;
 
-  for (std::size_t i = 0; i < kMaxShards; ++i) {
+  for (std::size_t i = 0; i < shard_count; ++i) {
     auto shard = std::make_unique<Impl::Shard>();
-    std::byte *shard_base = base + (i * shard_size);
-    shard->allocator =
-        std::make_unique<FreeListAllocator>(shard_base, shard_size);
+    shard->mutex.set_bias_enabled(cfg.biased_locking);
+    shard->block_table = impl->block_table.get();
+    if (cfg.lock_histograms) {
+      shard->timing = std::make_unique<Impl::Shard::Timing>();
+    }
+    std::byte *shard_base = base + (i * impl->shard_stride);
+    if (auto committed = impl->arena->commit(i * impl->shard_stride,
+                                             shard_size);
+        !committed.has_value()) {
+      return std::unexpected(committed.error());
+    }
+    if (cfg.engine == EngineKind::Tlsf) {
+      shard->allocator = std::make_unique<TlsfAllocator>(
+          shard_base, shard_size, impl->shard_stride);
+    } else if (cfg.engine == EngineKind::Buddy) {
+      shard->allocator = std::make_unique<BuddyAllocator>(
+          shard_base, shard_size, impl->shard_stride);
+    } else {
+      auto alloc = std::make_unique<FreeListAllocator>(
+          shard_base, shard_size, cfg.placement, impl->shard_stride);
+      alloc->set_deferred_coalescing(cfg.deferred_coalescing);
+      shard->allocator = std::move(alloc);
+    }
+    shard->publish_totals();
     impl->shards[i] = std::move(shard);
   }
+  impl->committed = shard_size * shard_count;
 
   if (cfg.enable_server) {
     impl->server = std::make_unique<WsServer>(cfg.port, cfg.web_root, nullptr);
@@ -267,10 +1098,39 @@ auto VisualizationArena::create(ArenaConfig cfg)
 
     // Batcher thread
     va.batcher_thread_ = std::thread([raw_impl]() {
+      // Tag ids below this have been announced to every session: to those
+      // connected since by their snapshot, to the rest by "tags" messages.
+      std::size_t tags_sent = TagTable::kUntagged + 1;
+      // Lock histograms as of the last "shard_stats" message.
+      const auto stats_interval = std::chrono::milliseconds(
+          std::max(raw_impl->config.shard_stats_interval_ms, std::size_t{1}));
+      auto stats_at = std::chrono::steady_clock::now();
+      auto stats_sent = raw_impl->lock_histograms();
       while (raw_impl->running) {
         std::this_thread::sleep_for(std::chrono::milliseconds(16));
 
-        // 1. Drain all TLS buffers into batcher
+        // 1. Per-shard lock activity over the last interval.
+        if (const auto now = std::chrono::steady_clock::now();
+            raw_impl->server && raw_impl->config.lock_histograms &&
+            now >= stats_at + stats_interval) {
+          auto current = raw_impl->lock_histograms();
+          std::vector<ShardLockHistograms> window;
+          window.reserve(current.size());
+          for (std::size_t i = 0; i < current.size(); ++i) {
+            window.push_back(current[i].since(stats_sent[i]));
+          }
+          const auto elapsed =
+              std::chrono::duration_cast<std::chrono::milliseconds>(
+                  now - stats_at);
+          raw_impl->server->broadcast(
+              shard_stats_to_json(window,
+                                  static_cast<std::size_t>(elapsed.count()))
+                  .dump());
+          stats_sent = std::move(current);
+          stats_at = now;
+        }
+
+        // 2. Drain all TLS buffers into batcher
         {
           std::lock_guard lock(raw_impl->contexts_mutex);
           std::lock_guard batch_lock(raw_impl->batcher->mutex);
@@ -286,7 +1146,7 @@ auto VisualizationArena::create(ArenaConfig cfg)
           }
         }
 
-        // 2. Flush batcher to server
+        // 3. Flush batcher to server
         std::vector<AllocationEvent> batch;
         {
           std::lock_guard lock(raw_impl->batcher->mutex);
@@ -296,6 +1156,12 @@ auto VisualizationArena::create(ArenaConfig cfg)
         }
 
         if (raw_impl->server) {
+          // New tag names go out before the events that refer to them.
+          auto tags = tag_dictionary(TagTable::global(), tags_sent);
+          if (!tags.empty()) {
+            raw_impl->server->broadcast(tags_to_json(std::move(tags)).dump());
+          }
+
           std::string payload = "[";
           for (size_t i = 0; i < batch.size(); ++i) {
             nlohmann::json j = batch[i];
@@ -310,12 +1176,59 @@ auto VisualizationArena::create(ArenaConfig cfg)
     });
   }
 
+  // 7. Periodically hand large free blocks back to the OS.
+  if (cfg.decommit_threshold > 0) {
+    va.purge_thread_ = std::thread([raw_impl = va.impl_.get()]() {
+      const auto interval = std::chrono::milliseconds(
+          std::max(raw_impl->config.purge_interval_ms, std::size_t{1}));
+      std::unique_lock lock(raw_impl->purge_mutex);
+      while (raw_impl->running) {
+        raw_impl->purge_cv.wait_for(lock, interval);
+        if (!raw_impl->running)
+          break;
+        lock.unlock();
+        raw_impl->purge(raw_impl->config.decommit_threshold);
+        lock.lock();
+      }
+    });
+  }
+
+  // 8. Compact shards that have gone quiet.
+  if (cfg.compact_interval_ms > 0) {
+    va.compactor_thread_ = std::thread([raw_impl = va.impl_.get()]() {
+      const auto interval =
+          std::chrono::milliseconds(raw_impl->config.compact_interval_ms);
+      std::vector<std::uint64_t> seen(raw_impl->shards.size(), 0);
+      std::unique_lock lock(raw_impl->purge_mutex);
+      while (raw_impl->running) {
+        raw_impl->purge_cv.wait_for(lock, interval);
+        if (!raw_impl->running)
+          break;
+        lock.unlock();
+        for (std::size_t i = 0; i < raw_impl->shards.size(); ++i) {
+          auto &shard = *raw_impl->shards[i];
+          const auto acquisitions =
+              shard.acquisitions.load(std::memory_order_relaxed);
+          if (acquisitions == seen[i]) {
+            raw_impl->compact(shard);
+          }
+          seen[i] = acquisitions;
+        }
+        lock.lock();
+      }
+    });
+  }
+
   return va;
 }
 
-VisualizationArena::~VisualizationArena() {
+void VisualizationArena::stop_threads() {
   if (impl_) {
-    impl_->running = false;
+    {
+      std::lock_guard lock(impl_->purge_mutex);
+      impl_->running = false;
+    }
+    impl_->purge_cv.notify_all();
     if (impl_->server) {
       impl_->server->stop();
     }
@@ -326,8 +1239,16 @@ VisualizationArena::~VisualizationArena() {
   if (server_thread_.joinable()) {
     server_thread_.join();
   }
+  if (purge_thread_.joinable()) {
+    purge_thread_.join();
+  }
+  if (compactor_thread_.joinable()) {
+    compactor_thread_.join();
+  }
 }
 
+VisualizationArena::~VisualizationArena() { stop_threads(); }
+
 VisualizationArena::VisualizationArena(VisualizationArena &&other) noexcept {
   *this = std::move(other);
 }
@@ -336,20 +1257,14 @@ VisualizationArena &
 VisualizationArena::operator=(VisualizationArena &&other) noexcept {
   if (this != &other) {
     // Stop current threads
-    if (impl_) {
-      impl_->running = false;
-      if (impl_->server)
-        impl_->server->stop();
-    }
-    if (batcher_thread_.joinable())
-      batcher_thread_.join();
-    if (server_thread_.joinable())
-      server_thread_.join();
+    stop_threads();
 
     // Move state
     impl_ = std::move(other.impl_);
     batcher_thread_ = std::move(other.batcher_thread_);
     server_thread_ = std::move(other.server_thread_);
+    purge_thread_ = std::move(other.purge_thread_);
+    compactor_thread_ = std::move(other.compactor_thread_);
 
     // Update resource back-pointer
     if (impl_ && impl_->resource) {
@@ -359,13 +1274,150 @@ VisualizationArena::operator=(VisualizationArena &&other) noexcept {
   return *this;
 }
 
+// ─── Magazine cache ──────────────────────────────────────────────────────
+
+VisualizationArena::ThreadContext::~ThreadContext() {
+  if (!lifeline)
+    return;
+  std::lock_guard lock(lifeline->mutex);
+  lifeline->retired_hits += hits.load(std::memory_order_relaxed);
+  lifeline->retired_misses += misses.load(std::memory_order_relaxed);
+  if (lifeline->alive) {
+    flush_all();
+    shard->bound_threads.fetch_sub(1, std::memory_order_relaxed);
+  }
+}
+
+auto VisualizationArena::ThreadContext::magazine_pop(std::size_t total,
+                                                     std::size_t alignment)
+    -> std::byte * {
+  if (magazine_size == 0 || alignment > kMagazineQuantum)
+    return nullptr;
+
+  auto *allocator = shard->allocator.get();
+  std::size_t block = allocator->block_size_for(total);
+  if (block > kMagazineClasses * kMagazineQuantum)
+    return nullptr;
+
+  auto &mag = magazines[block / kMagazineQuantum - 1];
+  if (mag.count != 0) {
+    hits.store(hits.load(std::memory_order_relaxed) + 1,
+               std::memory_order_relaxed);
+    auto *raw_ptr = mag.blocks[--mag.count];
+    shard->cached_bytes.fetch_sub(
+        reinterpret_cast<ParkedBlock *>(raw_ptr)->actual_size,
+        std::memory_order_relaxed);
+    shard->cached_blocks.fetch_sub(1, std::memory_order_relaxed);
+    return raw_ptr;
+  }
+
+  // Refill half a magazine, but never park more than 1/8 of the shard.
+  std::size_t want = std::min(std::max(magazine_size / 2, std::size_t{1}),
+                              allocator->capacity() / 8 / block);
+  if (want == 0)
+    return nullptr;
+  misses.store(misses.load(std::memory_order_relaxed) + 1,
+               std::memory_order_relaxed);
+
+  std::array<AllocationResult, kMaxMagazineSize> fresh;
+  std::size_t n = 0;
+  {
+    auto lock = shard->lock();
+    n = allocator->allocate_batch(block, kMagazineQuantum,
+                                  std::span(fresh.data(), want));
+  }
+  if (n == 0)
+    return nullptr;
+
+  std::size_t parked = 0;
+  for (std::size_t i = 1; i < n; ++i) {
+    park(fresh[i].ptr, fresh[i].actual_size, shard->block_table);
+    mag.blocks[mag.count++] = fresh[i].ptr;
+    parked += fresh[i].actual_size;
+  }
+  shard->cached_bytes.fetch_add(parked, std::memory_order_relaxed);
+  shard->cached_blocks.fetch_add(n - 1, std::memory_order_relaxed);
+
+  park(fresh[0].ptr, fresh[0].actual_size, shard->block_table);
+  return fresh[0].ptr;
+}
+
+auto VisualizationArena::ThreadContext::magazine_push(std::byte *raw_ptr,
+                                                      std::size_t actual_size)
+    -> bool {
+  std::size_t cls = actual_size / kMagazineQuantum;
+  if (magazine_size == 0 || cls == 0 || cls > kMagazineClasses ||
+      !shard->allocator->contains(raw_ptr)) {
+    return false;
+  }
+
+  auto &mag = magazines[cls - 1];
+  if (mag.count == magazine_size) {
+    flush(mag, std::max(magazine_size / 2, std::size_t{1}));
+  }
+
+  // First word = block size, like a free block, for heap walkers.
+  park(raw_ptr, actual_size);
+  mag.blocks[mag.count++] = raw_ptr;
+  shard->cached_bytes.fetch_add(actual_size, std::memory_order_relaxed);
+  shard->cached_blocks.fetch_add(1, std::memory_order_relaxed);
+  return true;
+}
+
+void VisualizationArena::ThreadContext::flush(Magazine &mag, std::size_t n) {
+  auto *allocator = shard->allocator.get();
+  std::array<AllocationResult, kMaxMagazineSize> blocks;
+  std::size_t bytes = 0;
+  for (std::size_t i = 0; i < n; ++i) {
+    auto *raw_ptr = mag.blocks[i];
+    std::size_t actual_size =
+        reinterpret_cast<ParkedBlock *>(raw_ptr)->actual_size;
+    blocks[i] = AllocationResult{
+        .ptr = raw_ptr,
+        .offset = static_cast<std::size_t>(raw_ptr - allocator->base()),
+        .actual_size = actual_size,
+    };
+    bytes += actual_size;
+  }
+  std::copy(mag.blocks.begin() + n, mag.blocks.begin() + mag.count,
+            mag.blocks.begin());
+  mag.count -= n;
+
+  shard->cached_bytes.fetch_sub(bytes, std::memory_order_relaxed);
+  shard->cached_blocks.fetch_sub(n, std::memory_order_relaxed);
+  auto lock = shard->lock();
+  (void)allocator->deallocate_batch(std::span(blocks.data(), n));
+}
+
+auto VisualizationArena::ThreadContext::flush_all() -> bool {
+  bool flushed = false;
+  for (auto &mag : magazines) {
+    if (mag.count != 0) {
+      flush(mag, mag.count);
+      flushed = true;
+    }
+  }
+  return flushed;
+}
+
 // ─── TLS Init ────────────────────────────────────────────────────────────
 
 void VisualizationArena::init_tls_context() {
-  auto idx = impl_->next_shard_idx.fetch_add(1);
-  if (idx >= kMaxShards) {
-    // Wrap around or handle overflow
-    idx = idx % kMaxShards;
+  const std::size_t n = impl_->shards.size();
+  auto idx = impl_->next_shard_idx.fetch_add(1) % n;
+
+  // Prefer the shard with the fewest threads, scanning from the round-robin
+  // position so ties still spread out.
+  if (impl_->config.rebind_threads) {
+    std::size_t best = impl_->shards[idx]->bound_threads.load();
+    for (std::size_t k = 1; k < n && best != 0; ++k) {
+      std::size_t i = (idx + k) % n;
+      std::size_t load = impl_->shards[i]->bound_threads.load();
+      if (load < best) {
+        best = load;
+        idx = i;
+      }
+    }
   }
 
   if (!impl_->shards[idx]) {
@@ -376,9 +1428,16 @@ void VisualizationArena::init_tls_context() {
   tls_context_ = std::make_shared<ThreadContext>();
   tls_context_->generation = impl_->generation;
   tls_context_->shard = impl_->shards[idx].get();
+  tls_context_->shard->bound_threads.fetch_add(1, std::memory_order_relaxed);
+  tls_context_->seen_acquisitions = tls_context_->shard->acquisitions.load();
+  tls_context_->seen_contentions = tls_context_->shard->contentions.load();
 
   tls_context_->tracker = std::make_unique<LocalTracker>(
-      *tls_context_->shard->allocator, impl_->config.sampling);
+      *tls_context_->shard->allocator, tls_context_->shard->totals,
+      impl_->config.sampling);
+  tls_context_->magazine_size =
+      std::min(impl_->config.magazine_size, kMaxMagazineSize);
+  tls_context_->lifeline = impl_->lifeline;
 
   {
     std::lock_guard lock(impl_->contexts_mutex);
@@ -387,15 +1446,60 @@ void VisualizationArena::init_tls_context() {
   }
 }
 
+void VisualizationArena::maybe_rebind() {
+  auto *ctx = tls_context_.get();
+  if (++ctx->ops < kRebindInterval)
+    return;
+  ctx->ops = 0;
+
+  auto *home = ctx->shard;
+  const auto acquisitions = home->acquisitions.load(std::memory_order_relaxed);
+  const auto contentions = home->contentions.load(std::memory_order_relaxed);
+  const auto acquired = acquisitions - ctx->seen_acquisitions;
+  const auto waited = contentions - ctx->seen_contentions;
+  ctx->seen_acquisitions = acquisitions;
+  ctx->seen_contentions = contentions;
+  if (waited * kRebindContention <= acquired)
+    return;
+
+  // Move only if that leaves both shards less loaded than home is now.
+  Impl::Shard *target = nullptr;
+  std::size_t target_load = home->bound_threads.load() - 1;
+  for (const auto &shard : impl_->shards) {
+    std::size_t load = shard->bound_threads.load();
+    if (load < target_load) {
+      target = shard.get();
+      target_load = load;
+    }
+  }
+  if (target == nullptr)
+    return;
+
+  // Parked blocks belong to the old shard.
+  ctx->flush_all();
+  home->bound_threads.fetch_sub(1, std::memory_order_relaxed);
+  target->bound_threads.fetch_add(1, std::memory_order_relaxed);
+  ctx->shard = target;
+  ctx->tracker->rebind(*target->allocator, target->totals);
+  ctx->seen_acquisitions = target->acquisitions.load();
+  ctx->seen_contentions = target->contentions.load();
+  impl_->rebinds.fetch_add(1, std::memory_order_relaxed);
+}
+
+auto VisualizationArena::is_home_shard(const void *shard) const -> bool {
+  return tls_context_ && tls_context_->generation == impl_->generation &&
+         tls_context_->shard == shard;
+}
+
 auto VisualizationArena::get_shard_idx(void *ptr) const -> std::size_t {
+  const std::size_t n = impl_->shards.size();
   auto *base = impl_->arena->base();
   if (ptr < base || ptr >= base + impl_->arena->capacity()) {
-    return kMaxShards; // Out of bounds
+    return n; // Out of bounds
   }
   auto offset = static_cast<std::size_t>(static_cast<std::byte *>(ptr) - base);
-  std::size_t shard_size = impl_->arena->capacity() / kMaxShards;
-  std::size_t idx = offset / shard_size;
-  return (idx >= kMaxShards) ? (kMaxShards - 1) : idx;
+  std::size_t idx = offset / impl_->shard_stride;
+  return (idx >= n) ? (n - 1) : idx;
 }
 
 // ─── Raw allocation ──────────────────────────────────────────────────────
@@ -408,42 +1512,66 @@ auto VisualizationArena::alloc_raw(std::size_t size, std::size_t alignment,
   if (!tls_context_)
     return nullptr;
 
-  auto *allocator = tls_context_->shard->allocator.get();
+  if (impl_->config.rebind_threads) {
+    maybe_rebind();
+  }
 
-  std::size_t header_size = sizeof(AllocationHeader);
-  std::size_t footer_size = sizeof(std::uint32_t);
-  std::size_t base_overhead = header_size + footer_size;
-  std::size_t padding = 0;
+  auto *ctx = tls_context_.get();
+  auto *allocator = ctx->shard->allocator.get();
 
-  if (alignment > 0) {
-    std::size_t remainder = base_overhead % alignment;
-    if (remainder != 0) {
-      padding = alignment - remainder;
-    }
-  }
+  std::size_t offset_to_user = user_offset(alignment, impl_->headers());
+  std::size_t total_request = block_request(size, offset_to_user);
 
-  std::size_t offset_to_user = base_overhead + padding;
-  std::size_t total_request = size + offset_to_user;
+  // Fast path: a block from this thread's magazine, no lock taken.
+  std::byte *raw_ptr = ctx->magazine_pop(total_request, alignment);
+  if (raw_ptr != nullptr) {
+    return finish_alloc(
+        raw_ptr, reinterpret_cast<ParkedBlock *>(raw_ptr)->actual_size,
+        offset_to_user, size, alignment, tag);
+  }
 
-  std::lock_guard lock(tls_context_->shard->mutex);
-  auto result = allocator->allocate(total_request, alignment);
+  auto result = [&] {
+    auto lock = ctx->shard->lock();
+    return allocator->allocate(total_request, alignment);
+  }();
+  // Blocks parked in magazines may be what is missing.
+  if (!result.has_value() && ctx->flush_all()) {
+    auto lock = ctx->shard->lock();
+    result = allocator->allocate(total_request, alignment);
+  }
+  // Otherwise commit more of the shard's reserved slice. A buddy engine may
+  // need several doublings before an aligned block of the order is free.
+  if (!result.has_value()) {
+    auto lock = ctx->shard->lock();
+    while (!result.has_value() &&
+           impl_->grow_shard(*ctx->shard, total_request + alignment)) {
+      result = allocator->allocate(total_request, alignment);
+    }
+  }
+  // As a last resort, borrow from another shard.
+  bool borrowed = false;
+  if (!result.has_value() && impl_->config.cross_shard_fallback) {
+    result = impl_->fallback_allocate(ctx->shard, total_request, alignment);
+    borrowed = result.has_value();
+  }
 
   if (!result.has_value()) {
     return nullptr;
   }
 
-  std::byte *raw_ptr = result->ptr;
-  if (raw_ptr) {
+  raw_ptr = result->ptr;
+  if (raw_ptr && !borrowed) {
     auto actual_shard_idx = get_shard_idx(raw_ptr);
     // Find matching shard
-    std::size_t expected_shard_idx = kMaxShards;
-    for (std::size_t i = 0; i < kMaxShards; ++i) {
+    const std::size_t n = impl_->shards.size();
+    std::size_t expected_shard_idx = n;
+    for (std::size_t i = 0; i < n; ++i) {
       if (impl_->shards[i].get() == tls_context_->shard) {
         expected_shard_idx = i;
         break;
       }
     }
-    if (expected_shard_idx != kMaxShards &&
+    if (expected_shard_idx != n &&
         actual_shard_idx != expected_shard_idx) {
       std::fprintf(
           stderr,
@@ -453,30 +1581,24 @@ auto VisualizationArena::alloc_raw(std::size_t size, std::size_t alignment,
     }
   }
 
-  std::byte *user_ptr = raw_ptr + offset_to_user;
-
-  // Write header
-  auto *header = reinterpret_cast<AllocationHeader *>(raw_ptr);
-  header->magic = AllocationHeader::kMagicValue;
-  header->size = size;
-  header->actual_size = result->actual_size;
-
-  std::size_t len = std::min(tag.size(), sizeof(header->tag) - 1);
-  std::memcpy(header->tag, tag.data(), len);
-  header->tag[len] = '\0';
-
-  // Write footer (offset to raw_ptr)
-  *reinterpret_cast<std::uint32_t *>(user_ptr - sizeof(std::uint32_t)) =
-      static_cast<std::uint32_t>(offset_to_user);
+  return finish_alloc(raw_ptr, result->actual_size, offset_to_user, size,
+                      alignment, tag, result->zeroed_begin,
+                      result->zeroed_end);
+}
 
-  // Initialize user memory
-  std::memset(user_ptr, 0, size);
+auto VisualizationArena::finish_alloc(
+    std::byte *raw_ptr, std::size_t actual_size, std::size_t offset_to_user,
+    std::size_t size, std::size_t alignment, std::string_view tag,
+    std::size_t zeroed_begin, std::size_t zeroed_end) -> void * {
+  std::byte *user_ptr =
+      init_block(raw_ptr, offset_to_user, size, actual_size, tag,
+                 impl_->headers(), zeroed_begin, zeroed_end);
 
   BlockMetadata meta{
-      .offset = result->offset,
+      .offset = static_cast<std::size_t>(raw_ptr - impl_->arena->base()),
       .size = size,
       .alignment = alignment,
-      .actual_size = result->actual_size,
+      .actual_size = actual_size,
       .timestamp = std::chrono::system_clock::now(),
   };
   meta.set_tag(tag);
@@ -489,34 +1611,32 @@ void VisualizationArena::dealloc_raw(void *ptr, std::size_t size) {
   if (ptr == nullptr)
     return;
 
-  // AllocationHeader is at the start of the block.
-  // We need to find it. How? VisualizationArena assumes alignment and overhead.
-  // Actually, VisualizationArena KNOWS how it allocated.
-  // Base overhead is header + footer (offset).
-  std::size_t base_overhead = sizeof(AllocationHeader) + sizeof(std::uint32_t);
-
-  // Actually, we can just use the footer to find the start of the block!
-  std::byte *user_ptr = static_cast<std::byte *>(ptr);
-  std::uint32_t offset_val =
-      *reinterpret_cast<std::uint32_t *>(user_ptr - sizeof(std::uint32_t));
-  std::byte *raw_ptr = user_ptr - offset_val;
-  auto *header = reinterpret_cast<AllocationHeader *>(raw_ptr);
+  // The header is at the start of the block; the footer just before the
+  // user pointer records how far back that is. Buddy blocks keep theirs in
+  // the block table.
+  const auto headers = impl_->headers();
+  std::byte *raw_ptr = block_start(ptr, headers);
 
-  if (header->magic != AllocationHeader::kMagicValue) {
+  if (!is_live(raw_ptr, headers)) {
     return; // Safety check or double free
   }
 
-  header->magic = 0; // Invalidate to prevent double free
-
-  std::size_t actual_size = header->actual_size;
+  std::size_t actual_size = sizes_of(raw_ptr, headers).actual_size;
+  retire(raw_ptr, headers); // Invalidate to prevent double free
 
   if (tls_context_) {
     auto offset = static_cast<std::size_t>(raw_ptr - impl_->arena->base());
     tls_context_->tracker->record_dealloc(offset, actual_size);
+
+    // Fast path: park the block in this thread's magazine, no lock taken.
+    if (tls_context_->generation == impl_->generation &&
+        tls_context_->magazine_push(raw_ptr, actual_size)) {
+      return;
+    }
   }
 
   std::size_t idx = get_shard_idx(raw_ptr);
-  if (idx >= kMaxShards || !impl_->shards[idx]) {
+  if (idx >= impl_->shards.size() || !impl_->shards[idx]) {
     return;
   }
 
@@ -527,7 +1647,7 @@ void VisualizationArena::dealloc_raw(void *ptr, std::size_t size) {
                  "WARNING: Shard hint %zu wrong for ptr %p. Searching...\n",
                  idx, (void *)raw_ptr);
     shard = nullptr;
-    for (std::size_t i = 0; i < kMaxShards; ++i) {
+    for (std::size_t i = 0; i < impl_->shards.size(); ++i) {
       if (impl_->shards[i] && impl_->shards[i]->allocator->contains(raw_ptr)) {
         shard = impl_->shards[i].get();
         idx = i;
@@ -541,10 +1661,237 @@ void VisualizationArena::dealloc_raw(void *ptr, std::size_t size) {
     std::abort();
   }
 
-  std::lock_guard lock(shard->mutex);
+  // A block of another thread's shard goes on that shard's remote-free
+  // list rather than contending for its lock.
+  if (impl_->config.remote_free && !is_home_shard(shard)) {
+    auto *node = park(raw_ptr, actual_size);
+    shard->push_remote(node, node, 1, actual_size);
+    return;
+  }
+
+  auto lock = shard->lock();
   (void)shard->allocator->deallocate(raw_ptr, actual_size);
 }
 
+auto VisualizationArena::realloc_raw(void *ptr, std::size_t new_size,
+                                     std::size_t alignment,
+                                     std::string_view tag) -> void * {
+  if (ptr == nullptr)
+    return alloc_raw(new_size, alignment, tag);
+  if (new_size == 0) {
+    dealloc_raw(ptr, 0);
+    return nullptr;
+  }
+
+  const auto headers = impl_->headers();
+  std::byte *raw_ptr = block_start(ptr, headers);
+  if (!is_live(raw_ptr, headers))
+    return nullptr;
+
+  if (!tls_context_ || tls_context_->generation != impl_->generation) {
+    init_tls_context();
+  }
+  if (!tls_context_)
+    return nullptr;
+
+  const auto offset_to_user =
+      static_cast<std::size_t>(static_cast<std::byte *>(ptr) - raw_ptr);
+  const auto [old_size, old_actual_size] = sizes_of(raw_ptr, headers);
+
+  std::size_t idx = get_shard_idx(raw_ptr);
+  if (idx < impl_->shards.size() && impl_->shards[idx]) {
+    auto *shard = impl_->shards[idx].get();
+    auto resized = [&] {
+      auto lock = shard->lock();
+      return shard->allocator->try_extend(raw_ptr, old_actual_size,
+                                          offset_to_user + new_size);
+    }();
+    if (resized.has_value()) {
+      // Zero the user bytes gained, except those known to be zero.
+      const std::size_t begin = offset_to_user + old_size;
+      const std::size_t end = offset_to_user + new_size;
+      if (end > begin) {
+        const std::size_t zb = std::clamp(resized->zeroed_begin, begin, end);
+        const std::size_t ze = std::clamp(resized->zeroed_end, zb, end);
+        std::memset(raw_ptr + begin, 0, zb - begin);
+        std::memset(raw_ptr + ze, 0, end - ze);
+      }
+      set_sizes(raw_ptr, headers, new_size, resized->actual_size);
+
+      BlockMetadata meta{
+          .offset = static_cast<std::size_t>(raw_ptr - impl_->arena->base()),
+          .size = new_size,
+          .alignment = alignment,
+          .actual_size = resized->actual_size,
+          .timestamp = std::chrono::system_clock::now(),
+      };
+      meta.tag_id = tag_id_of(raw_ptr, headers);
+      tls_context_->tracker->record_resize(std::move(meta));
+      return ptr;
+    }
+  }
+
+  // No room behind the block: move it.
+  void *moved = alloc_raw(new_size, alignment, tag_of(raw_ptr, headers));
+  if (moved == nullptr)
+    return nullptr;
+  std::memcpy(moved, ptr, std::min(old_size, new_size));
+  dealloc_raw(ptr, old_size);
+  return moved;
+}
+
+auto VisualizationArena::alloc_batch(std::size_t count, std::size_t size,
+                                     std::size_t alignment,
+                                     std::string_view tag, void **out)
+    -> std::size_t {
+  std::fill_n(out, count, nullptr);
+  if (count == 0)
+    return 0;
+
+  if (!tls_context_ || tls_context_->generation != impl_->generation) {
+    init_tls_context();
+  }
+  if (!tls_context_)
+    return 0;
+
+  auto *shard = tls_context_->shard;
+  const auto headers = impl_->headers();
+  std::size_t offset_to_user = user_offset(alignment, headers);
+  std::size_t request = block_request(size, offset_to_user);
+  std::vector<AllocationResult> results(count);
+
+  auto lock = shard->lock();
+  std::size_t n =
+      shard->allocator->allocate_batch(request, alignment, results);
+  while (n < count &&
+         impl_->grow_shard(*shard, (count - n) * (request + alignment))) {
+    n += shard->allocator->allocate_batch(request, alignment,
+                                          std::span(results).subspan(n));
+  }
+  results.resize(n);
+
+  for (std::size_t i = 0; i < n; ++i) {
+    out[i] = init_block(results[i].ptr, offset_to_user, size,
+                        results[i].actual_size, tag, headers,
+                        results[i].zeroed_begin, results[i].zeroed_end);
+  }
+
+  auto *arena_base = impl_->arena->base();
+  auto now = std::chrono::system_clock::now();
+  for_each_stride_run(results, [&](std::size_t first, std::size_t run,
+                                   std::size_t stride) {
+    BlockMetadata meta{
+        .offset = static_cast<std::size_t>(results[first].ptr - arena_base),
+        .size = size,
+        .alignment = alignment,
+        .actual_size = results[first].actual_size,
+        .timestamp = now,
+    };
+    meta.set_tag(tag);
+    tls_context_->tracker->record_alloc_batch(std::move(meta), run, stride);
+  });
+
+  return n;
+}
+
+void VisualizationArena::dealloc_batch(std::span<void *const> ptrs) {
+  auto *arena_base = impl_->arena->base();
+  const auto headers = impl_->headers();
+
+  std::vector<AllocationResult> blocks;
+  blocks.reserve(ptrs.size());
+  for (void *ptr : ptrs) {
+    if (ptr == nullptr)
+      continue;
+    std::byte *raw_ptr = block_start(ptr, headers);
+    if (!is_live(raw_ptr, headers))
+      continue; // Double free within or across batches.
+    blocks.push_back(AllocationResult{
+        .ptr = raw_ptr,
+        .offset = static_cast<std::size_t>(raw_ptr - arena_base),
+        .actual_size = sizes_of(raw_ptr, headers).actual_size,
+    });
+    retire(raw_ptr, headers);
+  }
+
+  // Shards partition the arena in address order, so after sorting each
+  // shard's blocks form one contiguous slice.
+  std::sort(blocks.begin(), blocks.end(),
+            [](const AllocationResult &a, const AllocationResult &b) {
+              return a.ptr < b.ptr;
+            });
+
+  bool track = tls_context_ && tls_context_->generation == impl_->generation;
+  auto first = blocks.begin();
+  while (first != blocks.end()) {
+    std::size_t idx = get_shard_idx(first->ptr);
+    auto last = std::find_if(first, blocks.end(), [&](const auto &b) {
+      return get_shard_idx(b.ptr) != idx;
+    });
+    std::span<AllocationResult> group(first, last);
+    first = last;
+    if (idx >= impl_->shards.size() || !impl_->shards[idx])
+      continue;
+
+    auto *shard = impl_->shards[idx].get();
+    if (impl_->config.remote_free && !is_home_shard(shard)) {
+      std::size_t bytes = 0;
+      for (std::size_t i = 0; i < group.size(); ++i) {
+        auto *node = park(group[i].ptr, group[i].actual_size);
+        node->next = i + 1 < group.size()
+                         ? reinterpret_cast<ParkedBlock *>(group[i + 1].ptr)
+                         : nullptr;
+        bytes += group[i].actual_size;
+      }
+      shard->push_remote(reinterpret_cast<ParkedBlock *>(group.front().ptr),
+                         reinterpret_cast<ParkedBlock *>(group.back().ptr),
+                         group.size(), bytes);
+    } else {
+      auto lock = shard->lock();
+      (void)shard->allocator->deallocate_batch(group);
+    }
+    if (track) {
+      for_each_stride_run(group, [&](std::size_t i, std::size_t run,
+                                     std::size_t stride) {
+        tls_context_->tracker->record_dealloc_batch(
+            group[i].offset, group[i].actual_size, run, stride);
+      });
+    }
+  }
+}
+
+// ─── Regions ─────────────────────────────────────────────────────────────
+
+auto VisualizationArena::make_region(std::size_t size, std::string_view tag)
+    -> Region {
+  auto *base = static_cast<std::byte *>(
+      alloc_raw(size, alignof(std::max_align_t), tag));
+  if (base == nullptr)
+    return {};
+  return Region{this, base, size};
+}
+
+void VisualizationArena::record_fill(void *user_ptr, std::size_t used) {
+  if (!tls_context_ || tls_context_->generation != impl_->generation) {
+    init_tls_context();
+  }
+  if (!tls_context_)
+    return;
+
+  const auto headers = impl_->headers();
+  std::byte *raw_ptr = block_start(user_ptr, headers);
+  const auto [size, actual_size] = sizes_of(raw_ptr, headers);
+  BlockMetadata meta{
+      .offset = static_cast<std::size_t>(raw_ptr - impl_->arena->base()),
+      .size = size,
+      .alignment = alignof(std::max_align_t),
+      .actual_size = actual_size,
+      .timestamp = std::chrono::system_clock::now(),
+  };
+  meta.tag_id = tag_id_of(raw_ptr, headers);
+  tls_context_->tracker->record_fill(std::move(meta), used);
+}
+
 // ─── PMR interop ─────────────────────────────────────────────────────────
 
 auto VisualizationArena::resource() noexcept -> std::pmr::memory_resource * {
@@ -575,6 +1922,10 @@ void VisualizationArena::set_command_handler(
 // ─── Accessors ───────────────────────────────────────────────────────────
 
 auto VisualizationArena::capacity() const noexcept -> std::size_t {
+  return impl_ ? impl_->committed.load(std::memory_order_relaxed) : 0;
+}
+
+auto VisualizationArena::max_capacity() const noexcept -> std::size_t {
   return impl_ && impl_->arena ? impl_->arena->capacity() : 0;
 }
 
@@ -582,10 +1933,14 @@ auto VisualizationArena::bytes_allocated() const noexcept -> std::size_t {
   if (!impl_)
     return 0;
   std::size_t sum = 0;
+  std::size_t cached = 0;
   for (const auto &s : impl_->shards)
-    if (s)
+    if (s) {
       sum += s->allocator->bytes_allocated();
-  return sum;
+      cached += s->cached_bytes.load(std::memory_order_relaxed);
+    }
+  // Blocks parked in magazines count as free.
+  return sum > cached ? sum - cached : 0;
 }
 
 auto VisualizationArena::bytes_free() const noexcept -> std::size_t {
@@ -594,18 +1949,212 @@ auto VisualizationArena::bytes_free() const noexcept -> std::size_t {
   std::size_t sum = 0;
   for (const auto &s : impl_->shards)
     if (s)
-      sum += s->allocator->bytes_free();
+      sum += s->allocator->bytes_free() +
+             s->cached_bytes.load(std::memory_order_relaxed);
   return sum;
 }
 
 auto VisualizationArena::active_block_count() const noexcept -> std::size_t {
-  return 0;
+  if (!impl_)
+    return 0;
+  std::size_t sum = 0;
+  std::size_t cached = 0;
+  for (const auto &s : impl_->shards)
+    if (s) {
+      sum += s->allocator->live_block_count();
+      cached += s->cached_blocks.load(std::memory_order_relaxed);
+    }
+  // Blocks parked in magazines or queued for remote free are not live.
+  return sum > cached ? sum - cached : 0;
+}
+
+auto VisualizationArena::largest_free_block() const -> std::size_t {
+  if (!impl_)
+    return 0;
+  std::size_t largest = 0;
+  for (const auto &s : impl_->shards)
+    if (s) {
+      std::lock_guard lock(s->mutex);
+      s->allocator->coalesce();
+      s->publish_totals();
+      largest = std::max(largest, s->allocator->largest_free_block());
+    }
+  return largest;
+}
+
+auto VisualizationArena::fragmentation_pct() const -> std::size_t {
+  const std::size_t free = bytes_free();
+  if (free == 0)
+    return 0;
+  return 100 - std::min(largest_free_block(), free) * 100 / free;
+}
+
+auto VisualizationArena::magazine_stats() const -> MagazineStats {
+  if (!impl_)
+    return {};
+  MagazineStats stats{
+      .hits = impl_->lifeline->retired_hits.load(),
+      .misses = impl_->lifeline->retired_misses.load(),
+  };
+  std::lock_guard lock(const_cast<std::mutex &>(impl_->contexts_mutex));
+  for (const auto &weak_ctx : impl_->active_contexts) {
+    if (auto ctx = weak_ctx.lock()) {
+      stats.hits += ctx->hits.load(std::memory_order_relaxed);
+      stats.misses += ctx->misses.load(std::memory_order_relaxed);
+    }
+  }
+  return stats;
+}
+
+auto VisualizationArena::shard_count() const noexcept -> std::size_t {
+  return impl_ ? impl_->shards.size() : 0;
+}
+
+auto VisualizationArena::shard_stats() const -> std::vector<ShardStats> {
+  std::vector<ShardStats> stats;
+  if (!impl_)
+    return stats;
+  stats.reserve(impl_->shards.size());
+  for (const auto &shard : impl_->shards) {
+    stats.push_back(ShardStats{
+        .threads = shard->bound_threads.load(std::memory_order_relaxed),
+        .acquisitions = shard->acquisitions.load(std::memory_order_relaxed),
+        .contentions = shard->contentions.load(std::memory_order_relaxed),
+        .wait_ns = shard->wait_ns.load(std::memory_order_relaxed),
+        .remote_frees = shard->remote_frees.load(std::memory_order_relaxed),
+        .biased_acquisitions = shard->mutex.fast_acquisitions(),
+        .bias_revocations = shard->mutex.revocations(),
+    });
+  }
+  return stats;
+}
+
+auto VisualizationArena::shard_lock_histograms() const
+    -> std::vector<ShardLockHistograms> {
+  return impl_ ? impl_->lock_histograms() : std::vector<ShardLockHistograms>{};
+}
+
+auto VisualizationArena::thread_rebinds() const noexcept -> std::size_t {
+  return impl_ ? impl_->rebinds.load(std::memory_order_relaxed) : 0;
+}
+
+auto VisualizationArena::purge() -> std::size_t {
+  if (!impl_)
+    return 0;
+  auto threshold = impl_->config.decommit_threshold;
+  return impl_->purge(threshold > 0 ? threshold : Arena::page_size());
+}
+
+auto VisualizationArena::compact() -> std::size_t {
+  if (!impl_)
+    return 0;
+  std::size_t moved = 0;
+  for (auto &shard : impl_->shards) {
+    moved += impl_->compact(*shard);
+  }
+  return moved;
+}
+
+// ─── Handle table ────────────────────────────────────────────────────────
+
+auto VisualizationArena::register_handle(void *ptr, std::size_t alignment,
+                                         Relocator relocate) -> std::uint32_t {
+  std::lock_guard lock(impl_->handles_mutex);
+  std::uint32_t id = impl_->free_handles;
+  if (id != 0) {
+    impl_->free_handles = impl_->handle_slot(id).next_free;
+  } else {
+    if (impl_->handle_slots == Impl::kHandleChunk * Impl::kMaxHandleChunks)
+      return 0;
+    id = ++impl_->handle_slots;
+    auto &chunk = impl_->handle_chunks[(id - 1) / Impl::kHandleChunk];
+    if (chunk.load(std::memory_order_relaxed) == nullptr) {
+      chunk.store(new Impl::HandleSlot[Impl::kHandleChunk],
+                  std::memory_order_release);
+    }
+  }
+  auto &slot = impl_->handle_slot(id);
+  slot.relocate = relocate;
+  slot.alignment = static_cast<std::uint32_t>(alignment);
+  slot.state.store(0, std::memory_order_relaxed);
+  slot.ptr.store(ptr, std::memory_order_release);
+  return id;
+}
+
+auto VisualizationArena::pin_handle(std::uint32_t id) -> void * {
+  if (id == 0)
+    return nullptr;
+  auto &slot = impl_->handle_slot(id);
+  auto state = slot.state.load(std::memory_order_relaxed);
+  while (true) {
+    if ((state & Impl::kMoving) != 0) {
+      std::this_thread::yield(); // The compactor is copying the object.
+      state = slot.state.load(std::memory_order_relaxed);
+    } else if (slot.state.compare_exchange_weak(state, state + 1,
+                                                std::memory_order_acquire,
+                                                std::memory_order_relaxed)) {
+      break;
+    }
+  }
+  return slot.ptr.load(std::memory_order_relaxed);
+}
+
+void VisualizationArena::unpin_handle(std::uint32_t id) {
+  if (id != 0) {
+    impl_->handle_slot(id).state.fetch_sub(1, std::memory_order_release);
+  }
+}
+
+void VisualizationArena::release_handle(std::uint32_t id, std::size_t size) {
+  void *ptr = nullptr;
+  {
+    std::lock_guard lock(impl_->handles_mutex);
+    auto &slot = impl_->handle_slot(id);
+    ptr = slot.ptr.exchange(nullptr, std::memory_order_relaxed);
+    slot.state.store(0, std::memory_order_relaxed);
+    slot.next_free = impl_->free_handles;
+    impl_->free_handles = id;
+  }
+  dealloc_raw(ptr, size);
+}
+
+auto VisualizationArena::shard_memory() const -> std::vector<ShardMemoryStats> {
+  std::vector<ShardMemoryStats> stats;
+  if (!impl_)
+    return stats;
+  stats.reserve(impl_->shards.size());
+  for (const auto &shard : impl_->shards) {
+    if (!shard)
+      continue;
+    std::lock_guard lock(shard->mutex);
+    stats.push_back(ShardMemoryStats{
+        .committed = shard->allocator->committed_bytes(),
+        .resident = shard->allocator->resident_bytes(),
+    });
+  }
+  return stats;
+}
+
+auto VisualizationArena::fallback_stats() const -> FallbackStats {
+  if (!impl_)
+    return {};
+  return FallbackStats{
+      .attempts = impl_->fallback_attempts.load(std::memory_order_relaxed),
+      .successes = impl_->fallback_successes.load(std::memory_order_relaxed),
+      .busy_skips = impl_->fallback_busy_skips.load(std::memory_order_relaxed),
+      .total_ns = impl_->fallback_ns.load(std::memory_order_relaxed),
+      .max_ns = impl_->fallback_max_ns.load(std::memory_order_relaxed),
+  };
 }
 
 auto VisualizationArena::cache_line_size() const noexcept -> std::size_t {
   return impl_ ? impl_->cache_analyzer.line_size() : 0;
 }
 
+auto VisualizationArena::mapped_page_size() const noexcept -> std::size_t {
+  return impl_ && impl_->arena ? impl_->arena->mapped_page_size() : 0;
+}
+
 auto VisualizationArena::base() const noexcept -> std::byte * {
   return impl_ && impl_->arena ? impl_->arena->base() : nullptr;
 }
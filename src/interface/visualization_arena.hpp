@@ -15,23 +15,30 @@
 /// @endcode
 
 #include "allocator/arena.hpp"
+#include "allocator/buddy.hpp"
 #include "allocator/free_list.hpp"
+#include "allocator/tlsf.hpp"
 #include "allocator/tracked_resource.hpp"
 #include "interface/cache_analyzer.hpp"
+#include "interface/lock_histogram.hpp"
 #include "interface/padding_inspector.hpp"
+#include "interface/region.hpp"
 #include "tracker/tracker.hpp"
 
 #include <atomic>
 #include <cstddef>
+#include <cstdint>
 #include <expected>
 #include <functional>
 #include <memory>
 #include <memory_resource>
 #include <mutex>
+#include <span>
 #include <string>
 #include <string_view>
 #include <system_error>
 #include <thread>
+#include <type_traits>
 #include <utility>
 #include <vector>
 
@@ -39,6 +46,7 @@ namespace mmap_viz {
 
 // Forward-declare WsServer to keep the header lightweight.
 class WsServer;
+template <typename T> class ObjectPool;
 
 /// @brief Configuration for VisualizationArena construction.
 struct ArenaConfig {
@@ -48,6 +56,87 @@ struct ArenaConfig {
   unsigned short port = 8080;           ///< Server port (if enabled).
   std::string web_root = "web";         ///< Static file root (if enabled).
   std::size_t sampling = 1; ///< Event sampling rate (1 = all events).
+  EngineKind engine =
+      EngineKind::FreeList; ///< Block allocator every shard runs on.
+  PlacementPolicy placement =
+      PlacementPolicy::FirstFit; ///< Free-block placement policy per shard
+                                 ///< (EngineKind::FreeList only).
+  std::size_t deferred_coalescing =
+      0; ///< Frees a shard queues before coalescing them in one sweep
+         ///< (0 = on every free; EngineKind::FreeList only).
+  std::size_t magazine_size =
+      32; ///< Blocks cached per size class per thread (0 = disabled).
+  HugePages huge_pages = HugePages::None; ///< Huge page backing to request.
+  bool prefault = false; ///< Fault in the whole arena at creation.
+  std::size_t decommit_threshold =
+      0; ///< Free blocks at least this large are purged (0 = never).
+  std::size_t purge_interval_ms = 1000; ///< Period of the purge thread.
+  std::size_t max_arena_size =
+      0; ///< Address space reserved for growth (0 = fixed at arena_size).
+         ///< Huge pages and prefault apply to fixed arenas only.
+  bool cross_shard_fallback =
+      true; ///< Borrow from other shards when the own shard is full.
+  std::size_t shard_count =
+      0; ///< Number of shards (0 = derived from hardware_concurrency).
+  bool rebind_threads = true; ///< Home threads on the least-loaded shard and
+                              ///< move them off contended shards.
+  bool remote_free = true; ///< Queue frees of other threads' blocks on the
+                           ///< owning shard instead of taking its lock.
+  bool biased_locking = true; ///< Let a thread that keeps locking a shard
+                              ///< skip the mutex until another thread
+                              ///< locks it (see BiasedMutex).
+  bool compact_headers = false; ///< 16-byte block headers holding a TagTable
+                                ///< id instead of the 56-byte inline tag.
+  std::size_t compact_interval_ms =
+      0; ///< Period of the compactor thread (0 = no compactor). A shard is
+         ///< compacted once no thread locked it for a whole period.
+  bool lock_histograms = false; ///< Record per-shard lock wait and hold
+                                ///< time histograms (shard_lock_histograms()).
+  std::size_t shard_stats_interval_ms =
+      500; ///< Period of "shard_stats" messages to WebSocket clients, sent
+           ///< when both lock_histograms and the server are enabled.
+};
+
+/// @brief Relocatable object of type T, owned through the arena's handle
+/// table. The compactor may move the object while it is not pinned.
+template <typename T> struct Handle {
+  std::uint32_t id = 0; ///< Handle table slot (0 = null handle).
+
+  explicit operator bool() const noexcept { return id != 0; }
+  auto operator==(const Handle &) const -> bool = default;
+};
+
+/// @brief Per-thread magazine cache counters, summed over all threads.
+struct MagazineStats {
+  std::size_t hits = 0;   ///< Allocations served from a magazine.
+  std::size_t misses = 0; ///< Allocations that had to refill a magazine.
+};
+
+/// @brief Cross-shard fallback counters (see alloc_raw()).
+struct FallbackStats {
+  std::size_t attempts = 0;     ///< Allocations that left their own shard.
+  std::size_t successes = 0;    ///< Of those, served by another shard.
+  std::size_t busy_skips = 0;   ///< Shards passed over because locked.
+  std::uint64_t total_ns = 0;   ///< Time spent in fallbacks.
+  std::uint64_t max_ns = 0;     ///< Slowest single fallback.
+};
+
+/// @brief Load and lock statistics of one shard.
+struct ShardStats {
+  std::size_t threads = 0;        ///< Threads currently homed here.
+  std::uint64_t acquisitions = 0; ///< Instrumented lock acquisitions.
+  std::uint64_t contentions = 0;  ///< Of those, acquisitions that waited.
+  std::uint64_t wait_ns = 0;      ///< Total time spent waiting.
+  std::uint64_t remote_frees = 0; ///< Blocks queued by foreign threads.
+  std::uint64_t biased_acquisitions = 0; ///< Of acquisitions, owner fast
+                                         ///< path ones that skipped the mutex.
+  std::uint64_t bias_revocations = 0;    ///< Owner biases taken away.
+};
+
+/// @brief Memory footprint of one shard.
+struct ShardMemoryStats {
+  std::size_t committed = 0; ///< Bytes not handed back with purge().
+  std::size_t resident = 0;  ///< Bytes currently backed by physical pages.
 };
 
 /// @brief Single-object façade wrapping the entire instrumented allocation
@@ -56,10 +145,16 @@ struct ArenaConfig {
 /// Owns: Arena, FreeListAllocator, AllocationTracker, TrackedResource,
 /// CacheAnalyzer, and optionally WsServer.
 ///
-/// Thread-safety: individual allocations are **not** internally synchronized.
-/// The caller must provide external synchronization if allocating from
-/// multiple threads. Diagnostic queries (reports, JSON) take a snapshot
-/// under a lock.
+/// Thread-safety: alloc_raw(), dealloc_raw(), realloc_raw(), the batch
+/// calls, the typed and handle wrappers, compact() and purge() may be
+/// called concurrently from any thread. Each thread allocates from its home
+/// shard through its own magazines, a block may be freed by a thread other
+/// than the one that allocated it, and a full shard falls back to the
+/// others. Diagnostic queries (reports, JSON, statistics) take a snapshot
+/// under the shard locks. A Region or ObjectPool is not synchronized and
+/// belongs to one thread at a time; neither is the tag that resource()
+/// keeps for its next allocation. Creating, moving or destroying the arena
+/// itself must not race with any other call.
 class VisualizationArena {
 public:
   /// @brief Create a fully initialized VisualizationArena.
@@ -104,9 +199,75 @@ public:
     dealloc_raw(ptr, sizeof(T));
   }
 
+  // ─── Relocatable allocation ──────────────────────────────────────────
+
+  /// @brief Allocate and construct a T that the compactor may move.
+  ///
+  /// The object is reached through pin(), which keeps it in place until the
+  /// matching unpin(). Unpinned objects may be relocated by compact() or
+  /// the compactor thread, with T's move constructor (memcpy if T is
+  /// trivially copyable).
+  /// @return The handle, or a null handle on OOM.
+  template <typename T, typename... Args>
+  auto alloc_handle(std::string_view tag, Args &&...args) -> Handle<T> {
+    static_assert(std::is_nothrow_move_constructible_v<T>,
+                  "relocation must not throw");
+    auto *raw = alloc_raw(sizeof(T), alignof(T), tag);
+    if (raw == nullptr) {
+      return {};
+    }
+    ::new (raw) T(std::forward<Args>(args)...);
+    Relocator relocate = nullptr;
+    if constexpr (!std::is_trivially_copyable_v<T>) {
+      relocate = [](void *to, void *from) noexcept {
+        auto *old = static_cast<T *>(from);
+        ::new (to) T(std::move(*old));
+        old->~T();
+      };
+    }
+    const auto id = register_handle(raw, alignof(T), relocate);
+    if (id == 0) {
+      static_cast<T *>(raw)->~T();
+      dealloc_raw(raw, sizeof(T));
+    }
+    return Handle<T>{id};
+  }
+
+  /// @brief Address of the object of @p handle, fixed until unpin().
+  /// Pins nest; waits while the compactor is moving the object.
+  template <typename T> auto pin(Handle<T> handle) -> T * {
+    return static_cast<T *>(pin_handle(handle.id));
+  }
+
+  /// @brief Release one pin() of @p handle.
+  template <typename T> void unpin(Handle<T> handle) {
+    unpin_handle(handle.id);
+  }
+
+  /// @brief Destroy and free the object of @p handle. It must not be pinned.
+  template <typename T> void dealloc(Handle<T> handle) {
+    if (!handle) {
+      return;
+    }
+    auto *ptr = pin(handle);
+    ptr->~T();
+    release_handle(handle.id, sizeof(T));
+  }
+
+  /// @brief Slide unpinned handle-owned blocks toward the base of their
+  /// shard, into the lowest free block that holds them. Each move is
+  /// streamed as a "relocate" event.
+  /// @return Number of blocks moved.
+  auto compact() -> std::size_t;
+
   // ─── Raw allocation ──────────────────────────────────────────────────
 
   /// @brief Allocate raw bytes from the arena.
+  ///
+  /// If the calling thread's shard cannot serve the request even after
+  /// flushing its magazines and growing, other shards are tried, fullest
+  /// free space first. Their locks are only try_lock()ed, so a busy shard
+  /// is skipped rather than waited for.
   /// @param size      Requested size in bytes.
   /// @param alignment Required alignment (power of 2).
   /// @param tag       Diagnostic tag.
@@ -115,10 +276,59 @@ public:
       -> void *;
 
   /// @brief Deallocate raw bytes previously allocated via alloc_raw().
+  ///
+  /// A block belonging to another thread's shard is pushed onto that
+  /// shard's lock-free remote-free list and returned to its allocator the
+  /// next time the shard is locked, normally by its owner allocating.
   /// @param ptr  Pointer returned by alloc_raw().
   /// @param size Original requested size.
   void dealloc_raw(void *ptr, std::size_t size);
 
+  /// @brief Resize a block from alloc_raw(), in place when possible.
+  ///
+  /// The block grows into the free block that follows it, or shrinks by
+  /// freeing its tail, and one "resize" event is recorded. Only if it
+  /// cannot grow in place is it moved: allocated anew under its old tag,
+  /// copied and freed. Bytes beyond the old size read as zero.
+  /// @param ptr       Pointer returned by alloc_raw(), or nullptr.
+  /// @param new_size  New size in bytes (0 frees the block).
+  /// @param alignment Alignment for a moved or new block (power of 2).
+  /// @param tag       Diagnostic tag if @p ptr is nullptr.
+  /// @return The (possibly moved) block, or nullptr on failure, in which
+  ///         case @p ptr is left untouched.
+  auto realloc_raw(void *ptr, std::size_t new_size, std::size_t alignment,
+                   std::string_view tag) -> void *;
+
+  /// @brief Allocate @p count blocks of @p size bytes under one shard lock.
+  ///
+  /// Blocks are carved from as few free blocks as possible and reported to
+  /// the tracker as aggregated records. Each block may be released with
+  /// dealloc_raw() or dealloc_batch().
+  /// @param count     Number of blocks requested.
+  /// @param size      Requested size of each block in bytes.
+  /// @param alignment Required alignment (power of 2).
+  /// @param tag       Diagnostic tag shared by all blocks.
+  /// @param out       Array of at least @p count pointers. Entries past the
+  ///                  returned count are set to nullptr.
+  /// @return Number of blocks allocated (short on exhaustion).
+  auto alloc_batch(std::size_t count, std::size_t size, std::size_t alignment,
+                   std::string_view tag, void **out) -> std::size_t;
+
+  /// @brief Deallocate several blocks, taking each owning shard's lock once.
+  /// @param ptrs Pointers returned by alloc_raw() or alloc_batch(). Null
+  ///             entries are ignored.
+  void dealloc_batch(std::span<void *const> ptrs);
+
+  // ─── Regions ─────────────────────────────────────────────────────────
+
+  /// @brief Carve a bump-pointer sub-arena of @p size bytes out of one
+  /// tracked block, for request-scoped memory freed all at once.
+  /// @param size Usable bytes of the region.
+  /// @param tag  Diagnostic tag of the region's block.
+  /// @return The region, or a null region on OOM.
+  [[nodiscard]] auto make_region(std::size_t size, std::string_view tag)
+      -> Region;
+
   // ─── PMR interop ─────────────────────────────────────────────────────
 
   /// @brief Get a std::pmr::memory_resource* backed by this arena.
@@ -139,26 +349,68 @@ public:
   /// @brief Get the full event history as a JSON string.
   [[nodiscard]] auto event_log_json() const -> std::string;
 
+  /// @brief Return the pages of large free blocks to the OS now.
+  ///
+  /// Runs the same pass as the purge thread, using decommit_threshold
+  /// (or one page if it is 0) as the minimum block size.
+  /// @return Bytes decommitted by this call.
+  auto purge() -> std::size_t;
+
+  /// @brief Number of shards the arena is split into.
+  [[nodiscard]] auto shard_count() const noexcept -> std::size_t;
+
+  /// @brief Thread load and lock wait of every shard.
+  [[nodiscard]] auto shard_stats() const -> std::vector<ShardStats>;
+
+  /// @brief Lock wait and hold time histograms of every shard since
+  /// creation, or an empty vector unless ArenaConfig::lock_histograms.
+  [[nodiscard]] auto shard_lock_histograms() const
+      -> std::vector<ShardLockHistograms>;
+
+  /// @brief Number of times a thread was moved to a quieter shard.
+  [[nodiscard]] auto thread_rebinds() const noexcept -> std::size_t;
+
+  /// @brief Committed and resident bytes of every shard.
+  [[nodiscard]] auto shard_memory() const -> std::vector<ShardMemoryStats>;
+
   /// @brief Set a callback for WebSocket commands.
   void set_command_handler(std::function<void(const std::string &)> handler);
 
   // ─── Accessors ───────────────────────────────────────────────────────
 
-  /// @brief Total arena capacity in bytes.
+  /// @brief Total arena capacity in bytes (committed so far if growable).
   [[nodiscard]] auto capacity() const noexcept -> std::size_t;
 
+  /// @brief Capacity the arena may grow to (capacity() if fixed).
+  [[nodiscard]] auto max_capacity() const noexcept -> std::size_t;
+
   /// @brief Bytes currently allocated.
   [[nodiscard]] auto bytes_allocated() const noexcept -> std::size_t;
 
   /// @brief Bytes currently free.
   [[nodiscard]] auto bytes_free() const noexcept -> std::size_t;
 
-  /// @brief Number of currently active (allocated) blocks.
+  /// @brief Number of currently active (allocated) blocks. O(shards).
   [[nodiscard]] auto active_block_count() const noexcept -> std::size_t;
 
+  /// @brief Largest free block of any shard. O(shards).
+  [[nodiscard]] auto largest_free_block() const -> std::size_t;
+
+  /// @brief Share of free bytes (0–100) outside the largest free block.
+  [[nodiscard]] auto fragmentation_pct() const -> std::size_t;
+
+  /// @brief Magazine hit/miss counters of all threads, live and exited.
+  [[nodiscard]] auto magazine_stats() const -> MagazineStats;
+
+  /// @brief How often and how long allocations fell back to other shards.
+  [[nodiscard]] auto fallback_stats() const -> FallbackStats;
+
   /// @brief The cache-line size used by the analyzer.
   [[nodiscard]] auto cache_line_size() const noexcept -> std::size_t;
 
+  /// @brief Page size actually backing the arena (see Arena).
+  [[nodiscard]] auto mapped_page_size() const noexcept -> std::size_t;
+
   /// @brief Base address of the underlying arena.
   [[nodiscard]] auto base() const noexcept -> std::byte *;
 
@@ -170,6 +422,8 @@ private:
   // Threads managed by VisualizationArena to allow joining in destructor.
   std::thread batcher_thread_;
   std::thread server_thread_;
+  std::thread purge_thread_;
+  std::thread compactor_thread_;
 
   // Global generation counter to detect stale TLS contexts
   static std::atomic<std::size_t> global_generation_;
@@ -178,9 +432,32 @@ private:
   struct ThreadContext;
   static thread_local std::shared_ptr<ThreadContext> tls_context_;
 
+  // Handle table
+  using Relocator = void (*)(void *to, void *from) noexcept;
+  auto register_handle(void *ptr, std::size_t alignment, Relocator relocate)
+      -> std::uint32_t;
+  auto pin_handle(std::uint32_t id) -> void *;
+  void unpin_handle(std::uint32_t id);
+  void release_handle(std::uint32_t id, std::size_t size);
+
+  // Regions and object pools
+  friend class Region;
+  template <typename> friend class ObjectPool;
+  /// @brief Record that @p used bytes of the region or pool slab at
+  /// @p user_ptr are in use.
+  void record_fill(void *user_ptr, std::size_t used);
+
   // Helpers
   void init_tls_context();
+  void maybe_rebind();
+  auto finish_alloc(std::byte *raw_ptr, std::size_t actual_size,
+                    std::size_t offset_to_user, std::size_t size,
+                    std::size_t alignment, std::string_view tag,
+                    std::size_t zeroed_begin = 0, std::size_t zeroed_end = 0)
+      -> void *;
+  void stop_threads();
   auto get_shard_idx(void *ptr) const -> std::size_t;
+  auto is_home_shard(const void *shard) const -> bool;
 };
 
 } // namespace mmap_viz
@@ -266,7 +266,8 @@ int main(int argc, char *argv[]) {
                                                .enable_server = true,
                                                .port = kPort,
                                                .web_root = web_root,
-                                               .sampling = 1});
+                                               .sampling = 1,
+                                               .lock_histograms = true});
 
   if (!va_result.has_value()) {
     std::cerr << "Failed to create arena: " << va_result.error().message()
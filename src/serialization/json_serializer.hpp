@@ -2,10 +2,15 @@
 /// @file json_serializer.hpp
 /// @brief nlohmann/json serialization for BlockMetadata and AllocationEvent.
 
+#include "interface/lock_histogram.hpp"
 #include "tracker/block_metadata.hpp"
 
 #include <nlohmann/json.hpp>
 
+#include <algorithm>
+#include <string>
+#include <vector>
+
 namespace mmap_viz {
 
 inline void to_json(nlohmann::json &j, const BlockMetadata &b) {
@@ -14,22 +19,25 @@ inline void to_json(nlohmann::json &j, const BlockMetadata &b) {
       {"size", b.size},
       {"alignment", b.alignment},
       {"actual_size", b.actual_size},
-      {"tag", b.tag},
+      {"tag", b.tag_id},
       {"timestamp_us", std::chrono::duration_cast<std::chrono::microseconds>(
                            b.timestamp.time_since_epoch())
                            .count()},
   };
+  if (b.order >= 0) {
+    j["order"] = b.order;
+  }
 }
 
 inline void to_json(nlohmann::json &j, const AllocationEvent &e) {
   j = nlohmann::json{
-      {"type", e.type == EventType::Allocate ? "allocate" : "deallocate"},
+      {"type", to_string(e.type)},
       {"event_id", e.event_id},
       {"offset", e.block.offset},
       {"size", e.block.size},
       {"alignment", e.block.alignment},
       {"actual_size", e.block.actual_size},
-      {"tag", e.block.tag},
+      {"tag", e.block.tag_id},
       {"timestamp_us", std::chrono::duration_cast<std::chrono::microseconds>(
                            e.block.timestamp.time_since_epoch())
                            .count()},
@@ -38,10 +46,94 @@ inline void to_json(nlohmann::json &j, const AllocationEvent &e) {
       {"fragmentation_pct", e.fragmentation_pct},
       {"free_block_count", e.free_block_count},
   };
+  if (e.block.order >= 0) {
+    j["order"] = e.block.order;
+  }
+  if (e.count > 1) {
+    j["count"] = e.count;
+    j["stride"] = e.stride;
+  }
+  if (e.type == EventType::Relocate) {
+    j["from_offset"] = e.from_offset;
+  }
+  if (e.type == EventType::Fill) {
+    j["used"] = e.used;
+  }
+}
+
+/// @brief Tag dictionary entries {"id": name} for ids from @p cursor on.
+///
+/// Blocks and events carry tag ids only; clients build the id → name map
+/// from the dictionary in the snapshot and from later "tags" messages.
+/// @p cursor advances past every id sent, stopping at the first id whose
+/// name another thread is still publishing so that it is sent next time.
+/// Bytes that are not printable ASCII are replaced with '?'.
+inline auto tag_dictionary(const TagTable &table, std::size_t &cursor)
+    -> nlohmann::json {
+  auto j = nlohmann::json::object();
+  bool gap = false;
+  for (std::size_t id = cursor, n = table.size(); id < n; ++id) {
+    auto name = table.name(static_cast<std::uint16_t>(id));
+    if (name.empty()) {
+      gap = true;
+      continue;
+    }
+    std::string safe(name);
+    for (auto &c : safe) {
+      if (static_cast<unsigned char>(c) < 32 ||
+          static_cast<unsigned char>(c) > 126) {
+        c = '?';
+      }
+    }
+    j[std::to_string(id)] = std::move(safe);
+    if (!gap) {
+      cursor = id + 1;
+    }
+  }
+  return j;
+}
+
+/// @brief Dictionary update announcing tags interned since the last one.
+inline auto tags_to_json(nlohmann::json dictionary) -> nlohmann::json {
+  return nlohmann::json{{"type", "tags"}, {"tags", std::move(dictionary)}};
+}
+
+/// @brief Per-shard lock activity over the last @p interval_ms, from the
+/// histogram deltas in @p window (one entry per shard).
+///
+/// Each shard reports its acquisitions, how many of them waited, wait and
+/// hold percentiles (bucket upper bounds, ns), busy_pct (estimated share
+/// of the interval the lock was held) and the raw bucket counts.
+inline auto shard_stats_to_json(const std::vector<ShardLockHistograms> &window,
+                                std::size_t interval_ms) -> nlohmann::json {
+  nlohmann::json j;
+  j["type"] = "shard_stats";
+  j["interval_ms"] = interval_ms;
+  j["shards"] = nlohmann::json::array();
+  const auto interval_ns =
+      static_cast<double>(std::max<std::size_t>(interval_ms, 1)) * 1e6;
+  for (std::size_t i = 0; i < window.size(); ++i) {
+    const auto &w = window[i];
+    const auto acquisitions = w.wait.total();
+    const auto busy = static_cast<double>(w.hold.approx_sum()) / interval_ns;
+    j["shards"].push_back(nlohmann::json{
+        {"shard", i},
+        {"acquisitions", acquisitions},
+        {"contended", acquisitions - w.wait.counts[0]},
+        {"wait_p50", w.wait.percentile(0.5)},
+        {"wait_p99", w.wait.percentile(0.99)},
+        {"hold_p50", w.hold.percentile(0.5)},
+        {"hold_p99", w.hold.percentile(0.99)},
+        {"busy_pct", std::min(100.0, 100.0 * busy)},
+        {"wait_ns", w.wait.counts},
+        {"hold_ns", w.hold.counts},
+    });
+  }
+  return j;
 }
 
 /// @brief Serialize a full snapshot (vector of active blocks) for initial
-/// client sync.
+/// client sync, with the tag dictionary as it stands.
 inline auto snapshot_to_json(const std::vector<BlockMetadata> &blocks,
                              std::size_t total_allocated,
                              std::size_t total_free, std::size_t capacity,
@@ -54,6 +146,8 @@ inline auto snapshot_to_json(const std::vector<BlockMetadata> &blocks,
   j["total_free"] = total_free;
   j["fragmentation_pct"] = fragmentation_pct;
   j["free_block_count"] = free_block_count;
+  std::size_t first_tag = TagTable::kUntagged + 1;
+  j["tags"] = tag_dictionary(TagTable::global(), first_tag);
   j["blocks"] = nlohmann::json::array();
 
   for (const auto &block : blocks) {
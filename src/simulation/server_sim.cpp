@@ -3,6 +3,7 @@
 
 #include "simulation/server_sim.hpp"
 
+#include <algorithm>
 #include <chrono>
 #include <cstring>
 #include <random>
@@ -15,6 +16,10 @@ namespace mmap_viz::sim {
 
 namespace {
 
+/// STREAM responses are produced, and their buffer grown, in chunks of
+/// this size.
+constexpr std::size_t kStreamChunk = 4096;
+
 /// Thread-local RNG for jittering response sizes.
 auto &rng() {
   thread_local std::mt19937 gen{std::random_device{}()};
@@ -32,7 +37,26 @@ auto rand_between(std::size_t lo, std::size_t hi) -> std::size_t {
 // ─── ServerSim ──────────────────────────────────────────────────────────
 
 ServerSim::ServerSim(VisualizationArena &arena, ServerConfig cfg) noexcept
-    : arena_{arena}, cfg_{cfg} {}
+    : arena_{arena}, cfg_{cfg} {
+  if (cfg_.scratch_size > 0) {
+    scratch_ = arena_.make_region(cfg_.scratch_size, "request scratch");
+  }
+}
+
+auto ServerSim::scratch_alloc(std::size_t size, const char *tag) -> void * {
+  if (void *ptr = scratch_.allocate(size, 16)) {
+    return ptr;
+  }
+  return arena_.alloc_raw(size, 16, tag);
+}
+
+void ServerSim::scratch_free(void *ptr, std::size_t size) {
+  auto *p = static_cast<std::byte *>(ptr);
+  if (p >= scratch_.data() && p < scratch_.data() + scratch_.capacity()) {
+    return; // Reclaimed by the next reset.
+  }
+  arena_.dealloc_raw(ptr, size);
+}
 
 auto ServerSim::response_size_for(const Request &req) const -> std::size_t {
   switch (req.type) {
@@ -62,7 +86,7 @@ auto ServerSim::handle_request(const Request &req) -> Response {
     std::snprintf(tag_buf, sizeof(tag_buf), "%s %s #%llu [req]",
                   to_string(req.type), req.endpoint.c_str(),
                   static_cast<unsigned long long>(req.id));
-    req_buf = arena_.alloc_raw(req.payload_size, 16, tag_buf);
+    req_buf = scratch_alloc(req.payload_size, tag_buf);
     if (req_buf == nullptr) {
       // Arena OOM — record failure.
       const auto latency = Clock::now() - t0;
@@ -77,17 +101,25 @@ auto ServerSim::handle_request(const Request &req) -> Response {
     std::memset(req_buf, 0xAA, req.payload_size);
   }
 
-  // 2. Allocate response buffer.
+  // 2. Allocate response buffer. STREAM responses outlive the request:
+  //    they start with one chunk of their own and grow as they are
+  //    produced.
   auto resp_size = response_size_for(req);
   std::snprintf(tag_buf, sizeof(tag_buf), "%s %s #%llu [resp]",
                 to_string(req.type), req.endpoint.c_str(),
                 static_cast<unsigned long long>(req.id));
-  void *resp_buf = arena_.alloc_raw(resp_size, 16, tag_buf);
+  const auto initial_size = req.type == RequestType::STREAM
+                                ? std::min(resp_size, kStreamChunk)
+                                : resp_size;
+  void *resp_buf = req.type == RequestType::STREAM
+                       ? arena_.alloc_raw(initial_size, 16, tag_buf)
+                       : scratch_alloc(initial_size, tag_buf);
   if (resp_buf == nullptr) {
     // Free request buffer if allocated, then fail.
     if (req_buf != nullptr) {
-      arena_.dealloc_raw(req_buf, req.payload_size);
+      scratch_free(req_buf, req.payload_size);
     }
+    scratch_.reset();
     const auto latency = Clock::now() - t0;
     metrics_.record(latency, req.payload_size, 0, false);
     return Response{
@@ -97,8 +129,21 @@ auto ServerSim::handle_request(const Request &req) -> Response {
     };
   }
 
-  // 3. Simulate processing — write response data.
-  std::memset(resp_buf, 0xBB, resp_size);
+  // 3. Simulate processing — write response data. A stream that cannot
+  //    grow further is cut short.
+  std::memset(resp_buf, 0xBB, initial_size);
+  for (std::size_t written = initial_size; written < resp_size;) {
+    const auto next = std::min(written + kStreamChunk, resp_size);
+    void *grown = arena_.realloc_raw(resp_buf, next, 16, tag_buf);
+    if (grown == nullptr) {
+      resp_size = written;
+      break;
+    }
+    resp_buf = grown;
+    std::memset(static_cast<std::byte *>(resp_buf) + written, 0xBB,
+                next - written);
+    written = next;
+  }
 
   // 4. Simulate base processing latency if configured.
   if (cfg_.base_latency_us > 0) {
@@ -108,16 +153,18 @@ auto ServerSim::handle_request(const Request &req) -> Response {
 
   // 5. Free request buffer (we've "consumed" the payload).
   if (req_buf != nullptr) {
-    arena_.dealloc_raw(req_buf, req.payload_size);
+    scratch_free(req_buf, req.payload_size);
   }
 
   // 6. For STREAM requests, keep the response buffer alive.
-  //    For all others, free it immediately (short-lived).
+  //    For all others, free it immediately (short-lived). Whatever the
+  //    request took from the scratch region goes with one reset.
   if (req.type == RequestType::STREAM) {
     stream_buffers_.emplace_back(resp_buf, resp_size);
   } else {
-    arena_.dealloc_raw(resp_buf, resp_size);
+    scratch_free(resp_buf, resp_size);
   }
+  scratch_.reset();
 
   // 7. Record metrics.
   const auto latency = Clock::now() - t0;
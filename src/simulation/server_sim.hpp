@@ -2,7 +2,7 @@
 /// @file server_sim.hpp
 /// @brief Simulated high-bandwidth server backed by VisualizationArena.
 ///
-/// Each request allocates from the arena (tagged by endpoint + type),
+/// Each request takes its buffers from a scratch region of the arena,
 /// simulates processing, writes a response, and records metrics.
 
 #include "interface/visualization_arena.hpp"
@@ -73,14 +73,19 @@ struct ServerConfig {
   /// Simulate processing latency (microseconds) per request type.
   /// If 0, no artificial delay is added.
   std::size_t base_latency_us = 0;
+  /// Size of the region request and response buffers are carved from,
+  /// reset after every request. Buffers that do not fit, STREAM responses
+  /// and all buffers if 0 are allocated individually.
+  std::size_t scratch_size = 16 * 1024;
 };
 
 /// @brief Simulated request/response server backed by VisualizationArena.
 ///
 /// All request and response buffers are allocated from the arena,
-/// making every allocation visible to the visualization frontend.
-/// Response buffers are freed after each request completes (short-lived),
-/// except STREAM responses which are accumulated and freed on cleanup().
+/// making every allocation visible to the visualization frontend. Buffers
+/// of one request share a scratch region that is reset once the request
+/// completes (short-lived), except STREAM responses, which are allocated
+/// on their own, accumulated and freed on cleanup().
 class ServerSim {
 public:
   /// @brief Construct a server simulation.
@@ -104,9 +109,16 @@ private:
   /// @brief Determine response size based on request type.
   [[nodiscard]] auto response_size_for(const Request &req) const -> std::size_t;
 
+  /// @brief A buffer from the scratch region, or from the arena if the
+  /// region is full.
+  auto scratch_alloc(std::size_t size, const char *tag) -> void *;
+  /// @brief Free a buffer from scratch_alloc() unless it is in the region.
+  void scratch_free(void *ptr, std::size_t size);
+
   VisualizationArena &arena_;
   ServerConfig cfg_;
   MetricsCollector metrics_;
+  Region scratch_; ///< Request-scoped buffers.
 
   /// Outstanding STREAM allocations (ptr → size).
   std::vector<std::pair<void *, std::size_t>> stream_buffers_;
@@ -9,9 +9,11 @@
 #include "simulation/request_generator.hpp"
 #include "simulation/server_sim.hpp"
 
+#include <algorithm>
 #include <cstdlib>
 #include <iomanip>
 #include <iostream>
+#include <numeric>
 #include <string>
 #include <thread>
 #include <vector>
@@ -33,6 +35,8 @@ struct SimArgs {
   bool show_progress = true;
   std::size_t interval_us = 100; // Default 100us
   std::size_t sampling = 1;      // Default 1 (no sampling)
+  std::size_t coalesce_batch = 0; // Deferred frees per sweep (0 = eager).
+  bool lock_stats = false;        // Per-shard lock histograms.
 };
 
 void print_usage(const char *prog) {
@@ -47,6 +51,10 @@ void print_usage(const char *prog) {
       << "  --interval-us <N>    Request interval in microseconds (default: "
          "100)\n"
       << "  --sampling <N>       Event sampling rate (default: 1)\n"
+      << "  --coalesce-batch <N> Frees merged per coalescing sweep, 0 = on "
+         "every free (default: 0)\n"
+      << "  --lock-stats         Record shard lock wait/hold histograms and "
+         "stream them to clients\n"
       << "  --server             Enable WebSocket visualization server\n"
       << "  --port <N>           Server port (default: 8080)\n"
       << "  --no-progress        Disable progress output\n"
@@ -96,6 +104,10 @@ auto parse_args(int argc, char *argv[]) -> SimArgs {
       args.interval_us = std::stoull(argv[++i]);
     } else if (arg == "--sampling" && i + 1 < argc) {
       args.sampling = std::stoull(argv[++i]);
+    } else if (arg == "--coalesce-batch" && i + 1 < argc) {
+      args.coalesce_batch = std::stoull(argv[++i]);
+    } else if (arg == "--lock-stats") {
+      args.lock_stats = true;
     } else if (arg == "--server") {
       args.enable_server = true;
     } else if (arg == "--port" && i + 1 < argc) {
@@ -161,11 +173,34 @@ void print_report(const RequestMetrics &m, const VisualizationArena &arena) {
             << "    Capacity:    " << arena.capacity() / 1024 << " KB\n"
             << "    Allocated:   " << arena.bytes_allocated() / 1024 << " KB\n"
             << "    Free:        " << arena.bytes_free() / 1024 << " KB\n"
+            << "    Live Blocks: " << arena.active_block_count() << "\n"
+            << "    Fragmented:  " << arena.fragmentation_pct() << " %\n"
             << "    Pad Eff:     " << pad.efficiency * 100 << " %\n"
             << "    Cache Util:  " << cache.avg_utilization * 100 << " %\n"
             << "    Cache Lines: " << cache.active_lines << " active / "
             << cache.total_lines << " total\n";
 
+  // Shard locks (--lock-stats): the busiest shards by acquisitions.
+  auto locks = arena.shard_lock_histograms();
+  if (!locks.empty()) {
+    std::vector<std::size_t> order(locks.size());
+    std::iota(order.begin(), order.end(), std::size_t{0});
+    std::ranges::sort(order, [&](std::size_t a, std::size_t b) {
+      return locks[a].wait.total() > locks[b].wait.total();
+    });
+    std::cout << "\n  Shard Locks (busiest)\n";
+    for (std::size_t i = 0; i < std::min<std::size_t>(order.size(), 4); ++i) {
+      const auto &h = locks[order[i]];
+      if (h.wait.total() == 0)
+        break;
+      std::cout << "    Shard " << std::setw(3) << order[i] << ":  "
+                << h.wait.total() << " locks, "
+                << h.wait.total() - h.wait.counts[0] << " waited, wait p99 < "
+                << h.wait.percentile(0.99) << " ns, hold p99 < "
+                << h.hold.percentile(0.99) << " ns\n";
+    }
+  }
+
   print_separator();
   std::cout << std::endl;
 }
@@ -196,6 +231,8 @@ int main(int argc, char *argv[]) {
       .enable_server = args.enable_server,
       .port = args.port,
       .sampling = args.sampling,
+      .deferred_coalescing = args.coalesce_batch,
+      .lock_histograms = args.lock_stats,
   });
 
   if (!arena_result.has_value()) {
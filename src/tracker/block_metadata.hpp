@@ -10,6 +10,8 @@
 #include <cstring>
 #include <string_view>
 
+#include "tracker/tag_table.hpp"
+
 namespace mmap_viz {
 
 /// @brief Metadata for a single allocated block.
@@ -18,13 +20,15 @@ struct BlockMetadata {
   std::size_t size;        ///< Requested allocation size.
   std::size_t alignment;   ///< Requested alignment.
   std::size_t actual_size; ///< Size including alignment padding.
-  char tag[32] = {};       ///< Optional label (fixed buffer to avoid malloc).
+  std::uint16_t tag_id = TagTable::kUntagged; ///< Optional label (TagTable).
+  std::int8_t order = -1; ///< Buddy order (-1 = engine without orders).
   std::chrono::system_clock::time_point timestamp; ///< When the event occurred.
 
-  void set_tag(std::string_view t) {
-    std::size_t len = std::min(t.size(), sizeof(tag) - 1);
-    std::memcpy(tag, t.data(), len);
-    tag[len] = '\0';
+  void set_tag(std::string_view t) { tag_id = TagTable::global().intern(t); }
+
+  /// @brief Label text, resolved through the global TagTable.
+  [[nodiscard]] auto tag() const -> std::string_view {
+    return TagTable::global().name(tag_id);
   }
 };
 
@@ -36,12 +40,84 @@ struct AllocationHeader {
   static constexpr std::size_t kMagicValue = 0xAC1DCAFEDEADBEEF;
 };
 
+/// @brief 16-byte header used instead of AllocationHeader when
+/// ArenaConfig::compact_headers is set. The tag is an id into TagTable, and
+/// the last word doubles as the footer when the user pointer follows the
+/// header directly. It sits at the start of its block.
+struct CompactHeader {
+  std::uint32_t granules;    ///< Full block size in 16-byte units.
+  std::uint16_t tail;        ///< Block bytes past the end of the user region,
+                             ///< or kTailInBlock.
+  std::uint16_t tag_id;      ///< Interned tag (TagTable).
+  std::uint32_t magic;
+  std::uint32_t user_offset; ///< Distance from the block to the user pointer.
+  static constexpr std::uint32_t kMagicValue = 0xAC1DC0DE;
+  static constexpr std::size_t kGranule = 16;
+  /// A tail too long for the field is kept in the last word of the block,
+  /// which the tail itself covers.
+  static constexpr std::uint16_t kTailInBlock = 0xFFFF;
+
+  /// @brief Record the block size and the user size; user_offset must be
+  /// set already.
+  void set_sizes(std::size_t actual_size, std::size_t size) {
+    granules = static_cast<std::uint32_t>(actual_size / kGranule);
+    const std::uint64_t bytes = actual_size - user_offset - size;
+    if (bytes < kTailInBlock) {
+      tail = static_cast<std::uint16_t>(bytes);
+      return;
+    }
+    tail = kTailInBlock;
+    std::memcpy(block_end() - sizeof(bytes), &bytes, sizeof(bytes));
+  }
+
+  /// @brief Full block size.
+  [[nodiscard]] auto actual_size() const -> std::size_t {
+    return std::size_t{granules} * kGranule;
+  }
+
+  /// @brief Requested user size.
+  [[nodiscard]] auto size() const -> std::size_t {
+    std::uint64_t bytes = tail;
+    if (tail == kTailInBlock) {
+      std::memcpy(&bytes, block_end() - sizeof(bytes), sizeof(bytes));
+    }
+    return actual_size() - user_offset - bytes;
+  }
+
+private:
+  [[nodiscard]] auto block_end() const -> std::byte * {
+    return const_cast<std::byte *>(reinterpret_cast<const std::byte *>(this)) +
+           actual_size();
+  }
+};
+static_assert(sizeof(CompactHeader) == 16);
+
 /// @brief Type of allocation event.
 enum class EventType : std::uint8_t {
   Allocate,
   Deallocate,
+  Resize,   ///< A live block changed size in place.
+  Relocate, ///< The compactor moved a live block (see from_offset).
+  Fill,     ///< Bytes in use of a region or pool slab changed (see used).
 };
 
+/// @brief Wire name of an event type.
+[[nodiscard]] constexpr auto to_string(EventType t) -> const char * {
+  switch (t) {
+  case EventType::Allocate:
+    return "allocate";
+  case EventType::Deallocate:
+    return "deallocate";
+  case EventType::Resize:
+    return "resize";
+  case EventType::Relocate:
+    return "relocate";
+  case EventType::Fill:
+    return "fill";
+  }
+  return "unknown";
+}
+
 /// @brief A recorded allocation or deallocation event with aggregate stats.
 struct AllocationEvent {
   EventType type;
@@ -52,6 +128,10 @@ struct AllocationEvent {
   std::size_t total_free; ///< Running total free bytes after this event.
   std::size_t fragmentation_pct; ///< External fragmentation percentage (0–100).
   std::size_t free_block_count;  ///< Number of free blocks after this event.
+  std::size_t count = 1;  ///< Blocks covered (> 1 for batch records).
+  std::size_t stride = 0; ///< Offset step between blocks of a batch record.
+  std::size_t from_offset = 0; ///< Previous offset of a relocated block.
+  std::size_t used = 0; ///< Bytes in use of the block (Fill events).
 };
 
 } // namespace mmap_viz
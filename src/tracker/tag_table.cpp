@@ -0,0 +1,134 @@
+/// @file tag_table.cpp
+/// @brief Implementation of TagTable.
+
+#include "tracker/tag_table.hpp"
+
+#include <algorithm>
+#include <cstring>
+#include <functional>
+
+namespace mmap_viz {
+
+namespace {
+std::atomic<std::uint64_t> g_next_serial{1};
+} // namespace
+
+TagTable::TagTable()
+    : serial_(g_next_serial.fetch_add(1, std::memory_order_relaxed)),
+      index_(std::make_unique<std::atomic<std::uint16_t>[]>(kIndexSize)) {}
+
+TagTable::~TagTable() {
+  for (auto &chunk : chunks_) {
+    delete[] chunk.load(std::memory_order_relaxed);
+  }
+}
+
+auto TagTable::global() -> TagTable & {
+  static TagTable table;
+  return table;
+}
+
+auto TagTable::entry(std::uint16_t id) -> Entry & {
+  auto &slot = chunks_[id / kChunkSize];
+  auto *chunk = slot.load(std::memory_order_acquire);
+  if (chunk == nullptr) {
+    auto *fresh = new Entry[kChunkSize];
+    if (slot.compare_exchange_strong(chunk, fresh, std::memory_order_acq_rel,
+                                     std::memory_order_acquire)) {
+      chunk = fresh;
+    } else {
+      delete[] fresh; // Another thread installed the chunk first.
+    }
+  }
+  return chunk[id % kChunkSize];
+}
+
+auto TagTable::append(std::string_view tag) -> std::uint16_t {
+  const auto id = next_id_.fetch_add(1, std::memory_order_relaxed);
+  if (id >= kCapacity) {
+    return kUntagged;
+  }
+  auto &e = entry(static_cast<std::uint16_t>(id));
+  std::memcpy(e.text, tag.data(), tag.size());
+  e.length.store(static_cast<std::uint8_t>(tag.size()),
+                 std::memory_order_release);
+  return static_cast<std::uint16_t>(id);
+}
+
+auto TagTable::matches(std::uint16_t id, std::string_view tag) const -> bool {
+  return name(id) == tag;
+}
+
+auto TagTable::intern(std::string_view tag) -> std::uint16_t {
+  tag = tag.substr(0, kMaxTagLength);
+  if (tag.empty())
+    return kUntagged;
+
+  // Allocation sites mostly repeat the same tag; remember the last one per
+  // thread so the common case skips the index. Ids never change, so the
+  // cache stays valid for as long as its table lives.
+  struct LastTag {
+    std::uint64_t table = 0;
+    char text[kMaxTagLength];
+    std::size_t length = 0;
+    std::uint16_t id = kUntagged;
+  };
+  thread_local LastTag last;
+  if (last.table == serial_ && last.length == tag.size() &&
+      std::memcmp(last.text, tag.data(), tag.size()) == 0) {
+    return last.id;
+  }
+
+  // Linear probing. A slot only ever goes from empty to an id, so a probe
+  // that reaches an empty slot has seen every id the tag could have.
+  std::uint16_t mine = kUntagged;
+  std::uint16_t found = kUntagged;
+  auto i = std::hash<std::string_view>{}(tag) % kIndexSize;
+  for (std::size_t probes = 0; probes < kIndexSize && found == kUntagged;
+       ++probes, i = (i + 1) % kIndexSize) {
+    auto id = index_[i].load(std::memory_order_acquire);
+    if (id == kUntagged) {
+      if (mine == kUntagged) {
+        mine = append(tag);
+        if (mine == kUntagged)
+          return kUntagged; // Full.
+      }
+      if (index_[i].compare_exchange_strong(id, mine,
+                                            std::memory_order_acq_rel,
+                                            std::memory_order_acquire)) {
+        found = mine;
+        break;
+      }
+      // Lost the slot; id is the winner's, which may be this very tag. If
+      // so, `mine` stays unindexed: a spare id with the same name.
+    }
+    if (matches(id, tag)) {
+      found = id;
+    }
+  }
+  if (found == kUntagged)
+    return kUntagged;
+
+  last.table = serial_;
+  std::memcpy(last.text, tag.data(), tag.size());
+  last.length = tag.size();
+  last.id = found;
+  return found;
+}
+
+auto TagTable::name(std::uint16_t id) const -> std::string_view {
+  if (id >= size())
+    return {};
+  const auto *chunk = chunks_[id / kChunkSize].load(std::memory_order_acquire);
+  if (chunk == nullptr)
+    return {};
+  const auto &e = chunk[id % kChunkSize];
+  return {e.text, e.length.load(std::memory_order_acquire)};
+}
+
+auto TagTable::size() const -> std::size_t {
+  return std::min<std::size_t>(next_id_.load(std::memory_order_relaxed),
+                               kCapacity);
+}
+
+} // namespace mmap_viz
@@ -0,0 +1,70 @@
+#pragma once
+/// @file tag_table.hpp
+/// @brief Process-wide lock-free registry interning allocation tags as
+/// 16-bit ids.
+
+#include <array>
+#include <atomic>
+#include <cstddef>
+#include <cstdint>
+#include <memory>
+#include <string_view>
+
+namespace mmap_viz {
+
+/// @brief Append-only map from tag strings to small integer ids.
+///
+/// Block headers, events and wire messages carry the id; the text is
+/// resolved through the table only where it is displayed. Ids are never
+/// reused and a name stays valid for the life of the table. Interning and
+/// lookup take no locks: names live in chunks allocated on demand, and an
+/// open-addressed index of ids is filled by compare-and-swap.
+class TagTable {
+public:
+  /// @brief Longest tag kept, matching the inline tag of AllocationHeader.
+  static constexpr std::size_t kMaxTagLength = 31;
+  /// @brief Id of the empty tag, and of every tag once the table is full.
+  static constexpr std::uint16_t kUntagged = 0;
+  /// @brief Number of ids, kUntagged included.
+  static constexpr std::size_t kCapacity = std::size_t{1} << 16;
+
+  TagTable();
+  ~TagTable();
+  TagTable(const TagTable &) = delete;
+  TagTable &operator=(const TagTable &) = delete;
+
+  /// @brief The table shared by all arenas and serializers.
+  [[nodiscard]] static auto global() -> TagTable &;
+
+  /// @brief Id of @p tag (truncated to kMaxTagLength), adding it if new.
+  /// @return kUntagged if the tag is empty or the table is full.
+  [[nodiscard]] auto intern(std::string_view tag) -> std::uint16_t;
+
+  /// @brief Tag text for @p id. Empty for kUntagged, for unknown ids, and
+  /// for an id whose name is still being published by another thread.
+  [[nodiscard]] auto name(std::uint16_t id) const -> std::string_view;
+
+  /// @brief Number of ids handed out, including kUntagged.
+  [[nodiscard]] auto size() const -> std::size_t;
+
+private:
+  struct Entry {
+    std::atomic<std::uint8_t> length{0}; ///< 0 until the text is written.
+    char text[kMaxTagLength];
+  };
+  static constexpr std::size_t kChunkSize = 256;
+  static constexpr std::size_t kIndexSize = 2 * kCapacity;
+
+  /// @brief Entry of @p id, allocating its chunk if needed.
+  auto entry(std::uint16_t id) -> Entry &;
+  /// @brief Claim a fresh id holding @p tag; kUntagged if the table is full.
+  auto append(std::string_view tag) -> std::uint16_t;
+  auto matches(std::uint16_t id, std::string_view tag) const -> bool;
+
+  const std::uint64_t serial_; ///< Distinguishes tables in per-thread caches.
+  std::atomic<std::uint32_t> next_id_{1};
+  std::array<std::atomic<Entry *>, kCapacity / kChunkSize> chunks_{};
+  std::unique_ptr<std::atomic<std::uint16_t>[]> index_; ///< 0 = empty slot.
+};
+
+} // namespace mmap_viz
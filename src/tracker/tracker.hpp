@@ -7,10 +7,11 @@
 #include <array>
 #include <atomic>
 #include <cstddef>
+#include <cstdint>
 #include <functional>
 #include <vector>
 
-#include "allocator/free_list.hpp"
+#include "allocator/allocator_engine.hpp"
 
 namespace mmap_viz {
 
@@ -51,25 +52,88 @@ private:
   std::atomic<std::size_t> tail_{0};
 };
 
+/// @brief Allocator totals stamped on events, published by whoever holds
+/// the allocator's lock so that trackers never read the allocator itself.
+///
+/// publish() calls must be serialized (the lock does that). load() may run
+/// on any thread, never blocks them and returns the values of one
+/// publish().
+class AllocatorTotals {
+public:
+  struct Values {
+    std::size_t allocated = 0;
+    std::size_t free = 0;
+    std::size_t fragmentation_pct = 0;
+    std::size_t free_blocks = 0;
+  };
+
+  /// @brief Copy the totals of @p allocator. Caller holds its lock.
+  void publish(const AllocatorEngine &allocator) noexcept {
+    const Values v{
+        .allocated = allocator.bytes_allocated(),
+        .free = allocator.bytes_free(),
+        .fragmentation_pct = allocator.fragmentation_pct(),
+        .free_blocks = allocator.free_block_count(),
+    };
+    const auto seq = seq_.load(std::memory_order_relaxed);
+    seq_.store(seq + 1, std::memory_order_relaxed);
+    std::atomic_thread_fence(std::memory_order_release);
+    allocated_.store(v.allocated, std::memory_order_relaxed);
+    free_.store(v.free, std::memory_order_relaxed);
+    fragmentation_pct_.store(v.fragmentation_pct, std::memory_order_relaxed);
+    free_blocks_.store(v.free_blocks, std::memory_order_relaxed);
+    seq_.store(seq + 2, std::memory_order_release);
+  }
+
+  [[nodiscard]] auto load() const noexcept -> Values {
+    for (;;) {
+      const auto seq = seq_.load(std::memory_order_acquire);
+      const Values v{
+          .allocated = allocated_.load(std::memory_order_relaxed),
+          .free = free_.load(std::memory_order_relaxed),
+          .fragmentation_pct =
+              fragmentation_pct_.load(std::memory_order_relaxed),
+          .free_blocks = free_blocks_.load(std::memory_order_relaxed),
+      };
+      std::atomic_thread_fence(std::memory_order_acquire);
+      if ((seq & 1) == 0 && seq_.load(std::memory_order_relaxed) == seq) {
+        return v;
+      }
+    }
+  }
+
+private:
+  std::atomic<std::uint64_t> seq_{0}; ///< Odd while publish() writes.
+  std::atomic<std::size_t> allocated_{0};
+  std::atomic<std::size_t> free_{0};
+  std::atomic<std::size_t> fragmentation_pct_{0};
+  std::atomic<std::size_t> free_blocks_{0};
+};
+
 /// @brief Thread-local tracker that writes to a ring buffer.
+///
+/// Events carry the totals last published to @p totals, which belong to
+/// @p allocator; the allocator itself is only asked for block orders.
 class LocalTracker {
 public:
-  explicit LocalTracker(FreeListAllocator &allocator,
-                        std::size_t sampling = 1) noexcept
-      : allocator_{allocator}, sampling_{sampling} {}
+  LocalTracker(const AllocatorEngine &allocator, const AllocatorTotals &totals,
+               std::size_t sampling = 1) noexcept
+      : allocator_{&allocator}, totals_{&totals}, sampling_{sampling} {}
 
   void record_alloc(BlockMetadata block) {
     if (++next_event_id_ % sampling_ != 0)
       return;
+    stamp_order(block);
 
+    const auto totals = totals_->load();
     AllocationEvent event{
         .type = EventType::Allocate,
         .block = std::move(block),
         .event_id = next_event_id_,
-        .total_allocated = allocator_.bytes_allocated(),
-        .total_free = allocator_.bytes_free(),
-        .fragmentation_pct = 0, // Calculated centrally to avoid overhead
-        .free_block_count = allocator_.free_block_count(),
+        .total_allocated = totals.allocated,
+        .total_free = totals.free,
+        .fragmentation_pct = totals.fragmentation_pct,
+        .free_block_count = totals.free_blocks,
     };
     event_buffer_.push(std::move(event));
   }
@@ -83,18 +147,121 @@ public:
         .actual_size = size,
         .timestamp = std::chrono::system_clock::now(),
     };
+    stamp_order(block);
+    const auto totals = totals_->load();
     AllocationEvent event{
         .type = EventType::Deallocate,
         .block = std::move(block),
         .event_id = next_event_id_,
-        .total_allocated = allocator_.bytes_allocated(),
-        .total_free = allocator_.bytes_free(),
-        .fragmentation_pct = 0,
-        .free_block_count = allocator_.free_block_count(),
+        .total_allocated = totals.allocated,
+        .total_free = totals.free,
+        .fragmentation_pct = totals.fragmentation_pct,
+        .free_block_count = totals.free_blocks,
+    };
+    event_buffer_.push(std::move(event));
+  }
+
+  /// @brief Record that a live block now has the size and actual_size of
+  /// @p block, without moving.
+  void record_resize(BlockMetadata block) {
+    if (++next_event_id_ % sampling_ != 0)
+      return;
+    stamp_order(block);
+
+    const auto totals = totals_->load();
+    AllocationEvent event{
+        .type = EventType::Resize,
+        .block = std::move(block),
+        .event_id = next_event_id_,
+        .total_allocated = totals.allocated,
+        .total_free = totals.free,
+        .fragmentation_pct = totals.fragmentation_pct,
+        .free_block_count = totals.free_blocks,
     };
     event_buffer_.push(std::move(event));
   }
 
+  /// @brief Record that @p used bytes of the region block @p block are
+  /// handed out.
+  void record_fill(BlockMetadata block, std::size_t used) {
+    if (++next_event_id_ % sampling_ != 0)
+      return;
+
+    const auto totals = totals_->load();
+    AllocationEvent event{
+        .type = EventType::Fill,
+        .block = std::move(block),
+        .event_id = next_event_id_,
+        .total_allocated = totals.allocated,
+        .total_free = totals.free,
+        .fragmentation_pct = totals.fragmentation_pct,
+        .free_block_count = totals.free_blocks,
+        .used = used,
+    };
+    event_buffer_.push(std::move(event));
+  }
+
+  /// @brief Record @p count equal-stride allocations as one event.
+  /// @param first  Metadata of the lowest-addressed block.
+  /// @param count  Number of blocks.
+  /// @param stride Offset step between consecutive blocks.
+  void record_alloc_batch(BlockMetadata first, std::size_t count,
+                          std::size_t stride) {
+    if (++next_event_id_ % sampling_ != 0)
+      return;
+    stamp_order(first);
+
+    const auto totals = totals_->load();
+    AllocationEvent event{
+        .type = EventType::Allocate,
+        .block = std::move(first),
+        .event_id = next_event_id_,
+        .total_allocated = totals.allocated,
+        .total_free = totals.free,
+        .fragmentation_pct = totals.fragmentation_pct,
+        .free_block_count = totals.free_blocks,
+        .count = count,
+        .stride = stride,
+    };
+    event_buffer_.push(std::move(event));
+  }
+
+  /// @brief Record @p count equal-stride deallocations as one event.
+  void record_dealloc_batch(std::size_t offset, std::size_t size,
+                            std::size_t count, std::size_t stride) {
+    if (++next_event_id_ % sampling_ != 0)
+      return;
+
+    BlockMetadata block{
+        .offset = offset,
+        .actual_size = size,
+        .timestamp = std::chrono::system_clock::now(),
+    };
+    stamp_order(block);
+    const auto totals = totals_->load();
+    AllocationEvent event{
+        .type = EventType::Deallocate,
+        .block = std::move(block),
+        .event_id = next_event_id_,
+        .total_allocated = totals.allocated,
+        .total_free = totals.free,
+        .fragmentation_pct = totals.fragmentation_pct,
+        .free_block_count = totals.free_blocks,
+        .count = count,
+        .stride = stride,
+    };
+    event_buffer_.push(std::move(event));
+  }
+
+  /// @brief Report on @p allocator and @p totals from now on, e.g. after
+  /// the owning thread moved to another shard. Buffered events and the
+  /// event count are kept.
+  void rebind(const AllocatorEngine &allocator,
+              const AllocatorTotals &totals) noexcept {
+    allocator_ = &allocator;
+    totals_ = &totals;
+  }
+
   // Drain events into a vector (called by server thread)
   void drain_to(std::vector<AllocationEvent> &out) {
     AllocationEvent evt;
@@ -104,7 +271,14 @@ public:
   }
 
 private:
-  FreeListAllocator &allocator_;
+  /// @brief Fill in the buddy order of @p block from its actual_size.
+  void stamp_order(BlockMetadata &block) const noexcept {
+    block.order =
+        static_cast<std::int8_t>(allocator_->block_order(block.actual_size));
+  }
+
+  const AllocatorEngine *allocator_;
+  const AllocatorTotals *totals_;
   RingBuffer<AllocationEvent, 4096> event_buffer_; // 4K events per thread
   std::size_t sampling_;
   std::size_t next_event_id_ = 0;
@@ -143,6 +143,7 @@ def main():
     try:
         snapshot_received = False
         event_batches_received = 0
+        tag_names = {}  # tag id -> name, from the snapshot and "tags" messages
         max_events = 5
         
         print("Waiting for messages...")
@@ -160,6 +161,10 @@ def main():
                 if "blocks" in data:
                     print("Received Snapshot")
                     snapshot_received = True
+                    tag_names.update(data.get("tags", {}))
+                elif data.get("type") == "tags":
+                    print(f"Received {len(data['tags'])} tag names")
+                    tag_names.update(data["tags"])
                 else:
                     print(f"Received unknown dict: {data.keys()}")
             
@@ -172,6 +177,8 @@ def main():
                     for f in required_fields:
                         if f not in evt:
                              raise Exception(f"Event missing field {f}: {evt}")
+                    if evt["tag"] != 0 and str(evt["tag"]) not in tag_names:
+                        raise Exception(f"Event tag id not in dictionary: {evt}")
                 event_batches_received += 1
                 
         if not snapshot_received:
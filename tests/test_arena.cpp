@@ -3,7 +3,10 @@
 
 #include "allocator/arena.hpp"
 
+#include <cstdint>
+#include <filesystem>
 #include <gtest/gtest.h>
+#include <unistd.h>
 
 using namespace mmap_viz;
 
@@ -79,3 +82,128 @@ TEST(ArenaTest, LargeArena) {
   ASSERT_TRUE(result.has_value());
   EXPECT_GE(result->capacity(), 64u * 1024 * 1024);
 }
+
+TEST(ArenaTest, DefaultUsesBasePages) {
+  auto result = Arena::create(4096);
+  ASSERT_TRUE(result.has_value());
+  EXPECT_EQ(result->huge_pages(), HugePages::None);
+  EXPECT_EQ(result->mapped_page_size(), Arena::page_size());
+}
+
+TEST(ArenaTest, TransparentHugePagesAreAligned) {
+  const auto hps = Arena::huge_page_size();
+  auto result = Arena::create(2 * hps, {.huge_pages = HugePages::Transparent});
+  ASSERT_TRUE(result.has_value());
+  EXPECT_NE(result->huge_pages(), HugePages::Explicit);
+  EXPECT_EQ(reinterpret_cast<std::uintptr_t>(result->base()) % hps, 0u);
+  EXPECT_EQ(result->capacity(), 2 * hps);
+}
+
+TEST(ArenaTest, MappedPageSizeIsWhatTheKernelBacked) {
+  const auto hps = Arena::huge_page_size();
+  auto base = Arena::create(2 * hps, {.populate = true});
+  ASSERT_TRUE(base.has_value());
+  EXPECT_EQ(base->mapped_page_size(), Arena::page_size());
+
+  // Whether THP promotes the range is up to the kernel, but the answer
+  // has to be one of the two.
+  auto thp = Arena::create(2 * hps, {.huge_pages = HugePages::Transparent,
+                                     .populate = true});
+  ASSERT_TRUE(thp.has_value());
+  const auto page = thp->mapped_page_size();
+  EXPECT_TRUE(page == Arena::page_size() || page == hps) << page;
+  if (thp->huge_pages() == HugePages::None) {
+    EXPECT_EQ(page, Arena::page_size());
+  }
+}
+
+TEST(ArenaTest, ExplicitHugePagesFallBack) {
+  // Succeeds whether or not the HugeTLB pool has pages reserved.
+  auto result = Arena::create(4096, {.huge_pages = HugePages::Explicit});
+  ASSERT_TRUE(result.has_value());
+  if (result->huge_pages() == HugePages::Explicit) {
+    EXPECT_EQ(result->capacity() % Arena::huge_page_size(), 0u);
+    EXPECT_EQ(result->mapped_page_size(), Arena::huge_page_size());
+  } else {
+    EXPECT_EQ(result->capacity(), 4096u);
+  }
+  result->base()[0] = std::byte{1};
+  EXPECT_EQ(result->base()[0], std::byte{1});
+}
+
+TEST(ArenaTest, PopulatedMemoryIsZeroed) {
+  auto result = Arena::create(1024 * 1024, {.populate = true});
+  ASSERT_TRUE(result.has_value());
+  for (std::size_t i = 0; i < result->capacity(); i += Arena::page_size()) {
+    EXPECT_EQ(result->base()[i], std::byte{0});
+  }
+}
+
+// ─── File-backed arenas ─────────────────────────────────────────────────
+
+static auto temp_arena_path(const char *name) -> std::filesystem::path {
+  return std::filesystem::temp_directory_path() /
+         (std::string(name) + "." + std::to_string(::getpid()) + ".arena");
+}
+
+TEST(ArenaTest, FileBackedContentsPersist) {
+  const auto path = temp_arena_path("persist");
+  {
+    auto arena = Arena::create_file(path, 64 * 1024);
+    ASSERT_TRUE(arena.has_value());
+    EXPECT_TRUE(arena->file_backed());
+    EXPECT_EQ(arena->capacity(), 64u * 1024);
+    EXPECT_EQ(reinterpret_cast<std::uintptr_t>(arena->base()) %
+                  Arena::huge_page_size(),
+              0u);
+    arena->base()[100] = std::byte{42};
+    EXPECT_TRUE(arena->sync().has_value());
+  }
+  EXPECT_EQ(std::filesystem::file_size(path), 64u * 1024);
+
+  // Capacity 0 maps the file at its current size.
+  auto again = Arena::create_file(path, 0);
+  ASSERT_TRUE(again.has_value());
+  EXPECT_EQ(again->capacity(), 64u * 1024);
+  EXPECT_EQ(again->base()[100], std::byte{42});
+  std::filesystem::remove(path);
+}
+
+TEST(ArenaTest, FileBackedMissingFileWithZeroCapacityFails) {
+  const auto path = temp_arena_path("empty");
+  auto arena = Arena::create_file(path, 0);
+  EXPECT_FALSE(arena.has_value());
+  std::filesystem::remove(path);
+}
+
+TEST(ArenaTest, AnonymousArenaIsNotFileBacked) {
+  auto arena = Arena::create(4096);
+  ASSERT_TRUE(arena.has_value());
+  EXPECT_FALSE(arena->file_backed());
+  EXPECT_TRUE(arena->sync().has_value());
+}
+
+// ─── Reserved arenas ────────────────────────────────────────────────────
+
+TEST(ArenaTest, ReserveThenCommit) {
+  const auto ps = Arena::page_size();
+  auto arena = Arena::reserve(1024 * ps);
+  ASSERT_TRUE(arena.has_value());
+  EXPECT_TRUE(arena->reserved());
+  EXPECT_EQ(arena->capacity(), 1024 * ps);
+
+  ASSERT_TRUE(arena->commit(4 * ps, 2 * ps).has_value());
+  arena->base()[4 * ps] = std::byte{7};
+  arena->base()[6 * ps - 1] = std::byte{9};
+  EXPECT_EQ(arena->base()[4 * ps], std::byte{7});
+
+  EXPECT_FALSE(arena->commit(ps / 2, ps).has_value());
+  EXPECT_FALSE(arena->commit(1024 * ps, ps).has_value());
+}
+
+TEST(ArenaTest, CommitIsNoOpForMappedArena) {
+  auto arena = Arena::create(4096);
+  ASSERT_TRUE(arena.has_value());
+  EXPECT_FALSE(arena->reserved());
+  EXPECT_TRUE(arena->commit(0, 4096).has_value());
+}
@@ -0,0 +1,139 @@
+/// @file test_biased_mutex.cpp
+/// @brief Unit tests for the owner-biased BiasedMutex.
+
+#include "interface/biased_mutex.hpp"
+
+#include <atomic>
+#include <gtest/gtest.h>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+using namespace mmap_viz;
+
+namespace {
+
+/// Lock and unlock @p n times from the calling thread.
+void churn(BiasedMutex &m, std::uint32_t n) {
+  for (std::uint32_t i = 0; i < n; ++i) {
+    std::lock_guard lock(m);
+  }
+}
+
+} // namespace
+
+TEST(BiasedMutexTest, StreakBiasesTowardsTheThread) {
+  BiasedMutex m;
+  churn(m, BiasedMutex::kBiasStreak - 1);
+  EXPECT_FALSE(m.biased());
+  EXPECT_EQ(m.fast_acquisitions(), 0u);
+
+  churn(m, 1);
+  if (!m.biased()) {
+    GTEST_SKIP() << "biasing unsupported in this build";
+  }
+  churn(m, 100);
+  EXPECT_EQ(m.fast_acquisitions(), 100u);
+  EXPECT_EQ(m.revocations(), 0u);
+}
+
+TEST(BiasedMutexTest, ForeignLockRevokesTheBias) {
+  BiasedMutex m;
+  churn(m, BiasedMutex::kBiasStreak);
+  if (!m.biased()) {
+    GTEST_SKIP() << "biasing unsupported in this build";
+  }
+  std::thread([&] { churn(m, 1); }).join();
+  EXPECT_FALSE(m.biased());
+  EXPECT_EQ(m.revocations(), 1u);
+
+  // The old owner is back on the mutex until it wins a new streak.
+  const auto fast = m.fast_acquisitions();
+  churn(m, BiasedMutex::kBiasStreak);
+  EXPECT_EQ(m.fast_acquisitions(), fast);
+}
+
+TEST(BiasedMutexTest, TryLockDoesNotWaitForTheOwner) {
+  BiasedMutex m;
+  churn(m, BiasedMutex::kBiasStreak);
+  if (!m.biased()) {
+    GTEST_SKIP() << "biasing unsupported in this build";
+  }
+  {
+    std::lock_guard lock(m);
+    bool taken = true;
+    std::thread([&] { taken = m.try_lock(); }).join();
+    EXPECT_FALSE(taken);
+    EXPECT_TRUE(m.biased()); // Handed back, not revoked.
+  }
+  bool taken = false;
+  std::thread([&] {
+    taken = m.try_lock();
+    if (taken) {
+      m.unlock();
+    }
+  }).join();
+  EXPECT_TRUE(taken);
+  EXPECT_FALSE(m.biased());
+  EXPECT_EQ(m.revocations(), 1u);
+}
+
+TEST(BiasedMutexTest, UnbiasedProbeKeepsTheBias) {
+  BiasedMutex m;
+  churn(m, BiasedMutex::kBiasStreak);
+  if (!m.biased()) {
+    GTEST_SKIP() << "biasing unsupported in this build";
+  }
+  bool taken = true;
+  std::thread([&] { taken = m.try_lock_unbiased(); }).join();
+  EXPECT_FALSE(taken);
+  EXPECT_TRUE(m.biased());
+  EXPECT_EQ(m.revocations(), 0u);
+
+  // The owner itself still gets in, through the fast path.
+  ASSERT_TRUE(m.try_lock_unbiased());
+  m.unlock();
+  EXPECT_EQ(m.fast_acquisitions(), 1u);
+}
+
+TEST(BiasedMutexTest, UnbiasedProbeTakesAnUnbiasedMutex) {
+  BiasedMutex m;
+  ASSERT_TRUE(m.try_lock_unbiased());
+  bool taken = true;
+  std::thread([&] { taken = m.try_lock_unbiased(); }).join();
+  EXPECT_FALSE(taken);
+  m.unlock();
+}
+
+TEST(BiasedMutexTest, DisabledNeverBiases) {
+  BiasedMutex m;
+  m.set_bias_enabled(false);
+  churn(m, 10 * BiasedMutex::kBiasStreak);
+  EXPECT_FALSE(m.biased());
+  EXPECT_EQ(m.fast_acquisitions(), 0u);
+}
+
+TEST(BiasedMutexTest, ExcludesAcrossRevocations) {
+  // One thread takes the lock in long runs, so it keeps regaining the bias,
+  // while the others interrupt it and force revocations.
+  BiasedMutex m;
+  std::uint64_t counter = 0; // Guarded by m.
+  constexpr int kThreads = 4;
+  constexpr std::uint64_t kRounds = 20000;
+  std::vector<std::thread> threads;
+  for (int t = 0; t < kThreads; ++t) {
+    threads.emplace_back([&, t] {
+      for (std::uint64_t i = 0; i < kRounds; ++i) {
+        if (t != 0 && i % 64 == 0) {
+          std::this_thread::yield();
+        }
+        std::lock_guard lock(m);
+        ++counter;
+      }
+    });
+  }
+  for (auto &t : threads) {
+    t.join();
+  }
+  EXPECT_EQ(counter, kThreads * kRounds);
+}
@@ -0,0 +1,218 @@
+/// @file test_buddy.cpp
+/// @brief Unit tests for the BuddyAllocator.
+
+#include "allocator/arena.hpp"
+#include "allocator/buddy.hpp"
+
+#include <cstring>
+#include <gtest/gtest.h>
+#include <random>
+#include <vector>
+
+using namespace mmap_viz;
+
+class BuddyTest : public ::testing::Test {
+protected:
+  void SetUp() override {
+    auto result = Arena::create(kArenaSize);
+    ASSERT_TRUE(result.has_value());
+    arena_ = std::make_unique<Arena>(std::move(*result));
+    alloc_ =
+        std::make_unique<BuddyAllocator>(arena_->base(), arena_->capacity());
+  }
+
+  /// Free extents in address order, checking they are disjoint and that
+  /// each is an aligned power of two.
+  auto free_extents() const -> std::vector<FreeExtent> {
+    std::vector<FreeExtent> out;
+    alloc_->for_each_free_extent([&](const FreeExtent &e) {
+      if (!out.empty()) {
+        EXPECT_LE(out.back().ptr + out.back().size, e.ptr);
+      }
+      EXPECT_TRUE(std::has_single_bit(e.size));
+      EXPECT_EQ(static_cast<std::size_t>(e.ptr - arena_->base()) % e.size,
+                0u);
+      out.push_back(e);
+    });
+    EXPECT_EQ(out.size(), alloc_->free_block_count());
+    return out;
+  }
+
+  static constexpr std::size_t kArenaSize = 64 * 1024; // 64 KB
+  std::unique_ptr<Arena> arena_;
+  std::unique_ptr<BuddyAllocator> alloc_;
+};
+
+TEST_F(BuddyTest, StartsAsOneRoot) {
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize);
+  EXPECT_EQ(alloc_->bytes_free(), kArenaSize);
+  EXPECT_EQ(alloc_->fragmentation_pct(), 0u);
+}
+
+TEST_F(BuddyTest, RoundsUpToAlignedPowersOfTwo) {
+  for (std::size_t size : {1, 16, 17, 100, 4096, 4097}) {
+    auto r = alloc_->allocate(size);
+    ASSERT_TRUE(r.has_value()) << size;
+    EXPECT_EQ(r->actual_size, std::bit_ceil(std::max<std::size_t>(size, 16)));
+    EXPECT_EQ(r->actual_size, alloc_->block_size_for(size));
+    EXPECT_EQ(r->offset % r->actual_size, 0u);
+    EXPECT_EQ(alloc_->block_order(r->actual_size),
+              std::countr_zero(r->actual_size) - 4);
+    std::memset(r->ptr, 0x5A, r->actual_size);
+  }
+  EXPECT_EQ(alloc_->block_order(48), -1);
+  EXPECT_EQ(alloc_->live_block_count(), 6u);
+  free_extents();
+}
+
+TEST_F(BuddyTest, SplitsOnceAndMergesBack) {
+  // One 16-byte block splits the 64 KB root into one free buddy per order.
+  auto a = alloc_->allocate(16);
+  ASSERT_TRUE(a.has_value());
+  EXPECT_EQ(a->ptr, arena_->base());
+  EXPECT_EQ(alloc_->free_block_count(), 12u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize / 2);
+
+  auto b = alloc_->allocate(16);
+  ASSERT_TRUE(b.has_value());
+  EXPECT_EQ(b->ptr, a->ptr + 16); // a's buddy.
+
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, 16).has_value());
+  ASSERT_TRUE(alloc_->deallocate(b->ptr, 16).has_value());
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize);
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+}
+
+TEST_F(BuddyTest, RejectsDoubleFreeAndBadPointers) {
+  auto a = alloc_->allocate(256);
+  auto b = alloc_->allocate(256);
+  ASSERT_TRUE(a && b);
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, 256).has_value());
+  EXPECT_EQ(alloc_->deallocate(a->ptr, 256).error(), AllocError::DoubleFree);
+
+  EXPECT_EQ(alloc_->deallocate(b->ptr + 64, 64).error(),
+            AllocError::BadPointer);
+  EXPECT_EQ(alloc_->deallocate(b->ptr, 512).error(), AllocError::BadPointer);
+  int outside = 0;
+  EXPECT_EQ(alloc_->deallocate(reinterpret_cast<std::byte *>(&outside), 4)
+                .error(),
+            AllocError::BadPointer);
+  // A smaller size still finds the block.
+  EXPECT_TRUE(alloc_->deallocate(b->ptr, 100).has_value());
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+
+  EXPECT_EQ(alloc_->allocate(64, 48).error(), AllocError::InvalidAlignment);
+}
+
+TEST_F(BuddyTest, AlignmentRaisesTheOrder) {
+  (void)alloc_->allocate(16);
+  auto r = alloc_->allocate(100, 4096);
+  ASSERT_TRUE(r.has_value());
+  EXPECT_EQ(r->actual_size, 4096u);
+  EXPECT_EQ(reinterpret_cast<std::uintptr_t>(r->ptr) % 4096, 0u);
+}
+
+TEST_F(BuddyTest, FillsExactlyWithPowerOfTwoBlocks) {
+  std::vector<AllocationResult> blocks;
+  while (auto r = alloc_->allocate(4096)) {
+    blocks.push_back(*r);
+  }
+  EXPECT_EQ(blocks.size(), kArenaSize / 4096);
+  EXPECT_EQ(alloc_->bytes_free(), 0u);
+  EXPECT_EQ(alloc_->allocate(16).error(), AllocError::OutOfMemory);
+  for (const auto &b : blocks) {
+    ASSERT_TRUE(alloc_->deallocate(b.ptr, 4096).has_value());
+  }
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize);
+}
+
+TEST_F(BuddyTest, ExtendsIntoFreeBuddies) {
+  auto a = alloc_->allocate(1024);
+  ASSERT_TRUE(a.has_value());
+
+  auto grown = alloc_->try_extend(a->ptr, 1024, 4000);
+  ASSERT_TRUE(grown.has_value());
+  EXPECT_EQ(grown->ptr, a->ptr);
+  EXPECT_EQ(grown->actual_size, 4096u);
+  EXPECT_EQ(alloc_->bytes_allocated(), 4096u);
+
+  auto neighbour = alloc_->allocate(4096);
+  ASSERT_TRUE(neighbour.has_value());
+  EXPECT_EQ(neighbour->ptr, a->ptr + 4096);
+  EXPECT_EQ(alloc_->try_extend(a->ptr, 4096, 8192).error(),
+            AllocError::OutOfMemory);
+
+  auto shrunk = alloc_->try_extend(a->ptr, 4096, 512);
+  ASSERT_TRUE(shrunk.has_value());
+  EXPECT_EQ(shrunk->actual_size, 512u);
+  EXPECT_EQ(alloc_->bytes_allocated(), 512u + 4096u);
+
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, 512).has_value());
+  ASSERT_TRUE(alloc_->deallocate(neighbour->ptr, 4096).has_value());
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+}
+
+TEST(BuddyGrowTest, OddSizedRegionGrowsIntoOneRoot) {
+  auto arena = Arena::create(64 * 1024);
+  ASSERT_TRUE(arena.has_value());
+  // 48 KB: roots of 32 KB and 16 KB.
+  BuddyAllocator alloc{arena->base(), 48 * 1024, 64 * 1024};
+  EXPECT_EQ(alloc.free_block_count(), 2u);
+  EXPECT_EQ(alloc.largest_free_block(), 32u * 1024);
+
+  auto tail = alloc.allocate(16 * 1024);
+  ASSERT_TRUE(tail.has_value());
+  auto head = alloc.allocate(8 * 1024);
+  ASSERT_TRUE(head.has_value());
+  EXPECT_EQ(tail->offset, 32u * 1024);
+
+  EXPECT_FALSE(alloc.grow(32 * 1024));
+  ASSERT_TRUE(alloc.grow(16 * 1024));
+  EXPECT_EQ(alloc.capacity(), 64u * 1024);
+
+  // Freeing both blocks merges everything into the new 64 KB root.
+  ASSERT_TRUE(alloc.deallocate(tail->ptr, 16 * 1024).has_value());
+  ASSERT_TRUE(alloc.deallocate(head->ptr, 8 * 1024).has_value());
+  EXPECT_EQ(alloc.free_block_count(), 1u);
+  EXPECT_EQ(alloc.largest_free_block(), 64u * 1024);
+}
+
+TEST_F(BuddyTest, RandomChurnKeepsAccountingConsistent) {
+  std::mt19937 rng{11};
+  std::vector<AllocationResult> live;
+
+  for (int i = 0; i < 20000; ++i) {
+    if (live.empty() || rng() % 3 != 0) {
+      const std::size_t size = std::size_t{16} << (rng() % 9);
+      if (auto r = alloc_->allocate(size - rng() % 8); r.has_value()) {
+        live.push_back(*r);
+      }
+    } else {
+      const auto idx = rng() % live.size();
+      ASSERT_TRUE(
+          alloc_->deallocate(live[idx].ptr, live[idx].actual_size).has_value());
+      live[idx] = live.back();
+      live.pop_back();
+    }
+    if (i % 1000 == 0) {
+      std::size_t used = 0;
+      for (const auto &b : live) {
+        used += b.actual_size;
+      }
+      ASSERT_EQ(alloc_->bytes_allocated(), used);
+      ASSERT_EQ(alloc_->live_block_count(), live.size());
+      std::size_t free = 0;
+      for (const auto &e : free_extents()) {
+        free += e.size;
+      }
+      ASSERT_EQ(free + used, kArenaSize);
+    }
+  }
+
+  for (const auto &b : live) {
+    ASSERT_TRUE(alloc_->deallocate(b.ptr, b.actual_size).has_value());
+  }
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+}
@@ -4,7 +4,13 @@
 #include "allocator/arena.hpp"
 #include "allocator/free_list.hpp"
 
+#include <algorithm>
+#include <array>
+#include <bit>
+#include <cstring>
+#include <filesystem>
 #include <gtest/gtest.h>
+#include <unistd.h>
 #include <vector>
 
 using namespace mmap_viz;
@@ -126,6 +132,69 @@ TEST_F(FreeListTest, FragmentationPattern) {
   EXPECT_GT(alloc_->free_block_count(), 1u);
 }
 
+TEST_F(FreeListTest, FragmentationPctFollowsHoles) {
+  // Tree blocks only: four 8 KB blocks followed by a 32 KB free tail.
+  std::vector<AllocationResult> blocks;
+  for (int i = 0; i < 4; ++i) {
+    auto r = alloc_->allocate(8192);
+    ASSERT_TRUE(r.has_value());
+    blocks.push_back(*r);
+  }
+  EXPECT_EQ(alloc_->fragmentation_pct(), 0u);
+
+  // Two 8 KB holes next to the 32 KB tail: 16 of 48 KB lie outside it.
+  ASSERT_TRUE(alloc_->deallocate(blocks[0].ptr, 8192));
+  ASSERT_TRUE(alloc_->deallocate(blocks[2].ptr, 8192));
+  EXPECT_EQ(alloc_->largest_free_block(), 32768u);
+  EXPECT_EQ(alloc_->fragmentation_pct(), 34u);
+
+  ASSERT_TRUE(alloc_->deallocate(blocks[1].ptr, 8192));
+  ASSERT_TRUE(alloc_->deallocate(blocks[3].ptr, 8192));
+  EXPECT_EQ(alloc_->fragmentation_pct(), 0u);
+}
+
+TEST_F(FreeListTest, HistogramAndLiveCountTrackChurn) {
+  auto check = [&](std::size_t live) {
+    const auto &hist = alloc_->free_histogram();
+    std::size_t total = 0;
+    std::size_t top = 0;
+    for (std::size_t i = 0; i < hist.size(); ++i) {
+      total += hist[i];
+      top = hist[i] != 0 ? i : top;
+    }
+    EXPECT_EQ(total, alloc_->free_block_count());
+    EXPECT_EQ(top, std::bit_width(alloc_->largest_free_block()) - 1u);
+    EXPECT_EQ(alloc_->live_block_count(), live);
+  };
+  check(0);
+
+  // Slab objects, tree blocks and a batch, freed out of order.
+  std::vector<AllocationResult> live;
+  for (std::size_t size : {24u, 5000u, 64u, 64u, 9000u, 700u, 6000u}) {
+    auto r = alloc_->allocate(size);
+    ASSERT_TRUE(r.has_value());
+    live.push_back(*r);
+    check(live.size());
+  }
+  std::array<AllocationResult, 4> batch{};
+  ASSERT_EQ(alloc_->allocate_batch(4800, 16, batch), batch.size());
+  check(live.size() + batch.size());
+
+  for (std::size_t i = 0; i < live.size(); i += 2) {
+    ASSERT_TRUE(alloc_->deallocate(live[i].ptr, live[i].actual_size));
+  }
+  std::erase_if(live,
+                [&](const auto &r) { return (&r - live.data()) % 2 == 0; });
+  check(live.size() + batch.size());
+
+  EXPECT_EQ(alloc_->deallocate_batch(batch), batch.size());
+  check(live.size());
+  for (const auto &r : live) {
+    ASSERT_TRUE(alloc_->deallocate(r.ptr, r.actual_size));
+  }
+  check(0);
+}
+
 TEST_F(FreeListTest, DeallocateNullptr) {
   auto result = alloc_->deallocate(nullptr, 0);
   EXPECT_TRUE(result.has_value()); // Should be a no-op.
@@ -137,3 +206,718 @@ TEST_F(FreeListTest, BadPointer) {
   EXPECT_FALSE(result.has_value());
   EXPECT_EQ(result.error(), AllocError::BadPointer);
 }
+
+// ─── Placement policies ─────────────────────────────────────────────────
+// Sizes stay above the slab limit (4 KB) so every request hits the tree.
+
+class PlacementPolicyTest : public ::testing::TestWithParam<PlacementPolicy> {
+protected:
+  void SetUp() override {
+    auto result = Arena::create(kArenaSize);
+    ASSERT_TRUE(result.has_value());
+    arena_ = std::make_unique<Arena>(std::move(*result));
+    alloc_ = std::make_unique<FreeListAllocator>(
+        arena_->base(), arena_->capacity(), GetParam());
+  }
+
+  static constexpr std::size_t kArenaSize = 256 * 1024;
+  std::unique_ptr<Arena> arena_;
+  std::unique_ptr<FreeListAllocator> alloc_;
+};
+
+TEST_P(PlacementPolicyTest, ChurnPreservesAccounting) {
+  std::vector<AllocationResult> live;
+  for (int round = 0; round < 4; ++round) {
+    for (std::size_t sz : {4200u, 6000u, 5000u, 9000u, 4500u}) {
+      auto r = alloc_->allocate(sz);
+      ASSERT_TRUE(r.has_value());
+      live.push_back(*r);
+    }
+    for (std::size_t i = 0; i < live.size(); i += 2) {
+      ASSERT_TRUE(alloc_->deallocate(live[i].ptr, live[i].actual_size));
+    }
+    std::erase_if(live, [&](const auto &r) {
+      return (&r - live.data()) % 2 == 0;
+    });
+  }
+  for (const auto &r : live) {
+    ASSERT_TRUE(alloc_->deallocate(r.ptr, r.actual_size));
+  }
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+  EXPECT_EQ(alloc_->largest_free_block(), alloc_->capacity());
+  EXPECT_EQ(alloc_->policy(), GetParam());
+}
+
+INSTANTIATE_TEST_SUITE_P(AllPolicies, PlacementPolicyTest,
+                         ::testing::Values(PlacementPolicy::FirstFit,
+                                           PlacementPolicy::BestFit,
+                                           PlacementPolicy::NextFit),
+                         [](const auto &info) {
+                           return std::string(to_string(info.param));
+                         });
+
+namespace {
+constexpr std::size_t kBigHole = 8192;
+constexpr std::size_t kSmallHole = 5120;
+constexpr std::size_t kGuard = 4608;
+constexpr std::size_t kRequest = 4800;
+
+/// Lays out [big hole][guard][small hole][guard] at the front of the arena.
+auto make_two_holes(FreeListAllocator &alloc)
+    -> std::pair<std::byte *, std::byte *> {
+  auto big = alloc.allocate(kBigHole);
+  auto g1 = alloc.allocate(kGuard);
+  auto small = alloc.allocate(kSmallHole);
+  auto g2 = alloc.allocate(kGuard);
+  EXPECT_TRUE(big && g1 && small && g2);
+  alloc.deallocate(big->ptr, big->actual_size);
+  alloc.deallocate(small->ptr, small->actual_size);
+  return {big->ptr, small->ptr};
+}
+} // namespace
+
+TEST_F(FreeListTest, FirstFitTakesLowestAddress) {
+  auto [big, small] = make_two_holes(*alloc_);
+  auto r = alloc_->allocate(kRequest);
+  ASSERT_TRUE(r.has_value());
+  EXPECT_EQ(r->ptr, big);
+}
+
+TEST(FreeListPolicyTest, BestFitTakesSmallestHole) {
+  auto arena = Arena::create(64 * 1024).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity(),
+                          PlacementPolicy::BestFit};
+  auto [big, small] = make_two_holes(alloc);
+  auto r = alloc.allocate(kRequest);
+  ASSERT_TRUE(r.has_value());
+  EXPECT_EQ(r->ptr, small);
+  EXPECT_EQ(alloc.largest_free_block(),
+            arena.capacity() - (kBigHole + kGuard + kSmallHole + kGuard));
+}
+
+TEST(FreeListPolicyTest, NextFitResumesAfterLastPlacement) {
+  auto arena = Arena::create(64 * 1024).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity(),
+                          PlacementPolicy::NextFit};
+  auto [big, small] = make_two_holes(alloc);
+  // The cursor sits after the last guard, so the tail block is used first.
+  auto r1 = alloc.allocate(kRequest);
+  ASSERT_TRUE(r1.has_value());
+  EXPECT_GT(r1->ptr, small);
+
+  // Once the tail cannot satisfy a request, the search wraps to the front.
+  auto tail = alloc.allocate(alloc.largest_free_block());
+  ASSERT_TRUE(tail.has_value());
+  auto r2 = alloc.allocate(kRequest);
+  ASSERT_TRUE(r2.has_value());
+  EXPECT_EQ(r2->ptr, big);
+}
+
+// ─── Slab size classes ──────────────────────────────────────────────────
+
+TEST_F(FreeListTest, SmallAllocationsShareARun) {
+  std::vector<AllocationResult> results;
+  for (int i = 0; i < 10; ++i) {
+    auto r = alloc_->allocate(100);
+    ASSERT_TRUE(r.has_value());
+    EXPECT_EQ(r->actual_size, 112u); // Rounded to the 112-byte class.
+    results.push_back(*r);
+  }
+  auto page = [](std::byte *p) {
+    return reinterpret_cast<std::uintptr_t>(p) / 4096;
+  };
+  for (const auto &r : results) {
+    EXPECT_EQ(page(r.ptr), page(results.front().ptr));
+  }
+  for (const auto &r : results) {
+    ASSERT_TRUE(alloc_->deallocate(r.ptr, r.actual_size));
+  }
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+}
+
+TEST_F(FreeListTest, EmptyRunsReturnToTree) {
+  // 256-byte objects live in 4 KB runs of 15 slots; fill three runs.
+  std::vector<AllocationResult> results;
+  for (int i = 0; i < 45; ++i) {
+    auto r = alloc_->allocate(256);
+    ASSERT_TRUE(r.has_value());
+    results.push_back(*r);
+  }
+  for (const auto &r : results) {
+    ASSERT_TRUE(alloc_->deallocate(r.ptr, r.actual_size));
+  }
+  // One empty run stays cached for the class; the others coalesced away.
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+  EXPECT_EQ(alloc_->largest_free_block(), alloc_->capacity() - 4096);
+  EXPECT_EQ(alloc_->free_block_count(), 2u);
+}
+
+TEST_F(FreeListTest, SlabDoubleFree) {
+  auto r = alloc_->allocate(64);
+  ASSERT_TRUE(r.has_value());
+  ASSERT_TRUE(alloc_->deallocate(r->ptr, 64));
+  auto again = alloc_->deallocate(r->ptr, 64);
+  ASSERT_FALSE(again.has_value());
+  EXPECT_EQ(again.error(), AllocError::DoubleFree);
+}
+
+TEST(FreeListSlabTest, TinyArenaUsesTree) {
+  // 16 KB cannot hold enough runs, so small requests go to the tree.
+  auto arena = Arena::create(16 * 1024).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity()};
+  auto r = alloc.allocate(64);
+  ASSERT_TRUE(r.has_value());
+  EXPECT_EQ(alloc.largest_free_block(), arena.capacity() - 64);
+  ASSERT_TRUE(alloc.deallocate(r->ptr, r->actual_size));
+  EXPECT_EQ(alloc.largest_free_block(), arena.capacity());
+}
+
+TEST(FreeListSlabTest, TreeBlocksPackAtSixteenBytes) {
+  // Free nodes are 16 bytes, so tree blocks need no larger minimum.
+  auto arena = Arena::create(16 * 1024).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity()};
+  std::vector<AllocationResult> blocks;
+  while (auto r = alloc.allocate(1)) {
+    EXPECT_EQ(r->actual_size, 16u);
+    blocks.push_back(*r);
+  }
+  ASSERT_EQ(blocks.size(), arena.capacity() / 16);
+
+  // Every other block freed leaves isolated 16-byte holes, each reusable.
+  for (std::size_t i = 0; i < blocks.size(); i += 2) {
+    ASSERT_TRUE(alloc.deallocate(blocks[i].ptr, blocks[i].actual_size));
+    EXPECT_EQ(alloc.free_block_at(blocks[i].ptr), 16u);
+  }
+  EXPECT_EQ(alloc.free_block_count(), blocks.size() / 2);
+  EXPECT_EQ(alloc.largest_free_block(), 16u);
+  for (std::size_t i = 0; i < blocks.size(); i += 2) {
+    auto r = alloc.allocate(16);
+    ASSERT_TRUE(r.has_value());
+    EXPECT_EQ(r->ptr, blocks[i].ptr);
+  }
+  EXPECT_EQ(alloc.free_block_count(), 0u);
+}
+
+TEST(FreeListSlabTest, SixteenByteTailStaysAllocatable) {
+  auto arena = Arena::create(16 * 1024).value();
+  FreeListAllocator alloc{arena.base(), arena.capacity()};
+  auto big = alloc.allocate(arena.capacity() - 16);
+  ASSERT_TRUE(big.has_value());
+  EXPECT_EQ(alloc.largest_free_block(), 16u);
+  EXPECT_EQ(alloc.free_block_at(big->ptr + big->actual_size), 16u);
+  EXPECT_EQ(alloc.free_block_at(big->ptr), 0u);
+  auto tail = alloc.allocate(8);
+  ASSERT_TRUE(tail.has_value());
+  EXPECT_EQ(tail->ptr, big->ptr + big->actual_size);
+  EXPECT_EQ(alloc.bytes_free(), 0u);
+}
+
+// ─── Batch API ──────────────────────────────────────────────────────────
+
+TEST_F(FreeListTest, BatchCarvesContiguousBlocks) {
+  std::array<AllocationResult, 8> out{};
+  ASSERT_EQ(alloc_->allocate_batch(5000, 16, out), out.size());
+  for (std::size_t i = 1; i < out.size(); ++i) {
+    EXPECT_EQ(out[i].ptr, out[i - 1].ptr + out[i - 1].actual_size);
+  }
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+
+  // Pieces of a batch can be freed individually.
+  ASSERT_TRUE(alloc_->deallocate(out[3].ptr, out[3].actual_size));
+  EXPECT_EQ(alloc_->free_block_count(), 2u);
+}
+
+TEST_F(FreeListTest, BatchStopsShortOnExhaustion) {
+  std::array<AllocationResult, 16> out{};
+  std::size_t n = alloc_->allocate_batch(8192, 16, out);
+  EXPECT_GT(n, 0u);
+  EXPECT_LT(n, out.size());
+  EXPECT_EQ(alloc_->deallocate_batch(std::span(out.data(), n)), n);
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize);
+}
+
+TEST_F(FreeListTest, BatchDeallocateMixedSlabAndTree) {
+  std::array<AllocationResult, 20> small{};
+  std::array<AllocationResult, 4> large{};
+  ASSERT_EQ(alloc_->allocate_batch(100, 16, small), small.size());
+  ASSERT_EQ(alloc_->allocate_batch(6000, 64, large), large.size());
+  for (const auto &r : large) {
+    EXPECT_EQ(reinterpret_cast<std::uintptr_t>(r.ptr) % 64, 0u);
+  }
+
+  std::vector<AllocationResult> all(small.begin(), small.end());
+  all.insert(all.end(), large.rbegin(), large.rend());
+  EXPECT_EQ(alloc_->deallocate_batch(all), all.size());
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+}
+
+// ─── Free extents ───────────────────────────────────────────────────────
+
+TEST_F(FreeListTest, FreeExtentsMergeTreeAndSlotsInOrder) {
+  std::vector<AllocationResult> small;
+  std::vector<AllocationResult> large;
+  for (int i = 0; i < 3; ++i) {
+    auto s = alloc_->allocate(32);
+    auto l = alloc_->allocate(5000);
+    ASSERT_TRUE(s && l);
+    small.push_back(*s);
+    large.push_back(*l);
+  }
+  ASSERT_TRUE(alloc_->run_layout(small[0].ptr).begin != nullptr);
+  EXPECT_EQ(alloc_->run_layout(large[0].ptr).begin, nullptr);
+  ASSERT_TRUE(alloc_->deallocate(small[1].ptr, 32));
+  ASSERT_TRUE(alloc_->deallocate(large[1].ptr, large[1].actual_size));
+
+  std::vector<FreeExtent> extents;
+  for (const auto &e : alloc_->free_extents()) {
+    extents.push_back(e);
+  }
+  EXPECT_EQ(extents.size(), alloc_->free_block_count());
+  for (std::size_t i = 1; i < extents.size(); ++i) {
+    EXPECT_GE(extents[i].ptr, extents[i - 1].ptr + extents[i - 1].size);
+  }
+  auto starts_at = [&](const std::byte *p) {
+    return std::ranges::any_of(extents,
+                               [&](const FreeExtent &e) { return e.ptr == p; });
+  };
+  EXPECT_TRUE(starts_at(small[1].ptr));
+  EXPECT_TRUE(starts_at(large[1].ptr));
+  EXPECT_FALSE(starts_at(small[0].ptr));
+  EXPECT_FALSE(starts_at(large[0].ptr));
+}
+
+TEST_F(FreeListTest, FreeExtentsOfEmptyAllocatorCoverIt) {
+  std::size_t count = 0;
+  for (const auto &e : alloc_->free_extents()) {
+    EXPECT_EQ(e.ptr, arena_->base());
+    EXPECT_EQ(e.size, alloc_->capacity());
+    ++count;
+  }
+  EXPECT_EQ(count, 1u);
+}
+
+// ─── In-place resize ────────────────────────────────────────────────────
+
+TEST_F(FreeListTest, AllocateBelowTakesLowestHoleUnderLimit) {
+  auto a = alloc_->allocate(8192);
+  auto b = alloc_->allocate(8192);
+  auto c = alloc_->allocate(8192);
+  ASSERT_TRUE(a && b && c);
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, 8192));
+
+  // The hole below b fits; nothing below a does.
+  auto moved = alloc_->allocate_below(4096 + 16, 16, c->ptr);
+  ASSERT_TRUE(moved.has_value());
+  EXPECT_EQ(moved->ptr, a->ptr);
+  EXPECT_FALSE(alloc_->allocate_below(4096, 16, a->ptr).has_value());
+  // The free tail lies above the limit and is not used either.
+  EXPECT_FALSE(alloc_->allocate_below(8192, 16, c->ptr).has_value());
+  EXPECT_EQ(alloc_->live_block_count(), 3u);
+}
+
+TEST_F(FreeListTest, ExtendAbsorbsFreeSuccessor) {
+  auto a = alloc_->allocate(5000);
+  auto b = alloc_->allocate(5000);
+  auto c = alloc_->allocate(5000);
+  ASSERT_TRUE(a && b && c);
+  ASSERT_TRUE(alloc_->deallocate(b->ptr, b->actual_size));
+  const auto before = alloc_->bytes_allocated();
+
+  auto grown = alloc_->try_extend(a->ptr, a->actual_size, 8000);
+  ASSERT_TRUE(grown.has_value());
+  EXPECT_EQ(grown->ptr, a->ptr);
+  EXPECT_EQ(grown->actual_size, 8000u);
+  EXPECT_EQ(alloc_->bytes_allocated(), before + 8000 - a->actual_size);
+
+  // The rest of b stays free, but is too small for another 4 KB.
+  auto blocked = alloc_->try_extend(a->ptr, grown->actual_size, 12000);
+  ASSERT_FALSE(blocked.has_value());
+  EXPECT_EQ(blocked.error(), AllocError::OutOfMemory);
+  EXPECT_EQ(alloc_->bytes_allocated(), before + 8000 - a->actual_size);
+}
+
+TEST_F(FreeListTest, ShrinkReleasesTail) {
+  auto a = alloc_->allocate(8000);
+  auto c = alloc_->allocate(5000);
+  ASSERT_TRUE(a && c);
+
+  auto shrunk = alloc_->try_extend(a->ptr, a->actual_size, 4800);
+  ASSERT_TRUE(shrunk.has_value());
+  EXPECT_EQ(shrunk->actual_size, 4800u);
+  EXPECT_EQ(alloc_->bytes_allocated(), 4800u + c->actual_size);
+
+  // The freed tail is a block of its own and can be taken back.
+  EXPECT_EQ(alloc_->free_block_count(), 2u);
+  auto regrown = alloc_->try_extend(a->ptr, shrunk->actual_size, 8000);
+  ASSERT_TRUE(regrown.has_value());
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+}
+
+TEST_F(FreeListTest, SlabObjectResizesWithinItsClass) {
+  auto r = alloc_->allocate(40);
+  ASSERT_TRUE(r.has_value());
+  auto same = alloc_->try_extend(r->ptr, r->actual_size, r->actual_size);
+  ASSERT_TRUE(same.has_value());
+  EXPECT_EQ(same->actual_size, r->actual_size);
+  EXPECT_FALSE(alloc_->try_extend(r->ptr, r->actual_size, 2 * r->actual_size)
+                   .has_value());
+}
+
+// ─── Deferred coalescing ────────────────────────────────────────────────
+
+TEST_F(FreeListTest, DeferredFreesMergeInOneSweep) {
+  alloc_->set_deferred_coalescing(64);
+  std::vector<AllocationResult> blocks;
+  for (int i = 0; i < 8; ++i) {
+    auto r = alloc_->allocate(5000);
+    ASSERT_TRUE(r.has_value());
+    blocks.push_back(*r);
+  }
+  // Freed out of order; each one only joins the pending list.
+  for (std::size_t i : {3, 0, 6, 1, 7, 2, 5, 4}) {
+    ASSERT_TRUE(alloc_->deallocate(blocks[i].ptr, blocks[i].actual_size));
+  }
+  EXPECT_EQ(alloc_->pending_frees(), 8u);
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+  EXPECT_EQ(alloc_->free_block_count(), 9u); // Pending blocks plus the tail.
+  EXPECT_LT(alloc_->largest_free_block(), kArenaSize);
+
+  alloc_->coalesce();
+  EXPECT_EQ(alloc_->pending_frees(), 0u);
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize);
+  EXPECT_EQ(alloc_->free_histogram()[std::bit_width(kArenaSize) - 1], 1u);
+}
+
+TEST_F(FreeListTest, DeferredCoalescingSweepsAtThresholdAndOnMiss) {
+  alloc_->set_deferred_coalescing(4);
+  std::vector<AllocationResult> blocks;
+  while (auto r = alloc_->allocate(5000)) {
+    blocks.push_back(*r);
+  }
+  ASSERT_GE(blocks.size(), 8u);
+  for (std::size_t i = 0; i < 3; ++i) {
+    ASSERT_TRUE(alloc_->deallocate(blocks[i].ptr, blocks[i].actual_size));
+  }
+  EXPECT_EQ(alloc_->pending_frees(), 3u);
+  ASSERT_TRUE(alloc_->deallocate(blocks[3].ptr, blocks[3].actual_size));
+  EXPECT_EQ(alloc_->pending_frees(), 0u);
+
+  // Two more pending frees are needed, merged, for this request.
+  for (std::size_t i = 4; i < 6; ++i) {
+    ASSERT_TRUE(alloc_->deallocate(blocks[i].ptr, blocks[i].actual_size));
+  }
+  auto big = alloc_->allocate(5 * blocks[0].actual_size);
+  ASSERT_TRUE(big.has_value());
+  EXPECT_EQ(big->ptr, blocks[0].ptr);
+  EXPECT_EQ(alloc_->pending_frees(), 0u);
+
+  // Switching back to eager coalescing sweeps what is left.
+  ASSERT_TRUE(alloc_->deallocate(blocks[7].ptr, blocks[7].actual_size));
+  EXPECT_EQ(alloc_->pending_frees(), 1u);
+  alloc_->set_deferred_coalescing(0);
+  EXPECT_EQ(alloc_->pending_frees(), 0u);
+}
+
+TEST_F(FreeListTest, DeferredDoubleFreeIsRejected) {
+  alloc_->set_deferred_coalescing(64);
+  auto a = alloc_->allocate(8192);
+  auto b = alloc_->allocate(8192);
+  ASSERT_TRUE(a && b);
+
+  // Once at the head of the pending list, once further down.
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, a->actual_size));
+  EXPECT_EQ(alloc_->deallocate(a->ptr, a->actual_size).error(),
+            AllocError::DoubleFree);
+  ASSERT_TRUE(alloc_->deallocate(b->ptr, b->actual_size));
+  EXPECT_EQ(alloc_->deallocate(a->ptr, a->actual_size).error(),
+            AllocError::DoubleFree);
+  std::array blocks{*a};
+  EXPECT_EQ(alloc_->deallocate_batch(blocks), 0u);
+  EXPECT_EQ(alloc_->pending_frees(), 2u);
+
+  alloc_->coalesce();
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize);
+}
+
+TEST_F(FreeListTest, DeferredShrinkAndExtendSeeTheSameBlocks) {
+  alloc_->set_deferred_coalescing(16);
+  auto a = alloc_->allocate(8000);
+  auto guard = alloc_->allocate(5000);
+  ASSERT_TRUE(a && guard);
+
+  // The shrunk tail is pending; growing back has to find it in the tree.
+  ASSERT_TRUE(alloc_->try_extend(a->ptr, a->actual_size, 5000).has_value());
+  EXPECT_EQ(alloc_->pending_frees(), 1u);
+  auto grown = alloc_->try_extend(a->ptr, 5000, 8000);
+  ASSERT_TRUE(grown.has_value());
+  EXPECT_EQ(grown->actual_size, a->actual_size);
+  EXPECT_EQ(alloc_->pending_frees(), 0u);
+}
+
+TEST_P(PlacementPolicyTest, DeferredChurnMatchesEagerAccounting) {
+  alloc_->set_deferred_coalescing(7);
+  std::vector<AllocationResult> live;
+  unsigned seed = 12345;
+  auto next = [&] {
+    seed = seed * 1103515245 + 12345;
+    return seed >> 8;
+  };
+  for (int i = 0; i < 4000; ++i) {
+    if (live.empty() || next() % 3 != 0) {
+      if (auto r = alloc_->allocate(4100 + next() % 8000); r.has_value()) {
+        live.push_back(*r);
+      }
+    } else {
+      const auto idx = next() % live.size();
+      ASSERT_TRUE(
+          alloc_->deallocate(live[idx].ptr, live[idx].actual_size).has_value());
+      live[idx] = live.back();
+      live.pop_back();
+    }
+    if (i % 500 == 0) {
+      std::size_t in_histogram = 0;
+      for (auto n : alloc_->free_histogram()) {
+        in_histogram += n;
+      }
+      EXPECT_EQ(in_histogram, alloc_->free_block_count());
+
+      alloc_->coalesce();
+      std::size_t free = 0;
+      std::size_t count = 0;
+      const std::byte *prev_end = nullptr;
+      for (const auto &e : alloc_->free_extents()) {
+        EXPECT_LT(prev_end, e.ptr); // Adjacent blocks were merged.
+        prev_end = e.ptr + e.size;
+        free += e.size;
+        ++count;
+      }
+      EXPECT_EQ(count, alloc_->free_block_count());
+      EXPECT_EQ(free, alloc_->bytes_free());
+    }
+  }
+  for (const auto &r : live) {
+    ASSERT_TRUE(alloc_->deallocate(r.ptr, r.actual_size));
+  }
+  alloc_->coalesce();
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), alloc_->capacity());
+}
+
+// ─── Growth ─────────────────────────────────────────────────────────────
+
+TEST(GrowableFreeListTest, GrowExtendsFreeTail) {
+  constexpr std::size_t kReserve = 256 * 1024;
+  auto arena = Arena::create(kReserve).value();
+  FreeListAllocator alloc{arena.base(), 16 * 1024, PlacementPolicy::FirstFit,
+                          kReserve};
+  EXPECT_EQ(alloc.max_capacity(), kReserve);
+
+  auto a = alloc.allocate(8 * 1024, 16);
+  ASSERT_TRUE(a.has_value());
+  EXPECT_FALSE(alloc.allocate(32 * 1024, 16).has_value());
+
+  ASSERT_TRUE(alloc.grow(48 * 1024));
+  EXPECT_EQ(alloc.capacity(), 64u * 1024);
+  // The new range merged with the old free tail.
+  EXPECT_EQ(alloc.free_block_count(), 1u);
+  auto b = alloc.allocate(32 * 1024, 16);
+  ASSERT_TRUE(b.has_value());
+  EXPECT_TRUE(alloc.contains(b->ptr + 32 * 1024 - 1));
+
+  EXPECT_FALSE(alloc.grow(kReserve));
+  EXPECT_FALSE(alloc.grow(100)); // Not a multiple of 16.
+  ASSERT_TRUE(alloc.grow(kReserve - alloc.capacity()));
+  EXPECT_EQ(alloc.capacity(), kReserve);
+  EXPECT_FALSE(alloc.grow(16));
+}
+
+// ─── Page decommit ──────────────────────────────────────────────────────
+
+TEST_F(FreeListTest, PurgeReleasesWholeFreePages) {
+  const auto ps = Arena::page_size();
+  EXPECT_EQ(alloc_->committed_bytes(), kArenaSize);
+
+  std::size_t released = alloc_->purge(ps);
+  EXPECT_GT(released, 0u);
+  EXPECT_EQ(released % ps, 0u);
+  EXPECT_EQ(alloc_->committed_bytes(), kArenaSize - released);
+
+  // A second pass has nothing left to release.
+  EXPECT_EQ(alloc_->purge(ps), 0u);
+}
+
+TEST_F(FreeListTest, PurgeSkipsSmallBlocks) {
+  auto a = alloc_->allocate(kArenaSize - 1024, 16);
+  ASSERT_TRUE(a.has_value());
+  EXPECT_EQ(alloc_->purge(2048), 0u);
+  EXPECT_EQ(alloc_->committed_bytes(), kArenaSize);
+}
+
+TEST_F(FreeListTest, AllocationAfterPurgeRecommits) {
+  const auto ps = Arena::page_size();
+  alloc_->purge(ps);
+
+  auto r = alloc_->allocate(kArenaSize / 2, 16);
+  ASSERT_TRUE(r.has_value());
+  EXPECT_LE(r->zeroed_end, r->actual_size);
+#ifdef __linux__
+  // DONTNEED refaults zero pages; the range covers whole pages only.
+  EXPECT_GT(r->zeroed_end, r->zeroed_begin);
+  EXPECT_EQ((reinterpret_cast<std::uintptr_t>(r->ptr) + r->zeroed_begin) % ps,
+            0u);
+  for (auto i = r->zeroed_begin; i < r->zeroed_end; ++i) {
+    ASSERT_EQ(r->ptr[i], std::byte{0});
+  }
+#endif
+  EXPECT_GE(alloc_->committed_bytes(), r->actual_size);
+  ASSERT_TRUE(alloc_->deallocate(r->ptr, r->actual_size));
+}
+
+TEST_F(FreeListTest, PurgeDropsResidentBytes) {
+  const auto ps = Arena::page_size();
+  for (std::size_t off = 0; off < kArenaSize; off += ps) {
+    arena_->base()[off] = std::byte{1};
+  }
+  std::size_t before = alloc_->resident_bytes();
+  EXPECT_EQ(before, kArenaSize);
+  std::size_t released = alloc_->purge(ps, DecommitMode::DontNeed);
+  EXPECT_EQ(alloc_->resident_bytes(), before - released);
+}
+
+// ─── Persistent allocators ──────────────────────────────────────────────
+
+TEST(PersistentFreeListTest, AttachRestoresState) {
+  constexpr std::size_t kSize = 1024 * 1024;
+  auto arena = Arena::create(kSize).value();
+  std::vector<std::size_t> offsets;
+  std::size_t allocated = 0;
+  std::size_t free_blocks = 0;
+  std::array<std::size_t, FreeListAllocator::kHistogramBuckets> histogram{};
+  {
+    auto alloc = FreeListAllocator::format(arena.base(), kSize).value();
+    EXPECT_TRUE(alloc->persistent());
+    for (std::size_t size : {24, 100, 5000, 64, 30000, 700}) {
+      auto r = alloc->allocate(size, 16);
+      ASSERT_TRUE(r.has_value());
+      offsets.push_back(r->offset);
+    }
+    ASSERT_TRUE(alloc->deallocate(alloc->base() + offsets[2], 5000));
+    allocated = alloc->bytes_allocated();
+    free_blocks = alloc->free_block_count();
+    histogram = alloc->free_histogram();
+  }
+
+  auto alloc = FreeListAllocator::attach(arena.base(), kSize);
+  ASSERT_TRUE(alloc.has_value());
+  EXPECT_EQ((*alloc)->bytes_allocated(), allocated);
+  EXPECT_EQ((*alloc)->free_block_count(), free_blocks);
+  EXPECT_EQ((*alloc)->live_block_count(), offsets.size() - 1);
+  EXPECT_EQ((*alloc)->free_histogram(), histogram);
+  ASSERT_TRUE((*alloc)->deallocate((*alloc)->base() + offsets[0], 24));
+  ASSERT_TRUE((*alloc)->deallocate((*alloc)->base() + offsets[4], 30000));
+  EXPECT_TRUE((*alloc)->allocate(20000, 16).has_value());
+}
+
+TEST(PersistentFreeListTest, DetachSweepsPendingFrees) {
+  constexpr std::size_t kSize = 1024 * 1024;
+  auto arena = Arena::create(kSize).value();
+  std::size_t capacity = 0;
+  {
+    auto alloc = FreeListAllocator::format(arena.base(), kSize).value();
+    alloc->set_deferred_coalescing(100);
+    capacity = alloc->capacity();
+    auto a = alloc->allocate(30000, 16);
+    auto b = alloc->allocate(30000, 16);
+    ASSERT_TRUE(a && b);
+    ASSERT_TRUE(alloc->deallocate(a->ptr, a->actual_size));
+    ASSERT_TRUE(alloc->deallocate(b->ptr, b->actual_size));
+    EXPECT_EQ(alloc->pending_frees(), 2u);
+  }
+
+  auto alloc = FreeListAllocator::attach(arena.base(), kSize);
+  ASSERT_TRUE(alloc.has_value());
+  EXPECT_EQ((*alloc)->pending_frees(), 0u);
+  EXPECT_EQ((*alloc)->free_block_count(), 1u);
+  EXPECT_EQ((*alloc)->largest_free_block(), capacity);
+}
+
+TEST(PersistentFreeListTest, AttachRelocatesMovedRegion) {
+  constexpr std::size_t kSize = 1024 * 1024;
+  auto a = Arena::create(kSize).value();
+  auto b = Arena::create(kSize + FreeListAllocator::kMaxRunBytes).value();
+  // Place the copy at the same address modulo the largest run size.
+  constexpr auto kRun = FreeListAllocator::kMaxRunBytes;
+  auto *target = b.base() + (reinterpret_cast<std::uintptr_t>(a.base()) -
+                             reinterpret_cast<std::uintptr_t>(b.base())) %
+                                kRun;
+  std::vector<std::size_t> offsets;
+  {
+    auto alloc = FreeListAllocator::format(a.base(), kSize,
+                                           PlacementPolicy::BestFit)
+                     .value();
+    for (int i = 0; i < 64; ++i) {
+      auto r = alloc->allocate(i % 2 == 0 ? 48 : 3000, 16);
+      ASSERT_TRUE(r.has_value());
+      offsets.push_back(r->offset);
+    }
+    for (std::size_t i = 0; i < offsets.size(); i += 3) {
+      ASSERT_TRUE(alloc->deallocate(alloc->base() + offsets[i],
+                                    i % 2 == 0 ? 48 : 3000));
+    }
+  }
+  std::memcpy(target, a.base(), kSize);
+
+  auto alloc = FreeListAllocator::attach(target, kSize);
+  ASSERT_TRUE(alloc.has_value());
+  EXPECT_EQ((*alloc)->policy(), PlacementPolicy::BestFit);
+  for (std::size_t i = 1; i < offsets.size(); ++i) {
+    if (i % 3 != 0) {
+      ASSERT_TRUE((*alloc)->deallocate((*alloc)->base() + offsets[i],
+                                       i % 2 == 0 ? 48 : 3000));
+    }
+  }
+  EXPECT_EQ((*alloc)->bytes_allocated(), 0u);
+  EXPECT_TRUE((*alloc)->allocate(kSize / 2, 16).has_value());
+}
+
+TEST(PersistentFreeListTest, AttachRejectsDirtyOrForeignRegion) {
+  constexpr std::size_t kSize = 256 * 1024;
+  auto arena = Arena::create(kSize).value();
+  EXPECT_EQ(FreeListAllocator::attach(arena.base(), kSize).error(),
+            AllocError::BadSuperblock);
+
+  auto alloc = FreeListAllocator::format(arena.base(), kSize).value();
+  // Still attached: the superblock is not marked clean yet.
+  EXPECT_EQ(FreeListAllocator::attach(arena.base(), kSize).error(),
+            AllocError::BadSuperblock);
+  alloc.reset();
+  EXPECT_TRUE(FreeListAllocator::attach(arena.base(), kSize).has_value());
+}
+
+TEST(PersistentFreeListTest, FileBackedHeapSurvivesRemap) {
+  const auto path = std::filesystem::temp_directory_path() /
+                    ("heap." + std::to_string(::getpid()) + ".arena");
+  constexpr std::size_t kSize = 512 * 1024;
+  std::size_t offset = 0;
+  {
+    auto arena = Arena::create_file(path, kSize).value();
+    auto alloc = FreeListAllocator::format(arena.base(), kSize).value();
+    auto r = alloc->allocate(128, 16);
+    ASSERT_TRUE(r.has_value());
+    std::memcpy(r->ptr, "persisted", 10);
+    offset = r->offset;
+  }
+  {
+    auto arena = Arena::create_file(path, 0).value();
+    auto alloc = FreeListAllocator::attach(arena.base(), arena.capacity());
+    ASSERT_TRUE(alloc.has_value());
+    EXPECT_STREQ(reinterpret_cast<char *>((*alloc)->base() + offset),
+                 "persisted");
+    EXPECT_EQ((*alloc)->bytes_allocated(), 128u);
+  }
+  std::filesystem::remove(path);
+}
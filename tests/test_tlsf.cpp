@@ -0,0 +1,262 @@
+/// @file test_tlsf.cpp
+/// @brief Unit tests for the TlsfAllocator.
+
+#include "allocator/arena.hpp"
+#include "allocator/tlsf.hpp"
+
+#include <cstring>
+#include <expected>
+#include <gtest/gtest.h>
+#include <random>
+#include <vector>
+
+using namespace mmap_viz;
+
+class TlsfTest : public ::testing::Test {
+protected:
+  void SetUp() override {
+    auto result = Arena::create(kArenaSize);
+    ASSERT_TRUE(result.has_value());
+    arena_ = std::make_unique<Arena>(std::move(*result));
+    alloc_ =
+        std::make_unique<TlsfAllocator>(arena_->base(), arena_->capacity());
+  }
+
+  /// Sum of the free extents, checking they are ordered and disjoint.
+  auto free_extent_bytes() const -> std::size_t {
+    std::size_t total = 0;
+    std::size_t count = 0;
+    const std::byte *prev_end = nullptr;
+    alloc_->for_each_free_extent([&](const FreeExtent &e) {
+      EXPECT_LT(prev_end, e.ptr);
+      prev_end = e.ptr + e.size;
+      total += e.size;
+      ++count;
+    });
+    EXPECT_EQ(count, alloc_->free_block_count());
+    return total;
+  }
+
+  /// Lowest-address free extent.
+  auto first_free_extent() const -> FreeExtent {
+    FreeExtent first;
+    alloc_->for_each_free_extent([&](const FreeExtent &e) {
+      if (first.ptr == nullptr) {
+        first = e;
+      }
+    });
+    return first;
+  }
+
+  static constexpr std::size_t kArenaSize = 64 * 1024; // 64 KB
+  static constexpr std::size_t kTag = 16; // Boundary tag per block.
+  std::unique_ptr<Arena> arena_;
+  std::unique_ptr<TlsfAllocator> alloc_;
+};
+
+TEST_F(TlsfTest, StartsAsOneFreeBlock) {
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+  EXPECT_EQ(alloc_->bytes_free(), kArenaSize);
+  // Everything but the end-of-region tag.
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize - kTag);
+  EXPECT_EQ(free_extent_bytes(), kArenaSize - kTag);
+  EXPECT_EQ(alloc_->fragmentation_pct(), 0u);
+}
+
+TEST_F(TlsfTest, AllocatesDistinctAlignedBlocks) {
+  std::vector<AllocationResult> blocks;
+  for (std::size_t size : {1, 16, 17, 100, 255, 256, 1000, 4096}) {
+    auto r = alloc_->allocate(size);
+    ASSERT_TRUE(r.has_value()) << size;
+    EXPECT_EQ(reinterpret_cast<std::uintptr_t>(r->ptr) % 16, 0u);
+    EXPECT_GE(r->actual_size, size);
+    EXPECT_EQ(r->actual_size, alloc_->block_size_for(size));
+    EXPECT_EQ(r->offset, static_cast<std::size_t>(r->ptr - arena_->base()));
+    std::memset(r->ptr, 0xAB, r->actual_size);
+    blocks.push_back(*r);
+  }
+  for (std::size_t i = 0; i < blocks.size(); ++i) {
+    for (std::size_t j = i + 1; j < blocks.size(); ++j) {
+      EXPECT_TRUE(blocks[i].ptr + blocks[i].actual_size <= blocks[j].ptr ||
+                  blocks[j].ptr + blocks[j].actual_size <= blocks[i].ptr);
+    }
+  }
+  EXPECT_EQ(alloc_->live_block_count(), blocks.size());
+}
+
+TEST_F(TlsfTest, CoalescesWithBothNeighbours) {
+  auto a = alloc_->allocate(256);
+  auto b = alloc_->allocate(256);
+  auto c = alloc_->allocate(256);
+  auto guard = alloc_->allocate(256);
+  ASSERT_TRUE(a && b && c && guard);
+
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, 256).has_value());
+  ASSERT_TRUE(alloc_->deallocate(c->ptr, 256).has_value());
+  EXPECT_EQ(alloc_->free_block_count(), 3u); // a, c, tail
+
+  // Freeing b merges a, b and c into one block.
+  ASSERT_TRUE(alloc_->deallocate(b->ptr, 256).has_value());
+  EXPECT_EQ(alloc_->free_block_count(), 2u);
+  const auto merged = first_free_extent();
+  EXPECT_EQ(merged.ptr, a->ptr - kTag);
+  EXPECT_EQ(merged.size, 3 * (256 + kTag));
+
+  ASSERT_TRUE(alloc_->deallocate(guard->ptr, 256));
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize - kTag);
+  EXPECT_EQ(alloc_->bytes_allocated(), 0u);
+}
+
+TEST_F(TlsfTest, RejectsDoubleFreeAndForeignPointers) {
+  auto a = alloc_->allocate(64);
+  auto b = alloc_->allocate(64);
+  ASSERT_TRUE(a && b);
+  ASSERT_TRUE(alloc_->deallocate(a->ptr, 64).has_value());
+  EXPECT_EQ(alloc_->deallocate(a->ptr, 64).error(), AllocError::DoubleFree);
+
+  int outside = 0;
+  EXPECT_EQ(alloc_->deallocate(reinterpret_cast<std::byte *>(&outside), 4)
+                .error(),
+            AllocError::BadPointer);
+  EXPECT_EQ(alloc_->deallocate(b->ptr + 8, 8).error(), AllocError::BadPointer);
+  EXPECT_EQ(alloc_->deallocate(b->ptr, 4096).error(), AllocError::BadPointer);
+  EXPECT_EQ(alloc_->allocate(64, 3).error(), AllocError::InvalidAlignment);
+}
+
+TEST_F(TlsfTest, HonoursLargeAlignment) {
+  (void)alloc_->allocate(48); // Misalign the free tail.
+  for (std::size_t align : {32, 64, 256, 4096}) {
+    auto r = alloc_->allocate(100, align);
+    ASSERT_TRUE(r.has_value()) << align;
+    EXPECT_EQ(reinterpret_cast<std::uintptr_t>(r->ptr) % align, 0u) << align;
+  }
+  // Leading gaps went back to the free lists.
+  EXPECT_EQ(free_extent_bytes() + alloc_->bytes_allocated() +
+                kTag * (alloc_->live_block_count() + 1),
+            kArenaSize);
+}
+
+TEST_F(TlsfTest, FailsWhenExhausted) {
+  EXPECT_EQ(alloc_->allocate(kArenaSize).error(), AllocError::OutOfMemory);
+  std::expected<AllocationResult, AllocError> r;
+  std::size_t n = 0;
+  while ((r = alloc_->allocate(1024)).has_value()) {
+    ++n;
+  }
+  EXPECT_EQ(r.error(), AllocError::OutOfMemory);
+  EXPECT_EQ(n, alloc_->live_block_count());
+  // Good-fit rounding may leave one block that is only just large enough.
+  EXPECT_LT(alloc_->largest_free_block(), 2 * (1024 + kTag));
+}
+
+TEST_F(TlsfTest, LargestFreeBlockFollowsItsList) {
+  // Three blocks on one list (3072..3199 bytes), kept apart by guards.
+  std::vector<AllocationResult> blocks;
+  for (std::size_t size : {3056, 3104, 3168}) {
+    auto r = alloc_->allocate(size);
+    ASSERT_TRUE(alloc_->allocate(16).has_value());
+    ASSERT_TRUE(r.has_value());
+    blocks.push_back(*r);
+  }
+  for (std::size_t size : {1024, 16}) {
+    while (alloc_->allocate(size).has_value()) {
+    }
+  }
+  for (const auto &b : blocks) {
+    ASSERT_TRUE(alloc_->deallocate(b.ptr, b.actual_size).has_value());
+  }
+  EXPECT_EQ(alloc_->largest_free_block(), 3168 + kTag);
+
+  // The list head is the largest block; taking it leaves the middle one.
+  auto r = alloc_->allocate(3056);
+  ASSERT_TRUE(r.has_value());
+  EXPECT_EQ(r->ptr, blocks[2].ptr);
+  EXPECT_EQ(alloc_->largest_free_block(), 3104 + kTag);
+}
+
+TEST_F(TlsfTest, ExtendsInPlace) {
+  auto a = alloc_->allocate(128);
+  auto b = alloc_->allocate(1024);
+  auto guard = alloc_->allocate(64);
+  ASSERT_TRUE(a && b && guard);
+
+  // Blocked by b.
+  EXPECT_EQ(alloc_->try_extend(a->ptr, 128, 512).error(),
+            AllocError::OutOfMemory);
+
+  ASSERT_TRUE(alloc_->deallocate(b->ptr, 1024).has_value());
+  auto grown = alloc_->try_extend(a->ptr, 128, 512);
+  ASSERT_TRUE(grown.has_value());
+  EXPECT_EQ(grown->ptr, a->ptr);
+  EXPECT_EQ(grown->actual_size, 512u);
+  EXPECT_EQ(alloc_->bytes_allocated(), 512u + 64u);
+
+  auto shrunk = alloc_->try_extend(a->ptr, 512, 64);
+  ASSERT_TRUE(shrunk.has_value());
+  EXPECT_EQ(shrunk->actual_size, 64u);
+  // The released tail merged back with the rest of b.
+  const auto tail = first_free_extent();
+  EXPECT_EQ(tail.ptr, a->ptr + 64);
+  EXPECT_EQ(tail.size, (128 + kTag) + (1024 + kTag) - (64 + kTag));
+}
+
+TEST(TlsfGrowTest, GrowAppendsAndCoalescesWithTail) {
+  auto arena = Arena::create(16 * 1024);
+  ASSERT_TRUE(arena.has_value());
+  TlsfAllocator alloc{arena->base(), 8 * 1024, 16 * 1024};
+  EXPECT_EQ(alloc.max_capacity(), 16u * 1024);
+
+  auto head = alloc.allocate(1024);
+  ASSERT_TRUE(head.has_value());
+  EXPECT_FALSE(alloc.allocate(12 * 1024).has_value());
+
+  EXPECT_FALSE(alloc.grow(16 * 1024));
+  ASSERT_TRUE(alloc.grow(8 * 1024));
+  EXPECT_EQ(alloc.capacity(), 16u * 1024);
+  EXPECT_EQ(alloc.free_block_count(), 1u);
+  auto big = alloc.allocate(12 * 1024);
+  ASSERT_TRUE(big.has_value());
+  EXPECT_TRUE(alloc.contains(big->ptr + 12 * 1024 - 1));
+}
+
+TEST_F(TlsfTest, RandomChurnKeepsAccountingConsistent) {
+  std::mt19937 rng{7};
+  std::uniform_int_distribution<std::size_t> size_dist{1, 2048};
+  std::vector<AllocationResult> live;
+
+  for (int i = 0; i < 20000; ++i) {
+    if (live.empty() || rng() % 3 != 0) {
+      const auto size = size_dist(rng);
+      const std::size_t align = (rng() % 8 == 0) ? 128 : 16;
+      if (auto r = alloc_->allocate(size, align); r.has_value()) {
+        ASSERT_EQ(reinterpret_cast<std::uintptr_t>(r->ptr) % align, 0u);
+        live.push_back(*r);
+      }
+    } else {
+      const auto idx = rng() % live.size();
+      ASSERT_TRUE(
+          alloc_->deallocate(live[idx].ptr, live[idx].actual_size).has_value());
+      live[idx] = live.back();
+      live.pop_back();
+    }
+    if (i % 1000 == 0) {
+      std::size_t payload = 0;
+      for (const auto &b : live) {
+        payload += b.actual_size;
+      }
+      ASSERT_EQ(alloc_->bytes_allocated(), payload);
+      ASSERT_EQ(alloc_->live_block_count(), live.size());
+      ASSERT_EQ(free_extent_bytes() + payload + kTag * (live.size() + 1),
+                kArenaSize);
+      ASSERT_LE(alloc_->largest_free_block(), kArenaSize);
+    }
+  }
+
+  for (const auto &b : live) {
+    ASSERT_TRUE(alloc_->deallocate(b.ptr, b.actual_size).has_value());
+  }
+  EXPECT_EQ(alloc_->free_block_count(), 1u);
+  EXPECT_EQ(alloc_->largest_free_block(), kArenaSize - kTag);
+}
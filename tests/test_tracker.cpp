@@ -3,9 +3,13 @@
 
 #include "allocator/arena.hpp"
 #include "allocator/free_list.hpp"
+#include "tracker/tag_table.hpp"
 #include "tracker/tracker.hpp"
 
 #include <gtest/gtest.h>
+#include <string>
+#include <thread>
+#include <vector>
 
 using namespace mmap_viz;
 
@@ -17,12 +21,14 @@ protected:
     arena_ = std::make_unique<Arena>(std::move(*result));
     alloc_ =
         std::make_unique<FreeListAllocator>(arena_->base(), arena_->capacity());
-    tracker_ = std::make_unique<LocalTracker>(*alloc_, 1);
+    totals_.publish(*alloc_);
+    tracker_ = std::make_unique<LocalTracker>(*alloc_, totals_, 1);
   }
 
   static constexpr std::size_t kArenaSize = 64 * 1024;
   std::unique_ptr<Arena> arena_;
   std::unique_ptr<FreeListAllocator> alloc_;
+  AllocatorTotals totals_;
   std::unique_ptr<LocalTracker> tracker_;
 };
 
@@ -45,7 +51,7 @@ TEST_F(TrackerTest, RecordAlloc) {
   EXPECT_EQ(events[0].type, EventType::Allocate);
   EXPECT_EQ(events[0].event_id, 1u);
   // Verify tag
-  EXPECT_STREQ(events[0].block.tag, "test_block");
+  EXPECT_EQ(events[0].block.tag(), "test_block");
 }
 
 TEST_F(TrackerTest, RecordDealloc) {
@@ -64,7 +70,7 @@ TEST_F(TrackerTest, RecordDealloc) {
 
 TEST_F(TrackerTest, Sampling) {
   // Create tracker with sampling = 2
-  auto sampled_tracker = std::make_unique<LocalTracker>(*alloc_, 2);
+  auto sampled_tracker = std::make_unique<LocalTracker>(*alloc_, totals_, 2);
 
   BlockMetadata meta{};
 
@@ -97,3 +103,107 @@ TEST_F(TrackerTest, EventMonotonicity) {
     EXPECT_EQ(events[i].event_id, i + 1);
   }
 }
+
+TEST_F(TrackerTest, EventsCarryPublishedTotals) {
+  auto block = alloc_->allocate(1024);
+  ASSERT_TRUE(block.has_value());
+
+  // Not yet published: the event still shows the empty allocator.
+  tracker_->record_dealloc(block->offset, block->actual_size);
+  totals_.publish(*alloc_);
+  tracker_->record_dealloc(block->offset, block->actual_size);
+
+  std::vector<AllocationEvent> events;
+  tracker_->drain_to(events);
+  ASSERT_EQ(events.size(), 2u);
+  EXPECT_EQ(events[0].total_allocated, 0u);
+  EXPECT_EQ(events[0].free_block_count, 1u);
+  EXPECT_EQ(events[1].total_allocated, alloc_->bytes_allocated());
+  EXPECT_EQ(events[1].total_free, alloc_->bytes_free());
+  EXPECT_EQ(events[1].fragmentation_pct, alloc_->fragmentation_pct());
+  EXPECT_EQ(events[1].free_block_count, alloc_->free_block_count());
+}
+
+TEST_F(TrackerTest, RebindSwitchesTotals) {
+  FreeListAllocator other{arena_->base(), arena_->capacity() / 2};
+  ASSERT_TRUE(other.allocate(256).has_value());
+  AllocatorTotals other_totals;
+  other_totals.publish(other);
+
+  tracker_->record_dealloc(0, 0);
+  tracker_->rebind(other, other_totals);
+  tracker_->record_dealloc(0, 0);
+
+  std::vector<AllocationEvent> events;
+  tracker_->drain_to(events);
+  ASSERT_EQ(events.size(), 2u);
+  EXPECT_EQ(events[0].total_free, kArenaSize);
+  EXPECT_EQ(events[1].total_allocated, other.bytes_allocated());
+  EXPECT_EQ(events[1].total_free, other.bytes_free());
+  EXPECT_EQ(events[1].event_id, 2u); // The count carries on.
+}
+
+TEST(TagTableTest, InternsEachTagOnce) {
+  TagTable table;
+  auto a = table.intern("request");
+  auto b = table.intern("response");
+  EXPECT_NE(a, TagTable::kUntagged);
+  EXPECT_NE(a, b);
+  EXPECT_EQ(table.intern(std::string("request")), a);
+  EXPECT_EQ(table.name(a), "request");
+  EXPECT_EQ(table.name(b), "response");
+  EXPECT_EQ(table.size(), 3u);
+}
+
+TEST(TagTableTest, EmptyAndLongTags) {
+  TagTable table;
+  EXPECT_EQ(table.intern(""), TagTable::kUntagged);
+  EXPECT_EQ(table.name(TagTable::kUntagged), "");
+  EXPECT_EQ(table.name(999), "");
+
+  // Tags are cut at the length AllocationHeader keeps inline.
+  std::string long_tag(40, 'x');
+  auto id = table.intern(long_tag);
+  EXPECT_EQ(table.name(id), std::string(TagTable::kMaxTagLength, 'x'));
+  EXPECT_EQ(table.intern(long_tag.substr(0, 35)), id);
+}
+
+TEST(TagTableTest, TablesDoNotShareIds) {
+  TagTable first;
+  TagTable second;
+  (void)first.intern("a");
+  auto in_first = first.intern("b");
+  auto in_second = second.intern("b");
+  EXPECT_NE(in_first, in_second);
+  EXPECT_EQ(second.name(in_second), "b");
+}
+
+TEST(TagTableTest, ConcurrentInternsAgree) {
+  TagTable table;
+  constexpr int kThreads = 4;
+  constexpr int kTags = 300;
+  std::vector<std::vector<std::uint16_t>> ids(kThreads,
+                                              std::vector<std::uint16_t>(kTags));
+  std::vector<std::thread> threads;
+  for (int t = 0; t < kThreads; ++t) {
+    threads.emplace_back([&, t] {
+      for (int i = 0; i < kTags; ++i) {
+        ids[t][i] = table.intern("tag_" + std::to_string((i * 7 + t) % kTags));
+      }
+    });
+  }
+  for (auto &th : threads) {
+    th.join();
+  }
+
+  // Every thread got the same id for a tag, and the id names that tag.
+  for (int i = 0; i < kTags; ++i) {
+    auto expected = ids[0][i];
+    EXPECT_EQ(table.name(expected), "tag_" + std::to_string((i * 7) % kTags));
+    for (int t = 1; t < kThreads; ++t) {
+      auto tag = "tag_" + std::to_string((i * 7 + t) % kTags);
+      EXPECT_EQ(table.name(ids[t][i]), tag);
+      EXPECT_EQ(table.intern(tag), ids[t][i]);
+    }
+  }
+}
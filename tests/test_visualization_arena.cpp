@@ -1,10 +1,16 @@
 /// @file test_visualization_arena.cpp
 /// @brief Unit tests for the VisualizationArena façade.
 
+#include "interface/object_pool.hpp"
 #include "interface/padding_inspector.hpp"
 #include "interface/visualization_arena.hpp"
+#include "serialization/json_serializer.hpp"
 
+#include <array>
 #include <atomic>
+#include <bit>
+#include <chrono>
+#include <cstring>
 #include <gtest/gtest.h>
 #include <memory_resource>
 #include <string>
@@ -58,11 +64,10 @@ TEST_F(VisualizationArenaTest, TypedAllocDealloc) {
   ASSERT_NE(p, nullptr);
   EXPECT_EQ(*p, 42);
   EXPECT_GT(arena_->bytes_allocated(), 0u);
-  // active_block_count is not supported in sharded mode efficiently
-  // EXPECT_EQ(arena_->active_block_count(), 1u);
+  EXPECT_EQ(arena_->active_block_count(), 1u);
 
   arena_->dealloc(p);
-  // EXPECT_EQ(arena_->active_block_count(), 0u);
+  EXPECT_EQ(arena_->active_block_count(), 0u);
   EXPECT_EQ(arena_->bytes_allocated(), 0u);
 }
 
@@ -109,8 +114,754 @@ TEST_F(VisualizationArenaTest, RawAllocNullOnOOM) {
   EXPECT_EQ(p, nullptr);
 }
 
+TEST_F(VisualizationArenaTest, BatchAllocDealloc) {
+  std::array<void *, 8> ptrs{};
+  ASSERT_EQ(arena_->alloc_batch(ptrs.size(), 24, 8, "batch", ptrs.data()),
+            ptrs.size());
+  for (void *p : ptrs) {
+    ASSERT_NE(p, nullptr);
+    EXPECT_EQ(reinterpret_cast<std::uintptr_t>(p) % 8, 0u);
+  }
+  EXPECT_GT(arena_->bytes_allocated(), 0u);
+  EXPECT_EQ(arena_->active_block_count(), ptrs.size());
+
+  // Mix per-object and batch release.
+  arena_->dealloc_raw(ptrs[0], 24);
+  EXPECT_EQ(arena_->active_block_count(), ptrs.size() - 1);
+  arena_->dealloc_batch(std::span(ptrs).subspan(1));
+  EXPECT_EQ(arena_->bytes_allocated(), 0u);
+  EXPECT_EQ(arena_->active_block_count(), 0u);
+}
+
+TEST_F(VisualizationArenaTest, BatchEmitsAggregatedEvent) {
+  std::array<void *, 4> ptrs{};
+  ASSERT_EQ(arena_->alloc_batch(ptrs.size(), 64, 16, "agg", ptrs.data()),
+            ptrs.size());
+
+  auto json = arena_->event_log_json();
+  EXPECT_NE(json.find("\"count\":4"), std::string::npos);
+  arena_->dealloc_batch(ptrs);
+}
+
+// ─── Magazine cache ─────────────────────────────────────────────────────
+
+TEST_F(VisualizationArenaTest, MagazineReusesFreedBlock) {
+  void *p = arena_->alloc_raw(64, 16, "first");
+  ASSERT_NE(p, nullptr);
+  arena_->dealloc_raw(p, 64);
+  EXPECT_EQ(arena_->bytes_allocated(), 0u);
+
+  void *q = arena_->alloc_raw(64, 16, "second");
+  EXPECT_EQ(q, p);
+  auto stats = arena_->magazine_stats();
+  EXPECT_EQ(stats.misses, 1u);
+  EXPECT_EQ(stats.hits, 1u);
+  arena_->dealloc_raw(q, 64);
+}
+
+TEST_F(VisualizationArenaTest, MagazineYieldsToLargeRequest) {
+  // Park blocks in the magazine, then ask for (nearly) the whole shard.
+  void *small = arena_->alloc_raw(64, 16, "small");
+  ASSERT_NE(small, nullptr);
+  arena_->dealloc_raw(small, 64);
+
+  void *big = arena_->alloc_raw(3900, 16, "big");
+  ASSERT_NE(big, nullptr);
+  arena_->dealloc_raw(big, 3900);
+  EXPECT_EQ(arena_->bytes_allocated(), 0u);
+}
+
+TEST_F(VisualizationArenaTest, MagazineFlushedOnThreadExit) {
+  std::thread worker([this] {
+    for (int i = 0; i < 10; ++i) {
+      void *p = arena_->alloc_raw(32, 8, "worker");
+      ASSERT_NE(p, nullptr);
+      arena_->dealloc_raw(p, 32);
+    }
+  });
+  worker.join();
+
+  auto stats = arena_->magazine_stats();
+  EXPECT_EQ(stats.hits + stats.misses, 10u);
+  EXPECT_GT(stats.hits, stats.misses);
+  EXPECT_EQ(arena_->bytes_allocated(), 0u);
+  EXPECT_EQ(arena_->bytes_free(), arena_->capacity());
+}
+
+TEST(VisualizationArenaConfigTest, MagazineDisabled) {
+  auto arena =
+      VisualizationArena::create({.arena_size = 1024 * 1024, .magazine_size = 0})
+          .value();
+  void *p = arena.alloc_raw(64, 16, "direct");
+  ASSERT_NE(p, nullptr);
+  arena.dealloc_raw(p, 64);
+  auto stats = arena.magazine_stats();
+  EXPECT_EQ(stats.hits, 0u);
+  EXPECT_EQ(stats.misses, 0u);
+}
+
+// ─── Page decommit ──────────────────────────────────────────────────────
+
+// 256 shards of a 1 MB arena are a single page each, so these use a larger
+// arena.
+TEST(VisualizationArenaConfigTest, PurgeLowersCommittedBytes) {
+  auto arena =
+      VisualizationArena::create(
+          {.arena_size = 4 * 1024 * 1024, .shard_count = 256})
+          .value();
+  auto before = arena.shard_memory();
+  ASSERT_FALSE(before.empty());
+
+  EXPECT_GT(arena.purge(), 0u);
+  auto after = arena.shard_memory();
+  ASSERT_EQ(after.size(), before.size());
+  std::size_t committed_before = 0;
+  std::size_t committed_after = 0;
+  for (std::size_t i = 0; i < after.size(); ++i) {
+    committed_before += before[i].committed;
+    committed_after += after[i].committed;
+    EXPECT_LE(after[i].resident, arena.capacity() / after.size());
+  }
+  EXPECT_LT(committed_after, committed_before);
+
+  // Memory served from purged pages is still zeroed for the caller.
+  auto *p = static_cast<unsigned char *>(arena.alloc_raw(2048, 16, "z"));
+  ASSERT_NE(p, nullptr);
+  for (std::size_t i = 0; i < 2048; ++i) {
+    ASSERT_EQ(p[i], 0);
+  }
+  arena.dealloc_raw(p, 2048);
+}
+
+TEST(VisualizationArenaConfigTest, PurgeThreadDecommits) {
+  auto arena = VisualizationArena::create({.arena_size = 4 * 1024 * 1024,
+                                           .decommit_threshold = 8192,
+                                           .purge_interval_ms = 1,
+                                           .shard_count = 256})
+                   .value();
+  auto total = [&] {
+    std::size_t sum = 0;
+    for (const auto &s : arena.shard_memory())
+      sum += s.committed;
+    return sum;
+  };
+  for (int i = 0; i < 1000 && total() == arena.capacity(); ++i) {
+    std::this_thread::sleep_for(std::chrono::milliseconds(1));
+  }
+  EXPECT_LT(total(), arena.capacity());
+}
+
+// ─── Growable arenas ────────────────────────────────────────────────────
+
+TEST(VisualizationArenaConfigTest, GrowableArenaCommitsOnDemand) {
+  auto arena = VisualizationArena::create({.arena_size = 1024 * 1024,
+                                           .max_arena_size = 256 * 1024 * 1024,
+                                           .shard_count = 256})
+                   .value();
+  EXPECT_GE(arena.max_capacity(), 256u * 1024 * 1024);
+  const auto initial = arena.capacity();
+  EXPECT_LT(initial, arena.max_capacity());
+
+  // Far more than this thread's initial 4 KB shard slice.
+  std::vector<void *> blocks;
+  for (int i = 0; i < 32; ++i) {
+    void *p = arena.alloc_raw(16 * 1024, 16, "grow");
+    ASSERT_NE(p, nullptr);
+    std::memset(p, 0xab, 16 * 1024);
+    blocks.push_back(p);
+  }
+  EXPECT_GT(arena.capacity(), initial);
+
+  std::array<void *, 32> batch{};
+  EXPECT_EQ(arena.alloc_batch(batch.size(), 4096, 16, "grow", batch.data()),
+            batch.size());
+  arena.dealloc_batch(batch);
+  arena.dealloc_batch(blocks);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, FixedArenaDoesNotGrow) {
+  auto arena = VisualizationArena::create(
+                   {.arena_size = 1024 * 1024,
+                    .cross_shard_fallback = false,
+                    .shard_count = 256})
+                   .value();
+  EXPECT_EQ(arena.capacity(), arena.max_capacity());
+  EXPECT_EQ(arena.alloc_raw(16 * 1024, 16, "too-big"), nullptr);
+}
+
+// ─── Cross-shard fallback ───────────────────────────────────────────────
+
+TEST(VisualizationArenaConfigTest, FallbackBorrowsFromOtherShards) {
+  auto arena = VisualizationArena::create({.arena_size = 4 * 1024 * 1024,
+                                           .magazine_size = 0,
+                                           .shard_count = 256})
+                   .value();
+  // Each shard holds 16 KB; this thread fills several shards' worth.
+  std::vector<void *> blocks;
+  for (int i = 0; i < 32; ++i) {
+    void *p = arena.alloc_raw(8 * 1024, 16, "spill");
+    ASSERT_NE(p, nullptr) << "allocation " << i;
+    blocks.push_back(p);
+  }
+  auto stats = arena.fallback_stats();
+  EXPECT_GT(stats.attempts, 0u);
+  EXPECT_EQ(stats.successes, stats.attempts);
+  EXPECT_GE(stats.total_ns, stats.max_ns);
+
+  // Borrowed blocks go back to the shard that owns them.
+  for (void *p : blocks) {
+    arena.dealloc_raw(p, 8 * 1024);
+  }
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, FallbackFailsWhenArenaIsFull) {
+  auto arena =
+      VisualizationArena::create({.arena_size = 1024 * 1024, .shard_count = 256})
+          .value();
+  // Larger than any 4 KB shard.
+  EXPECT_EQ(arena.alloc_raw(16 * 1024, 16, "too-big"), nullptr);
+  auto stats = arena.fallback_stats();
+  EXPECT_EQ(stats.attempts, 1u);
+  EXPECT_EQ(stats.successes, 0u);
+}
+
+// ─── Shard count and thread placement ───────────────────────────────────
+
+TEST(VisualizationArenaConfigTest, ShardCountDerivedFromHardware) {
+  auto derived = VisualizationArena::create({}).value();
+  const auto hw = std::max(std::thread::hardware_concurrency(), 1u);
+  EXPECT_EQ(derived.shard_count(),
+            std::min<std::size_t>(std::bit_ceil(2 * hw), 256));
+
+  auto rounded = VisualizationArena::create({.shard_count = 5}).value();
+  EXPECT_EQ(rounded.shard_count(), 8u);
+  auto clamped = VisualizationArena::create({.shard_count = 1000}).value();
+  EXPECT_EQ(clamped.shard_count(), 256u);
+}
+
+TEST(VisualizationArenaConfigTest, ThreadsSpreadOverLeastLoadedShards) {
+  auto arena = VisualizationArena::create({.shard_count = 4}).value();
+
+  // Four threads alive at once land on four different shards.
+  std::atomic<int> ready{0};
+  std::atomic<bool> release{false};
+  std::vector<std::thread> threads;
+  for (int t = 0; t < 4; ++t) {
+    threads.emplace_back([&] {
+      arena.dealloc_raw(arena.alloc_raw(32, 16, "spread"), 32);
+      ready.fetch_add(1);
+      while (!release.load()) {
+        std::this_thread::yield();
+      }
+    });
+  }
+  while (ready.load() != 4) {
+    std::this_thread::yield();
+  }
+  for (const auto &s : arena.shard_stats()) {
+    EXPECT_EQ(s.threads, 1u);
+  }
+  release = true;
+  for (auto &t : threads) {
+    t.join();
+  }
+
+  // Exited threads release their slot.
+  for (const auto &s : arena.shard_stats()) {
+    EXPECT_EQ(s.threads, 0u);
+  }
+}
+
+TEST(VisualizationArenaConfigTest, ContendedThreadsRebind) {
+  if (std::thread::hardware_concurrency() < 2) {
+    GTEST_SKIP() << "needs parallel threads to produce lock contention";
+  }
+  auto arena = VisualizationArena::create(
+                   {.arena_size = 8 * 1024 * 1024, .magazine_size = 0,
+                    .shard_count = 2})
+                   .value();
+
+  // Threads 0 and 2 share shard 0; 1 and 3 share shard 1 and exit early,
+  // leaving shard 1 idle.
+  std::atomic<int> started{0};
+  std::atomic<bool> go{false};
+  auto churn = [&](int rounds) {
+    for (int i = 0; i < rounds; ++i) {
+      arena.dealloc_raw(arena.alloc_raw(64, 16, "churn"), 64);
+    }
+  };
+  std::vector<std::thread> threads;
+  for (int t = 0; t < 4; ++t) {
+    threads.emplace_back([&, t] {
+      churn(1);
+      started.fetch_add(1);
+      while (!go.load()) {
+        std::this_thread::yield();
+      }
+      if (t % 2 == 0) {
+        churn(200000);
+      }
+    });
+    while (started.load() != t + 1) {
+      std::this_thread::yield();
+    }
+  }
+  go = true;
+  for (auto &t : threads) {
+    t.join();
+  }
+  EXPECT_GT(arena.thread_rebinds(), 0u);
+  EXPECT_GT(arena.shard_stats()[0].contentions, 0u);
+}
+
+TEST(LatencyHistogramTest, BucketsArePowersOfTwo) {
+  EXPECT_EQ(LatencyHistogram::bucket_of(0), 0u);
+  EXPECT_EQ(LatencyHistogram::bucket_of(1), 1u);
+  EXPECT_EQ(LatencyHistogram::bucket_of(1023), 10u);
+  EXPECT_EQ(LatencyHistogram::bucket_of(1024), 11u);
+  EXPECT_EQ(LatencyHistogram::bucket_of(~std::uint64_t{0}),
+            LatencyHistogram::kBuckets - 1);
+
+  AtomicLatencyHistogram recorder;
+  for (int i = 0; i < 90; ++i) {
+    recorder.record(0);
+  }
+  for (int i = 0; i < 10; ++i) {
+    recorder.record(3000); // [2048, 4096)
+  }
+  const auto h = recorder.load();
+  EXPECT_EQ(h.total(), 100u);
+  EXPECT_EQ(h.percentile(0.5), 0u);
+  EXPECT_EQ(h.percentile(0.99), 4096u);
+  EXPECT_EQ(h.approx_sum(), 10u * 3072);
+
+  LatencyHistogram earlier;
+  earlier.counts[0] = 40;
+  const auto d = h.since(earlier);
+  EXPECT_EQ(d.total(), 60u);
+  EXPECT_EQ(d.counts[12], 10u);
+}
+
+TEST(VisualizationArenaConfigTest, LockHistogramsCountEveryAcquisition) {
+  auto arena = VisualizationArena::create(
+                   {.magazine_size = 0, .shard_count = 2,
+                    .lock_histograms = true})
+                   .value();
+  for (int i = 0; i < 100; ++i) {
+    arena.dealloc_raw(arena.alloc_raw(64, 16, "timed"), 64);
+  }
+  std::thread([&] { arena.dealloc_raw(arena.alloc_raw(64, 16, "timed"), 64); })
+      .join();
+
+  const auto histograms = arena.shard_lock_histograms();
+  const auto stats = arena.shard_stats();
+  ASSERT_EQ(histograms.size(), stats.size());
+  std::uint64_t total = 0;
+  for (std::size_t i = 0; i < stats.size(); ++i) {
+    EXPECT_EQ(histograms[i].wait.total(), stats[i].acquisitions);
+    EXPECT_EQ(histograms[i].hold.total(), stats[i].acquisitions);
+    EXPECT_LE(histograms[i].wait.total() - histograms[i].wait.counts[0],
+              stats[i].contentions);
+    total += histograms[i].wait.total();
+  }
+  EXPECT_GE(total, 200u);
+
+  auto plain = VisualizationArena::create({.magazine_size = 0}).value();
+  plain.dealloc_raw(plain.alloc_raw(64, 16, "untimed"), 64);
+  EXPECT_TRUE(plain.shard_lock_histograms().empty());
+}
+
 // ─── PMR interop ────────────────────────────────────────────────────────
 
+TEST(VisualizationArenaConfigTest, ReallocGrowsAndShrinksInPlace) {
+  auto arena = VisualizationArena::create(
+                   {.magazine_size = 0, .shard_count = 2})
+                   .value();
+
+  auto *p = static_cast<unsigned char *>(arena.alloc_raw(5000, 16, "stream"));
+  ASSERT_NE(p, nullptr);
+  std::memset(p, 0x5A, 5000);
+
+  auto *q = static_cast<unsigned char *>(arena.realloc_raw(p, 9000, 16, ""));
+  ASSERT_EQ(q, p);
+  EXPECT_EQ(q[4999], 0x5A);
+  EXPECT_EQ(q[5000], 0);
+  EXPECT_EQ(q[8999], 0);
+
+  const auto grown = arena.bytes_allocated();
+  ASSERT_EQ(arena.realloc_raw(q, 100, 16, ""), q);
+  EXPECT_LT(arena.bytes_allocated(), grown);
+
+  // One resize event per call, and nothing else.
+  const auto log = arena.event_log_json();
+  auto count = [&](std::string_view needle) {
+    std::size_t n = 0;
+    for (auto pos = log.find(needle); pos != std::string::npos;
+         pos = log.find(needle, pos + 1)) {
+      ++n;
+    }
+    return n;
+  };
+  EXPECT_EQ(count("\"resize\""), 2u);
+  EXPECT_EQ(count("\"allocate\""), 1u);
+  EXPECT_EQ(count("\"deallocate\""), 0u);
+
+  arena.dealloc_raw(q, 100);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, ReallocMovesWhenBlocked) {
+  auto arena = VisualizationArena::create(
+                   {.magazine_size = 0, .shard_count = 2})
+                   .value();
+
+  auto *p = static_cast<unsigned char *>(arena.alloc_raw(5000, 16, "stream"));
+  void *blocker = arena.alloc_raw(5000, 16, "blocker");
+  ASSERT_NE(p, nullptr);
+  ASSERT_NE(blocker, nullptr);
+  std::memset(p, 0x5A, 5000);
+
+  auto *q = static_cast<unsigned char *>(arena.realloc_raw(p, 20000, 16, ""));
+  ASSERT_NE(q, nullptr);
+  EXPECT_NE(q, p);
+  EXPECT_EQ(q[0], 0x5A);
+  EXPECT_EQ(q[4999], 0x5A);
+  EXPECT_EQ(q[19999], 0);
+
+  arena.dealloc_raw(q, 20000);
+  arena.dealloc_raw(blocker, 5000);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, CompactHeadersShrinkSmallBlocks) {
+  auto full = VisualizationArena::create({.magazine_size = 0}).value();
+  auto compact = VisualizationArena::create(
+                     {.magazine_size = 0, .compact_headers = true})
+                     .value();
+
+  void *a = full.alloc_raw(48, 16, "node");
+  void *b = compact.alloc_raw(48, 16, "node");
+  ASSERT_NE(a, nullptr);
+  ASSERT_NE(b, nullptr);
+  EXPECT_EQ(reinterpret_cast<std::uintptr_t>(b) % 16, 0u);
+  EXPECT_EQ(full.bytes_allocated(), 112u);   // 60 B header + footer, padded.
+  EXPECT_EQ(compact.bytes_allocated(), 64u); // 16 B header + footer.
+
+  full.dealloc_raw(a, 48);
+  compact.dealloc_raw(b, 48);
+  EXPECT_EQ(compact.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, CompactHeadersKeepTagsAndSizes) {
+  auto arena =
+      VisualizationArena::create({.shard_count = 1, .compact_headers = true})
+          .value();
+
+  auto *p = static_cast<unsigned char *>(arena.alloc_raw(100, 64, "compact"));
+  ASSERT_NE(p, nullptr);
+  EXPECT_EQ(reinterpret_cast<std::uintptr_t>(p) % 64, 0u);
+  EXPECT_NE(arena.snapshot_json().find("\"compact\""), std::string::npos);
+
+  // Sizes survive an in-place resize; the tag survives a move.
+  auto *q = static_cast<unsigned char *>(arena.realloc_raw(p, 120, 64, ""));
+  ASSERT_NE(q, nullptr);
+  q[119] = 1;
+  auto *r = static_cast<unsigned char *>(arena.realloc_raw(q, 8000, 64, ""));
+  ASSERT_NE(r, nullptr);
+  EXPECT_EQ(r[119], 1);
+  EXPECT_EQ(r[7999], 0);
+  EXPECT_NE(arena.snapshot_json().find("\"compact\""), std::string::npos);
+
+  arena.dealloc_raw(r, 8000);
+  arena.dealloc_raw(r, 8000); // Double free is ignored.
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+
+  // Tiny blocks still have room to be parked and queued when freed.
+  std::array<void *, 64> ptrs{};
+  EXPECT_EQ(arena.alloc_batch(ptrs.size(), 1, 1, "tiny", ptrs.data()),
+            ptrs.size());
+  std::thread([&] { arena.dealloc_batch(ptrs); }).join();
+  void *again = arena.alloc_raw(0, 1, "tiny");
+  ASSERT_NE(again, nullptr);
+  arena.dealloc_raw(again, 0);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, CompactHeadersKeepLongTails) {
+  // A tail past the 16-bit field moves into the end of the block.
+  std::vector<std::uint64_t> block(256 * 1024 / sizeof(std::uint64_t));
+  auto *header = reinterpret_cast<CompactHeader *>(block.data());
+  header->user_offset = sizeof(CompactHeader);
+  header->set_sizes(200000, 100);
+  EXPECT_EQ(header->tail, CompactHeader::kTailInBlock);
+  EXPECT_EQ(header->actual_size(), 200000u);
+  EXPECT_EQ(header->size(), 100u);
+  header->set_sizes(200000, 199000);
+  EXPECT_EQ(header->size(), 199000u);
+
+  // Buddy blocks keep 140000 bytes in a 256 KiB block.
+  auto arena = VisualizationArena::create({
+                                              .arena_size = 1024 * 1024,
+                                              .engine = EngineKind::Buddy,
+                                              .shard_count = 1,
+                                              .compact_headers = true,
+                                          })
+                   .value();
+  auto *p = static_cast<unsigned char *>(arena.alloc_raw(140000, 16, "big"));
+  ASSERT_NE(p, nullptr);
+  p[139999] = 7;
+  auto snap = nlohmann::json::parse(arena.snapshot_json());
+  ASSERT_EQ(snap["blocks"].size(), 1u);
+  EXPECT_EQ(snap["blocks"][0]["size"], 140000);
+  EXPECT_EQ(snap["blocks"][0]["actual_size"], 256 * 1024);
+  auto *q = static_cast<unsigned char *>(arena.realloc_raw(p, 300000, 16, ""));
+  ASSERT_NE(q, nullptr);
+  EXPECT_EQ(q[139999], 7);
+  EXPECT_EQ(q[299999], 0);
+  arena.dealloc_raw(q, 300000);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, ForeignFreesQueueUntilOwnerAllocates) {
+  auto arena = VisualizationArena::create(
+                   {.magazine_size = 0, .shard_count = 2})
+                   .value();
+
+  void *p = arena.alloc_raw(1024, 16, "remote");
+  ASSERT_NE(p, nullptr);
+  std::thread([&] { arena.dealloc_raw(p, 1024); }).join();
+
+  // Queued, not yet returned, but already accounted as free.
+  std::uint64_t queued = 0;
+  for (const auto &s : arena.shard_stats()) {
+    queued += s.remote_frees;
+  }
+  EXPECT_EQ(queued, 1u);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+
+  // The owner's next allocation drains the list and reuses the block.
+  void *q = arena.alloc_raw(1024, 16, "remote");
+  EXPECT_EQ(q, p);
+  arena.dealloc_raw(q, 1024);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, ForeignBatchFreeIsOnePush) {
+  auto arena = VisualizationArena::create(
+                   {.magazine_size = 0, .shard_count = 2})
+                   .value();
+
+  std::array<void *, 16> ptrs{};
+  ASSERT_EQ(arena.alloc_batch(ptrs.size(), 64, 16, "batch", ptrs.data()),
+            ptrs.size());
+  const auto acquisitions = [&] {
+    std::uint64_t sum = 0;
+    for (const auto &s : arena.shard_stats()) {
+      sum += s.acquisitions;
+    }
+    return sum;
+  };
+  const auto before = acquisitions();
+  std::thread([&] { arena.dealloc_batch(ptrs); }).join();
+
+  EXPECT_EQ(acquisitions(), before);
+  std::uint64_t queued = 0;
+  for (const auto &s : arena.shard_stats()) {
+    queued += s.remote_frees;
+  }
+  EXPECT_EQ(queued, ptrs.size());
+
+  void *q = arena.alloc_raw(64, 16, "batch");
+  EXPECT_EQ(q, ptrs[0]);
+  arena.dealloc_raw(q, 64);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, RemoteFreeDisabledLocksOwner) {
+  auto arena = VisualizationArena::create(
+                   {.magazine_size = 0, .shard_count = 2,
+                    .remote_free = false})
+                   .value();
+
+  void *p = arena.alloc_raw(1024, 16, "remote");
+  ASSERT_NE(p, nullptr);
+  std::thread([&] { arena.dealloc_raw(p, 1024); }).join();
+
+  for (const auto &s : arena.shard_stats()) {
+    EXPECT_EQ(s.remote_frees, 0u);
+  }
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+}
+
+TEST(VisualizationArenaConfigTest, HomeThreadSkipsTheShardMutex) {
+  const auto fast_acquisitions = [](bool biased) {
+    auto arena = VisualizationArena::create(
+                     {.magazine_size = 0, .shard_count = 1,
+                      .biased_locking = biased})
+                     .value();
+    for (int i = 0; i < 1000; ++i) {
+      arena.dealloc_raw(arena.alloc_raw(64, 16, "biased"), 64);
+    }
+    EXPECT_EQ(arena.bytes_allocated(), 0u);
+    const auto stats = arena.shard_stats()[0];
+    EXPECT_LE(stats.biased_acquisitions, stats.acquisitions);
+    return stats.biased_acquisitions;
+  };
+  EXPECT_EQ(fast_acquisitions(false), 0u);
+#if defined(__SANITIZE_THREAD__)
+  GTEST_SKIP() << "biasing is off under ThreadSanitizer";
+#endif
+  EXPECT_GT(fast_acquisitions(true), 1000u);
+}
+
+TEST(VisualizationArenaConfigTest, FallbackProbeKeepsOtherShardsBiased) {
+  auto arena = VisualizationArena::create({.arena_size = 1024 * 1024,
+                                           .magazine_size = 0,
+                                           .shard_count = 4,
+                                           .biased_locking = true})
+                   .value();
+  // This thread takes one shard, three more threads bias the others.
+  arena.dealloc_raw(arena.alloc_raw(64, 16, "home"), 64);
+  for (int t = 0; t < 3; ++t) {
+    std::thread([&] {
+      for (int i = 0; i < 100; ++i) {
+        arena.dealloc_raw(arena.alloc_raw(64, 16, "biased"), 64);
+      }
+    }).join();
+  }
+
+  // Larger than any shard: every other shard is probed, none allocated
+  // from.
+  EXPECT_EQ(arena.alloc_raw(512 * 1024, 16, "too-big"), nullptr);
+  EXPECT_EQ(arena.fallback_stats().attempts, 1u);
+  std::uint64_t biased = 0;
+  for (const auto &s : arena.shard_stats()) {
+    biased += s.biased_acquisitions;
+    EXPECT_EQ(s.bias_revocations, 0u);
+  }
+#if defined(__SANITIZE_THREAD__)
+  GTEST_SKIP() << "biasing is off under ThreadSanitizer";
+#endif
+  EXPECT_GT(biased, 0u);
+}
+
+// ─── Relocatable handles ────────────────────────────────────────────────
+
+namespace {
+/// Not trivially copyable, so relocation goes through the move constructor.
+struct Record {
+  std::string name;
+  std::array<int, 1500> values{};
+};
+
+auto handle_test_arena(std::size_t compact_interval_ms = 0)
+    -> VisualizationArena {
+  return VisualizationArena::create({
+                                        .arena_size = 256 * 1024,
+                                        .magazine_size = 0,
+                                        .cross_shard_fallback = false,
+                                        .shard_count = 1,
+                                        .compact_interval_ms =
+                                            compact_interval_ms,
+                                    })
+      .value();
+}
+} // namespace
+
+TEST(VisualizationArenaHandleTest, CompactSlidesHandlesDown) {
+  auto arena = handle_test_arena();
+  std::array<void *, 4> fillers{};
+  for (auto &p : fillers) {
+    p = arena.alloc_raw(8192, 16, "filler");
+    ASSERT_NE(p, nullptr);
+  }
+  auto h = arena.alloc_handle<Record>("record");
+  ASSERT_TRUE(h);
+  auto *before = arena.pin(h);
+  before->name = "a name too long for the small string buffer";
+  before->values[1499] = 42;
+  arena.unpin(h);
+
+  for (void *p : fillers) {
+    arena.dealloc_raw(p, 8192);
+  }
+  EXPECT_EQ(arena.compact(), 1u);
+  EXPECT_EQ(arena.compact(), 0u); // Already as low as it goes.
+
+  auto *after = arena.pin(h);
+  EXPECT_LT(after, before);
+  EXPECT_EQ(after->name, "a name too long for the small string buffer");
+  EXPECT_EQ(after->values[1499], 42);
+  arena.unpin(h);
+  EXPECT_EQ(arena.fragmentation_pct(), 0u);
+
+  // The relocation follows the frees that made room for it.
+  auto log = nlohmann::json::parse(arena.event_log_json());
+  const auto &last = log.back();
+  EXPECT_EQ(last["type"], "relocate");
+  EXPECT_EQ(last["tag"], TagTable::global().intern("record"));
+  EXPECT_LT(last["offset"].get<std::size_t>(),
+            last["from_offset"].get<std::size_t>());
+
+  arena.dealloc(h);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+  EXPECT_EQ(arena.active_block_count(), 0u);
+}
+
+TEST(VisualizationArenaHandleTest, PinnedHandlesStayPut) {
+  auto arena = handle_test_arena();
+  void *filler = arena.alloc_raw(8192, 16, "filler");
+  auto h = arena.alloc_handle<std::array<double, 1000>>("pinned");
+  ASSERT_TRUE(h);
+  arena.dealloc_raw(filler, 8192);
+
+  auto *p = arena.pin(h);
+  EXPECT_EQ(arena.compact(), 0u);
+  EXPECT_EQ(arena.pin(h), p); // Pins nest.
+  arena.unpin(h);
+  arena.unpin(h);
+  EXPECT_EQ(arena.compact(), 1u);
+  arena.dealloc(h);
+}
+
+TEST(VisualizationArenaHandleTest, HandleSlotsAreReused) {
+  auto arena = handle_test_arena();
+  auto a = arena.alloc_handle<int>("a", 1);
+  auto b = arena.alloc_handle<int>("b", 2);
+  EXPECT_NE(a, b);
+  arena.dealloc(a);
+  auto c = arena.alloc_handle<int>("c", 3);
+  EXPECT_EQ(c, a);
+  EXPECT_EQ(*arena.pin(c), 3);
+  arena.unpin(c);
+  arena.dealloc(b);
+  arena.dealloc(c);
+  EXPECT_EQ(arena.active_block_count(), 0u);
+}
+
+TEST(VisualizationArenaHandleTest, CompactorThreadMovesIdleShard) {
+  auto arena = handle_test_arena(/*compact_interval_ms=*/5);
+  void *filler = arena.alloc_raw(16384, 16, "filler");
+  auto h = arena.alloc_handle<std::array<char, 10000>>("moving");
+  ASSERT_TRUE(h);
+  auto *start = arena.pin(h);
+  arena.unpin(h);
+  arena.dealloc_raw(filler, 16384);
+
+  auto deadline = std::chrono::steady_clock::now() + std::chrono::seconds(5);
+  while (arena.pin(h) == start &&
+         std::chrono::steady_clock::now() < deadline) {
+    arena.unpin(h);
+    std::this_thread::sleep_for(std::chrono::milliseconds(5));
+  }
+  EXPECT_LT(arena.pin(h), start);
+  arena.unpin(h);
+  arena.unpin(h);
+  arena.dealloc(h);
+}
+
 TEST_F(VisualizationArenaTest, PmrInterop) {
   auto *res = arena_->resource();
   ASSERT_NE(res, nullptr);
@@ -125,6 +876,164 @@ TEST_F(VisualizationArenaTest, PmrInterop) {
   EXPECT_GT(arena_->bytes_allocated(), 0u);
 }
 
+// ─── Regions ────────────────────────────────────────────────────────────
+
+TEST(VisualizationArenaRegionTest, BumpsWithinOneBlock) {
+  auto arena = handle_test_arena();
+  auto region = arena.make_region(4096, "scratch");
+  ASSERT_TRUE(region);
+  EXPECT_EQ(arena.active_block_count(), 1u);
+  const auto allocated = arena.bytes_allocated();
+
+  auto *a = static_cast<std::byte *>(region.allocate(100, 8));
+  auto *b = static_cast<std::byte *>(region.allocate(64, 64));
+  ASSERT_NE(a, nullptr);
+  ASSERT_NE(b, nullptr);
+  EXPECT_EQ(a, region.data());
+  EXPECT_GE(b, a + 100);
+  EXPECT_EQ(reinterpret_cast<std::uintptr_t>(b) % 64, 0u);
+  EXPECT_EQ(region.used(), static_cast<std::size_t>(b + 64 - a));
+  EXPECT_EQ(region.allocate(4096, 8), nullptr);
+
+  // Neither bumping nor resetting touches the arena.
+  EXPECT_EQ(arena.bytes_allocated(), allocated);
+  region.reset();
+  EXPECT_EQ(region.used(), 0u);
+  EXPECT_EQ(region.allocate(4096, 8), region.data());
+  EXPECT_EQ(arena.active_block_count(), 1u);
+
+  region.release();
+  EXPECT_FALSE(region);
+  EXPECT_EQ(region.allocate(1, 1), nullptr);
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+  EXPECT_EQ(arena.active_block_count(), 0u);
+}
+
+TEST(VisualizationArenaRegionTest, ResourceBacksPmrContainers) {
+  auto arena = handle_test_arena();
+  auto region = arena.make_region(1024, "pmr scratch");
+  ASSERT_TRUE(region);
+
+  std::pmr::vector<int> vec{region.resource()};
+  vec.reserve(16);
+  for (int i = 0; i < 16; ++i) {
+    vec.push_back(i);
+  }
+  EXPECT_EQ(static_cast<void *>(vec.data()), region.data());
+  EXPECT_THROW(vec.reserve(1024), std::bad_alloc);
+
+  // A moved region keeps its resource pointing at itself.
+  Region moved = std::move(region);
+  EXPECT_FALSE(region);
+  std::pmr::vector<char> bytes{moved.resource()};
+  bytes.resize(8);
+  EXPECT_GT(moved.used(), 16 * sizeof(int));
+}
+
+TEST(VisualizationArenaRegionTest, StreamsFillLevel) {
+  auto arena = handle_test_arena();
+  auto region = arena.make_region(4096, "scratch");
+  ASSERT_TRUE(region);
+
+  // Small steps stay quiet until a sixteenth of the region is used.
+  ASSERT_NE(region.allocate(16, 16), nullptr);
+  auto log = nlohmann::json::parse(arena.event_log_json());
+  EXPECT_EQ(log.back()["type"], "allocate");
+
+  ASSERT_NE(region.allocate(1024, 16), nullptr);
+  log = nlohmann::json::parse(arena.event_log_json());
+  EXPECT_EQ(log.back()["type"], "fill");
+  EXPECT_EQ(log.back()["used"], region.used());
+  EXPECT_EQ(log.back()["size"], 4096u);
+  EXPECT_EQ(log.back()["tag"], TagTable::global().intern("scratch"));
+
+  region.reset();
+  log = nlohmann::json::parse(arena.event_log_json());
+  EXPECT_EQ(log.back()["type"], "fill");
+  EXPECT_EQ(log.back()["used"], 0u);
+}
+
+// ─── Object pools ───────────────────────────────────────────────────────
+
+namespace {
+struct Node {
+  static inline int alive = 0;
+  Node *left = nullptr;
+  Node *right = nullptr;
+  int key;
+  explicit Node(int k) : key{k} { ++alive; }
+  ~Node() { --alive; }
+};
+} // namespace
+
+TEST(ObjectPoolTest, CarvesSlabsAndRecyclesSlots) {
+  auto arena = handle_test_arena();
+  {
+    ObjectPool<Node> pool{arena, "nodes", 64};
+    std::vector<Node *> nodes;
+    for (int i = 0; i < 100; ++i) {
+      auto *n = pool.create(i);
+      ASSERT_NE(n, nullptr);
+      EXPECT_EQ(reinterpret_cast<std::uintptr_t>(n) % alignof(Node), 0u);
+      nodes.push_back(n);
+    }
+    EXPECT_EQ(Node::alive, 100);
+    EXPECT_EQ(pool.size(), 100u);
+    EXPECT_EQ(pool.slab_count(), 2u);
+    EXPECT_EQ(pool.capacity(), 128u);
+    // The arena sees slabs, not objects.
+    EXPECT_EQ(arena.active_block_count(), 2u);
+    EXPECT_EQ(nodes[1] - nodes[0], 1);
+
+    // A freed slot is the next one handed out.
+    auto *freed = nodes[42];
+    pool.destroy(freed);
+    EXPECT_EQ(Node::alive, 99);
+    nodes[42] = pool.create(-1);
+    EXPECT_EQ(nodes[42], freed);
+    EXPECT_EQ(nodes[42]->key, -1);
+
+    for (auto *n : nodes) {
+      pool.destroy(n);
+    }
+    EXPECT_EQ(Node::alive, 0);
+    EXPECT_EQ(pool.size(), 0u);
+    EXPECT_EQ(pool.slab_count(), 2u); // Slabs stay until the pool goes.
+  }
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+  EXPECT_EQ(arena.active_block_count(), 0u);
+}
+
+TEST(ObjectPoolTest, ReportsOccupancyAsSlabFill) {
+  auto arena = handle_test_arena();
+  ObjectPool<Node> pool{arena, "nodes", 32};
+  constexpr auto kSlot = ObjectPool<Node>::kSlotSize;
+
+  // 32 slots report every second object.
+  auto *a = pool.create(1);
+  auto log = nlohmann::json::parse(arena.event_log_json());
+  EXPECT_EQ(log.back()["type"], "allocate");
+  EXPECT_EQ(log.back()["size"], 32 * kSlot);
+  auto *b = pool.create(2);
+  log = nlohmann::json::parse(arena.event_log_json());
+  EXPECT_EQ(log.back()["type"], "fill");
+  EXPECT_EQ(log.back()["used"], 2 * kSlot);
+  EXPECT_EQ(log.back()["tag"], TagTable::global().intern("nodes"));
+
+  pool.destroy(a);
+  pool.destroy(b);
+  log = nlohmann::json::parse(arena.event_log_json());
+  EXPECT_EQ(log.back()["type"], "fill");
+  EXPECT_EQ(log.back()["used"], 0u);
+}
+
+TEST(ObjectPoolTest, FailsWhenArenaIsFull) {
+  auto arena = handle_test_arena();
+  ObjectPool<Node> pool{arena, "nodes", 1024 * 1024};
+  EXPECT_EQ(pool.create(1), nullptr);
+  EXPECT_EQ(pool.slab_count(), 0u);
+}
+
 // ─── Padding report ─────────────────────────────────────────────────────
 
 TEST_F(VisualizationArenaTest, DISABLED_PaddingReport) {
@@ -162,6 +1071,250 @@ TEST_F(VisualizationArenaTest, SnapshotJson) {
   EXPECT_NE(json.find("\"capacity\""), std::string::npos);
 }
 
+TEST(VisualizationArenaConfigTest, SnapshotListsEveryLiveBlock) {
+  for (bool compact : {false, true}) {
+    auto arena = VisualizationArena::create({
+                                                .arena_size = 1024 * 1024,
+                                                .shard_count = 1,
+                                                .compact_headers = compact,
+                                            })
+                     .value();
+    // Slab slots, tree blocks, and blocks parked in the magazine.
+    std::vector<std::pair<void *, std::size_t>> live;
+    for (std::size_t size : {8, 24, 100, 5000, 40, 20000}) {
+      for (int i = 0; i < 4; ++i) {
+        live.emplace_back(arena.alloc_raw(size, 16, "snap"), size);
+        ASSERT_NE(live.back().first, nullptr);
+      }
+    }
+    for (std::size_t i = 0; i < live.size(); i += 3) {
+      arena.dealloc_raw(live[i].first, live[i].second);
+      live[i].first = nullptr;
+    }
+
+    auto snap = nlohmann::json::parse(arena.snapshot_json());
+    const auto &blocks = snap["blocks"];
+    EXPECT_EQ(blocks.size(), arena.active_block_count());
+    std::size_t offset = 0;
+    for (const auto &b : blocks) {
+      EXPECT_GE(b["offset"].get<std::size_t>(), offset);
+      offset = b["offset"].get<std::size_t>() +
+               b["actual_size"].get<std::size_t>();
+    }
+    for (auto [p, size] : live) {
+      arena.dealloc_raw(p, size);
+    }
+  }
+}
+
+TEST(VisualizationArenaConfigTest, TlsfEngineServesEveryPath) {
+  for (bool compact : {false, true}) {
+    auto arena = VisualizationArena::create({
+                                                .arena_size = 1024 * 1024,
+                                                .engine = EngineKind::Tlsf,
+                                                .max_arena_size =
+                                                    64 * 1024 * 1024,
+                                                .shard_count = 4,
+                                                .compact_headers = compact,
+                                            })
+                     .value();
+    const auto initial = arena.capacity();
+
+    // Single, magazine-cached and batched blocks, past the initial slice.
+    std::vector<std::pair<void *, std::size_t>> live;
+    for (std::size_t size : {8, 24, 100, 5000, 40, 200000}) {
+      for (int i = 0; i < 4; ++i) {
+        live.emplace_back(arena.alloc_raw(size, 16, "tlsf"), size);
+        ASSERT_NE(live.back().first, nullptr);
+        std::memset(live.back().first, 0x3C, size);
+      }
+    }
+    EXPECT_GT(arena.capacity(), initial);
+    std::array<void *, 16> batch{};
+    ASSERT_EQ(arena.alloc_batch(batch.size(), 64, 64, "tlsf", batch.data()),
+              batch.size());
+    for (void *p : batch) {
+      EXPECT_EQ(reinterpret_cast<std::uintptr_t>(p) % 64, 0u);
+    }
+    for (std::size_t i = 0; i < live.size(); i += 3) {
+      arena.dealloc_raw(live[i].first, live[i].second);
+      live[i].first = nullptr;
+    }
+
+    auto *grown = static_cast<unsigned char *>(
+        arena.realloc_raw(live[1].first, 500, 16, ""));
+    ASSERT_NE(grown, nullptr);
+    EXPECT_EQ(grown[7], 0x3C);
+    live[1] = {grown, 500};
+
+    auto snap = nlohmann::json::parse(arena.snapshot_json());
+    const auto &blocks = snap["blocks"];
+    EXPECT_EQ(blocks.size(), arena.active_block_count());
+    std::size_t offset = 0;
+    for (const auto &b : blocks) {
+      EXPECT_GE(b["offset"].get<std::size_t>(), offset);
+      offset = b["offset"].get<std::size_t>() +
+               b["actual_size"].get<std::size_t>();
+    }
+
+    arena.dealloc_batch(batch);
+    for (auto [p, size] : live) {
+      arena.dealloc_raw(p, size);
+    }
+    EXPECT_EQ(arena.bytes_allocated(), 0u);
+  }
+}
+
+TEST(VisualizationArenaConfigTest, DeferredCoalescingIsInvisibleToQueries) {
+  auto arena = VisualizationArena::create({
+                                              .arena_size = 1024 * 1024,
+                                              .deferred_coalescing = 64,
+                                              .magazine_size = 0,
+                                              .shard_count = 1,
+                                          })
+                   .value();
+  std::vector<void *> live;
+  while (void *p = arena.alloc_raw(6000, 16, "deferred")) {
+    live.push_back(p);
+  }
+  ASSERT_GT(live.size(), 64u);
+  // Free every block but the last; most of them are still pending.
+  for (std::size_t i = 0; i + 1 < live.size(); ++i) {
+    arena.dealloc_raw(live[i], 6000);
+  }
+  EXPECT_GT(arena.largest_free_block(), 6000 * (live.size() - 2));
+  auto snap = nlohmann::json::parse(arena.snapshot_json());
+  EXPECT_EQ(snap["blocks"].size(), 1u);
+  EXPECT_LE(snap["free_block_count"].get<std::size_t>(), 2u); // Head, tail.
+
+  // The freed space serves one large request.
+  void *big = arena.alloc_raw(6000 * (live.size() - 2), 16, "big");
+  EXPECT_NE(big, nullptr);
+}
+
+TEST(VisualizationArenaConfigTest, BuddyEngineStreamsOrders) {
+  auto arena = VisualizationArena::create({
+                                              .arena_size = 1024 * 1024,
+                                              .engine = EngineKind::Buddy,
+                                              .magazine_size = 0,
+                                              .max_arena_size =
+                                                  16 * 1024 * 1024,
+                                              .shard_count = 2,
+                                          })
+                   .value();
+  std::vector<std::pair<void *, std::size_t>> live;
+  for (std::size_t size : {4096, 64, 1000, 65536, 700000}) {
+    live.emplace_back(arena.alloc_raw(size, 16, "io"), size);
+    ASSERT_NE(live.back().first, nullptr) << size;
+  }
+
+  auto snap = nlohmann::json::parse(arena.snapshot_json());
+  EXPECT_EQ(snap["engine"], "buddy");
+  const auto stride = snap["buddy_stride"].get<std::size_t>();
+  ASSERT_GT(stride, 0u);
+  ASSERT_EQ(snap["blocks"].size(), live.size());
+  for (const auto &b : snap["blocks"]) {
+    const auto actual = b["actual_size"].get<std::size_t>();
+    EXPECT_EQ(actual, std::size_t{16} << b["order"].get<int>());
+    // Headers live out of band, so a power of two is not rounded up.
+    EXPECT_EQ(actual, std::bit_ceil(b["size"].get<std::size_t>()));
+    // Aligned to its size within its shard.
+    EXPECT_EQ(b["offset"].get<std::size_t>() % stride % actual, 0u);
+  }
+
+  for (auto [p, size] : live) {
+    arena.dealloc_raw(p, size);
+  }
+  EXPECT_EQ(arena.bytes_allocated(), 0u);
+  auto log = nlohmann::json::parse(arena.event_log_json());
+  ASSERT_EQ(log.size(), 2 * live.size());
+  for (const auto &e : log) {
+    EXPECT_EQ(e["actual_size"].get<std::size_t>(),
+              std::size_t{16} << e["order"].get<int>());
+  }
+}
+
+TEST(VisualizationArenaConfigTest, SnapshotReportsFragmentation) {
+  auto arena = VisualizationArena::create({
+                                              .arena_size = 256 * 1024,
+                                              .magazine_size = 0,
+                                              .shard_count = 1,
+                                          })
+                   .value();
+  std::array<void *, 8> blocks{};
+  for (auto &p : blocks) {
+    p = arena.alloc_raw(16 * 1024, 16, "frag");
+    ASSERT_NE(p, nullptr);
+  }
+  EXPECT_EQ(arena.fragmentation_pct(), 0u);
+
+  // Holes between live blocks: free bytes outside the largest free block.
+  for (std::size_t i = 0; i < blocks.size(); i += 2) {
+    arena.dealloc_raw(blocks[i], 16 * 1024);
+  }
+  const auto pct = arena.fragmentation_pct();
+  EXPECT_GT(pct, 0u);
+  EXPECT_LT(arena.largest_free_block(), arena.bytes_free());
+  auto j = nlohmann::json::parse(arena.snapshot_json());
+  EXPECT_EQ(j["fragmentation_pct"].get<std::size_t>(), pct);
+  EXPECT_EQ(arena.active_block_count(), blocks.size() / 2);
+}
+
+TEST_F(VisualizationArenaTest, SnapshotCarriesTagDictionary) {
+  // Large enough for the tree, which the snapshot walk visits.
+  arena_->alloc_raw(8192, 16, "dict_test");
+
+  auto j = nlohmann::json::parse(arena_->snapshot_json());
+  ASSERT_TRUE(j["tags"].is_object());
+  bool found = false;
+  for (const auto &block : j["blocks"]) {
+    ASSERT_TRUE(block["tag"].is_number());
+    auto id = std::to_string(block["tag"].get<int>());
+    if (j["tags"].contains(id) && j["tags"][id] == "dict_test") {
+      found = true;
+    }
+  }
+  EXPECT_TRUE(found);
+}
+
+TEST(TagDictionaryTest, CursorSkipsAnnouncedTags) {
+  std::size_t cursor = TagTable::kUntagged + 1;
+  auto all = tag_dictionary(TagTable::global(), cursor);
+  EXPECT_EQ(cursor, TagTable::global().size());
+  EXPECT_TRUE(tag_dictionary(TagTable::global(), cursor).empty());
+
+  auto id = TagTable::global().intern("dictionary_cursor_test");
+  auto delta = tag_dictionary(TagTable::global(), cursor);
+  ASSERT_EQ(delta.size(), 1u);
+  EXPECT_EQ(delta[std::to_string(id)], "dictionary_cursor_test");
+  EXPECT_EQ(tags_to_json(delta)["type"], "tags");
+}
+
+TEST(ShardStatsJsonTest, ReportsWindowPerShard) {
+  std::vector<ShardLockHistograms> window(2);
+  window[1].wait.counts[0] = 6;
+  window[1].wait.counts[LatencyHistogram::bucket_of(5000)] = 2;
+  window[1].hold.counts[LatencyHistogram::bucket_of(1'000'000)] = 8;
+
+  auto j = shard_stats_to_json(window, 100);
+  EXPECT_EQ(j["type"], "shard_stats");
+  EXPECT_EQ(j["interval_ms"], 100);
+  ASSERT_EQ(j["shards"].size(), 2u);
+  EXPECT_EQ(j["shards"][0]["acquisitions"], 0);
+  EXPECT_EQ(j["shards"][0]["busy_pct"], 0.0);
+
+  const auto &hot = j["shards"][1];
+  EXPECT_EQ(hot["shard"], 1);
+  EXPECT_EQ(hot["acquisitions"], 8);
+  EXPECT_EQ(hot["contended"], 2);
+  EXPECT_EQ(hot["wait_p50"], 0);
+  EXPECT_EQ(hot["wait_p99"], 8192);
+  EXPECT_EQ(hot["hold_p99"], 1u << 20);
+  // Eight holds of ~0.79 ms each in 100 ms.
+  EXPECT_NEAR(hot["busy_pct"].get<double>(), 6.3, 0.1);
+  ASSERT_EQ(hot["hold_ns"].size(), LatencyHistogram::kBuckets);
+}
+
 TEST_F(VisualizationArenaTest, EventLogJson) {
   arena_->alloc_raw(64, 16, "log_test");
 
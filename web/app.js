@@ -13,7 +13,9 @@ const state = {
     ws: null,
     connected: false,
     capacity: 0,
-    blocks: new Map(),         // offset → { offset, size, actual_size, alignment, tag, age }
+    buddyStride: 0,            // Shard stride of a buddy-engine arena (0 = other engine)
+    blocks: new Map(),         // offset → { offset, size, actual_size, alignment, tag, order, age }
+    tagNames: new Map(),       // tag id → name, from the server's tag dictionary
     recentDeallocs: new Map(), // offset → { size, fadeStart }
     events: [],                // Event log for the timeline panel
     stats: {
@@ -28,6 +30,7 @@ const state = {
     heatmapEnabled: false,
     heatmap: new Float64Array(HEATMAP_BUCKETS), // Per-bucket access frequency
     heatmapMax: 1,             // Maximum bucket value (for normalization)
+    shardStats: [],            // Latest shard_stats window, one entry per shard
     // Replay state
     importedEvents: null,      // Loaded JSON events awaiting replay
     replaying: false,
@@ -43,6 +46,8 @@ const dom = {
     timeline: document.getElementById('timeline'),
     connectionStatus: document.getElementById('connectionStatus'),
     fragBar: document.getElementById('fragBar'),
+    shardStrip: document.getElementById('shardStrip'),
+    shardStripContainer: document.getElementById('shardStripContainer'),
     statCapacity: document.getElementById('statCapacity'),
     statAllocated: document.getElementById('statAllocated'),
     statFree: document.getElementById('statFree'),
@@ -89,6 +94,7 @@ const DEALLOC_FADE_MS = 1200;    // How long freed blocks glow red
 const CANVAS_PADDING = 12;       // px padding inside canvas
 const ROW_HEIGHT = 28;           // px height per row in grid view
 const MAX_TIMELINE_EVENTS = 200;
+const BUDDY_ANCESTOR_LEVELS = 3; // Enclosing buddy blocks bracketed per block
 
 // ─── Canvas Setup ───────────────────────────────────────────────
 
@@ -155,16 +161,43 @@ function handleMessage(data) {
 function processEvent(data) {
     if (data.type === 'snapshot') {
         handleSnapshot(data);
+    } else if (data.type === 'tags') {
+        handleTags(data.tags);
     } else if (data.type === 'allocate') {
         handleAllocate(data);
     } else if (data.type === 'deallocate') {
         handleDeallocate(data);
+    } else if (data.type === 'resize') {
+        handleResize(data);
+    } else if (data.type === 'relocate') {
+        handleRelocate(data);
+    } else if (data.type === 'fill') {
+        handleFill(data);
+    } else if (data.type === 'shard_stats') {
+        handleShardStats(data);
     }
 }
 
+// Blocks and events carry tag ids; the dictionary arrives once with the
+// snapshot and grows through "tags" messages as new tags appear.
+function handleTags(tags) {
+    for (const [id, name] of Object.entries(tags || {})) {
+        state.tagNames.set(Number(id), name);
+    }
+}
+
+// Tag text for an event's tag field. Older exports carry the text itself.
+function tagName(tag) {
+    if (typeof tag !== 'number') return tag || '';
+    if (tag === 0) return '';
+    return state.tagNames.get(tag) ?? `#${tag}`;
+}
+
 function handleSnapshot(data) {
     state.capacity = data.capacity;
+    state.buddyStride = data.buddy_stride || 0;
     state.blocks.clear();
+    handleTags(data.tags);
 
     for (const block of data.blocks) {
         state.blocks.set(block.offset, {
@@ -172,7 +205,8 @@ function handleSnapshot(data) {
             size: block.size,
             actual_size: block.actual_size,
             alignment: block.alignment,
-            tag: block.tag || '',
+            tag: tagName(block.tag),
+            order: block.order,
             age: 0,
         });
     }
@@ -186,14 +220,20 @@ function handleSnapshot(data) {
 }
 
 function handleAllocate(data) {
-    state.blocks.set(data.offset, {
-        offset: data.offset,
-        size: data.size,
-        actual_size: data.actual_size,
-        alignment: data.alignment,
-        tag: data.tag || '',
-        age: performance.now(),
-    });
+    // Batch records describe `count` blocks spaced `stride` bytes apart.
+    const count = data.count || 1;
+    for (let i = 0; i < count; i++) {
+        const offset = data.offset + i * (data.stride || 0);
+        state.blocks.set(offset, {
+            offset: offset,
+            size: data.size,
+            actual_size: data.actual_size,
+            alignment: data.alignment,
+            tag: tagName(data.tag),
+            order: data.order,
+            age: performance.now(),
+        });
+    }
 
     state.stats.totalAllocated = data.total_allocated;
     state.stats.totalFree = data.total_free;
@@ -205,7 +245,7 @@ function handleAllocate(data) {
         state.capacity = data.total_allocated + data.total_free;
     }
 
-    bumpHeatmap(data.offset, data.actual_size || data.size);
+    bumpHeatmap(data.offset, batchExtent(data));
 
     state.eventCount++;
     addTimelineEvent(data);
@@ -213,15 +253,49 @@ function handleAllocate(data) {
 }
 
 function handleDeallocate(data) {
+    const count = data.count || 1;
+    for (let i = 0; i < count; i++) {
+        const offset = data.offset + i * (data.stride || 0);
+        const block = state.blocks.get(offset);
+        if (block) {
+            // Move to recent deallocs for fade animation.
+            state.recentDeallocs.set(offset, {
+                offset: offset,
+                size: block.actual_size || data.actual_size,
+                fadeStart: performance.now(),
+            });
+            state.blocks.delete(offset);
+        }
+    }
+
+    state.stats.totalAllocated = data.total_allocated;
+    state.stats.totalFree = data.total_free;
+    state.stats.fragPct = data.fragmentation_pct;
+    state.stats.freeBlockCount = data.free_block_count;
+
+    bumpHeatmap(data.offset, batchExtent(data));
+
+    state.eventCount++;
+    addTimelineEvent(data);
+    updateStatsUI();
+}
+
+function handleResize(data) {
     const block = state.blocks.get(data.offset);
+    const oldSize = block ? block.actual_size : data.actual_size;
     if (block) {
-        // Move to recent deallocs for fade animation.
-        state.recentDeallocs.set(data.offset, {
-            offset: data.offset,
-            size: block.actual_size || data.actual_size,
+        block.size = data.size;
+        block.actual_size = data.actual_size;
+        block.order = data.order;
+        block.age = performance.now();
+    }
+    // A shrink leaves a freed tail behind; fade it out like a dealloc.
+    if (data.actual_size < oldSize) {
+        state.recentDeallocs.set(data.offset + data.actual_size, {
+            offset: data.offset + data.actual_size,
+            size: oldSize - data.actual_size,
             fadeStart: performance.now(),
         });
-        state.blocks.delete(data.offset);
     }
 
     state.stats.totalAllocated = data.total_allocated;
@@ -229,13 +303,68 @@ function handleDeallocate(data) {
     state.stats.fragPct = data.fragmentation_pct;
     state.stats.freeBlockCount = data.free_block_count;
 
-    bumpHeatmap(data.offset, data.actual_size || data.size);
+    bumpHeatmap(data.offset, Math.max(data.actual_size, oldSize));
 
     state.eventCount++;
     addTimelineEvent(data);
     updateStatsUI();
 }
 
+// The compactor moved a live block down: the old place fades out like a
+// dealloc and the block reappears, freshly lit, at its new offset.
+function handleRelocate(data) {
+    const block = state.blocks.get(data.from_offset);
+    state.blocks.delete(data.from_offset);
+    state.recentDeallocs.set(data.from_offset, {
+        offset: data.from_offset,
+        size: block ? block.actual_size : data.actual_size,
+        fadeStart: performance.now(),
+    });
+    state.blocks.set(data.offset, {
+        offset: data.offset,
+        size: data.size,
+        actual_size: data.actual_size,
+        alignment: data.alignment,
+        tag: block ? block.tag : tagName(data.tag),
+        age: performance.now(),
+    });
+
+    state.stats.totalAllocated = data.total_allocated;
+    state.stats.totalFree = data.total_free;
+    state.stats.fragPct = data.fragmentation_pct;
+    state.stats.freeBlockCount = data.free_block_count;
+
+    bumpHeatmap(data.offset, data.actual_size);
+
+    state.eventCount++;
+    addTimelineEvent(data);
+    updateStatsUI();
+}
+
+// A region block reports how much of it is handed out. The block itself
+// does not change, so the timeline is left alone.
+function handleFill(data) {
+    const block = state.blocks.get(data.offset);
+    if (block) {
+        block.fill = data.used;
+    }
+
+    state.stats.totalAllocated = data.total_allocated;
+    state.stats.totalFree = data.total_free;
+    state.stats.fragPct = data.fragmentation_pct;
+    state.stats.freeBlockCount = data.free_block_count;
+
+    state.eventCount++;
+    updateStatsUI();
+}
+
+// Bytes spanned by an event (all blocks of a batch record).
+function batchExtent(data) {
+    const single = data.actual_size || data.size;
+    const count = data.count || 1;
+    return count > 1 ? (count - 1) * data.stride + single : single;
+}
+
 // ─── Stats UI ───────────────────────────────────────────────────
 
 function formatBytes(bytes) {
@@ -254,6 +383,41 @@ function updateStatsUI() {
     dom.fragBar.style.width = state.stats.fragPct + '%';
 }
 
+// ─── Shard Lock Heat Strip ──────────────────────────────────────
+
+function formatNs(ns) {
+    if (ns >= 1e6) return (ns / 1e6).toFixed(1) + ' ms';
+    if (ns >= 1e3) return (ns / 1e3).toFixed(1) + ' µs';
+    return ns + ' ns';
+}
+
+// One cell per shard, hotter the longer its lock was held or waited for
+// during the last interval.
+function handleShardStats(data) {
+    state.shardStats = data.shards || [];
+    dom.shardStripContainer.hidden = state.shardStats.length === 0;
+    while (dom.shardStrip.children.length < state.shardStats.length) {
+        const cell = document.createElement('div');
+        cell.className = 'shard-cell';
+        dom.shardStrip.appendChild(cell);
+    }
+    while (dom.shardStrip.children.length > state.shardStats.length) {
+        dom.shardStrip.lastChild.remove();
+    }
+
+    state.shardStats.forEach((s, i) => {
+        const cell = dom.shardStrip.children[i];
+        const contendedPct = s.acquisitions > 0 ? 100 * s.contended / s.acquisitions : 0;
+        const heat = Math.min(1, Math.max(s.busy_pct, contendedPct) / 100);
+        cell.style.background = s.acquisitions > 0 ? heatmapColor(heat, 0.9) : '';
+        cell.title =
+            `Shard ${s.shard}: ${s.acquisitions} locks / ${data.interval_ms} ms\n` +
+            `Contended: ${contendedPct.toFixed(1)}%  Busy: ${s.busy_pct.toFixed(1)}%\n` +
+            `Wait p50/p99: ${formatNs(s.wait_p50)} / ${formatNs(s.wait_p99)}\n` +
+            `Hold p50/p99: ${formatNs(s.hold_p50)} / ${formatNs(s.hold_p99)}`;
+    });
+}
+
 // ─── Timeline ───────────────────────────────────────────────────
 
 function addTimelineEvent(data) {
@@ -267,21 +431,26 @@ function addTimelineEvent(data) {
         // We'll re-render in next efficient pass; for now just append.
     }
 
-    const isAlloc = data.type === 'allocate';
+    const [typeClass, typeLabel] = {
+        allocate: ['alloc', 'ALLOC'],
+        deallocate: ['dealloc', 'FREE'],
+        resize: ['resize', 'RESIZE'],
+        relocate: ['relocate', 'MOVE'],
+    }[data.type] || ['dealloc', data.type];
     const row = document.createElement('div');
     row.className = 'event-row';
     row.innerHTML = `
         <span class="event-id">#${data.event_id}</span>
-        <span class="event-type ${isAlloc ? 'alloc' : 'dealloc'}">${isAlloc ? 'ALLOC' : 'FREE'}</span>
-        <span class="event-tag">${data.tag || '—'}</span>
-        <span class="event-size">${formatBytes(data.size)}</span>
+        <span class="event-type ${typeClass}">${typeLabel}</span>
+        <span class="event-tag">${tagName(data.tag) || '—'}</span>
+        <span class="event-size">${(data.count || 1) > 1 ? data.count + ' × ' : ''}${formatBytes(data.size)}</span>
         <span class="event-offset">0x${data.offset.toString(16).padStart(6, '0')}</span>
         <span class="event-frag">${data.fragmentation_pct}%</span>
     `;
 
     // Highlight block on hover.
     row.addEventListener('mouseenter', () => {
-        state.hover = { offset: data.offset, size: data.actual_size || data.size };
+        state.hover = { offset: data.offset, size: batchExtent(data) };
     });
     row.addEventListener('mouseleave', () => {
         state.hover = null;
@@ -348,7 +517,7 @@ function bumpHeatmap(offset, size) {
     }
 }
 
-function heatmapColor(intensity) {
+function heatmapColor(intensity, alpha = 0.35) {
     // 0 = cold (blue #3b82f6) → 0.5 = warm (orange #f97316) → 1.0 = hot (red #ef4444)
     let r, g, b;
     if (intensity < 0.5) {
@@ -362,7 +531,7 @@ function heatmapColor(intensity) {
         g = Math.round(115 + (68 - 115) * t);
         b = Math.round(22 + (68 - 22) * t);
     }
-    return `rgba(${r}, ${g}, ${b}, 0.35)`;
+    return `rgba(${r}, ${g}, ${b}, ${alpha})`;
 }
 
 function drawHeatmapOverlay(pad, drawW, rows, bytesPerRow) {
@@ -392,6 +561,7 @@ dom.btnExport.addEventListener('click', () => {
         exported_at: new Date().toISOString(),
         capacity: state.capacity,
         event_count: state.events.length,
+        tags: Object.fromEntries(state.tagNames),
         events: state.events,
     };
     const blob = new Blob([JSON.stringify(payload, null, 2)], { type: 'application/json' });
@@ -453,6 +623,7 @@ dom.btnReplay.addEventListener('click', async () => {
     if (state.importedEvents.capacity) {
         state.capacity = state.importedEvents.capacity;
     }
+    handleTags(state.importedEvents.tags);
 
     const REPLAY_SPEED = 4; // Nx speed multiplier
     const BASE_DELAY_MS = 80; // Minimum delay between events
@@ -604,6 +775,18 @@ function drawBlock(offset, size, block, now, pad, drawW, rows, bytesPerRow, isHi
     roundRect(ctx, start.x + BLOCK_PADDING, start.y + 1, pixelWidth - BLOCK_PADDING * 2, ROW_HEIGHT - 4, 2);
     ctx.fill();
 
+    // Regions: dim the part past the fill level.
+    if (block.fill !== undefined && block.size > 0) {
+        const innerW = pixelWidth - BLOCK_PADDING * 2;
+        const filledW = innerW * Math.min(1, block.fill / block.size);
+        ctx.fillStyle = 'rgba(10, 14, 23, 0.55)';
+        ctx.fillRect(start.x + BLOCK_PADDING + filledW, start.y + 1, innerW - filledW, ROW_HEIGHT - 4);
+    }
+
+    if (block.order !== undefined && state.buddyStride > 0) {
+        drawBuddyAncestors(offset, size, block.order, pad, drawW, rows, bytesPerRow);
+    }
+
     // Tag label if block is wide enough.
     if (pixelWidth > 40 && block.tag) {
         ctx.fillStyle = '#0a0e17';
@@ -621,6 +804,37 @@ function drawBlock(offset, size, block, now, pad, drawW, rows, bytesPerRow, isHi
     }
 }
 
+// Buddy blocks are aligned to their size within their shard, so the block
+// enclosing one k orders up starts at its offset with the low bits cleared.
+// Each ancestor gets a thin bracket under the row, coloured by its order.
+function drawBuddyAncestors(offset, size, order, pad, drawW, rows, bytesPerRow) {
+    const shardBase = Math.floor(offset / state.buddyStride) * state.buddyStride;
+    const rel = offset - shardBase;
+    for (let k = 1; k <= BUDDY_ANCESTOR_LEVELS; k++) {
+        const ancestorSize = size * 2 ** k;
+        if (ancestorSize > state.buddyStride) break;
+        const ancestorOffset = shardBase + rel - (rel % ancestorSize);
+        const start = offsetToPixel(ancestorOffset, pad, drawW, rows, bytesPerRow);
+        const width = Math.min((ancestorSize / bytesPerRow) * drawW, pad + drawW - start.x);
+        const y = start.y + ROW_HEIGHT - 3 + k;
+        ctx.strokeStyle = orderColor(order + k, 0.35);
+        ctx.lineWidth = 1;
+        ctx.beginPath();
+        ctx.moveTo(start.x + 0.5, y - 2);
+        ctx.lineTo(start.x + 0.5, y);
+        ctx.lineTo(start.x + width - 0.5, y);
+        ctx.lineTo(start.x + width - 0.5, y - 2);
+        ctx.stroke();
+    }
+    ctx.fillStyle = orderColor(order, 0.9);
+    const start = offsetToPixel(offset, pad, drawW, rows, bytesPerRow);
+    ctx.fillRect(start.x + BLOCK_PADDING, start.y + 1, Math.max(1, (size / bytesPerRow) * drawW - BLOCK_PADDING * 2), 2);
+}
+
+function orderColor(order, alpha) {
+    return `hsla(${(order * 37) % 360}, 75%, 60%, ${alpha})`;
+}
+
 function drawDeallocBlock(offset, size, alpha, pad, drawW, rows, bytesPerRow) {
     const start = offsetToPixel(offset, pad, drawW, rows, bytesPerRow);
     const pixelWidth = Math.max(2, (size / bytesPerRow) * drawW);
@@ -732,6 +946,8 @@ function showTooltip(x, y, block) {
         <div><span class="tt-label">Size: </span><span class="tt-value">${formatBytes(block.size)}</span></div>
         <div><span class="tt-label">Actual: </span><span class="tt-value">${formatBytes(block.actual_size)}</span></div>
         <div><span class="tt-label">Align: </span><span class="tt-value">${block.alignment}B</span></div>
+        ${block.order !== undefined ? `<div><span class="tt-label">Order: </span><span class="tt-value">${block.order} (${formatBytes(16 * 2 ** block.order)})</span></div>` : ''}
+        ${block.fill !== undefined ? `<div><span class="tt-label">Fill: </span><span class="tt-value">${formatBytes(block.fill)} (${Math.round(100 * block.fill / Math.max(1, block.size))}%)</span></div>` : ''}
     `;
 
     // Position tooltip, keeping it within the canvas container.